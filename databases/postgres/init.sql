@@ -15,6 +15,9 @@ ALTER SYSTEM SET log_duration = 'on';
 ALTER SYSTEM SET log_line_prefix = '%t [%p]: [%l-1] user=%u,db=%d,app=%a,client=%h ';
 SELECT pg_reload_conf();
 
+-- Widok statystyk zapytań (biblioteka ładowana w postgresql.conf) - źródło modelu obciążenia
+CREATE EXTENSION IF NOT EXISTS pg_stat_statements;
+
 -- 3) Użytkownicy testowi – takie same jak w simulate_activity.py
 CREATE USER app_user        WITH PASSWORD 'AppUser123!';
 CREATE USER analyst         WITH PASSWORD 'Analyst123!';
@@ -0,0 +1,427 @@
+"""
+Silnik wirtualnych użytkowników oparty o asyncio
+Uruchamia wiele niezależnych sesji jednocześnie na asynchronicznych sterownikach
+(asyncpg, aiomysql, motor) - jeden kontener generuje tysiące zapytań na sekundę
+"""
+
+import asyncio
+import random
+import time
+from datetime import datetime
+
+from config import DB_CONFIG
+from identity import default_stream
+from latency import LatencyRecorder
+from metrics import METRICS
+
+# Profile wirtualnych użytkowników: (baza, użytkownik)
+VU_PROFILES = [
+    ('postgres', 'app_user'),
+    ('postgres', 'analyst'),
+    ('mariadb', 'dbadmin'),
+    ('mongodb', 'appuser'),
+]
+
+# Ponawianie pierwszego połączenia VU: opóźnienie początkowe i górny limit (podwajane co próbę)
+CONNECT_RETRY_DELAY = 0.5
+CONNECT_RETRY_MAX_DELAY = 10.0
+
+
+# ============================================
+# POSTGRESQL - kroki wirtualnego użytkownika
+# ============================================
+
+async def pg_select_customers(conn):
+    await conn.fetch("SELECT customer_id, first_name, last_name, email FROM customers WHERE customer_id <= 3;")
+
+
+async def pg_insert_customer(conn):
+    person = default_stream().take()
+    await conn.execute(
+        "INSERT INTO customers (first_name, last_name, email, phone, pesel) VALUES ($1, $2, $3, $4, $5);",
+        person['first_name'], person['last_name'], person['email'], person['phone'], person['pesel'])
+
+
+async def pg_update_phone(conn):
+    await conn.execute("UPDATE customers SET phone = '666777888' WHERE email = 'jan.kowalski@email.pl';")
+
+
+async def pg_insert_transaction(conn):
+    await conn.execute(
+        f"INSERT INTO financial_transactions (customer_id, amount, transaction_type, account_number) "
+        f"VALUES (1, {random.uniform(50, 500):.2f}, 'payment', $1);",
+        default_stream().value('account_number'))
+
+
+async def pg_transaction_history(conn):
+    await conn.fetch(
+        "SELECT t.transaction_id, t.amount, t.transaction_type, t.transaction_date "
+        "FROM financial_transactions t "
+        "WHERE t.customer_id = 1 "
+        "ORDER BY t.transaction_date DESC LIMIT 5;")
+
+
+async def pg_monthly_report(conn):
+    await conn.fetch(
+        "SELECT COUNT(*) as total_transactions, SUM(amount) as total_amount "
+        "FROM financial_transactions "
+        "WHERE transaction_date >= CURRENT_DATE - INTERVAL '30 days';")
+
+
+async def pg_sqli_or(conn):
+    await conn.fetch("SELECT * FROM customers WHERE email = 'admin@example.com' OR '1'='1';")
+
+
+async def pg_read_pg_user(conn):
+    await conn.fetch("SELECT usename, usesuper, usecreatedb FROM pg_user;")
+
+
+async def pg_escalation(conn):
+    await conn.execute("ALTER USER app_user WITH SUPERUSER;")
+
+
+# ============================================
+# MARIADB - kroki wirtualnego użytkownika
+# ============================================
+
+async def _mariadb_query(conn, query, fetch=False, params=None):
+    async with conn.cursor() as cursor:
+        await cursor.execute(query, params)
+        if fetch:
+            await cursor.fetchall()
+
+
+async def maria_select_customers(conn):
+    await _mariadb_query(conn, "SELECT * FROM customers LIMIT 5;", fetch=True)
+
+
+async def maria_insert_customer(conn):
+    person = default_stream().take()
+    await _mariadb_query(conn,
+        "INSERT INTO customers (first_name, last_name, email, phone, pesel) VALUES (%s, %s, %s, %s, %s);",
+        params=(person['first_name'], person['last_name'], person['email'], person['phone'], person['pesel']))
+
+
+async def maria_daily_report(conn):
+    await _mariadb_query(conn,
+        "SELECT DATE(transaction_date) as date, COUNT(*) as count, SUM(amount) as total "
+        "FROM financial_transactions "
+        "GROUP BY DATE(transaction_date);", fetch=True)
+
+
+async def maria_blind_sqli(conn):
+    await _mariadb_query(conn, "SELECT * FROM customers WHERE customer_id = 1 AND 1=1;", fetch=True)
+
+
+async def maria_union_sqli(conn):
+    await _mariadb_query(conn,
+        "SELECT first_name, last_name FROM customers WHERE customer_id = 1 "
+        "UNION SELECT user, password FROM mysql.user;", fetch=True)
+
+
+# ============================================
+# MONGODB - kroki wirtualnego użytkownika
+# ============================================
+
+async def mongo_find_users(db):
+    await db.users.find().limit(3).to_list(length=3)
+
+
+async def mongo_insert_user(db):
+    await db.users.insert_one({
+        'username': f'new_user_{random.randint(1, 10**9)}',
+        'email': default_stream().value('email'),
+        'role': 'user',
+        'created': datetime.now()
+    })
+
+
+async def mongo_update_login(db):
+    await db.users.update_one({'username': 'john_doe'}, {'$set': {'last_login': datetime.now()}})
+
+
+async def mongo_order_stats(db):
+    pipeline = [{'$group': {'_id': '$user', 'total': {'$sum': '$total'}, 'count': {'$sum': 1}}}]
+    await db.orders.aggregate(pipeline).to_list(length=None)
+
+
+async def mongo_nosql_injection(db):
+    await db.users.find({'username': {'$ne': None}}).limit(10).to_list(length=10)
+
+
+async def mongo_list_collections(db):
+    await db.list_collection_names()
+
+
+# Mieszanka kroków: baza -> (normalne, ataki)
+STEP_MIX = {
+    'postgres': (
+        [pg_select_customers, pg_insert_customer, pg_update_phone,
+         pg_insert_transaction, pg_transaction_history, pg_monthly_report],
+        [pg_sqli_or, pg_read_pg_user, pg_escalation],
+    ),
+    'mariadb': (
+        [maria_select_customers, maria_insert_customer, maria_daily_report],
+        [maria_blind_sqli, maria_union_sqli],
+    ),
+    'mongodb': (
+        [mongo_find_users, mongo_insert_user, mongo_update_login, mongo_order_stats],
+        [mongo_nosql_injection, mongo_list_collections],
+    ),
+}
+
+
+# ============================================
+# POŁĄCZENIA ASYNCHRONICZNE
+# ============================================
+
+# Kroki zwracające wiersze/dokumenty - w histogramach jako faza 'fetch', pozostałe jako 'execute'
+FETCH_STEPS = {
+    pg_select_customers, pg_transaction_history, pg_monthly_report, pg_sqli_or, pg_read_pg_user,
+    maria_select_customers, maria_daily_report, maria_blind_sqli, maria_union_sqli,
+    mongo_find_users, mongo_order_stats, mongo_nosql_injection, mongo_list_collections,
+}
+
+
+def step_phase(step):
+    return 'fetch' if step in FETCH_STEPS else 'execute'
+
+
+async def open_connection(backend, username, password, event_listeners=None):
+    """Otwiera asynchroniczną sesję dla danej bazy (event_listeners - słuchacze komend motor)"""
+    cfg = DB_CONFIG[backend]
+    if backend == 'postgres':
+        import asyncpg
+
+        return await asyncpg.connect(
+            host=cfg['host'], port=cfg['port'], database=cfg['database'],
+            user=username, password=password, timeout=5)
+    if backend == 'mariadb':
+        import aiomysql
+
+        return await aiomysql.connect(
+            host=cfg['host'], port=cfg['port'], db=cfg['database'],
+            user=username, password=password, connect_timeout=5, autocommit=True)
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(
+        host=cfg['host'], port=cfg['port'], username=username, password=password,
+        authSource='admin', serverSelectionTimeoutMS=5000, event_listeners=event_listeners or [])
+    await client.admin.command('ping')
+    return client
+
+
+async def open_pool(backend, username, password, size=10, event_listeners=None):
+    """Otwiera asynchroniczną pulę połączeń dla danej bazy (motor ma własną pulę w kliencie)"""
+    cfg = DB_CONFIG[backend]
+    if backend == 'postgres':
+        import asyncpg
+
+        return await asyncpg.create_pool(
+            host=cfg['host'], port=cfg['port'], database=cfg['database'],
+            user=username, password=password, timeout=5, min_size=1, max_size=size)
+    if backend == 'mariadb':
+        import aiomysql
+
+        return await aiomysql.create_pool(
+            host=cfg['host'], port=cfg['port'], db=cfg['database'],
+            user=username, password=password, connect_timeout=5, autocommit=True,
+            minsize=1, maxsize=size)
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    client = AsyncIOMotorClient(
+        host=cfg['host'], port=cfg['port'], username=username, password=password,
+        authSource='admin', serverSelectionTimeoutMS=5000, maxPoolSize=size,
+        event_listeners=event_listeners or [])
+    await client.admin.command('ping')
+    return client
+
+
+async def run_pooled_step(backend, pool, step):
+    """Wykonuje jeden krok na połączeniu pobranym z asynchronicznej puli"""
+    if backend == 'mongodb':
+        await step(pool[DB_CONFIG[backend]['database']])
+        return
+    async with pool.acquire() as conn:
+        await step(conn)
+
+
+async def close_pool(backend, pool):
+    """Zamyka asynchroniczną pulę"""
+    if backend == 'postgres':
+        await pool.close()
+    elif backend == 'mariadb':
+        pool.close()
+        await pool.wait_closed()
+    else:
+        pool.close()
+
+
+async def close_connection(backend, conn):
+    """Zamyka asynchroniczną sesję"""
+    if backend == 'postgres':
+        await conn.close()
+    else:
+        conn.close()
+
+
+# ============================================
+# SILNIK
+# ============================================
+
+class EngineStats:
+    """Liczniki operacji wspólne dla wszystkich wirtualnych użytkowników"""
+
+    def __init__(self):
+        self.ok = {backend: 0 for backend in DB_CONFIG}
+        self.failed = {backend: 0 for backend in DB_CONFIG}
+        self.connect_failed = {backend: 0 for backend in DB_CONFIG}
+
+    def total(self):
+        return sum(self.ok.values()) + sum(self.failed.values())
+
+    def as_dict(self):
+        return {'ok': dict(self.ok), 'failed': dict(self.failed),
+                'connect_failed': dict(self.connect_failed)}
+
+    def load(self, data):
+        self.ok = dict(data['ok'])
+        self.failed = dict(data['failed'])
+        self.connect_failed = dict(data['connect_failed'])
+
+
+class AsyncEngine:
+    """Uruchamia N niezależnych wirtualnych użytkowników jednocześnie"""
+
+    def __init__(self, simulator, users=100, duration=60, attack_ratio=0.1,
+                 think_time=(0.0, 0.0), backends=None, seed=None, vu_ids=None, ready_timeout=0):
+        self.simulator = simulator
+        self.users = users
+        # Podzbiór wirtualnych użytkowników obsługiwany przez ten proces (tryb --workers)
+        self.vu_ids = list(vu_ids) if vu_ids is not None else list(range(users))
+        self.seed = seed
+        self.duration = duration
+        self.attack_ratio = attack_ratio
+        self.think_time = think_time
+        self.backends = backends or list(DB_CONFIG)
+        self.stats = EngineStats()
+        self.latency = LatencyRecorder()
+        METRICS.register_latency(self.latency)
+        self.profiles = [p for p in VU_PROFILES if p[0] in self.backends]
+        # Czas oczekiwania na gotowość baz (0 = VU łączą się od razu)
+        self.ready_timeout = ready_timeout
+        self.readiness = None
+
+    async def virtual_user(self, vu_id, deadline):
+        """Pętla jednego wirtualnego użytkownika - własna sesja i własny losowy przebieg"""
+        backend, username = self.profiles[vu_id % len(self.profiles)]
+        password = DB_CONFIG[backend]['users'][username]
+        # Przebieg VU zależy tylko od (seed, vu_id) - niezależnie od podziału na procesy
+        rng = random.Random(f"{self.seed}:{vu_id}") if self.seed is not None else random.Random()
+
+        # VU danej bazy ruszają, gdy tylko ona jest gotowa - niezależnie od pozostałych
+        if self.readiness is not None and not await self.readiness.wait_async(backend):
+            self.stats.connect_failed[backend] += 1
+            return
+
+        normal_steps, attack_steps = STEP_MIX[backend]
+
+        def next_step():
+            return rng.choice(attack_steps if rng.random() < self.attack_ratio else normal_steps)
+
+        # Połączenie otwierane jest dla pierwszego kroku - jego czas trafia pod etykietę tego kroku
+        step = next_step()
+        conn = await self.connect(vu_id, backend, username, password, step.__name__, deadline)
+        if conn is None:
+            return
+        target = conn[DB_CONFIG[backend]['database']] if backend == 'mongodb' else conn
+
+        try:
+            while time.monotonic() < deadline:
+                try:
+                    with METRICS.operation(backend, username, step.__name__), \
+                            self.latency.measure(backend, step.__name__, step_phase(step)):
+                        await step(target)
+                    self.stats.ok[backend] += 1
+                except Exception:
+                    # Ataki celowo kończą się błędami uprawnień - to też zdarzenie audytowe
+                    self.stats.failed[backend] += 1
+                if self.think_time[1] > 0:
+                    await asyncio.sleep(rng.uniform(*self.think_time))
+                else:
+                    await asyncio.sleep(0)
+                step = next_step()
+        finally:
+            await close_connection(backend, conn)
+
+    async def connect(self, vu_id, backend, username, password, scenario, deadline):
+        """Otwiera sesję VU, ponawiając z wykładniczym odstępem do końca przebiegu
+
+        Każda nieudana próba liczy się w connect_failed; błąd jest wypisywany przy pierwszej
+        próbie i przy rezygnacji. Zwraca None, gdy do końca przebiegu nie udało się połączyć.
+        """
+        delay = CONNECT_RETRY_DELAY
+        attempts = 0
+        while True:
+            attempts += 1
+            try:
+                with self.latency.measure(backend, scenario, 'connect'):
+                    return await open_connection(backend, username, password)
+            except Exception as e:
+                self.stats.connect_failed[backend] += 1
+                error = e
+            if attempts == 1:
+                self.simulator.print_error(
+                    f"VU {vu_id}: błąd połączenia {backend} ({username}): {error} - ponawianie")
+            # Losowe rozrzucenie odstępu (poza generatorem VU - przebieg zostaje powtarzalny)
+            pause = delay * random.uniform(0.5, 1.0)
+            if time.monotonic() + pause >= deadline:
+                self.simulator.print_error(
+                    f"VU {vu_id}: brak połączenia {backend} ({username}) po {attempts} próbach: {error}")
+                return None
+            await asyncio.sleep(pause)
+            delay = min(delay * 2, CONNECT_RETRY_MAX_DELAY)
+
+    async def run(self):
+        """Uruchamia wszystkich wirtualnych użytkowników i czeka na ich zakończenie"""
+        deadline = time.monotonic() + self.duration
+        if self.ready_timeout:
+            from readiness import ReadinessProbe
+            self.readiness = ReadinessProbe(self.simulator, sorted({backend for backend, _ in self.profiles}),
+                                            timeout=self.ready_timeout, seed=self.seed).start()
+        tasks = [asyncio.create_task(self.virtual_user(i, deadline)) for i in self.vu_ids]
+        await asyncio.gather(*tasks)
+
+    def run_blocking(self):
+        """Uruchamia pętlę zdarzeń i zwraca czas trwania w sekundach"""
+        started = time.monotonic()
+        asyncio.run(self.run())
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        return (f"Silnik asyncio: {self.users} wirtualnych użytkowników, {self.duration}s, "
+                f"bazy: {', '.join(self.backends)}")
+
+    def stats_dict(self):
+        return dict(self.stats.as_dict(), latency=self.latency.as_dict())
+
+    def load_stats(self, data):
+        self.stats.load(data)
+        self.latency.load(data.get('latency', {}))
+
+    def start(self):
+        """Punkt wejścia synchroniczny - uruchamia pętlę zdarzeń i drukuje podsumowanie"""
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run_blocking())
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie silnika asyncio")
+        for backend in self.backends:
+            ok = self.stats.ok[backend]
+            failed = self.stats.failed[backend]
+            self.simulator.print_info(
+                f"{backend}: {ok} OK, {failed} błędów, "
+                f"{self.stats.connect_failed[backend]} nieudanych prób połączenia, "
+                f"{(ok + failed) / elapsed:.1f} op/s")
+        self.simulator.print_info(f"Razem: {self.stats.total() / elapsed:.1f} op/s w {elapsed:.1f}s")
+        self.latency.print_summary(self.simulator, detailed=True)
@@ -0,0 +1,378 @@
+"""
+Macierz A/B kosztu konfiguracji audytu
+Każdy wariant logowania jest włączany w działającej bazie (ALTER SYSTEM, SET GLOBAL,
+setProfilingLevel), po czym to samo obciążenie o stałym ziarnie mierzy przepustowość,
+opóźnienia i bajty logów na 1000 operacji. Po każdym wariancie przywracane są wartości
+sprzed pomiaru - także wtedy, gdy pomiar się nie powiedzie
+"""
+
+import glob
+import json
+import os
+import time
+
+from async_engine import AsyncEngine
+from benchmark import environment
+from config import DB_CONFIG
+from preagg import WATCHED_LOGS
+
+# Konta z prawem zmiany konfiguracji serwera
+ADMIN_USERS = {'postgres': 'dba', 'mariadb': 'root', 'mongodb': 'admin'}
+# Czas na przeładowanie konfiguracji przed pomiarem i na zrzut buforów logów po nim
+SETTLE_SECONDS = 2.0
+REFERENCE = 'full'
+
+# Warianty: nazwa, opis utraty danych dla dashboardów, ustawienia. Wariant 'full' niczego
+# nie zmienia - to konfiguracja z repozytorium i punkt odniesienia dla pozostałych.
+VARIANTS = {
+    'postgres': [
+        ('full', "konfiguracja z postgresql.conf", {}),
+        ('no-statement-log', "SQL tylko z pgaudit - bez log_statement i czasów wykonania",
+         {'log_statement': 'none', 'log_duration': 'off', 'log_min_duration_statement': '-1'}),
+        ('pgaudit-lean', "pgaudit bez katalogu, relacji i parametrów (log_statement zostaje)",
+         {'pgaudit.log_catalog': 'off', 'pgaudit.log_relation': 'off', 'pgaudit.log_parameter': 'off'}),
+        ('pgaudit-write-ddl', "pgaudit bez odczytów - panele eksfiltracji tracą SELECT",
+         {'pgaudit.log': 'write, ddl, role', 'log_statement': 'none', 'log_duration': 'off',
+          'log_min_duration_statement': '-1'}),
+        ('off', "bez audytu i logu zapytań - tylko połączenia (dolna granica kosztu)",
+         {'pgaudit.log': 'none', 'log_statement': 'none', 'log_duration': 'off',
+          'log_min_duration_statement': '-1'}),
+    ],
+    'mariadb': [
+        ('full', "konfiguracja z my.cnf", {}),
+        ('binlog-async', "sync_binlog = 0 - binlog bez fsync przy każdym zatwierdzeniu",
+         {'sync_binlog': '0'}),
+        ('no-ps-history', "performance_schema bez historii zapytań (digesty zostają)",
+         {'consumer:events_statements_history': 'NO', 'consumer:events_statements_history_long': 'NO'}),
+        ('audit-ddl-dcl', "server_audit bez DML - panele eksfiltracji tracą SELECT/INSERT",
+         {'server_audit_events': 'CONNECT,QUERY_DDL,QUERY_DCL'}),
+        ('off', "server_audit wyłączony, sync_binlog = 0, bez historii performance_schema",
+         {'server_audit_logging': 'OFF', 'sync_binlog': '0', 'consumer:events_statements_history': 'NO',
+          'consumer:events_statements_history_long': 'NO'}),
+    ],
+    'mongodb': [
+        ('full', "profiler poziom 2 (slowms 0) i szczegółowość komend 2", {}),
+        ('profile-slow', "profiler tylko operacji wolniejszych niż 100 ms", {'profile': (1, 100)}),
+        ('command-verbosity-0', "profiler bez zmian, log komend na poziomie domyślnym",
+         {'command_verbosity': 0}),
+        ('off', "profiler wyłączony i log komend domyślny", {'profile': (0, 100), 'command_verbosity': 0}),
+    ],
+}
+
+
+# ============================================
+# ZMIANA I PRZYWRACANIE KONFIGURACJI
+# ============================================
+
+class PostgresSettings:
+    """ALTER SYSTEM + pg_reload_conf; przywraca wpisy postgresql.auto.conf sprzed zmiany"""
+
+    # pg_ls_logdir widzi te same pliki co --log-root - liczony tylko, gdy plików nie widać
+    mirrors_files = True
+
+    def __init__(self):
+        import psycopg2
+
+        cfg = DB_CONFIG['postgres']
+        user = ADMIN_USERS['postgres']
+        self.conn = psycopg2.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'], user=user,
+                                     password=cfg['users'][user], connect_timeout=5)
+        self.conn.autocommit = True
+
+    def apply(self, settings):
+        cursor = self.conn.cursor()
+        # init.sql ustawia część parametrów przez ALTER SYSTEM - te wartości trzeba odtworzyć, nie zresetować
+        cursor.execute("SELECT name, setting FROM pg_file_settings "
+                       "WHERE sourcefile LIKE '%%postgresql.auto.conf' AND name = ANY(%s)", (list(settings),))
+        saved = {name: None for name in settings}
+        saved.update(dict(cursor.fetchall()))
+        try:
+            for name, value in settings.items():
+                cursor.execute(f"ALTER SYSTEM SET {name} = %s", (value,))
+        except Exception:
+            self.restore(saved)
+            raise
+        finally:
+            cursor.execute("SELECT pg_reload_conf()")
+            cursor.close()
+        return saved
+
+    def restore(self, saved):
+        cursor = self.conn.cursor()
+        for name, value in saved.items():
+            if value is None:
+                cursor.execute(f"ALTER SYSTEM RESET {name}")
+            else:
+                cursor.execute(f"ALTER SYSTEM SET {name} = %s", (value,))
+        cursor.execute("SELECT pg_reload_conf()")
+        cursor.close()
+
+    def log_bytes(self):
+        """Suma rozmiarów plików w log_directory (pg_ls_logdir wymaga superużytkownika)"""
+        cursor = self.conn.cursor()
+        cursor.execute("SELECT COALESCE(SUM(size), 0) FROM pg_ls_logdir()")
+        size = int(cursor.fetchone()[0])
+        cursor.close()
+        return {'log_directory': size}
+
+    def close(self):
+        self.conn.close()
+
+
+class MariaDBSettings:
+    """SET GLOBAL i setup_consumers performance_schema; przywraca odczytane wcześniej wartości"""
+
+    mirrors_files = False
+
+    def __init__(self):
+        import mysql.connector
+
+        cfg = DB_CONFIG['mariadb']
+        user = ADMIN_USERS['mariadb']
+        self.conn = mysql.connector.connect(host=cfg['host'], port=cfg['port'], user=user,
+                                            password=cfg['users'][user], connect_timeout=5, autocommit=True)
+
+    def apply(self, settings):
+        cursor = self.conn.cursor()
+        saved = {}
+        for name, value in settings.items():
+            if name.startswith('consumer:'):
+                consumer = name.split(':', 1)[1]
+                cursor.execute("SELECT ENABLED FROM performance_schema.setup_consumers WHERE NAME = %s", (consumer,))
+                saved[name] = cursor.fetchone()[0]
+            else:
+                cursor.execute(f"SELECT @@GLOBAL.{name}")
+                saved[name] = str(cursor.fetchone()[0])
+        try:
+            self._set(cursor, settings)
+        except Exception:
+            self.restore(saved)
+            raise
+        finally:
+            cursor.close()
+        return saved
+
+    def _set(self, cursor, settings):
+        for name, value in settings.items():
+            if name.startswith('consumer:'):
+                cursor.execute("UPDATE performance_schema.setup_consumers SET ENABLED = %s WHERE NAME = %s",
+                               (value, name.split(':', 1)[1]))
+            else:
+                # Zmienne liczbowe nie przyjmują napisu ('0'), ON/OFF i listy zdarzeń - tak
+                numeric = str(value).lstrip('-').isdigit()
+                cursor.execute(f"SET GLOBAL {name} = %s", (int(value) if numeric else value,))
+
+    def restore(self, saved):
+        cursor = self.conn.cursor()
+        self._set(cursor, saved)
+        cursor.close()
+
+    def log_bytes(self):
+        """Rozmiar binlogów (SHOW BINARY LOGS) - audit.log liczony z plików pod --log-root"""
+        cursor = self.conn.cursor()
+        cursor.execute("SHOW BINARY LOGS")
+        size = sum(int(row[1]) for row in cursor.fetchall())
+        cursor.close()
+        return {'binlog': size}
+
+    def close(self):
+        self.conn.close()
+
+
+class MongoSettings:
+    """setProfilingLevel na bazie symulatora i logComponentVerbosity.command"""
+
+    mirrors_files = False
+
+    def __init__(self):
+        import pymongo
+
+        cfg = DB_CONFIG['mongodb']
+        user = ADMIN_USERS['mongodb']
+        self.client = pymongo.MongoClient(host=cfg['host'], port=cfg['port'], username=user,
+                                          password=cfg['users'][user], authSource='admin',
+                                          serverSelectionTimeoutMS=5000)
+        self.db = self.client[cfg['database']]
+        self.since = None
+
+    def _verbosity(self):
+        reply = self.client.admin.command('getParameter', 1, logComponentVerbosity=1)
+        return reply['logComponentVerbosity'].get('command', {}).get('verbosity', -1)
+
+    def apply(self, settings):
+        # Początek okna, z którego liczone są wpisy profilera
+        self.since = self.db.command('serverStatus')['localTime']
+        saved = {}
+        try:
+            if 'profile' in settings:
+                current = self.db.command('profile', -1)
+                saved['profile'] = (current['was'], current['slowms'])
+                level, slowms = settings['profile']
+                self.db.command('profile', level, slowms=slowms)
+            if 'command_verbosity' in settings:
+                saved['command_verbosity'] = self._verbosity()
+                self._set_verbosity(settings['command_verbosity'])
+        except Exception:
+            self.restore(saved)
+            raise
+        return saved
+
+    def _set_verbosity(self, level):
+        self.client.admin.command('setParameter', 1, logComponentVerbosity={'command': {'verbosity': level}})
+
+    def restore(self, saved):
+        if 'profile' in saved:
+            level, slowms = saved['profile']
+            self.db.command('profile', level, slowms=slowms)
+        if 'command_verbosity' in saved:
+            self._set_verbosity(saved['command_verbosity'])
+
+    def log_bytes(self):
+        """Bajty dokumentów system.profile od włączenia wariantu ($bsonSize, MongoDB 4.4+)
+
+        system.profile jest kolekcją ograniczoną (domyślnie 1 MB) - przy długim pomiarze
+        najstarsze wpisy znikają i wynik jest dolnym oszacowaniem.
+        """
+        rows = list(self.db['system.profile'].aggregate([
+            {'$match': {'ts': {'$gte': self.since}}},
+            {'$group': {'_id': None, 'bytes': {'$sum': {'$bsonSize': '$$ROOT'}}}},
+        ]))
+        return {'system.profile': rows[0]['bytes'] if rows else 0}
+
+    def close(self):
+        self.client.close()
+
+
+SETTINGS = {'postgres': PostgresSettings, 'mariadb': MariaDBSettings, 'mongodb': MongoSettings}
+
+
+# ============================================
+# POMIAR
+# ============================================
+
+class AuditMatrix:
+    """Dla każdej bazy kolejno: wariant -> obciążenie -> pomiar -> przywrócenie konfiguracji"""
+
+    def __init__(self, simulator, backends=None, variants=None, users=50, duration=60, attack_ratio=0.1,
+                 seed=42, log_root='/', output=None):
+        self.simulator = simulator
+        self.backends = [b for b in (backends or DB_CONFIG) if b in VARIANTS]
+        self.variants = variants
+        self.users = users
+        self.duration = duration
+        self.attack_ratio = attack_ratio
+        self.seed = seed
+        self.log_root = log_root
+        self.output = output
+        self.results = []
+
+    def file_bytes(self, backend):
+        """Rozmiary plików logów widocznych pod log_root (wzorce jak w trybie preagg)"""
+        sizes = {}
+        for watched, pattern, sourcetype in WATCHED_LOGS:
+            if watched != backend:
+                continue
+            for path in glob.glob(os.path.join(self.log_root, pattern.lstrip('/'))):
+                if os.path.isfile(path):
+                    sizes[sourcetype] = sizes.get(sourcetype, 0) + os.path.getsize(path)
+        return sizes
+
+    def log_bytes(self, backend, settings):
+        sizes = self.file_bytes(backend)
+        if sizes and settings.mirrors_files:
+            return sizes
+        try:
+            sizes.update(settings.log_bytes())
+        except Exception as e:
+            self.simulator.print_error(f"{backend}: odczyt rozmiaru logów po stronie serwera: {e}")
+        return sizes
+
+    def measure(self, backend, settings, name, description, changes):
+        saved = settings.apply(changes)
+        try:
+            time.sleep(SETTLE_SECONDS)
+            before = self.log_bytes(backend, settings)
+            engine = AsyncEngine(self.simulator, users=self.users, duration=self.duration,
+                                 attack_ratio=self.attack_ratio, backends=[backend], seed=self.seed)
+            elapsed = engine.run_blocking()
+            time.sleep(SETTLE_SECONDS)
+            after = self.log_bytes(backend, settings)
+        finally:
+            settings.restore(saved)
+        operations = engine.stats.total()
+        produced = {source: max(0, after.get(source, 0) - before.get(source, 0)) for source in after}
+        latency = {phase: histogram.summary()
+                   for (_, phase), histogram in sorted(engine.latency.by_backend().items()) if phase != 'connect'}
+        total = sum(produced.values())
+        return {
+            'backend': backend,
+            'variant': name,
+            'description': description,
+            'settings': {key: list(value) if isinstance(value, tuple) else value for key, value in changes.items()},
+            'elapsed_s': round(elapsed, 3),
+            'operations': operations,
+            'errors': engine.stats.failed[backend],
+            'throughput_ops': round(operations / elapsed, 2),
+            'latency': latency,
+            'log_bytes': produced,
+            'log_bytes_per_1000_ops': round(total * 1000 / operations, 1) if operations else None,
+        }
+
+    def run(self):
+        for backend in self.backends:
+            try:
+                settings = SETTINGS[backend]()
+            except Exception as e:
+                self.simulator.print_error(f"{backend}: brak połączenia administracyjnego ({ADMIN_USERS[backend]}): {e}")
+                continue
+            try:
+                for name, description, changes in VARIANTS[backend]:
+                    if self.variants and name not in self.variants:
+                        continue
+                    self.simulator.print_scenario(f"{backend}/{name}: {description}")
+                    try:
+                        result = self.measure(backend, settings, name, description, changes)
+                    except Exception as e:
+                        self.simulator.print_error(f"{backend}/{name}: pomiar nieudany: {e}")
+                        continue
+                    self.results.append(result)
+                    self.simulator.print_detail(self._format(result))
+            finally:
+                settings.close()
+
+    @staticmethod
+    def _format(result):
+        p99 = max((summary['p99_ms'] for summary in result['latency'].values()), default=0.0)
+        per_ops = result['log_bytes_per_1000_ops']
+        return (f"{result['throughput_ops']:.0f} operacji/s, p99 {p99:.1f} ms, błędy {result['errors']}, "
+                f"log {per_ops / 1024 if per_ops is not None else 0:.1f} KB / 1000 operacji "
+                f"({', '.join(f'{s} {b / 1024:.0f} KB' for s, b in sorted(result['log_bytes'].items())) or 'brak źródeł'})")
+
+    def describe(self):
+        return (f"Macierz audytu: {', '.join(self.backends)}, {self.users} VU x {self.duration:g}s na wariant, "
+                f"udział ataków {self.attack_ratio:.0%}, ziarno {self.seed}")
+
+    def start(self):
+        self.simulator.print_header("Koszt konfiguracji audytu (A/B)")
+        self.simulator.print_info(self.describe())
+        self.run()
+        self.print_summary()
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump({'environment': environment(), 'users': self.users, 'duration_s': self.duration,
+                           'attack_ratio': self.attack_ratio, 'seed': self.seed, 'results': self.results},
+                          f, indent=2, ensure_ascii=False)
+            self.simulator.print_info(f"Wyniki zapisane w {self.output}")
+
+    def print_summary(self):
+        self.simulator.print_header(f"Warianty audytu względem '{REFERENCE}'")
+        reference = {r['backend']: r for r in self.results if r['variant'] == REFERENCE}
+        for result in self.results:
+            base = reference.get(result['backend'])
+            line = f"{result['backend']}/{result['variant']}: {self._format(result)}"
+            if base is not None and result is not base and base['throughput_ops']:
+                change = result['throughput_ops'] / base['throughput_ops'] - 1
+                line += f"; przepustowość {change:+.1%}"
+                if base['log_bytes_per_1000_ops'] and result['log_bytes_per_1000_ops'] is not None:
+                    line += f", log {result['log_bytes_per_1000_ops'] / base['log_bytes_per_1000_ops'] - 1:+.1%}"
+            self.simulator.print_info(line)
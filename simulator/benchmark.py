@@ -0,0 +1,201 @@
+"""
+Powtarzalny benchmark symulatora
+Odtwarza stałe obciążenia z benchmarks/*.json (stałe ziarno, stała liczba użytkowników i tempo)
+i zapisuje przepustowość oraz p50/p95/p99/max do pliku JSON, który można porównać z innym przebiegiem
+"""
+
+import hashlib
+import json
+import os
+import platform
+import socket
+import subprocess
+from datetime import datetime
+
+from config import DB_CONFIG
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'benchmarks')
+RESULTS_DIR = 'benchmark_results'
+# Pliki konfiguracyjne baz - ich skróty trafiają do wyników, żeby było wiadomo, co porównujemy
+CONFIG_FILES = (
+    '../databases/postgres/postgresql.conf',
+    '../databases/mariadb/my.cnf',
+    '../databases/mongodb/mongod.conf',
+)
+
+
+def load_workloads(path=None):
+    with open(path or os.path.join(BENCHMARK_DIR, 'default.json'), encoding='utf-8') as f:
+        return json.load(f)['workloads']
+
+
+def environment():
+    """Metadane przebiegu: host, wersje, commit i skróty konfiguracji baz"""
+    here = os.path.dirname(os.path.abspath(__file__))
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=here, capture_output=True,
+                                text=True, timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        commit = None
+    configs = {}
+    for name in CONFIG_FILES:
+        path = os.path.join(here, name)
+        if os.path.exists(path):
+            with open(path, 'rb') as f:
+                configs[os.path.basename(name)] = hashlib.sha256(f.read()).hexdigest()[:12]
+    return {
+        'started_at': datetime.now().isoformat(timespec='seconds'),
+        'host': socket.gethostname(),
+        'python': platform.python_version(),
+        'commit': commit,
+        'configs': configs,
+    }
+
+
+class BenchmarkRunner:
+    """Uruchamia kolejno obciążenia, zbiera histogramy i zapisuje wyniki"""
+
+    def __init__(self, simulator, workload_file=None, output=None, only=None, label=None,
+                 repeat=1, compare=None):
+        self.simulator = simulator
+        self.workloads = [w for w in load_workloads(workload_file) if not only or w['name'] in only]
+        self.output = output or os.path.join(
+            RESULTS_DIR, f"{datetime.now().strftime('%Y%m%d_%H%M%S')}{'_' + label if label else ''}.json")
+        self.label = label
+        self.repeat = repeat
+        self.compare = compare
+
+    # ============================================
+    # BUDOWANIE SILNIKÓW
+    # ============================================
+
+    def build_engine(self, spec):
+        """Zwraca (silnik, funkcja licząca (operacje, błędy)) dla definicji obciążenia"""
+        engine = spec['engine']
+        seed = spec.get('seed', 42)
+        if engine == 'scenarios':
+            from scenarios import ScenarioEngine, StepPlan, load_scenarios
+            scenarios = load_scenarios(spec.get('scenario_files'), spec.get('weights'))
+            if 'think_time' in spec:
+                think_min, think_max = spec['think_time']
+                for scenario in scenarios:
+                    for step in scenario.steps:
+                        step.think_min, step.think_max = think_min, think_max
+            runner = ScenarioEngine(self.simulator, StepPlan(scenarios), users=spec.get('users', 50),
+                                    duration=spec.get('duration', 60), pool_size=spec.get('pool_size', 20),
+                                    seed=seed)
+
+            def counts():
+                ok = sum(s['ok'] for s in runner.stats.values())
+                failed = sum(s['failed'] for s in runner.stats.values())
+                return ok + failed, failed
+            return runner, counts
+        if engine == 'async':
+            from async_engine import AsyncEngine
+            runner = AsyncEngine(self.simulator, users=spec.get('users', 100), duration=spec.get('duration', 60),
+                                 attack_ratio=spec.get('attack_ratio', 0.1),
+                                 think_time=tuple(spec.get('think_time', (0.0, 0.0))),
+                                 backends=spec.get('backends'), seed=seed)
+            return runner, lambda: (runner.stats.total(), sum(runner.stats.failed.values()))
+        if engine == 'rate':
+            from scheduler import OpenLoopScheduler, RateProfile, parse_rate_specs
+            rates = parse_rate_specs(f"{key}={value}" for key, value in spec['rates'].items())
+            profile = RateProfile(spec.get('duration', 60), ramp_up=spec.get('ramp_up', 0))
+            runner = OpenLoopScheduler(self.simulator, rates, profile, process=spec.get('arrival', 'poisson'),
+                                       max_in_flight=spec.get('max_in_flight', 1000),
+                                       pool_size=spec.get('pool_size', 20), seed=seed)
+
+            def counts():
+                done = sum(s.completed + s.failed for s in runner.stats.values())
+                return done, sum(s.failed for s in runner.stats.values())
+            return runner, counts
+        raise ValueError(f"Nieznany silnik obciążenia '{engine}' w '{spec['name']}'")
+
+    def run_workload(self, spec, iteration):
+        runner, counts = self.build_engine(spec)
+        self.simulator.print_scenario(f"{spec['name']} (przebieg {iteration + 1}/{self.repeat}): {runner.describe()}")
+        elapsed = runner.run_blocking()
+        operations, errors = counts()
+        overall = {f"{backend}/{phase}": histogram.summary()
+                   for (backend, phase), histogram in sorted(runner.latency.by_backend().items())}
+        return {
+            'name': spec['name'],
+            'iteration': iteration,
+            'spec': spec,
+            'elapsed_s': round(elapsed, 3),
+            'operations': operations,
+            'errors': errors,
+            'throughput_ops': round(operations / elapsed, 2),
+            'latency': overall,
+            'latency_detail': runner.latency.rows(),
+        }
+
+    # ============================================
+    # URUCHOMIENIE I RAPORT
+    # ============================================
+
+    def run(self):
+        results = {'label': self.label, 'environment': environment(),
+                   'backends': {name: cfg['host'] for name, cfg in DB_CONFIG.items()}, 'workloads': []}
+        self.simulator.print_header(f"Benchmark: {len(self.workloads)} obciążeń x {self.repeat}")
+        for spec in self.workloads:
+            for iteration in range(self.repeat):
+                result = self.run_workload(spec, iteration)
+                results['workloads'].append(result)
+                self.print_result(result)
+                # Zapis po każdym obciążeniu - przerwany benchmark zostawia częściowe wyniki
+                self.save(results)
+        self.simulator.print_info(f"Wyniki zapisane w {self.output}")
+        if self.compare:
+            self.print_comparison(results, self.compare)
+        return results
+
+    def save(self, results):
+        directory = os.path.dirname(self.output)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        tmp = self.output + '.tmp'
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2, ensure_ascii=False)
+        os.replace(tmp, self.output)
+
+    def print_result(self, result):
+        self.simulator.print_info(
+            f"{result['name']}: {result['throughput_ops']:.1f} op/s, {result['operations']} operacji, "
+            f"{result['errors']} błędów, {result['elapsed_s']:.1f}s")
+        for key, summary in result['latency'].items():
+            self.simulator.print_info(
+                f"  {key}: p50 {summary['p50_ms']:.2f} ms, p95 {summary['p95_ms']:.2f} ms, "
+                f"p99 {summary['p99_ms']:.2f} ms, max {summary['max_ms']:.2f} ms")
+
+    @staticmethod
+    def _best(results):
+        """Mediana przepustowości i p99 dla każdego obciążenia (przy --repeat > 1)"""
+        grouped = {}
+        for result in results['workloads']:
+            grouped.setdefault(result['name'], []).append(result)
+        summary = {}
+        for name, runs in grouped.items():
+            runs = sorted(runs, key=lambda r: r['throughput_ops'])
+            summary[name] = runs[len(runs) // 2]
+        return summary
+
+    def print_comparison(self, results, baseline_path):
+        with open(baseline_path, encoding='utf-8') as f:
+            baseline = self._best(json.load(f))
+        current = self._best(results)
+        self.simulator.print_header(f"Porównanie z {baseline_path}")
+        for name, result in current.items():
+            before = baseline.get(name)
+            if before is None:
+                self.simulator.print_info(f"{name}: brak w wynikach bazowych")
+                continue
+            change = (result['throughput_ops'] / before['throughput_ops'] - 1) * 100 if before['throughput_ops'] else 0.0
+            self.simulator.print_info(
+                f"{name}: {before['throughput_ops']:.1f} -> {result['throughput_ops']:.1f} op/s ({change:+.1f}%)")
+            for key, summary in result['latency'].items():
+                old = before['latency'].get(key)
+                if old and old['p99_ms']:
+                    self.simulator.print_info(
+                        f"  {key} p99: {old['p99_ms']:.2f} -> {summary['p99_ms']:.2f} ms "
+                        f"({(summary['p99_ms'] / old['p99_ms'] - 1) * 100:+.1f}%)")
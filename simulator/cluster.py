@@ -0,0 +1,331 @@
+"""
+Rozproszone generowanie obciążenia: koordynator i agenci
+Koordynator czeka na N agentów, rozdaje im fragmenty zadania (wirtualni użytkownicy
+i części tempa jak przy --workers) z jednym momentem startu, zbiera bieżące liczniki
+i na końcu scala wyniki z histogramami opóźnień w jedno podsumowanie.
+
+Protokół: linie JSON przez TCP, jedna wiadomość na linię:
+  agent -> koordynator  {"type": "hello", "agent": nazwa}
+  koordynator -> agent  {"type": "job", "index": k, "count": N, "start_in": s, "job": {...}}
+  agent -> koordynator  {"type": "metrics", "counters": [...], "gauges": [...]}   (co interval)
+  agent -> koordynator  {"type": "result", "elapsed": s, "stats": {...}} albo {"type": "error", ...}
+"""
+
+import json
+import os
+import random
+import selectors
+import socket
+import threading
+import time
+
+from metrics import METRICS
+from workers import merge_counters
+
+DEFAULT_PORT = 7070
+
+
+def parse_address(address, default_host='127.0.0.1'):
+    """'host:port', 'host' albo ':port' -> (host, port)"""
+    host, _, port = address.rpartition(':') if ':' in address else (address, '', '')
+    return host or default_host, int(port or DEFAULT_PORT)
+
+
+def send_message(sock, message):
+    sock.sendall((json.dumps(message) + '\n').encode())
+
+
+def metric_series(series):
+    """Migawka rejestru metryk -> lista [nazwa, etykiety, wartość] zdatna do JSON"""
+    return [[name, [list(pair) for pair in labels], value] for (name, labels), value in series]
+
+
+# ============================================
+# KOORDYNATOR
+# ============================================
+
+class AgentConnection:
+    """Stan jednego agenta po stronie koordynatora"""
+
+    def __init__(self, sock, address):
+        self.sock = sock
+        self.address = address
+        self.buffer = b''
+        self.name = None
+        self.index = None
+        self.counters = []
+        self.gauges = []
+        self.result = None
+        self.error = None
+        self.closed = False
+
+    def messages(self, data):
+        """Dokleja odebrane bajty i zwraca kompletne wiadomości"""
+        self.buffer += data
+        *lines, self.buffer = self.buffer.split(b'\n')
+        return [json.loads(line) for line in lines if line.strip()]
+
+    def label(self):
+        return f"{self.name or self.address} (#{self.index})"
+
+
+class Coordinator:
+    """Rozdaje fragmenty zadania agentom i scala ich wyniki
+
+    Start jest synchronizowany względnie: każdy agent dostaje w zadaniu liczbę sekund do
+    startu liczoną w chwili wysyłki, więc zegary maszyn nie muszą być zgodne - rozrzut
+    startów to różnica czasu dostarczenia wiadomości.
+    """
+
+    def __init__(self, simulator, job, runner, agents=2, address='0.0.0.0:7070', start_delay=3.0,
+                 wait=300.0, interval=5.0):
+        self.simulator = simulator
+        self.job = job
+        self.runner = runner
+        self.agents = agents
+        self.address = parse_address(address, default_host='0.0.0.0')
+        self.start_delay = start_delay
+        self.wait = wait
+        self.interval = interval
+        self.connections = []
+        self.selector = selectors.DefaultSelector()
+        self.totals = {}
+        self.last_report = 0.0
+
+    def describe(self):
+        return (f"Koordynator {self.address[0]}:{self.address[1]}: tryb {self.job['mode']}, "
+                f"{self.agents} agentów, start {self.start_delay}s po zebraniu wszystkich")
+
+    def receive(self, connection):
+        """Obsługuje dane od agenta; False gdy połączenie zostało zamknięte"""
+        try:
+            data = connection.sock.recv(1 << 20)
+        except OSError:
+            data = b''
+        if not data:
+            connection.closed = True
+            self.selector.unregister(connection.sock)
+            connection.sock.close()
+            if connection.result is None and connection.error is None and connection.index is not None:
+                connection.error = "połączenie zerwane przed wynikiem"
+                self.simulator.print_error(f"Agent {connection.label()}: {connection.error}")
+            return False
+        for message in connection.messages(data):
+            kind = message.get('type')
+            if kind == 'hello':
+                connection.name = message.get('agent')
+                self.simulator.print_info(f"Agent {connection.name} połączony z {connection.address[0]} "
+                                          f"({len(self.named())}/{self.agents})")
+            elif kind == 'metrics':
+                connection.counters = message['counters']
+                connection.gauges = message['gauges']
+            elif kind == 'result':
+                connection.result = message
+                self.simulator.print_info(f"Agent {connection.label()} zakończył po {message['elapsed']:.1f}s")
+            elif kind == 'error':
+                connection.error = message.get('message')
+                self.simulator.print_error(f"Agent {connection.label()}: {connection.error}")
+        return True
+
+    def named(self):
+        return [c for c in self.connections if c.name is not None and not c.closed]
+
+    def gather(self, server):
+        """Przyjmuje agentów, aż zgłosi się wymagana liczba albo minie czas oczekiwania"""
+        deadline = time.monotonic() + self.wait
+        while len(self.named()) < self.agents:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                return False
+            for key, _ in self.selector.select(timeout=min(remaining, 1.0)):
+                if key.fileobj is server:
+                    sock, address = server.accept()
+                    connection = AgentConnection(sock, address)
+                    self.connections.append(connection)
+                    self.selector.register(sock, selectors.EVENT_READ, connection)
+                else:
+                    self.receive(key.data)
+        return True
+
+    def dispatch(self):
+        """Wysyła zadania - indeksy w kolejności zgłoszeń, wspólny moment startu"""
+        agents = self.named()[:self.agents]
+        start = time.monotonic() + self.start_delay
+        for index, connection in enumerate(agents):
+            connection.index = index
+            send_message(connection.sock, {'type': 'job', 'index': index, 'count': len(agents),
+                                           'start_in': max(0.0, start - time.monotonic()), 'job': self.job})
+        # Nadmiarowi agenci nie dostają zadania
+        for connection in self.named()[self.agents:]:
+            send_message(connection.sock, {'type': 'error', 'message': 'komplet agentów już zebrany'})
+        return agents, start
+
+    def live(self, agents, elapsed):
+        """Przepisuje bieżące liczniki agentów do rejestru koordynatora (etykieta agent) i drukuje sumy"""
+        counters = {}
+        gauges = {}
+        for connection in agents:
+            agent = (('agent', connection.name),)
+            for name, labels, value in connection.counters:
+                counters[(name, tuple(sorted(agent + tuple(map(tuple, labels)))))] = value
+            for name, labels, value in connection.gauges:
+                gauges[(name, tuple(sorted(agent + tuple(map(tuple, labels)))))] = value
+        METRICS.counters = counters
+        METRICS.gauges = gauges
+        totals = {}
+        for (name, _), value in counters.items():
+            totals[name] = totals.get(name, 0) + value
+        running = sum(1 for c in agents if c.result is None and c.error is None and not c.closed)
+        span = max(elapsed - self.last_report, 1e-9)
+        rates = ", ".join(
+            f"{name} {value} ({(value - self.totals.get(name, 0)) / span:.0f}/s)"
+            for name, value in sorted(totals.items()))
+        self.simulator.print_info(f"[{elapsed:.0f}s] agentów w toku: {running}/{len(agents)}"
+                                  + (f", {rates}" if rates else ""))
+        self.totals = totals
+        self.last_report = elapsed
+
+    def run(self):
+        self.simulator.print_info(self.describe())
+        server = socket.create_server(self.address)
+        server.setblocking(False)
+        self.selector.register(server, selectors.EVENT_READ)
+        try:
+            if not self.gather(server):
+                self.simulator.print_error(f"Zgłosiło się {len(self.named())} z {self.agents} agentów "
+                                           f"w ciągu {self.wait:.0f}s - przerywam")
+                return
+            self.selector.unregister(server)
+            agents, start = self.dispatch()
+            self.simulator.print_info(f"Zadania wysłane, start za {self.start_delay:.1f}s")
+            next_report = start + self.interval
+            while any(c.result is None and c.error is None and not c.closed for c in agents):
+                timeout = max(0.0, min(next_report - time.monotonic(), 1.0))
+                for key, _ in self.selector.select(timeout=timeout):
+                    self.receive(key.data)
+                if time.monotonic() >= next_report:
+                    self.live(agents, time.monotonic() - start)
+                    next_report += self.interval
+            self.live(agents, time.monotonic() - start)
+            self.summarize(agents)
+        finally:
+            for connection in self.connections:
+                if not connection.closed:
+                    connection.sock.close()
+            server.close()
+
+    def summarize(self, agents):
+        finished = [c for c in agents if c.result is not None]
+        merged = {}
+        for connection in finished:
+            merge_counters(merged, connection.result['stats'])
+        self.simulator.print_header("Agenci klastra")
+        for connection in agents:
+            if connection.result is not None:
+                self.simulator.print_info(f"{connection.label()}: {connection.result['elapsed']:.1f}s, "
+                                          f"odchylenie startu {connection.result['start_skew'] * 1000:.1f} ms")
+            else:
+                self.simulator.print_error(f"{connection.label()}: brak wyniku ({connection.error})")
+        if len(finished) < len(agents):
+            self.simulator.print_error(f"Podsumowanie obejmuje {len(finished)} z {len(agents)} fragmentów")
+        if merged:
+            self.runner.load_stats(merged)
+            self.runner.print_summary(max(c.result['elapsed'] for c in finished))
+
+
+# ============================================
+# AGENT
+# ============================================
+
+class Agent:
+    """Łączy się z koordynatorem, wykonuje przydzielony fragment i odsyła wyniki
+
+    build_shard(job) zwraca fabrykę fragmentów build(index, count) dla parametrów
+    zadania - tę samą, której używa --workers.
+    """
+
+    def __init__(self, simulator, build_shard, address='127.0.0.1:7070', name=None, wait=300.0, interval=5.0):
+        self.simulator = simulator
+        self.build_shard = build_shard
+        self.address = parse_address(address)
+        self.name = name or f"{socket.gethostname()}:{os.getpid()}"
+        self.wait = wait
+        self.interval = interval
+        self.lock = threading.Lock()
+        self.done = threading.Event()
+
+    def connect(self):
+        """Łączy się z koordynatorem, ponawiając z wykładniczym backoffem (koordynator może startować później)"""
+        deadline = time.monotonic() + self.wait
+        delay = 0.25
+        while True:
+            try:
+                return socket.create_connection(self.address, timeout=5)
+            except OSError as e:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise ConnectionError(f"koordynator {self.address[0]}:{self.address[1]} niedostępny: {e}")
+                time.sleep(min(remaining, random.uniform(0, delay)))
+                delay = min(delay * 2, 5.0)
+
+    def send(self, sock, message):
+        with self.lock:
+            send_message(sock, message)
+
+    def report_metrics(self, sock):
+        """Wątek wysyłający bieżące liczniki, dopóki fragment pracuje"""
+        while not self.done.wait(self.interval):
+            counters, gauges, _ = METRICS.snapshot()
+            try:
+                self.send(sock, {'type': 'metrics', 'counters': metric_series(counters),
+                                 'gauges': metric_series(gauges)})
+            except OSError:
+                return
+
+    def run(self):
+        self.simulator.print_info(f"Agent {self.name}: łączenie z {self.address[0]}:{self.address[1]}")
+        sock = self.connect()
+        sock.settimeout(None)
+        self.send(sock, {'type': 'hello', 'agent': self.name})
+        reader = sock.makefile('r', encoding='utf-8')
+        try:
+            line = reader.readline()
+            if not line:
+                self.simulator.print_error("Koordynator zamknął połączenie przed przydziałem zadania")
+                return
+            message = json.loads(line)
+            if message.get('type') != 'job':
+                self.simulator.print_error(f"Koordynator odrzucił agenta: {message.get('message')}")
+                return
+            start = time.monotonic() + message['start_in']
+            index, count = message['index'], message['count']
+            job = message['job']
+            try:
+                runner = self.build_shard(job)(index, count)
+            except Exception as e:
+                self.send(sock, {'type': 'error', 'message': f"budowa fragmentu: {e}"})
+                raise
+            self.simulator.print_info(f"Fragment {index + 1}/{count} trybu {job['mode']}: {runner.describe()}")
+            delay = start - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            start_skew = time.monotonic() - start
+            reporter = threading.Thread(target=self.report_metrics, args=(sock,), name="cluster-metrics",
+                                        daemon=True)
+            reporter.start()
+            try:
+                elapsed = runner.run_blocking()
+            except Exception as e:
+                self.send(sock, {'type': 'error', 'message': str(e)})
+                raise
+            finally:
+                self.done.set()
+                reporter.join()
+            counters, gauges, _ = METRICS.snapshot()
+            self.send(sock, {'type': 'metrics', 'counters': metric_series(counters), 'gauges': metric_series(gauges)})
+            self.send(sock, {'type': 'result', 'elapsed': elapsed, 'start_skew': start_skew,
+                             'stats': runner.stats_dict()})
+            self.simulator.print_info(f"Fragment {index + 1}/{count} zakończony po {elapsed:.1f}s, wyniki wysłane")
+        finally:
+            reader.close()
+            sock.close()
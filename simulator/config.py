@@ -0,0 +1,54 @@
+"""
+Wspólna konfiguracja połączeń z bazami danych dla modułów symulatora
+"""
+
+# Konfiguracja połączeń
+DB_CONFIG = {
+    'postgres': {
+        'host': 'postgres',
+        'port': 5432,
+        'database': 'secure_data',
+        'users': {
+            'app_user': 'AppUser123!',
+            'analyst': 'Analyst123!',
+            'readonly_user': 'ReadOnly123!',
+            'suspicious_user': 'Suspicious123!',
+            'dba': 'DBA123!'
+        }
+    },
+    'mariadb': {
+        'host': 'mariadb',
+        'port': 3306,
+        'database': 'secure_data',
+        'users': {
+            'dbadmin': 'DbAdmin123!',
+            'root': 'MariadbPass123!'
+        }
+    },
+    'mongodb': {
+        'host': 'mongodb',
+        'port': 27017,
+        'database': 'secure_data',
+        'users': {
+            'appuser': 'AppPass123!',
+            'reader': 'ReadPass123!',
+            'admin': 'MongoPass123!'
+        }
+    }
+}
+
+# HTTP Event Collector Splunka (SPLUNK_HEC_TOKEN z docker-compose.yml)
+HEC_CONFIG = {
+    'url': 'https://splunk:8088',
+    'token': '12345678-1234-1234-1234-123456789012',
+    # Obraz splunk/splunk używa certyfikatu samopodpisanego
+    'verify': False,
+}
+
+# REST API Splunka (wyszukiwanie i przyjmowanie zdarzeń) - SPLUNK_PASSWORD z docker-compose.yml
+SPLUNK_REST_CONFIG = {
+    'url': 'https://splunk:8089',
+    'username': 'admin',
+    'password': 'Admin123!',
+    'verify': False,
+}
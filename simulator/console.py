@@ -0,0 +1,76 @@
+"""
+Buforowane, próbkowane wyjście konsolowe symulatora
+Linie kroków (NORMAL/ATAK/SCENARIUSZ/ERROR) mogą być próbkowane lub wyłączone,
+a całość trafia na stdout w paczkach zamiast pojedynczych niebuforowanych zapisów
+"""
+
+import atexit
+import os
+import random
+import sys
+import threading
+
+# Rodzaje linii, które powstają w gorącej ścieżce i podlegają próbkowaniu
+SAMPLED_KINDS = ('normal', 'attack', 'scenario', 'error', 'detail')
+
+
+class ConsoleSink:
+    """Ujście konsoli: sample=1.0 drukuje wszystko, 0 wyłącza linie kroków
+
+    Nagłówki i linie INFO są zawsze drukowane i opróżniają bufor (zachowana kolejność).
+    Pozostałe linie są sklejane i wypisywane co flush_interval sekund lub po flush_bytes.
+    """
+
+    def __init__(self, sample=1.0, buffered=True, flush_interval=1.0, flush_bytes=64 * 1024,
+                 stream=None, seed=None):
+        self.sample = sample
+        self.buffered = buffered
+        self.flush_bytes = flush_bytes
+        self.stream = stream or sys.stdout
+        self.rng = random.Random(seed)
+        self.suppressed = 0
+        self._lines = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self.flush_interval = flush_interval
+        if buffered:
+            self._start_flusher()
+            atexit.register(self.flush)
+            # Procesy --workers (fork) nie dziedziczą wątku - startujemy go od nowa w potomku
+            os.register_at_fork(after_in_child=self._after_fork)
+
+    def write(self, kind, text):
+        if kind in SAMPLED_KINDS and self.sample < 1.0:
+            if self.sample <= 0.0 or self.rng.random() >= self.sample:
+                self.suppressed += 1
+                return
+        if not self.buffered:
+            print(text, file=self.stream)
+            return
+        with self._lock:
+            self._lines.append(text)
+            self._size += len(text) + 1
+            full = self._size >= self.flush_bytes
+        if full or kind not in SAMPLED_KINDS:
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            if not self._lines:
+                return
+            lines, self._lines, self._size = self._lines, [], 0
+            self.stream.write('\n'.join(lines) + '\n')
+            self.stream.flush()
+
+    def _start_flusher(self):
+        self._stop = threading.Event()
+        threading.Thread(target=self._flusher, name='console-flush', daemon=True).start()
+
+    def _after_fork(self):
+        self._lock = threading.Lock()
+        self._lines, self._size = [], 0
+        self._start_flusher()
+
+    def _flusher(self):
+        while not self._stop.wait(self.flush_interval):
+            self.flush()
@@ -0,0 +1,361 @@
+"""
+Konsolidacja wyszukiwań dashboardów we wspólne wyszukiwania bazowe
+Panele z tym samym wyszukiwaniem początkowym i zakresem czasu dostają jedno <search id=...>
+na poziomie formularza, a ich własne zapytania stają się post-process <search base=...>
+"""
+
+import os
+import re
+import xml.etree.ElementTree as ET
+
+from spl import SplError, dashboard_paths, parse_xml, load_panels, relative_hours, referenced_fields, search_walk
+from splcost import base_selectivity
+
+# Polecenia strumieniowe, które można przenieść do wyszukiwania bazowego, gdy wszystkie panele grupy je mają
+HOISTABLE_COMMANDS = ('eval', 'rex', 'spath', 'search', 'where')
+# Pola zawsze przekazywane do post-process (bez _raw rex/spath w panelach nie miałyby czego czytać)
+BASE_FIELDS = ('_time', '_raw', 'index', 'sourcetype', 'source', 'host')
+# Limit zdarzeń, które nietransformujące wyszukiwanie bazowe przekazuje do post-process
+POST_PROCESS_EVENT_LIMIT = 500000
+
+
+# Elementy szukane w tekście pliku; komentarze i CDATA dopasowane, żeby je pominąć
+_BLOCK = re.compile(r'''
+    <!--.*?-->
+  | <!\[CDATA\[.*?\]\]>
+  | (?P<search><search\b[^>]*?(?:/>|>.*?</search>))
+  | (?P<fieldset><fieldset\b[^>]*?(?:/>|>.*?</fieldset>))
+  | (?P<row><row\b)
+''', re.S | re.VERBOSE)
+
+
+def _indent(text, position):
+    line = text.rfind('\n', 0, position) + 1
+    return re.match(r'[ \t]*', text[line:position]).group()
+
+
+def _escape_dollars(query):
+    """Dosłowne $ (np. pole attr.command.$db) jako $$ - pojedynczy $ Simple XML czyta jako początek tokenu"""
+    return re.sub(r'\$(?:[\w.]+\$)?', lambda m: m.group(0) if len(m.group(0)) > 1 else '$$', query)
+
+
+def _query_block(query, indent):
+    """<query> w CDATA w układzie oryginalnych dashboardów; zapytanie jest po podstawieniu tokenów"""
+    if ']]>' in query:
+        raise SplError("zapytanie zawiera ']]>' - nie da się go zapisać w CDATA")
+    query = _escape_dollars(query)
+    return f"{indent}<query>\n{indent}  <![CDATA[\n{query}\n{indent}  ]]>\n{indent}</query>"
+
+
+def _normalize(text):
+    return re.sub(r'\s+', ' ', text).strip()
+
+
+def _render_field(name):
+    return f'"{name}"' if re.search(r'[^\w.*:]', name) else name
+
+
+class BaseGroup:
+    """Panele jednego dashboardu ze wspólnym wyszukiwaniem początkowym i zakresem czasu"""
+
+    def __init__(self, search_id, key, panels, pipelines):
+        self.id = search_id
+        self.key = key
+        self.panels = panels
+        self.pipelines = pipelines
+        self.prefix = self._common_prefix()
+        self.fields = self._fields()
+        self.events = None
+
+    def _common_prefix(self):
+        """Najdłuższy wspólny ciąg poleceń strumieniowych; każdy panel zachowuje co najmniej jedno polecenie"""
+        length = min(len(commands) for commands in self.pipelines) - 1
+        prefix = [self.pipelines[0][0]]
+        for position in range(1, length):
+            command = self.pipelines[0][position]
+            text = _normalize(command.render())
+            if command.name not in HOISTABLE_COMMANDS:
+                break
+            if any(_normalize(commands[position].render()) != text for commands in self.pipelines[1:]):
+                break
+            prefix.append(command)
+        return prefix
+
+    def _fields(self):
+        fields = set()
+        for commands in self.pipelines:
+            fields |= referenced_fields(commands[len(self.prefix):])
+        return list(BASE_FIELDS) + sorted(fields - set(BASE_FIELDS))
+
+    @property
+    def query(self):
+        first = self.prefix[0]
+        lines = [first.text if first.name == 'search' else first.render()]
+        lines += [command.render() for command in self.prefix[1:]]
+        lines.append(f"fields {' '.join(_render_field(field) for field in self.fields)}")
+        return '\n| '.join(lines)
+
+    def child_query(self, commands):
+        return '| ' + '\n| '.join(command.render() for command in commands[len(self.prefix):])
+
+    @property
+    def selectivity(self):
+        first = self.prefix[0]
+        return base_selectivity(first.args['expr']) if first.name == 'search' else 1.0
+
+    @property
+    def hours(self):
+        return relative_hours(self.panels[0].earliest, self.panels[0].latest)
+
+
+class DashboardConsolidator:
+    """Przepisuje dashboardy na wyszukiwania bazowe z post-process i raportuje oszczędności"""
+
+    def __init__(self, simulator, paths=None, output=None, min_group=2, count_events=False, **client_options):
+        self.simulator = simulator
+        self.paths = dashboard_paths(paths)
+        self.output = output
+        self.min_group = max(2, min_group)
+        self.count_events = count_events
+        self.client_options = client_options
+        self._client = None
+        self.reports = []
+
+    # ============================================
+    # PLANOWANIE
+    # ============================================
+
+    def plan(self, path, tree):
+        """Grupy paneli do połączenia i panele pominięte (z przyczyną)"""
+        panels = load_panels(path, tree)
+        taken = {search.get('id') for search in tree.getroot().iter('search') if search.get('id')}
+        candidates = {}
+        skipped = []
+        for panel in panels:
+            search = panel.search
+            if search.get('base') or search.get('id'):
+                skipped.append((panel, "już korzysta z wyszukiwania bazowego"))
+                continue
+            try:
+                commands = panel.pipeline()
+                referenced_fields(commands)
+            except SplError as e:
+                skipped.append((panel, str(e)))
+                continue
+            if commands[0].name != 'search' or len(commands) < 2:
+                skipped.append((panel, "brak poleceń do wykonania jako post-process"))
+                continue
+            # Zakres czasu porównywany przed podstawieniem tokenów - baza dziedziczy te same elementy
+            timing = tuple((child.tag, _normalize(child.text or '')) for child in search
+                           if child.tag != 'query')
+            key = (_normalize(commands[0].render()), timing)
+            candidates.setdefault(key, []).append((panel, commands))
+        groups = []
+        for key, members in candidates.items():
+            if len(members) < self.min_group:
+                skipped.extend((panel, "brak innych paneli z tym samym wyszukiwaniem") for panel, _ in members)
+                continue
+            groups.append(BaseGroup(self._group_id(members[0][1][0], taken), key,
+                                    [panel for panel, _ in members], [commands for _, commands in members]))
+        return panels, groups, skipped
+
+    def _group_id(self, command, taken):
+        indexes = [node[3] for node in search_walk(command.args['expr'])
+                   if node[0] == 'cmp' and node[1] == 'index' and node[2] == '=']
+        stem = 'base_' + re.sub(r'\W+', '_', indexes[0] if indexes else 'search').strip('_').lower()
+        number = 1
+        while f"{stem}_{number}" in taken:
+            number += 1
+        taken.add(f"{stem}_{number}")
+        return f"{stem}_{number}"
+
+    # ============================================
+    # PRZEPISANIE XML
+    # ============================================
+
+    def rewrite(self, text, tree, groups):
+        """Przepisuje tekst pliku - poza zmienionymi <search> układ i formatowanie zostają bez zmian"""
+        elements = list(tree.getroot().iter('search'))
+        blocks = [match for match in _BLOCK.finditer(text) if match.group('search')]
+        if len(blocks) != len(elements):
+            raise SplError(f"nie dopasowano elementów <search> w tekście ({len(blocks)} z {len(elements)})")
+        replacements = {}
+        for group in groups:
+            for panel, commands in zip(group.panels, group.pipelines):
+                replacements[id(panel.search)] = (group.id, group.child_query(commands))
+        parts = []
+        position = 0
+        for element, block in zip(elements, blocks):
+            if id(element) not in replacements:
+                continue
+            search_id, query = replacements[id(element)]
+            indent = _indent(text, block.start())
+            parts.append(text[position:block.start()])
+            parts.append(f'<search base="{search_id}">\n'
+                         + _query_block(query, indent + '  ')
+                         + f"\n{indent}</search>")
+            position = block.end()
+        parts.append(text[position:])
+        text = ''.join(parts)
+        if groups:
+            text = self._insert_bases(text, groups)
+        return text
+
+    def _insert_bases(self, text, groups):
+        # Wyszukiwania globalne za <fieldset>, a bez formularza przed pierwszym wierszem
+        anchor = next((m for m in _BLOCK.finditer(text) if m.group('fieldset')), None)
+        if anchor is not None:
+            position, indent = anchor.end(), _indent(text, anchor.start())
+        else:
+            row = next(m for m in _BLOCK.finditer(text) if m.group('row'))
+            position, indent = text.rindex('\n', 0, row.start()), _indent(text, row.start())
+        lines = ['', '', f"{indent}<!-- Wyszukiwania bazowe - panele wykonują na ich wynikach post-process -->"]
+        for group in groups:
+            if group.events is None:
+                lines.append(f"{indent}<!-- {group.id}: liczba zdarzeń niesprawdzona - post-process widzi najwyżej "
+                             f"{POST_PROCESS_EVENT_LIMIT:,} zdarzeń -->")
+            lines.append(f'{indent}<search id="{group.id}">')
+            lines.append(_query_block(group.query, indent + '  '))
+            for tag, value in group.key[1]:
+                lines.append(f"{indent}  <{tag}>{value}</{tag}>")
+            lines.append(f"{indent}</search>")
+        return text[:position] + '\n'.join(lines) + text[position:]
+
+    def verify(self, path, panels):
+        """Każdy panel po przepisaniu wykonuje ten sam potok (z dodanym 'fields' z bazy)"""
+        rewritten = load_panels(path)
+        if len(rewritten) != len(panels):
+            raise SplError(f"liczba paneli zmieniła się z {len(panels)} na {len(rewritten)}")
+        for before, after in zip(panels, rewritten):
+            original = [_normalize(command.render()) for command in before.pipeline()]
+            result = [_normalize(command.render()) for command in after.pipeline()
+                      if not (after.search.get('base') and command.name == 'fields'
+                              and command.render().startswith(f"fields {BASE_FIELDS[0]}"))]
+            if original != result or (before.earliest, before.latest) != (after.earliest, after.latest):
+                raise SplError(f"panel {after.name} po przepisaniu wykonuje inne zapytanie")
+
+    def write(self, text, path):
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+
+    def output_path(self, path):
+        # Domyślnie podkatalog - przepisane pliki nie trafiają do kolejnych analiz katalogu dashboardów
+        directory = self.output or os.path.join(os.path.dirname(path), 'consolidated')
+        os.makedirs(directory, exist_ok=True)
+        return os.path.join(directory, os.path.basename(path))
+
+    # ============================================
+    # ZDARZENIA
+    # ============================================
+
+    def _events(self, first, group):
+        """Liczba zdarzeń czytanych przez wyszukiwanie początkowe (REST Splunka)"""
+        if self._client is None:
+            from probe import SplunkRestClient
+            self._client = SplunkRestClient(**self.client_options)
+        panel = group.panels[0]
+        bounds = ' '.join(f"{name}={value}" for name, value in (('earliest', panel.earliest),
+                                                                 ('latest', panel.latest)) if value)
+        rows = self._client.oneshot(f"search {bounds} {first.text} | stats count")
+        return int(rows[0].get('count', 0)) if rows else 0
+
+    # ============================================
+    # URUCHOMIENIE
+    # ============================================
+
+    def consolidate(self, path):
+        with open(path, encoding='utf-8') as f:
+            text = f.read()
+        tree = parse_xml(path)
+        panels, groups, skipped = self.plan(path, tree)
+        for group in groups:
+            if self.count_events:
+                try:
+                    group.events = self._events(group.prefix[0], group)
+                except (OSError, RuntimeError, ValueError) as e:
+                    self.simulator.print_error(f"Nie policzono zdarzeń dla {group.id}: {e}")
+        # Nietransformująca baza obcięłaby wyniki paneli - takie grupy zostają bez zmian
+        excluded = [group for group in groups if group.events is not None and group.events > POST_PROCESS_EVENT_LIMIT]
+        groups = [group for group in groups if group not in excluded]
+        skipped.extend((panel, f"baza przekazałaby {group.events:,} zdarzeń - powyżej limitu "
+                               f"{POST_PROCESS_EVENT_LIMIT:,} dla post-process")
+                       for group in excluded for panel in group.panels)
+        target = self.output_path(path)
+        self.write(self.rewrite(text, tree, groups), target)
+        try:
+            self.verify(target, panels)
+        except (ET.ParseError, SplError):
+            os.remove(target)
+            raise
+        report = {'path': path, 'target': target, 'panels': panels, 'groups': groups, 'skipped': skipped,
+                  'excluded': excluded, 'verified': all(group.events is not None for group in groups)}
+        self.reports.append(report)
+        self.print_report(report)
+        return report
+
+    def run(self):
+        self.simulator.print_header(f"Konsolidacja wyszukiwań: {len(self.paths)} dashboardów")
+        for path in self.paths:
+            try:
+                self.consolidate(path)
+            except (OSError, ET.ParseError, SplError) as e:
+                self.simulator.print_error(f"{os.path.basename(path)}: {e}")
+        if self._client is not None:
+            self._client.close()
+        self.print_summary()
+        return self.reports
+
+    def print_report(self, report):
+        groups = report['groups']
+        grouped = sum(len(group.panels) for group in groups)
+        jobs_before = len(report['panels'])
+        jobs_after = jobs_before - grouped + len(groups)
+        self.simulator.print_header(f"{os.path.basename(report['path'])} -> {report['target']}")
+        self.simulator.print_info(f"Zadania wyszukiwania: {jobs_before} -> {jobs_after} "
+                                  f"({len(groups)} baz dla {grouped} paneli)")
+        for group in groups:
+            saved = len(group.panels) - 1
+            hoisted = len(group.prefix) - 1
+            scanned = (f"{group.events * saved:,} zdarzeń mniej" if group.events is not None else
+                       f"{group.selectivity * group.hours * saved:.3g} indekso-godzin mniej")
+            self.simulator.print_info(f"{group.id}: {len(group.panels)} paneli, '{_normalize(group.prefix[0].render())}'"
+                                      f" + {hoisted} wspólnych poleceń, {scanned}")
+            for panel in group.panels:
+                self.simulator.print_detail(f"#{panel.position} {panel.title}")
+        for group in report['excluded']:
+            self.simulator.print_error(f"{group.id}: {group.events:,} zdarzeń przekracza limit "
+                                       f"{POST_PROCESS_EVENT_LIMIT:,} przekazywanych do post-process - "
+                                       f"{len(group.panels)} paneli bez zmian")
+        if not report['verified']:
+            self.simulator.print_error(f"Wynik niezweryfikowany: bez liczby zdarzeń (--splunk-url) nie wiadomo, czy "
+                                       f"bazy mieszczą się w limicie {POST_PROCESS_EVENT_LIMIT:,} zdarzeń - "
+                                       f"panele mogą zostać obcięte")
+        for panel, reason in report['skipped']:
+            self.simulator.print_detail(f"Bez zmian #{panel.position} {panel.title}: {reason}")
+
+    def print_summary(self):
+        if not self.reports:
+            return
+        panels = sum(len(report['panels']) for report in self.reports)
+        groups = [group for report in self.reports for group in report['groups']]
+        jobs_after = panels - sum(len(group.panels) for group in groups) + len(groups)
+        self.simulator.print_header("Podsumowanie")
+        self.simulator.print_info(f"Zadania wyszukiwania przy ładowaniu dashboardów: {panels} -> {jobs_after} "
+                                  f"({panels - jobs_after} mniej)")
+        counted = [group for group in groups if group.events is not None]
+        if counted:
+            self.simulator.print_info(f"Przeczytane zdarzenia: "
+                                      f"{sum(g.events * len(g.panels) for g in counted):,} -> "
+                                      f"{sum(g.events for g in counted):,}")
+        else:
+            before = sum(g.selectivity * g.hours * len(g.panels) for g in groups)
+            after = sum(g.selectivity * g.hours for g in groups)
+            self.simulator.print_info(f"Przeczytane dane (szacunek, indekso-godziny): {before:.3g} -> {after:.3g} "
+                                      f"- dokładne liczby z --splunk-url")
+        unverified = [group for group in groups if group.events is None]
+        if unverified:
+            self.simulator.print_error(f"{len(unverified)} baz bez sprawdzonej liczby zdarzeń - post-process widzi "
+                                       f"najwyżej {POST_PROCESS_EVENT_LIMIT:,} zdarzeń na bazę")
+        excluded = sum(len(report['excluded']) for report in self.reports)
+        if excluded:
+            self.simulator.print_info(f"Pominięte grupy powyżej limitu post-process: {excluded}")
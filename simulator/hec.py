@@ -0,0 +1,395 @@
+"""
+Bezpośrednie zasilanie Splunka przez HTTP Event Collector (bez baz danych i forwarderów)
+Wsadowe, kompresowane gzipem żądania na trwałych połączeniach, kilka paczek w locie
+i ciśnienie zwrotne: gdy kolejka paczek jest pełna, generator zdarzeń czeka
+"""
+
+import gzip
+import http.client
+import json
+import queue
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlsplit
+
+from config import HEC_CONFIG
+from logformats import LOG_SOURCES, LogSynthesizer
+
+EVENT_PATH = '/services/collector/event'
+# Kody odpowiedzi, po których paczkę warto ponowić (HEC zwraca 503 "Server is busy")
+RETRY_STATUSES = (429, 500, 502, 503, 504)
+
+
+class HecStats:
+    """Liczniki nadawcy HEC"""
+
+    def __init__(self):
+        self.events = 0
+        self.batches = 0
+        self.raw_bytes = 0
+        self.sent_bytes = 0
+        self.retries = 0
+        self.busy = 0
+        self.failed_batches = 0
+        self.failed_events = 0
+        self.blocked_seconds = 0.0
+        self.request_seconds = 0.0
+        self.max_request_seconds = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+# ============================================
+# NADAWCA
+# ============================================
+
+class HecClient:
+    """Klient HEC: zdarzenia trafiają do bieżącej paczki, pełne paczki do ograniczonej kolejki
+
+    Każdy z `in_flight` wątków nadawczych ma własne połączenie keep-alive, więc tyle paczek
+    może być jednocześnie w drodze. Rozmiar kolejki jest równy `in_flight` - jeśli indekser
+    nie nadąża, send() blokuje producenta zamiast gromadzić paczki w pamięci.
+    """
+
+    def __init__(self, url=None, token=None, batch_events=1000, batch_bytes=1 << 20, in_flight=4,
+                 gzip_level=1, verify=None, timeout=30, max_retries=5):
+        url = urlsplit(url or HEC_CONFIG['url'])
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port or 8088
+        self.headers = {
+            'Authorization': f"Splunk {token or HEC_CONFIG['token']}",
+            'Content-Type': 'application/json',
+            'Content-Encoding': 'gzip',
+            'Connection': 'keep-alive',
+        }
+        self.batch_events = batch_events
+        self.batch_bytes = batch_bytes
+        self.in_flight = in_flight
+        self.gzip_level = gzip_level
+        self.verify = HEC_CONFIG['verify'] if verify is None else verify
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.stats = HecStats()
+        self.errors = []
+        self._lock = threading.Lock()
+        self._queue = queue.Queue(maxsize=in_flight)
+        self._batch = []
+        self._batch_size = 0
+        self._threads = []
+
+    def _connection(self):
+        if self.scheme == 'https':
+            context = ssl.create_default_context()
+            if not self.verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            return http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                               context=context)
+        return http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+
+    def start(self):
+        for index in range(self.in_flight):
+            thread = threading.Thread(target=self._sender, name=f"hec-sender-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        return self
+
+    def send(self, event):
+        """Dodaje zdarzenie (słownik w formacie HEC) do bieżącej paczki"""
+        data = json.dumps(event, separators=(',', ':')).encode('utf-8')
+        self._batch.append(data)
+        self._batch_size += len(data)
+        if len(self._batch) >= self.batch_events or self._batch_size >= self.batch_bytes:
+            self.flush()
+
+    def flush(self):
+        """Przekazuje bieżącą paczkę nadawcom - blokuje, gdy wszystkie miejsca w locie są zajęte"""
+        if not self._batch:
+            return
+        batch, self._batch, self._batch_size = self._batch, [], 0
+        started = time.monotonic()
+        self._queue.put(batch)
+        with self._lock:
+            self.stats.blocked_seconds += time.monotonic() - started
+
+    def close(self):
+        """Wysyła resztę, czeka na opróżnienie kolejki i zatrzymuje wątki"""
+        self.flush()
+        for _ in self._threads:
+            self._queue.put(None)
+        for thread in self._threads:
+            thread.join()
+
+    def _sender(self):
+        conn = self._connection()
+        try:
+            while True:
+                batch = self._queue.get()
+                if batch is None:
+                    return
+                raw = b''.join(batch)
+                body = gzip.compress(raw, compresslevel=self.gzip_level)
+                conn = self._post(conn, body, len(batch))
+                with self._lock:
+                    self.stats.batches += 1
+                    self.stats.events += len(batch)
+                    self.stats.raw_bytes += len(raw)
+                    self.stats.sent_bytes += len(body)
+        finally:
+            conn.close()
+
+    def _post(self, conn, body, count):
+        """Wysyła jedną paczkę z ponowieniami (wykładniczy odstęp); zwraca połączenie do dalszego użycia"""
+        delay = 0.1
+        for attempt in range(self.max_retries + 1):
+            started = time.monotonic()
+            try:
+                conn.request('POST', EVENT_PATH, body=body, headers=self.headers)
+                response = conn.getresponse()
+                payload = response.read()
+                status = response.status
+                if response.getheader('Connection', '').lower() == 'close':
+                    conn.close()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                conn = self._connection()
+                status, payload = None, str(e).encode()
+            elapsed = time.monotonic() - started
+            with self._lock:
+                self.stats.request_seconds += elapsed
+                self.stats.max_request_seconds = max(self.stats.max_request_seconds, elapsed)
+            if status == 200:
+                return conn
+            if status is not None and status not in RETRY_STATUSES or attempt == self.max_retries:
+                break
+            with self._lock:
+                self.stats.retries += 1
+                self.stats.busy += status == 503
+            time.sleep(delay)
+            delay = min(delay * 2, 5.0)
+        with self._lock:
+            self.stats.failed_batches += 1
+            self.stats.failed_events += count
+            if len(self.errors) < 10:
+                self.errors.append(f"HTTP {status}: {payload[:200].decode('utf-8', 'replace')}")
+        return conn
+
+
+# ============================================
+# GENERATOR ZDARZEŃ
+# ============================================
+
+class HecEmitter:
+    """Renderuje zdarzenia baz i strumieniuje je do HEC z zadanym tempem (0 = maksymalnie)"""
+
+    def __init__(self, simulator, rate=0, duration=60, backends=None, attack_ratio=0.1, seed=None,
+                 index=None, **client_options):
+        self.simulator = simulator
+        self.rate = rate
+        self.duration = duration
+        self.index = index
+        self.synthesizer = LogSynthesizer(backends, attack_ratio=attack_ratio, seed=seed)
+        self.client = HecClient(**client_options)
+        self.generated = 0
+
+    def event(self, backend, line, ts):
+        meta = LOG_SOURCES[backend]
+        return {
+            'time': round(ts, 3),
+            'host': meta['host'],
+            'source': meta['source'],
+            'sourcetype': meta['sourcetype'],
+            'index': self.index or meta['index'],
+            'event': line,
+        }
+
+    def run(self):
+        """Pętla producenta - tempo kontrolowane porcjami po ok. 10 ms"""
+        chunk = max(1, int(self.rate / 100)) if self.rate > 0 else 500
+        self.client.start()
+        started = time.monotonic()
+        deadline = started + self.duration
+        try:
+            while time.monotonic() < deadline:
+                now = time.time()
+                sent = 0
+                while sent < chunk:
+                    backend, entry = self.synthesizer.next_event(now)
+                    # Rekordy jsonlog jednego zapytania PostgreSQL to osobne zdarzenia
+                    for line in entry.split('\n'):
+                        self.client.send(self.event(backend, line, now))
+                        sent += 1
+                self.generated += sent
+                if self.rate > 0:
+                    delay = started + self.generated / self.rate - time.monotonic()
+                    if delay > 0:
+                        time.sleep(delay)
+        except KeyboardInterrupt:
+            self.simulator.print_info("Przerwano - wysyłanie pozostałych paczek")
+        finally:
+            self.client.close()
+        return max(time.monotonic() - started, 1e-9)
+
+    def run_blocking(self):
+        return self.run()
+
+    def describe(self):
+        client = self.client
+        return (f"HEC {client.scheme}://{client.host}:{client.port}, tempo "
+                f"{self.rate or 'maks.'} zdarzeń/s, {self.duration}s, paczki {client.batch_events} zdarzeń, "
+                f"{client.in_flight} w locie, gzip {client.gzip_level}")
+
+    def stats_dict(self):
+        return {'generated': self.generated, 'client': self.client.stats.as_dict()}
+
+    def load_stats(self, data):
+        self.generated = data['generated']
+        vars(self.client.stats).update(data['client'])
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run())
+
+    def print_summary(self, elapsed):
+        stats = self.client.stats
+        self.simulator.print_header("Podsumowanie nadawcy HEC")
+        self.simulator.print_info(
+            f"Wygenerowano {self.generated} zdarzeń ({self.generated / elapsed:.0f}/s), "
+            f"przyjęto {stats.events - stats.failed_events} ({(stats.events - stats.failed_events) / elapsed:.0f}/s)")
+        ratio = stats.raw_bytes / stats.sent_bytes if stats.sent_bytes else 0.0
+        self.simulator.print_info(
+            f"{stats.batches} paczek, {stats.raw_bytes / 2**20:.1f} MB surowych -> "
+            f"{stats.sent_bytes / 2**20:.1f} MB gzip (x{ratio:.1f}), "
+            f"{stats.raw_bytes / 2**20 / elapsed:.1f} MB/s przed kompresją")
+        mean = stats.request_seconds / max(stats.batches + stats.retries, 1)
+        self.simulator.print_info(
+            f"Żądanie: średnio {mean * 1000:.1f} ms, max {stats.max_request_seconds * 1000:.1f} ms; "
+            f"ciśnienie zwrotne {stats.blocked_seconds:.1f}s, ponowień {stats.retries} "
+            f"(w tym 503 busy: {stats.busy})")
+        if stats.failed_batches:
+            self.simulator.print_error(
+                f"Odrzucone paczki: {stats.failed_batches} ({stats.failed_events} zdarzeń)")
+            for error in self.client.errors:
+                self.simulator.print_error(error)
+
+
+# ============================================
+# LOKALNY ZASTĘPNIK HEC
+# ============================================
+
+class _HecHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'   # keep-alive jak w prawdziwym HEC
+
+    def _reply(self, status, text, code):
+        body = json.dumps({'text': text, 'code': code}).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        if self.path.startswith('/services/collector/health'):
+            self._reply(200, 'HEC is healthy', 17)
+        else:
+            self._reply(404, 'Not Found', 404)
+
+    def do_POST(self):
+        server = self.server
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if not self.path.startswith(EVENT_PATH):
+            self._reply(404, 'Not Found', 404)
+        elif self.headers.get('Authorization') != f"Splunk {server.token}":
+            self._reply(401, 'Invalid token', 4)
+        elif server.should_be_busy():
+            self._reply(503, 'Server is busy', 9)
+        else:
+            if self.headers.get('Content-Encoding') == 'gzip':
+                body = gzip.decompress(body)
+            try:
+                counts = server.count_events(body)
+            except ValueError:
+                self._reply(400, 'Invalid data format', 6)
+                return
+            server.record(counts, len(body))
+            self._reply(200, 'Success', 0)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class HecStandIn(ThreadingHTTPServer):
+    """Minimalny serwer udający HEC - weryfikuje token, rozpakowuje i zlicza zdarzenia
+
+    busy_ratio > 0 każe losowo odpowiadać 503, co pozwala sprawdzić ponowienia nadawcy.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='0.0.0.0', port=8088, token=None, busy_ratio=0.0):
+        super().__init__((host, port), _HecHandler)
+        self.token = token or HEC_CONFIG['token']
+        self.busy_ratio = busy_ratio
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.bytes = 0
+        self.sourcetypes = {}
+        self._busy_credit = 0.0
+
+    def should_be_busy(self):
+        with self.lock:
+            self._busy_credit += self.busy_ratio
+            if self._busy_credit >= 1.0:
+                self._busy_credit -= 1.0
+                return True
+        return False
+
+    @staticmethod
+    def count_events(body):
+        """Zlicza sklejone obiekty JSON wg sourcetype (tak jak HEC przyjmuje paczkę)"""
+        decoder = json.JSONDecoder()
+        text = body.decode('utf-8')
+        counts = {}
+        position = 0
+        while position < len(text):
+            event, position = decoder.raw_decode(text, position)
+            if 'event' not in event:
+                raise ValueError("Brak pola event")
+            counts[event.get('sourcetype')] = counts.get(event.get('sourcetype'), 0) + 1
+            while position < len(text) and text[position].isspace():
+                position += 1
+        return counts
+
+    def record(self, counts, size):
+        with self.lock:
+            self.requests += 1
+            self.bytes += size
+            for sourcetype, count in counts.items():
+                self.sourcetypes[sourcetype] = self.sourcetypes.get(sourcetype, 0) + count
+
+    def serve(self, simulator, report_interval=10.0):
+        """Obsługuje żądania do przerwania (Ctrl+C), co report_interval drukuje liczniki"""
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        simulator.print_info(f"Zastępnik HEC nasłuchuje na {self.server_address[0]}:{self.server_address[1]}"
+                             f"{EVENT_PATH} (503 dla {self.busy_ratio:.0%} żądań)")
+        last_total, last_time = 0, time.monotonic()
+        try:
+            while True:
+                time.sleep(report_interval)
+                with self.lock:
+                    total = sum(self.sourcetypes.values())
+                    breakdown = ", ".join(f"{k}={v}" for k, v in sorted(self.sourcetypes.items()))
+                now = time.monotonic()
+                simulator.print_info(f"{total} zdarzeń ({(total - last_total) / (now - last_time):.0f}/s), "
+                                     f"{self.requests} żądań: {breakdown}")
+                last_total, last_time = total, now
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+            self.server_close()
@@ -0,0 +1,362 @@
+"""
+Wektorowy generator syntetycznych polskich tożsamości (NumPy)
+PESEL z cyfrą kontrolną, numery rachunków NRB z sumą mod-97, e-maile, telefony
+i imiona/nazwiska z polskimi znakami - kolumnowo, unikalnie i powtarzalnie (seed)
+"""
+
+import threading
+from datetime import date
+from functools import lru_cache
+
+import numpy as np
+
+FIRST_NAMES_MALE = np.array([
+    'Jan', 'Piotr', 'Krzysztof', 'Tomasz', 'Paweł', 'Michał', 'Marcin', 'Łukasz', 'Jakub',
+    'Grzegorz', 'Andrzej', 'Stanisław', 'Wojciech', 'Mateusz', 'Kamil', 'Bartłomiej', 'Maciej',
+    'Rafał', 'Zbigniew', 'Jerzy', 'Mikołaj', 'Szymon', 'Przemysław', 'Sławomir'])
+FIRST_NAMES_FEMALE = np.array([
+    'Anna', 'Maria', 'Katarzyna', 'Małgorzata', 'Agnieszka', 'Barbara', 'Ewa', 'Zofia', 'Joanna',
+    'Magdalena', 'Monika', 'Aleksandra', 'Elżbieta', 'Beata', 'Dorota', 'Jadwiga', 'Halina',
+    'Urszula', 'Natalia', 'Żaneta', 'Bożena', 'Grażyna', 'Łucja', 'Jolanta'])
+# Imiona wg płci: wiersz 0 - męskie, wiersz 1 - żeńskie (listy równej długości)
+FIRST_NAMES = np.stack([FIRST_NAMES_MALE, FIRST_NAMES_FEMALE])
+# Nazwiska w parach (forma męska, forma żeńska)
+LAST_NAMES = np.array([
+    ('Kowalski', 'Kowalska'), ('Nowak', 'Nowak'), ('Wiśniewski', 'Wiśniewska'),
+    ('Dąbrowski', 'Dąbrowska'), ('Lewandowski', 'Lewandowska'), ('Wójcik', 'Wójcik'),
+    ('Kamiński', 'Kamińska'), ('Kowalczyk', 'Kowalczyk'), ('Zieliński', 'Zielińska'),
+    ('Szymański', 'Szymańska'), ('Woźniak', 'Woźniak'), ('Kozłowski', 'Kozłowska'),
+    ('Jankowski', 'Jankowska'), ('Mazur', 'Mazur'), ('Krawczyk', 'Krawczyk'),
+    ('Piotrowski', 'Piotrowska'), ('Grabowski', 'Grabowska'), ('Pawłowski', 'Pawłowska'),
+    ('Michalski', 'Michalska'), ('Król', 'Król'), ('Wieczorek', 'Wieczorek'),
+    ('Jabłoński', 'Jabłońska'), ('Wróbel', 'Wróbel'), ('Nowakowski', 'Nowakowska'),
+    ('Majewski', 'Majewska'), ('Olszewski', 'Olszewska'), ('Stępień', 'Stępień'),
+    ('Malinowski', 'Malinowska'), ('Jaworski', 'Jaworska'), ('Górski', 'Górska'),
+    ('Rutkowski', 'Rutkowska'), ('Sikora', 'Sikora'), ('Baran', 'Baran'), ('Duda', 'Duda'),
+    ('Szewczyk', 'Szewczyk'), ('Tomaszewski', 'Tomaszewska'), ('Pietrzak', 'Pietrzak'),
+    ('Marciniak', 'Marciniak'), ('Wróblewski', 'Wróblewska'), ('Zając', 'Zając'),
+    ('Jasiński', 'Jasińska'), ('Zawadzki', 'Zawadzka'), ('Bąk', 'Bąk'), ('Sadowski', 'Sadowska'),
+    ('Jakubowski', 'Jakubowska'), ('Wilk', 'Wilk'), ('Chmielewski', 'Chmielewska'),
+    ('Włodarczyk', 'Włodarczyk'), ('Borkowski', 'Borkowska'), ('Czarnecki', 'Czarnecka'),
+    ('Sokołowski', 'Sokołowska'), ('Urbański', 'Urbańska'), ('Kubiak', 'Kubiak'),
+    ('Maciejewski', 'Maciejewska'), ('Szczepański', 'Szczepańska'), ('Kucharski', 'Kucharska'),
+    ('Wilczyński', 'Wilczyńska'), ('Kalinowski', 'Kalinowska'), ('Lis', 'Lis'),
+    ('Mazurek', 'Mazurek'), ('Wysocki', 'Wysocka'), ('Adamski', 'Adamska'),
+    ('Kaźmierczak', 'Kaźmierczak'), ('Wasilewski', 'Wasilewska'), ('Sobczak', 'Sobczak'),
+    ('Czerwiński', 'Czerwińska'), ('Andrzejewski', 'Andrzejewska'), ('Cieślak', 'Cieślak'),
+    ('Głowacki', 'Głowacka'), ('Zakrzewski', 'Zakrzewska'), ('Kołodziej', 'Kołodziej'),
+    ('Sikorski', 'Sikorska'), ('Krajewski', 'Krajewska'), ('Gajewski', 'Gajewska'),
+    ('Szulc', 'Szulc'), ('Szymczak', 'Szymczak'), ('Baranowski', 'Baranowska'),
+    ('Laskowski', 'Laskowska'), ('Brzeziński', 'Brzezińska'), ('Makowski', 'Makowska'),
+    ('Ziółkowski', 'Ziółkowska'), ('Przybylski', 'Przybylska'), ('Żak', 'Żak'),
+    ('Śliwiński', 'Śliwińska'), ('Łuczak', 'Łuczak'), ('Ślusarczyk', 'Ślusarczyk')])
+
+EMAIL_AT_DOMAINS = np.array(['@email.pl', '@wp.pl', '@onet.pl', '@interia.pl', '@gmail.com', '@o2.pl'])
+
+# Numery rozliczeniowe banków (3 cyfry) używane w NRB
+BANK_IDS = np.array([102, 105, 109, 114, 116, 124, 175, 187, 249], dtype=np.int64)
+
+PESEL_WEIGHTS = np.array([1, 3, 7, 9, 1, 3, 7, 9, 1, 3], dtype=np.int64)
+SORT_CODE_WEIGHTS = np.array([3, 9, 7, 1, 3, 9, 7], dtype=np.int64)
+
+# Zakres dat urodzenia dla PESEL
+BIRTH_FROM = date(1940, 1, 1)
+BIRTH_TO = date(2005, 12, 31)
+
+# Mnożniki permutacji afinicznej (względnie pierwsze z rozmiarami przestrzeni indeksów)
+_PERMUTATION_PRIMES = np.array([2654435761, 2246822519, 3266489917, 668265263, 374761393],
+                               dtype=np.int64)
+_ACCOUNT_PRIMES = np.array([7368787, 8388617, 6291469, 5767169, 4194301], dtype=np.int64)
+_ACCOUNT_SPACE = 10 ** 12
+
+# Stałe splitmix64 - mieszanie (ziarno, pole, indeks) w pseudolosowe 64 bity
+_GOLDEN_GAMMA = np.uint64(0x9E3779B97F4A7C15)
+_MIX_MUL_1 = np.uint64(0xBF58476D1CE4E5B9)
+_MIX_MUL_2 = np.uint64(0x94D049BB133111EB)
+
+# Odstęp indeksów między strumieniami procesów roboczych (rozłączne zakresy e-maili)
+STREAM_SPAN = 10 ** 12
+
+_TRANSLIT = str.maketrans('ąćęłńóśźżĄĆĘŁŃÓŚŹŻ', 'acelnoszzACELNOSZZ')
+
+
+def _ascii_lower(names):
+    return np.array([name.translate(_TRANSLIT).lower() for name in names])
+
+
+FIRST_NAMES_ASCII = np.stack([_ascii_lower(FIRST_NAMES_MALE), _ascii_lower(FIRST_NAMES_FEMALE)])
+LAST_NAMES_ASCII = np.stack([_ascii_lower(LAST_NAMES[:, 0]), _ascii_lower(LAST_NAMES[:, 1])], axis=1)
+
+
+# ============================================
+# CYFRY I SUMY KONTROLNE
+# ============================================
+
+def digits_matrix(values, width):
+    """Zamienia wektor liczb na macierz cyfr (n, width), najstarsza cyfra w kolumnie 0"""
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return (values[:, None] // powers) % 10
+
+
+# Napisy 0-9, 00-99, 000-999 i 0000-9999 - liczby formatowane po 4 cyfry naraz przez indeksowanie
+_DIGIT_TABLES = {width: np.array([f'{i:0{width}d}' for i in range(10 ** width)]) for width in (1, 2, 3, 4)}
+# Progi długości zapisu dziesiętnego: 10, 100, ..., 10^18
+_DECIMAL_BOUNDS = 10 ** np.arange(1, 19, dtype=np.int64)
+
+
+@lru_cache(maxsize=None)
+def _weight_table(weights):
+    """Suma cyfra*waga dla każdej liczby o len(weights) cyfrach (tablica 10^len wartości)"""
+    width = len(weights)
+    return digits_matrix(np.arange(10 ** width, dtype=np.int64), width) @ np.array(weights, dtype=np.int64)
+
+
+def weighted_digit_sum(values, weights):
+    """Suma ważona cyfr liczb o len(weights) cyfrach - po 4 cyfry z tablic, bez macierzy cyfr"""
+    total = np.zeros(len(values), dtype=np.int64)
+    rest = values
+    for end in range(len(weights), 0, -4):
+        chunk = tuple(int(weight) for weight in weights[max(0, end - 4):end])
+        rest, low = np.divmod(rest, 10 ** len(chunk))
+        total += _weight_table(chunk)[low]
+    return total
+
+
+def digit_strings(*parts):
+    """Napisy z cyfr kolejnych liczb z zerami wiodącymi; parts to pary (wektor liczb, szerokość)
+
+    Fragmenty po 4 cyfry trafiają do pól rekordu o układzie kolejnych znaków UCS4, więc cały
+    rekord jest od razu gotowym napisem (view) - bez konwersji bajtów ani pętli po wierszach.
+    """
+    fields = []
+    for values, width in parts:
+        widths = [width % 4 or 4] + [4] * ((width - 1) // 4)
+        rest = values
+        chunks = []
+        for chunk_width in reversed(widths):
+            rest, low = np.divmod(rest, 10 ** chunk_width)
+            chunks.append(_DIGIT_TABLES[chunk_width][low])
+        fields.extend(reversed(chunks))
+    layout = np.dtype([(f'f{i}', chunk.dtype) for i, chunk in enumerate(fields)])
+    out = np.empty(len(fields[0]), dtype=layout)
+    for i, chunk in enumerate(fields):
+        out[f'f{i}'] = chunk
+    return out.view(f'U{layout.itemsize // 4}')
+
+
+def number_strings(values):
+    """Napisy liczb nieujemnych bez zer wiodących (jak str) - grupami o tej samej liczbie cyfr"""
+    lengths = np.searchsorted(_DECIMAL_BOUNDS, values, side='right') + 1
+    if len(values) and lengths[0] == lengths[-1] and (lengths == lengths[0]).all():
+        return digit_strings((values, int(lengths[0])))
+    out = np.empty(len(values), dtype=f'U{int(lengths.max(initial=1))}')
+    for length in np.unique(lengths):
+        selected = lengths == length
+        out[selected] = digit_strings((values[selected], int(length)))
+    return out
+
+
+def mix64(index, salt):
+    """Licznikowy hash splitmix64: 64 bity zależne tylko od (salt, indeks), bez stanu generatora"""
+    z = index.astype(np.uint64) * _GOLDEN_GAMMA + salt
+    z = (z ^ (z >> np.uint64(30))) * _MIX_MUL_1
+    z = (z ^ (z >> np.uint64(27))) * _MIX_MUL_2
+    return z ^ (z >> np.uint64(31))
+
+
+def pesel_check_digit(head):
+    """Cyfra kontrolna PESEL dla wektora 10 pierwszych cyfr zapisanych jako liczby"""
+    return (10 - weighted_digit_sum(head, PESEL_WEIGHTS) % 10) % 10
+
+
+def nrb_check_digits(sort_code, account):
+    """Dwie cyfry kontrolne NRB (IBAN mod-97) dla numeru rozliczeniowego (8 cyfr) i rachunku (16 cyfr)
+
+    Reszta z dzielenia liczona jest na fragmentach mieszczących się w int64, bez pętli po cyfrach.
+    """
+    remainder = (sort_code % 97 * pow(10, 16, 97) + account % 97) % 97
+    # Przestawienie IBAN: BBAN + 'PL' (P=25, L=21) + '00'
+    remainder = (remainder * pow(10, 6, 97) + 252100) % 97
+    return 98 - remainder
+
+
+def sort_code_check_digit(sort7):
+    """Cyfra kontrolna numeru rozliczeniowego oddziału (7 cyfr -> 8. cyfra)"""
+    return (10 - weighted_digit_sum(sort7, SORT_CODE_WEIGHTS) % 10) % 10
+
+
+def pesel_is_valid(pesel):
+    """Sprawdza cyfrę kontrolną pojedynczego numeru PESEL"""
+    if len(pesel) != 11 or not pesel.isdigit():
+        return False
+    return int(pesel_check_digit(np.array([int(pesel[:10])], dtype=np.int64))[0]) == int(pesel[10])
+
+
+def nrb_is_valid(nrb):
+    """Sprawdza sumę kontrolną mod-97 pojedynczego numeru NRB"""
+    if len(nrb) != 26 or not nrb.isdigit():
+        return False
+    return int(nrb[2:] + '2521' + nrb[:2]) % 97 == 1
+
+
+# ============================================
+# GENERATOR
+# ============================================
+
+class IdentityGenerator:
+    """Generuje kolumny tożsamości dla zakresu indeksów [start, start + count)
+
+    Wiersz o danym indeksie zależy tylko od (seed, indeks) - pola losowe pochodzą z hasha
+    indeksu (mix64), nie ze wspólnego generatora paczki - więc paczki można generować
+    w dowolnej kolejności, dowolnej wielkości i w wielu procesach. PESEL, NRB i e-mail są unikalne w obrębie
+    jednego ziarna (permutacja afiniczna indeksu). Wydajność: około miliona pełnych wierszy
+    na sekundę na jednym rdzeniu - więcej daje podział zakresu indeksów między procesy.
+    """
+
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.birth_origin = np.datetime64(BIRTH_FROM.isoformat())
+        self.birth_days = (BIRTH_TO - BIRTH_FROM).days + 1
+        self.pesel_space = self.birth_days * 10000
+        self.pesel_mul = int(_PERMUTATION_PRIMES[seed % len(_PERMUTATION_PRIMES)])
+        self.pesel_add = (seed * 7919) % self.pesel_space
+        self.account_mul = int(_ACCOUNT_PRIMES[seed % len(_ACCOUNT_PRIMES)])
+        self.account_add = (seed * 104729 + 982451653) % _ACCOUNT_SPACE
+        # Tablica dzień -> RRMMDD z miesiącem zakodowanym wg stulecia (+20 dla lat 2000-2099)
+        calendar = self.birth_origin + np.arange(self.birth_days).astype('timedelta64[D]')
+        years = calendar.astype('datetime64[Y]').astype(np.int64) + 1970
+        months = calendar.astype('datetime64[M]').astype(np.int64) % 12 + 1
+        days = (calendar - calendar.astype('datetime64[M]')).astype(np.int64) + 1
+        self.birth_codes = (years % 100) * 10000 + (months + np.where(years >= 2000, 20, 0)) * 100 + days
+        # Sole hasha dla pól losowych: imię/nazwisko/domena oraz telefon
+        self.name_salt, self.phone_salt = np.random.SeedSequence(seed).generate_state(2, np.uint64)
+        # Znacznik ziarna w e-mailu - różne ziarna nie kolidują na UNIQUE(email)
+        self.email_tag = format(seed % 16 ** 6, '06x')
+        # Gotowe początki e-maili 'imie.nazwisko.znacznik' dla każdej kombinacji (płeć, imię, nazwisko)
+        self.email_locals = np.array([
+            [[f"{first}.{last}.{self.email_tag}" for last in LAST_NAMES_ASCII[:, gender]]
+             for first in firsts]
+            for gender, firsts in enumerate(FIRST_NAMES_ASCII)])
+
+    def generate(self, start, count):
+        """Zwraca słownik kolumn (tablice NumPy) dla count kolejnych tożsamości"""
+        index = np.arange(start, start + count, dtype=np.int64)
+
+        # PESEL: unikalna para (dzień urodzenia, numer serii) z permutacji indeksu
+        slot = (index % self.pesel_space * self.pesel_mul + self.pesel_add) % self.pesel_space
+        day = slot // 10000
+        serial = slot % 10000
+        birth = self.birth_origin + day.astype('timedelta64[D]')
+        head = self.birth_codes[day] * 10000 + serial
+        pesel = digit_strings((head, 10), (pesel_check_digit(head), 1))
+        female = serial % 2 == 0
+
+        # Imię i nazwisko zgodne z płcią zakodowaną w PESEL
+        names = mix64(index, self.name_salt)
+        first_index = (names % np.uint64(FIRST_NAMES.shape[1])).astype(np.int64)
+        last_index = ((names >> np.uint64(20)) % np.uint64(len(LAST_NAMES))).astype(np.int64)
+        gender = female.astype(np.int64)
+        first_name = FIRST_NAMES[gender, first_index]
+        last_name = LAST_NAMES[last_index, gender]
+
+        # E-mail: unikalny dzięki indeksowi (i znacznikowi ziarna)
+        local = self.email_locals[gender, first_index, last_index]
+        domain = EMAIL_AT_DOMAINS[((names >> np.uint64(40)) % np.uint64(len(EMAIL_AT_DOMAINS))).astype(np.int64)]
+        email = np.char.add(np.char.add(local, number_strings(index)), domain)
+
+        # Telefon komórkowy: 9 cyfr z prefiksem 5/6/7/8
+        phones = mix64(index, self.phone_salt)
+        prefix = (phones % np.uint64(4)).astype(np.int64) + 5
+        phone = digit_strings((prefix * 10 ** 8 + ((phones >> np.uint64(8)) % np.uint64(10 ** 8)).astype(np.int64), 9))
+
+        account = self.accounts(index)
+
+        return {
+            'first_name': first_name,
+            'last_name': last_name,
+            'email': email,
+            'phone': phone,
+            'pesel': pesel,
+            'account_number': account,
+            'birth_date': birth,
+            'female': female,
+        }
+
+    def accounts(self, index):
+        """Numery NRB: 2 cyfry kontrolne + numer rozliczeniowy (8) + numer rachunku (16)
+
+        Numer zależy wyłącznie od (seed, indeks) - rachunek klienta o danym indeksie można
+        odtworzyć w dowolnej paczce (np. przy generowaniu jego transakcji).
+        """
+        mixed = (index % _ACCOUNT_SPACE * self.account_mul + self.account_add) % _ACCOUNT_SPACE
+        bank = BANK_IDS[mixed % len(BANK_IDS)]
+        branch = mixed // 7 % 10000
+        sort7 = bank * 10000 + branch
+        sort_code = sort7 * 10 + sort_code_check_digit(sort7)
+        # 4 cyfry pochodne + 12 cyfr z permutacji indeksu (unikalne)
+        account = (mixed // 13 % 10000) * _ACCOUNT_SPACE + mixed
+        check = nrb_check_digits(sort_code, account)
+        return digit_strings((check, 2), (sort_code, 8), (account, 16))
+
+
+class IdentityStream:
+    """Bufor tożsamości dla kodu wiersz-po-wierszu (scenariusze, symulator)
+
+    Generuje paczki wektorowo i wydaje pojedyncze wartości - koszt NumPy rozkłada się
+    na tysiące wierszy. Bezpieczny dla wątków; kolejne wywołania dają kolejne indeksy,
+    począwszy od start.
+    """
+
+    def __init__(self, seed=None, chunk=4096, start=0):
+        if seed is None:
+            seed = int(np.random.SeedSequence().entropy % (2 ** 31))
+        self.generator = IdentityGenerator(seed)
+        self.chunk = chunk
+        self.next_start = start
+        self.position = chunk
+        self.columns = None
+        self.lock = threading.Lock()
+
+    def take(self):
+        """Zwraca jedną tożsamość jako słownik zwykłych napisów Pythona"""
+        with self.lock:
+            if self.position >= self.chunk:
+                batch = self.generator.generate(self.next_start, self.chunk)
+                self.columns = {key: values.tolist() for key, values in batch.items()
+                                if values.dtype.kind == 'U'}
+                self.next_start += self.chunk
+                self.position = 0
+            position = self.position
+            self.position += 1
+        return {key: values[position] for key, values in self.columns.items()}
+
+    def value(self, field):
+        return self.take()[field]
+
+
+_default_stream = None
+
+
+def stream_seed(seed):
+    """Ziarno strumienia pochodne od --seed - inne niż ziarno seedera, więc e-maile
+    tworzone w trakcie symulacji nie powtarzają tych z masowego ładowania"""
+    return int(np.random.SeedSequence([seed, 1]).generate_state(1)[0] % (2 ** 31))
+
+
+def configure_default_stream(seed=None, worker=0):
+    """Ustawia strumień procesu: powtarzalny dla danego --seed, rozłączny między procesami
+
+    Bez ziarna strumień powstaje od nowa z losowym ziarnem (np. w procesie roboczym
+    utworzonym przez fork, który odziedziczyłby strumień rodzica).
+    """
+    global _default_stream
+    _default_stream = (IdentityStream() if seed is None
+                       else IdentityStream(stream_seed(seed), start=worker * STREAM_SPAN))
+
+
+def default_stream():
+    """Wspólny strumień tożsamości procesu (tworzony przy pierwszym użyciu)"""
+    global _default_stream
+    if _default_stream is None:
+        _default_stream = IdentityStream()
+    return _default_stream
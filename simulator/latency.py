@@ -0,0 +1,161 @@
+"""
+Histogramy opóźnień w stylu HDR dla każdej bazy, scenariusza i fazy operacji
+(connect, execute, fetch, commit) - stała pamięć niezależnie od liczby pomiarów
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# 2^8 kubełków poniżej 256 µs, dalej 128 podprzedziałów na oktawę - błąd względny kwantyli do 0,79%
+SUB_BITS = 8
+SUB_COUNT = 1 << SUB_BITS
+HALF_COUNT = SUB_COUNT >> 1
+PHASES = ('connect', 'execute', 'fetch', 'commit')
+PERCENTILES = (50, 95, 99)
+
+
+def bucket_index(micros):
+    """Indeks kubełka log-liniowego dla wartości w mikrosekundach"""
+    if micros < SUB_COUNT:
+        return micros
+    shift = micros.bit_length() - SUB_BITS
+    return SUB_COUNT + (shift - 1) * HALF_COUNT + (micros >> shift) - HALF_COUNT
+
+
+def bucket_upper(index):
+    """Największa wartość (µs) reprezentowana przez kubełek - jak highestEquivalentValue w HDR"""
+    if index < SUB_COUNT:
+        return index
+    shift = (index - SUB_COUNT) // HALF_COUNT + 1
+    top = (index - SUB_COUNT) % HALF_COUNT + HALF_COUNT
+    return ((top + 1) << shift) - 1
+
+
+class LatencyHistogram:
+    """Rzadki histogram log-liniowy; słownik kubełków scala się przez zwykłe sumowanie"""
+
+    __slots__ = ('counts', 'count', 'sum_us', 'max_us')
+
+    def __init__(self):
+        self.counts = {}
+        self.count = 0
+        self.sum_us = 0
+        self.max_us = 0
+
+    def record(self, seconds):
+        micros = max(0, int(seconds * 1_000_000))
+        index = bucket_index(micros)
+        self.counts[index] = self.counts.get(index, 0) + 1
+        self.count += 1
+        self.sum_us += micros
+        if micros > self.max_us:
+            self.max_us = micros
+
+    def percentile(self, p):
+        """Wartość p-tego percentyla w milisekundach"""
+        if not self.count:
+            return 0.0
+        rank = max(1, int(self.count * p / 100.0 + 0.5))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= rank:
+                return min(bucket_upper(index), self.max_us) / 1000.0
+        return self.max_us / 1000.0
+
+    def summary(self):
+        result = {'count': self.count,
+                  'mean_ms': round(self.sum_us / self.count / 1000.0, 3) if self.count else 0.0}
+        for p in PERCENTILES:
+            result[f"p{p}_ms"] = round(self.percentile(p), 3)
+        result['max_ms'] = round(self.max_us / 1000.0, 3)
+        return result
+
+    def as_dict(self):
+        return {'counts': dict(self.counts), 'count': self.count,
+                'sum_us': self.sum_us, 'max_us': self.max_us}
+
+    @classmethod
+    def from_dict(cls, data):
+        histogram = cls()
+        # Klucze po przejściu przez JSON są napisami
+        histogram.counts = {int(k): v for k, v in data.get('counts', {}).items()}
+        histogram.count = data.get('count', 0)
+        histogram.sum_us = data.get('sum_us', 0)
+        histogram.max_us = data.get('max_us', 0)
+        return histogram
+
+
+class LatencyRecorder:
+    """Zbiór histogramów kluczowanych przez (baza, scenariusz, faza)"""
+
+    def __init__(self):
+        self.histograms = {}
+        # Scenariusze trybu continuous mierzą równolegle z wielu wątków
+        self.lock = threading.Lock()
+
+    def record(self, backend, scenario, phase, seconds):
+        key = (backend, scenario, phase)
+        with self.lock:
+            histogram = self.histograms.get(key)
+            if histogram is None:
+                histogram = self.histograms[key] = LatencyHistogram()
+            histogram.record(seconds)
+
+    @contextmanager
+    def measure(self, backend, scenario, phase):
+        """Mierzy blok kodu (działa też wokół await wewnątrz korutyny)"""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(backend, scenario, phase, time.perf_counter() - started)
+
+    def as_dict(self):
+        """Zagnieżdżony słownik {baza: {scenariusz: {faza: histogram}}} - zgodny z merge_counters"""
+        data = {}
+        for (backend, scenario, phase), histogram in self.histograms.items():
+            data.setdefault(backend, {}).setdefault(scenario, {})[phase] = histogram.as_dict()
+        return data
+
+    def load(self, data):
+        self.histograms = {
+            (backend, scenario, phase): LatencyHistogram.from_dict(values)
+            for backend, scenarios in data.items()
+            for scenario, phases in scenarios.items()
+            for phase, values in phases.items()
+        }
+
+    def rows(self):
+        """Posortowane wiersze podsumowania: słownik z kluczem i percentylami"""
+        return [dict(backend=backend, scenario=scenario, phase=phase, **histogram.summary())
+                for (backend, scenario, phase), histogram in sorted(self.histograms.items())]
+
+    def by_backend(self):
+        """Histogramy zsumowane do poziomu (baza, faza)"""
+        merged = {}
+        for (backend, _, phase), histogram in self.histograms.items():
+            target = merged.setdefault((backend, phase), LatencyHistogram())
+            for index, count in histogram.counts.items():
+                target.counts[index] = target.counts.get(index, 0) + count
+            target.count += histogram.count
+            target.sum_us += histogram.sum_us
+            target.max_us = max(target.max_us, histogram.max_us)
+        return merged
+
+    def print_summary(self, simulator, detailed=False):
+        """Drukuje percentyle - per baza/faza, a z detailed=True także per scenariusz"""
+        if not self.histograms:
+            return
+        simulator.print_header("Opóźnienia operacji (ms)")
+        for (backend, phase), histogram in sorted(self.by_backend().items()):
+            simulator.print_info(self._format(f"{backend}/{phase}", histogram.summary()))
+        if detailed:
+            for row in self.rows():
+                simulator.print_info(self._format(f"{row['backend']}/{row['scenario']}/{row['phase']}", row))
+
+    @staticmethod
+    def _format(label, summary):
+        return (f"{label}: n={summary['count']}, p50 {summary['p50_ms']:.2f}, "
+                f"p95 {summary['p95_ms']:.2f}, p99 {summary['p99_ms']:.2f}, max {summary['max_ms']:.2f}")
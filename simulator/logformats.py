@@ -0,0 +1,425 @@
+"""
+Syntetyczne zdarzenia w dokładnie takich formatach, jakie zapisują bazy na dysku
+PostgreSQL jsonlog (pola z log_line_prefix + komunikaty pgaudit), MariaDB server_audit (CSV)
+i MongoDB audit (JSON) - bez uruchamiania prawdziwych baz danych
+"""
+
+import json
+import os
+import random
+import re
+import time
+from datetime import datetime, timezone
+
+try:
+    from zoneinfo import ZoneInfo
+    LOG_TIMEZONE = ZoneInfo('Europe/Warsaw')   # log_timezone z postgresql.conf
+except Exception:
+    LOG_TIMEZONE = timezone.utc
+
+from config import DB_CONFIG
+
+POSTGRESQL_CONF = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'databases', 'postgres',
+                               'postgresql.conf')
+# Ustawienia z postgresql.conf repozytorium - używane, gdy pliku nie ma (np. w kontenerze symulatora)
+PG_LOG_DEFAULTS = {'log_destination': 'jsonlog', 'log_directory': '/var/log/postgresql',
+                   'log_filename': 'postgresql-%Y-%m-%d_%H%M%S.log'}
+# Rozszerzenie pliku zależnie od log_destination (jsonlog/csvlog podmieniają .log z log_filename)
+PG_SUFFIXES = {'stderr': '.log', 'jsonlog': '.json', 'csvlog': '.csv'}
+_PG_SETTING = re.compile(r"\s*(log_destination|log_directory|log_filename)\s*=\s*'?([^'#]*?)'?\s*(?:#.*)?$")
+
+
+def postgres_log_settings(path=POSTGRESQL_CONF):
+    """(log_destination, wzorzec ścieżki pliku logu) wg postgresql.conf
+
+    Renderowane są formaty jsonlog i stderr - przy samym csvlog wybierany jest stderr.
+    """
+    settings = dict(PG_LOG_DEFAULTS)
+    try:
+        with open(path, encoding='utf-8') as f:
+            for line in f:
+                match = _PG_SETTING.match(line)
+                if match:
+                    settings[match.group(1)] = match.group(2).strip()
+    except OSError:
+        pass
+    destinations = [d.strip() for d in settings['log_destination'].split(',')]
+    destination = next((d for d in destinations if d in ('jsonlog', 'stderr')), 'stderr')
+    base = os.path.splitext(os.path.join(settings['log_directory'], settings['log_filename']))[0]
+    return destination, base + PG_SUFFIXES[destination]
+
+
+# Metadane zgodne z inputs.conf forwarderów
+LOG_SOURCES = {
+    'postgres': {
+        'host': 'postgres',
+        'index': 'postgres',
+        'sourcetype': 'postgresql',
+        'source': '/var/log/postgresql/postgresql.log',
+    },
+    'mariadb': {
+        'host': 'mariadb',
+        'index': 'mariadb',
+        'sourcetype': 'mariadb:audit',
+        'source': '/var/log/mysql/audit.log',
+    },
+    'mongodb': {
+        'host': 'mongodb',
+        'index': 'mongodb',
+        'sourcetype': 'mongodb:audit',
+        'source': '/var/log/mongodb/audit.json',
+    },
+}
+
+# Tabele/kolekcje i zapytania pojawiające się w normalnym ruchu
+PG_QUERIES = (
+    ('READ', 'SELECT', 'public.customers',
+     "SELECT first_name, last_name, email FROM customers WHERE customer_id = 42;"),
+    ('READ', 'SELECT', 'public.financial_transactions',
+     "SELECT * FROM financial_transactions WHERE customer_id = 17 ORDER BY transaction_date DESC LIMIT 10;"),
+    ('WRITE', 'INSERT', 'public.financial_transactions',
+     "INSERT INTO financial_transactions (customer_id, amount, transaction_type, account_number) VALUES (1, 120.50, 'payment', '61109010140000071219812874');"),
+    ('WRITE', 'UPDATE', 'public.customers',
+     "UPDATE customers SET phone = '600700800' WHERE customer_id = 7;"),
+)
+PG_ATTACKS = (
+    ('FATAL', '28P01', 'password authentication failed for user "{user}"', None),
+    ('ERROR', '42601', 'syntax error at or near "OR"',
+     "SELECT * FROM customers WHERE email = '' OR '1'='1' --';"),
+    ('ERROR', '42501', 'permission denied for table sensitive_medical_data',
+     "SELECT * FROM sensitive_medical_data;"),
+    ('ERROR', '42501', 'permission denied to create role',
+     "CREATE ROLE backdoor WITH SUPERUSER LOGIN PASSWORD 'x';"),
+)
+# Błąd składni przerywa parsowanie - log_statement nie zapisuje wtedy linii 'statement:'
+PG_SYNTAX_ERROR = '42601'
+MARIA_QUERIES = (
+    ('QUERY', "SELECT * FROM customers WHERE customer_id = 42"),
+    ('QUERY', "SELECT amount, transaction_date FROM financial_transactions WHERE customer_id = 17"),
+    ('QUERY', "INSERT INTO financial_transactions (customer_id, amount, transaction_type) VALUES (3, 99.90, 'transfer')"),
+    ('QUERY', "UPDATE customers SET email = 'nowy@email.pl' WHERE customer_id = 5"),
+)
+MARIA_ATTACKS = (
+    ('FAILED_CONNECT', '', 1045),
+    ('QUERY', "SELECT * FROM customers WHERE customer_id = 1 UNION SELECT user, password, 1, 1, 1, 1, 1 FROM mysql.user", 1142),
+    ('QUERY', "DROP TABLE audit_log", 1142),
+    ('QUERY', "GRANT ALL PRIVILEGES ON *.* TO 'dbadmin'@'%'", 1227),
+)
+MONGO_COMMANDS = (
+    ('find', 'users', {'find': 'users', 'filter': {'username': 'jan.kowalski'}}),
+    ('find', 'orders', {'find': 'orders', 'filter': {'status': 'pending'}}),
+    ('insert', 'orders', {'insert': 'orders', 'ordered': True}),
+    ('update', 'users', {'update': 'users', 'ordered': True}),
+)
+MONGO_ATTACKS = (
+    ('authenticate', 18, None),
+    ('authCheck', 13, ('find', 'users', {'find': 'users', 'filter': {'$where': 'this.password.length > 0'}})),
+    ('authCheck', 13, ('dropDatabase', '$cmd', {'dropDatabase': 1})),
+    ('createUser', 13, None),
+)
+MONGO_ROLES = {
+    'appuser': [{'role': 'readWrite', 'db': 'secure_data'}],
+    'reader': [{'role': 'read', 'db': 'secure_data'}],
+    'admin': [{'role': 'root', 'db': 'admin'}],
+}
+ATTACK_USERS = ('admin', 'root', 'postgres', 'sa', 'test', 'oracle')
+SERVER_IPS = {'postgres': '172.18.0.3', 'mariadb': '172.18.0.4', 'mongodb': '172.18.0.5'}
+
+# Znaczniki czasu w liniach logów: (wzorzec, format strptime, ISO 8601)
+_TIMESTAMPS = (
+    # PostgreSQL (stderr i jsonlog): 2025-01-31 12:00:00[.123] CET
+    (re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)?)'), '%Y-%m-%d %H:%M:%S', False),
+    # MongoDB: {"$date":"2025-01-31T11:00:00.123+00:00"}
+    (re.compile(r'"\$date"\s*:\s*"([^"]+)"'), None, True),
+    # MariaDB server_audit: 20250131 12:00:00
+    (re.compile(r'^(\d{8} \d{2}:\d{2}:\d{2})'), '%Y%m%d %H:%M:%S', False),
+)
+
+
+# Epoch pełnych sekund wg tekstu znacznika - kolejne linie logu zwykle dzielą tę samą sekundę
+_SECONDS = {}
+
+
+def parse_timestamp(raw):
+    """Epoch z pierwszego rozpoznanego znacznika czasu w linii logu; None, gdy brak"""
+    for regex, fmt, iso in _TIMESTAMPS:
+        match = regex.search(raw)
+        if not match:
+            continue
+        value = match.group(1)
+        try:
+            if iso:
+                return datetime.fromisoformat(value.replace('Z', '+00:00')).timestamp()
+            if '.' in value:
+                value, fraction = value.split('.', 1)
+            else:
+                fraction = '0'
+            second = _SECONDS.get(value)
+            if second is None:
+                if len(_SECONDS) >= 4096:
+                    _SECONDS.clear()
+                second = _SECONDS[value] = datetime.strptime(value, fmt).replace(tzinfo=LOG_TIMEZONE).timestamp()
+            return second + float(f"0.{fraction}")
+        except ValueError:
+            continue
+    return None
+
+
+class _Session:
+    """Stan jednej fikcyjnej sesji klienta - pid/identyfikator połączenia i licznik linii"""
+
+    def __init__(self, rng, backend, user):
+        self.user = user
+        self.pid = rng.randint(100, 65000)
+        self.client_ip = f"172.18.0.{rng.randint(6, 250)}"
+        self.client_port = rng.randint(32768, 60999)
+        self.line_num = 0
+        self.query_id = 0
+        self.started = time.time()
+        self.session_id = f"{int(self.started):x}.{self.pid:x}"
+
+
+class LogSynthesizer:
+    """Renderuje linie logów wszystkich trzech baz dla zadanej chwili (epoch)
+
+    Utrzymuje pulę kilkudziesięciu sesji na bazę, żeby pid, adres klienta i numer linii
+    zachowywały się jak w prawdziwym logu. Zwracany wpis nie kończy się znakiem końca linii;
+    zapytanie PostgreSQL daje kilka linii (statement, AUDIT, duration).
+    """
+
+    def __init__(self, backends=None, attack_ratio=0.1, seed=None, sessions=32):
+        self.backends = list(backends or DB_CONFIG)
+        self.attack_ratio = attack_ratio
+        self.rng = random.Random(seed)
+        self.sessions = {
+            backend: [_Session(self.rng, backend, self.rng.choice(list(DB_CONFIG[backend]['users'])))
+                      for _ in range(sessions)]
+            for backend in self.backends
+        }
+        self._renderers = {
+            'postgres': self.render_postgres,
+            'mariadb': self.render_mariadb,
+            'mongodb': self.render_mongodb,
+        }
+        self._second = None
+        self._stamps = None
+
+    # ============================================
+    # ZNACZNIKI CZASU
+    # ============================================
+
+    def _timestamps(self, ts):
+        """Formatuje części znacznika czasu raz na sekundę - to najdroższy element linii"""
+        second = int(ts)
+        if second != self._second:
+            local = datetime.fromtimestamp(second, LOG_TIMEZONE)
+            utc = datetime.fromtimestamp(second, timezone.utc)
+            self._second = second
+            self._stamps = (
+                local.strftime('%Y-%m-%d %H:%M:%S'), local.strftime('%Z'),
+                local.strftime('%Y%m%d %H:%M:%S'),
+                utc.strftime('%Y-%m-%dT%H:%M:%S'),
+            )
+        return self._stamps
+
+    # ============================================
+    # FORMATY
+    # ============================================
+
+    def render_postgres(self, ts, attack):
+        """Rekordy jsonlog jednego zapytania - pola %t, %p, %u, %d, %a, %h z log_line_prefix jako klucze JSON
+
+        Przy log_statement = all, pgaudit.log = all i log_min_duration_statement = 0 zapytanie daje
+        rekordy 'statement:', 'AUDIT:' i 'duration:', a odrzucone - 'statement:' i błąd. Rekordy są
+        rozdzielone znakiem nowej linii - każdy jest osobnym zdarzeniem w Splunku.
+        """
+        session = self.rng.choice(self.sessions['postgres'])
+        local, zone, _, _ = self._timestamps(ts)
+        millis = int((ts % 1) * 1000)
+        base = {
+            'timestamp': f"{local}.{millis:03d} {zone}",
+            'user': session.user,
+            'dbname': DB_CONFIG['postgres']['database'],
+            'pid': session.pid,
+            'remote_host': session.client_ip,
+            'remote_port': session.client_port,
+            'session_id': session.session_id,
+        }
+
+        def record(**fields):
+            session.line_num += 1
+            entry = dict(base, line_num=session.line_num, **fields)
+            entry['application_name'] = 'psycopg2'
+            entry['backend_type'] = 'client backend'
+            return json.dumps(entry, separators=(',', ':'))
+
+        if attack:
+            severity, state, message, statement = self.rng.choice(PG_ATTACKS)
+            if statement is None:
+                base['user'] = self.rng.choice(ATTACK_USERS)
+                return record(ps='authentication', error_severity=severity, state_code=state,
+                              message=message.format(user=base['user']))
+            command = statement.split(' ', 1)[0]
+            records = []
+            if state != PG_SYNTAX_ERROR:
+                records.append(record(ps=command, error_severity='LOG', message=f"statement: {statement}"))
+            records.append(record(ps=command, error_severity=severity, state_code=state,
+                                  message=message, statement=statement))
+            return '\n'.join(records)
+        audit_class, command, relation, statement = self.rng.choice(PG_QUERIES)
+        session.query_id += 1
+        escaped = statement.replace('"', '""')
+        return '\n'.join((
+            record(ps=command, error_severity='LOG', message=f"statement: {statement}"),
+            record(ps=command, error_severity='LOG',
+                   message=(f'AUDIT: SESSION,{session.query_id},1,{audit_class},{command},TABLE,'
+                            f'{relation},"{escaped}",<none>')),
+            record(ps=command, error_severity='LOG', message=f"duration: {self.rng.uniform(0.05, 25.0):.3f} ms"),
+        ))
+
+    def render_postgres_stderr(self, ts, attack):
+        """Linie w formacie stderr z log_line_prefix '%t [%p]: user=%u,db=%d,app=%a,client=%h '
+
+        Te same wpisy co w render_postgres. Zapytania wielowierszowe i pary ERROR/STATEMENT dają
+        wpisy wieloliniowe - dokładnie to, co scala SHOULD_LINEMERGE/BREAK_ONLY_BEFORE w inputs.conf
+        forwardera PostgreSQL.
+        """
+        session = self.rng.choice(self.sessions['postgres'])
+        local, zone, _, _ = self._timestamps(ts)
+        user = session.user
+        if attack:
+            severity, state, message, statement = self.rng.choice(PG_ATTACKS)
+            if statement is None:
+                user = self.rng.choice(ATTACK_USERS)
+        prefix = (f"{local} {zone} [{session.pid}]: user={user},db={DB_CONFIG['postgres']['database']},"
+                  f"app=psycopg2,client={session.client_ip} ")
+        if attack:
+            line = f"{prefix}{severity}:  {message.format(user=user)}"
+            if statement is not None:
+                line += f"\n{prefix}STATEMENT:  {statement}"
+                if state != PG_SYNTAX_ERROR:
+                    line = f"{prefix}LOG:  statement: {statement}\n{line}"
+            return line
+        audit_class, command, relation, statement = self.rng.choice(PG_QUERIES)
+        session.query_id += 1
+        # Klauzule w osobnych liniach, jak w zapytaniach formatowanych przez aplikacje
+        statement = statement.replace(' FROM ', '\n\tFROM ').replace(' WHERE ', '\n\tWHERE ')
+        return (f"{prefix}LOG:  statement: {statement}\n"
+                f"{prefix}LOG:  AUDIT: SESSION,{session.query_id},1,{audit_class},{command},TABLE,"
+                f"{relation},{statement},<none>\n"
+                f"{prefix}LOG:  duration: {self.rng.uniform(0.05, 25.0):.3f} ms")
+
+    def render_mariadb(self, ts, attack):
+        """Linia server_audit: czas,host,użytkownik,klient,id_połączenia,id_zapytania,operacja,baza,obiekt,kod"""
+        session = self.rng.choice(self.sessions['mariadb'])
+        _, _, stamp, _ = self._timestamps(ts)
+        user = session.user
+        if attack:
+            operation, statement, retcode = self.rng.choice(MARIA_ATTACKS)
+            if operation == 'FAILED_CONNECT':
+                user = self.rng.choice(ATTACK_USERS)
+        else:
+            (operation, statement), retcode = self.rng.choice(MARIA_QUERIES), 0
+        session.query_id += 1
+        obj = "'" + statement.replace("\\", "\\\\").replace("'", "\\'") + "'" if statement else ''
+        return (f"{stamp},mariadb,{user},{session.client_ip},{session.pid},{session.query_id},"
+                f"{operation},{DB_CONFIG['mariadb']['database']},{obj},{retcode}")
+
+    def render_mariadb_slow(self, ts, attack):
+        """Wpis slow.log (log_slow_verbosity = query_plan) - wieloliniowy, zaczyna się od '# Time:'"""
+        session = self.rng.choice(self.sessions['mariadb'])
+        local = datetime.fromtimestamp(ts, LOG_TIMEZONE)
+        if attack:
+            statement = self.rng.choice([s for operation, s, _ in MARIA_ATTACKS if operation == 'QUERY'])
+        else:
+            statement = self.rng.choice(MARIA_QUERIES)[1]
+        examined = self.rng.randint(1, 500_000)
+        full_scan = 'Yes' if examined > 10_000 else 'No'
+        return (f"# Time: {local.strftime('%y%m%d %H:%M:%S')}\n"
+                f"# User@Host: {session.user}[{session.user}] @  [{session.client_ip}]\n"
+                f"# Thread_id: {session.pid}  Schema: {DB_CONFIG['mariadb']['database']}  QC_hit: No\n"
+                f"# Query_time: {self.rng.uniform(1.0, 8.0):.6f}  Lock_time: {self.rng.uniform(0, 0.001):.6f}  "
+                f"Rows_sent: {self.rng.randint(0, 100)}  Rows_examined: {examined}\n"
+                f"# Rows_affected: 0  Bytes_sent: {self.rng.randint(100, 20_000)}\n"
+                f"# Full_scan: {full_scan}  Full_join: No  Tmp_table: No  Tmp_table_on_disk: No\n"
+                f"# Filesort: No  Filesort_on_disk: No  Merge_passes: 0  Priority_queue: No\n"
+                f"SET timestamp={int(ts)};\n"
+                f"{statement};")
+
+    def render_mongodb(self, ts, attack):
+        """Dokument audytu MongoDB (format JSON, atype/ts/local/remote/users/roles/param/result)"""
+        session = self.rng.choice(self.sessions['mongodb'])
+        _, _, _, utc = self._timestamps(ts)
+        millis = int((ts % 1) * 1000)
+        database = DB_CONFIG['mongodb']['database']
+        user, result = session.user, 0
+        if attack:
+            atype, result, command = self.rng.choice(MONGO_ATTACKS)
+            if atype == 'authenticate':
+                user = self.rng.choice(ATTACK_USERS)
+                param = {'user': user, 'db': 'admin', 'mechanism': 'SCRAM-SHA-256'}
+            elif atype == 'createUser':
+                param = {'user': 'backdoor', 'db': 'admin', 'roles': [{'role': 'root', 'db': 'admin'}]}
+            else:
+                name, collection, args = command
+                param = {'command': name, 'ns': f"{database}.{collection}", 'args': args}
+        else:
+            name, collection, args = self.rng.choice(MONGO_COMMANDS)
+            atype = 'authCheck'
+            param = {'command': name, 'ns': f"{database}.{collection}", 'args': args}
+        record = {
+            'atype': atype,
+            'ts': {'$date': f"{utc}.{millis:03d}+00:00"},
+            'local': {'ip': SERVER_IPS['mongodb'], 'port': DB_CONFIG['mongodb']['port']},
+            'remote': {'ip': session.client_ip, 'port': session.client_port},
+            'users': [] if result == 18 else [{'user': user, 'db': database}],
+            'roles': [] if result == 18 else MONGO_ROLES.get(user, []),
+            'param': param,
+            'result': result,
+        }
+        return json.dumps(record, separators=(',', ':'))
+
+    def render_mongod_log(self, ts, attack):
+        """Linia strukturalnego logu mongod.log (4.4+: t/s/c/id/ctx/msg/attr)"""
+        session = self.rng.choice(self.sessions['mongodb'])
+        _, _, _, utc = self._timestamps(ts)
+        millis = int((ts % 1) * 1000)
+        client = f"{session.client_ip}:{session.client_port}"
+        context = f"conn{session.pid}"
+        if attack:
+            component, log_id, message = 'ACCESS', 20249, 'Authentication failed'
+            attr = {'mechanism': 'SCRAM-SHA-256', 'principalName': self.rng.choice(ATTACK_USERS),
+                    'authenticationDatabase': 'admin', 'client': client,
+                    'result': 'AuthenticationFailed: SCRAM authentication failed, storedKey mismatch'}
+        else:
+            kind = self.rng.random()
+            if kind < 0.2:
+                component, log_id, message = 'NETWORK', 22943, 'Connection accepted'
+                attr = {'remote': client, 'connectionId': session.pid,
+                        'connectionCount': self.rng.randint(1, 64)}
+            elif kind < 0.4:
+                component, log_id, message = 'ACCESS', 20250, 'Authentication succeeded'
+                attr = {'mechanism': 'SCRAM-SHA-256', 'principalName': session.user,
+                        'authenticationDatabase': DB_CONFIG['mongodb']['database'], 'client': client}
+            else:
+                name, collection, args = self.rng.choice(MONGO_COMMANDS)
+                component, log_id, message = 'COMMAND', 51803, 'Slow query'
+                attr = {'type': 'command', 'ns': f"{DB_CONFIG['mongodb']['database']}.{collection}",
+                        'command': args, 'numYields': 0,
+                        'durationMillis': self.rng.randint(0, 120)}
+        record = {
+            't': {'$date': f"{utc}.{millis:03d}+00:00"},
+            's': 'I', 'c': component, 'id': log_id, 'ctx': context, 'msg': message, 'attr': attr,
+        }
+        return json.dumps(record, separators=(',', ':'))
+
+    def render(self, backend, ts, attack=None):
+        """Wpis logu danej bazy w formacie linia = zdarzenie; attack=None losuje wg attack_ratio"""
+        if attack is None:
+            attack = self.rng.random() < self.attack_ratio
+        return self._renderers[backend](ts, attack)
+
+    def next_event(self, ts):
+        """Losuje bazę i zwraca (baza, wpis) dla chwili ts - wpis może mieć kilka linii-zdarzeń"""
+        backend = self.rng.choice(self.backends)
+        return backend, self.render(backend, ts)
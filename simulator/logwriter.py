@@ -0,0 +1,204 @@
+"""
+Szybki generator plików logów zapisywanych bezpośrednio do ścieżek monitorowanych przez forwardery
+Duże buforowane bloki, zadana przepustowość w GB/h, rotacja jak w prawdziwych bazach
+i opcjonalne cofnięcie znaczników czasu o wiele dni wstecz (backfill historii)
+"""
+
+import os
+import time
+from datetime import datetime, timezone
+
+from logformats import LOG_TIMEZONE, LogSynthesizer
+
+# 100MB - log_rotation_size (postgresql.conf) i server_audit_file_rotate_size (my.cnf)
+ROTATE_BYTES = 100 * 1024 * 1024
+# server_audit_file_rotations z my.cnf
+MARIADB_ROTATIONS = 30
+
+
+class LogTarget:
+    """Jeden monitorowany plik z własną strategią rotacji
+
+    rotation:
+      'strftime' - jak PostgreSQL: nowy plik o nazwie z wzorca log_filename (czas z logu)
+      'numbered' - jak server_audit: audit.log -> audit.log.1 -> ... -> audit.log.N
+      'renamed'  - jak logRotate=rename w MongoDB: plik.RRRR-MM-DDTGG-MM-SS
+    """
+
+    def __init__(self, backend, path, rotation, render, rotate_bytes=ROTATE_BYTES, keep=MARIADB_ROTATIONS):
+        self.backend = backend
+        self.path = path
+        self.rotation = rotation
+        self.render = render
+        self.rotate_bytes = rotate_bytes
+        self.keep = keep
+        self.current = None
+        self.size = 0
+        self.last_ts = None
+        self.bytes = 0
+        self.lines = 0
+        self.rotations = 0
+
+    def _local(self, ts):
+        return datetime.fromtimestamp(ts, LOG_TIMEZONE)
+
+    def open_path(self, ts):
+        """Ścieżka pliku, do którego trafi blok zaczynający się w chwili ts"""
+        if self.current is None:
+            if self.rotation == 'strftime':
+                self.current = os.path.join(os.path.dirname(self.path),
+                                            self._local(ts).strftime(os.path.basename(self.path)))
+            else:
+                self.current = self.path
+            os.makedirs(os.path.dirname(self.current), exist_ok=True)
+            self.size = os.path.getsize(self.current) if os.path.exists(self.current) else 0
+        return self.current
+
+    def rotate(self, ts):
+        """Zamyka bieżący plik tak, jak zrobiłaby to baza po przekroczeniu rozmiaru"""
+        if self.current is None:
+            return
+        # Zamknięty plik dostaje mtime ostatniego wpisu - ważne przy backfillu historii
+        if self.last_ts is not None and os.path.exists(self.current):
+            os.utime(self.current, (self.last_ts, self.last_ts))
+        if self.rotation == 'numbered':
+            oldest = f"{self.path}.{self.keep}"
+            if os.path.exists(oldest):
+                os.remove(oldest)
+            for index in range(self.keep - 1, 0, -1):
+                if os.path.exists(f"{self.path}.{index}"):
+                    os.replace(f"{self.path}.{index}", f"{self.path}.{index + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        elif self.rotation == 'renamed':
+            rotated = f"{self.path}.{datetime.fromtimestamp(ts, timezone.utc):%Y-%m-%dT%H-%M-%S}"
+            counter = 0
+            while os.path.exists(rotated if not counter else f"{rotated}.{counter}"):
+                counter += 1
+            os.replace(self.path, rotated if not counter else f"{rotated}.{counter}")
+        self.current = None
+        self.size = 0
+        self.rotations += 1
+
+    def write(self, block, first_ts, last_ts, lines):
+        if self.size and self.size + len(block) > self.rotate_bytes:
+            self.rotate(first_ts)
+        path = self.open_path(first_ts)
+        with open(path, 'ab', buffering=0) as f:
+            f.write(block)
+        self.size += len(block)
+        self.bytes += len(block)
+        self.lines += lines
+        self.last_ts = last_ts
+
+
+class LogFileSynthesizer:
+    """Zapisuje syntetyczne logi do plików z tempem w GB/h (0 = maksymalnie)
+
+    W trybie na żywo znaczniki czasu to bieżący czas. Z backfill_days > 0 zegar logów
+    startuje backfill_days dni temu i przesuwa się o 1/log_eps sekundy na wpis każdego
+    pliku, aż dogoni teraźniejszość - gęstość historii nie zależy od szybkości zapisu.
+    """
+
+    def __init__(self, simulator, root='/', gb_per_hour=1.0, duration=60, backends=None,
+                 attack_ratio=0.1, seed=None, block_bytes=4 << 20, rotate_bytes=ROTATE_BYTES,
+                 backfill_days=0, log_eps=200):
+        self.simulator = simulator
+        self.gb_per_hour = gb_per_hour
+        self.duration = duration
+        self.block_bytes = block_bytes
+        self.backfill_days = backfill_days
+        self.log_eps = log_eps
+        self.synthesizer = LogSynthesizer(backends, attack_ratio=attack_ratio, seed=seed)
+        synth = self.synthesizer
+
+        def under(path):
+            return os.path.join(root, path.lstrip('/'))
+
+        targets = {
+            # Format stderr w pliku *.log monitorowanym przez forwarder - wpisy wieloliniowe sprawdzają
+            # SHOULD_LINEMERGE/BREAK_ONLY_BEFORE (jsonlog z postgresql.conf trafia do *.json, którego
+            # forwarder nie czyta - wskazuje to tryb capacity)
+            'postgres': [LogTarget('postgres', under('/var/log/postgresql/postgresql-%Y-%m-%d_%H%M%S.log'),
+                                   'strftime', synth.render_postgres_stderr, rotate_bytes)],
+            'mariadb': [LogTarget('mariadb', under('/var/log/mysql/audit.log'),
+                                  'numbered', synth.render_mariadb, rotate_bytes)],
+            'mongodb': [LogTarget('mongodb', under('/var/log/mongodb/mongod.log'),
+                                  'renamed', synth.render_mongod_log, rotate_bytes),
+                        LogTarget('mongodb', self._mongo_audit_path(under('/var/log/mongodb/audit.json')),
+                                  'renamed', synth.render_mongodb, rotate_bytes)],
+        }
+        self.targets = [target for backend in synth.backends for target in targets[backend]]
+        start = time.time() - backfill_days * 86400
+        self.clocks = {id(target): start for target in self.targets}
+
+    @staticmethod
+    def _mongo_audit_path(path):
+        # docker-compose montuje wolumen mongodb-audit pod ścieżką audit.json (katalog)
+        return os.path.join(path, 'audit.json') if os.path.isdir(path) else path
+
+    def render_block(self, target):
+        """Renderuje linie aż do rozmiaru bloku; zwraca (bajty, pierwszy ts, ostatni ts, liczba linii)"""
+        synth = self.synthesizer
+        lines = []
+        size = 0
+        backfill = self.backfill_days > 0
+        step = 1.0 / self.log_eps
+        ts = self.clocks[id(target)] if backfill else time.time()
+        first = ts
+        now = time.time()
+        while size < self.block_bytes and (ts < now or not backfill):
+            line = target.render(ts, synth.rng.random() < synth.attack_ratio)
+            lines.append(line)
+            size += len(line) + 1
+            ts = ts + step if backfill else time.time()
+        if backfill:
+            self.clocks[id(target)] = ts
+        lines.append('')
+        return '\n'.join(lines).encode('utf-8'), first, ts, len(lines) - 1
+
+    def run(self):
+        budget = self.gb_per_hour * 1e9 / 3600 if self.gb_per_hour > 0 else 0
+        started = time.monotonic()
+        deadline = started + self.duration
+        written = 0
+        active = list(self.targets)
+        try:
+            while active and time.monotonic() < deadline:
+                for target in list(active):
+                    block, first, last, lines = self.render_block(target)
+                    if not lines:
+                        # Backfill dogonił teraźniejszość
+                        active.remove(target)
+                        continue
+                    target.write(block, first, last, lines)
+                    written += len(block)
+                    if budget:
+                        delay = started + written / budget - time.monotonic()
+                        if delay > 0:
+                            time.sleep(delay)
+        except KeyboardInterrupt:
+            self.simulator.print_info("Przerwano zapis logów")
+        return max(time.monotonic() - started, 1e-9)
+
+    def start(self):
+        mode = f"backfill {self.backfill_days} dni, {self.log_eps} wpisów/s logu" if self.backfill_days else "na żywo"
+        self.simulator.print_info(
+            f"Zapis logów {self.gb_per_hour or 'maks.'} GB/h, {self.duration}s, bloki "
+            f"{self.block_bytes >> 20} MB, znaczniki czasu {mode}")
+        self.print_summary(self.run())
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie generatora plików logów")
+        total = 0
+        for target in self.targets:
+            total += target.bytes
+            newest = (self._format(target.last_ts) if target.last_ts else '-')
+            self.simulator.print_info(
+                f"{target.current or target.path}: {target.bytes / 2**20:.1f} MB, {target.lines} wpisów, "
+                f"{target.rotations} rotacji, ostatni wpis {newest}")
+        self.simulator.print_info(
+            f"Razem {total / 2**30:.2f} GB w {elapsed:.1f}s = {total / 1e9 / elapsed * 3600:.1f} GB/h")
+
+    @staticmethod
+    def _format(ts):
+        return datetime.fromtimestamp(ts, LOG_TIMEZONE).strftime('%Y-%m-%d %H:%M:%S')
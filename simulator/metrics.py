@@ -0,0 +1,205 @@
+"""
+Metryki symulatora: liczniki operacji, wskaźniki operacji w toku i podsumowania opóźnień
+Udostępniane w formacie tekstowym Prometheusa (GET /metrics) i opcjonalnie wysyłane
+do indeksu metryk Splunka przez HEC - zamiast kolorowych linii na konsoli
+"""
+
+import socket
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+PREFIX = 'simulator'
+OPERATION_LABELS = ('backend', 'user', 'scenario')
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _labels(pairs):
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+class MetricsRegistry:
+    """Liczniki i wskaźniki kluczowane przez (nazwa, etykiety)
+
+    Aktualizacje są zwykłymi operacjami na słownikach w wątku generatora - bez blokad.
+    Serwer HTTP czyta migawkę (kopię słownika), więc koszt na operację to kilka dodawań.
+    """
+
+    def __init__(self):
+        self.counters = {}
+        self.gauges = {}
+        self.latency = []
+        self.static_labels = ()
+
+    def set_static_labels(self, **labels):
+        """Etykiety dopisywane do każdej serii (np. worker przy --workers)"""
+        self.static_labels = tuple(sorted(labels.items()))
+
+    def inc(self, name, value=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge_add(self, name, delta, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        self.gauges[key] = self.gauges.get(key, 0) + delta
+
+    def register_latency(self, recorder):
+        """Dołącza LatencyRecorder - jego histogramy są eksportowane jako podsumowania"""
+        if recorder not in self.latency:
+            self.latency.append(recorder)
+
+    @contextmanager
+    def operation(self, backend, user, scenario):
+        """Zlicza próbę, sukces lub błąd operacji i utrzymuje wskaźnik operacji w toku"""
+        labels = (('backend', backend), ('scenario', scenario), ('user', user))
+        attempted = ('operations_attempted_total', labels)
+        self.counters[attempted] = self.counters.get(attempted, 0) + 1
+        in_flight = ('operations_in_flight', (('backend', backend),))
+        self.gauges[in_flight] = self.gauges.get(in_flight, 0) + 1
+        outcome = 'operations_failed_total'
+        try:
+            yield
+            outcome = 'operations_succeeded_total'
+        finally:
+            self.gauges[in_flight] -= 1
+            key = (outcome, labels)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    def record_result(self, backend, user, scenario, ok):
+        """Wariant bez menedżera kontekstu - dla miejsc, które znają wynik dopiero po fakcie"""
+        labels = (('backend', backend), ('scenario', scenario), ('user', user))
+        for name in ('operations_attempted_total', 'operations_succeeded_total' if ok else 'operations_failed_total'):
+            key = (name, labels)
+            self.counters[key] = self.counters.get(key, 0) + 1
+
+    # ============================================
+    # EKSPORT
+    # ============================================
+
+    def snapshot(self):
+        """Kopie liczników, wskaźników i podsumowań opóźnień: listy (nazwa, etykiety, wartość)"""
+        counters = list(self.counters.items())
+        gauges = list(self.gauges.items())
+        summaries = []
+        for recorder in list(self.latency):
+            for (backend, scenario, phase), histogram in list(recorder.histograms.items()):
+                summaries.append(((('backend', backend), ('phase', phase), ('scenario', scenario)),
+                                  histogram))
+        return counters, gauges, summaries
+
+    def render_prometheus(self):
+        counters, gauges, summaries = self.snapshot()
+        static = self.static_labels
+        lines = []
+        for kind, series in (('counter', counters), ('gauge', gauges)):
+            seen = set()
+            for (name, labels), value in sorted(series):
+                metric = f"{PREFIX}_{name}"
+                if metric not in seen:
+                    seen.add(metric)
+                    lines.append(f"# TYPE {metric} {kind}")
+                lines.append(f"{metric}{_labels(static + labels)} {value}")
+        if summaries:
+            metric = f"{PREFIX}_latency_seconds"
+            lines.append(f"# TYPE {metric} summary")
+            for labels, histogram in sorted(summaries, key=lambda item: item[0]):
+                for quantile in (0.5, 0.95, 0.99):
+                    value = histogram.percentile(quantile * 100) / 1000.0
+                    lines.append(f"{metric}{_labels(static + labels + (('quantile', quantile),))} {value:.6f}")
+                lines.append(f"{metric}_sum{_labels(static + labels)} {histogram.sum_us / 1e6:.6f}")
+                lines.append(f"{metric}_count{_labels(static + labels)} {histogram.count}")
+        return '\n'.join(lines) + '\n'
+
+    def splunk_events(self, index, host=None, ts=None):
+        """Zdarzenia metryk w formacie wielometrykowym HEC (jedno zdarzenie na zestaw etykiet)"""
+        counters, gauges, summaries = self.snapshot()
+        ts = ts or time.time()
+        host = host or socket.gethostname()
+        grouped = {}
+        for (name, labels), value in counters + gauges:
+            grouped.setdefault(self.static_labels + labels, {})[f"metric_name:{PREFIX}.{name}"] = value
+        for labels, histogram in summaries:
+            fields = grouped.setdefault(self.static_labels + labels, {})
+            summary = histogram.summary()
+            for key in ('p50_ms', 'p95_ms', 'p99_ms', 'max_ms', 'count'):
+                fields[f"metric_name:{PREFIX}.latency.{key}"] = summary[key]
+        return [{'time': round(ts, 3), 'event': 'metric', 'source': PREFIX, 'sourcetype': 'simulator:metrics',
+                 'host': host, 'index': index, 'fields': dict(labels, **values)}
+                for labels, values in grouped.items()]
+
+
+# Wspólny rejestr procesu - każdy proces --workers ma własny
+METRICS = MetricsRegistry()
+
+
+# ============================================
+# UJŚCIA
+# ============================================
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        if self.path.split('?', 1)[0] != '/metrics':
+            self.send_error(404)
+            return
+        body = self.server.registry.render_prometheus().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MetricsServer(ThreadingHTTPServer):
+    """Endpoint /metrics w wątku w tle"""
+
+    daemon_threads = True
+
+    def __init__(self, port=9108, host='0.0.0.0', registry=None):
+        super().__init__((host, port), _MetricsHandler)
+        self.registry = registry or METRICS
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='metrics-http', daemon=True).start()
+        return self
+
+
+class SplunkMetricsSink:
+    """Co interval sekund wysyła migawkę rejestru do indeksu metryk Splunka przez HEC"""
+
+    def __init__(self, index='simulator_metrics', interval=10.0, registry=None, **client_options):
+        from hec import HecClient
+        self.index = index
+        self.interval = interval
+        self.registry = registry or METRICS
+        self.client = HecClient(in_flight=1, **client_options)
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self.client.start()
+        self._thread = threading.Thread(target=self._loop, name='metrics-splunk', daemon=True)
+        self._thread.start()
+        return self
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.publish()
+
+    def publish(self):
+        for event in self.registry.splunk_events(self.index):
+            self.client.send(event)
+        self.client.flush()
+
+    def stop(self):
+        self._stop.set()
+        self.publish()
+        self.client.close()
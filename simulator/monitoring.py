@@ -0,0 +1,40 @@
+"""
+Słuchacze komend pymongo przypisujące czas komend MongoDB do scenariuszy symulatora
+Osobny moduł, bo klasa bazowa pochodzi z pymongo - sterownik ładowany jest dopiero
+przy pierwszym połączeniu z MongoDB
+"""
+
+import pymongo.monitoring
+
+from metrics import METRICS
+
+# Komendy wewnętrzne sterownika - ich czas jest już wliczony w fazę connect
+MONGO_INTERNAL_COMMANDS = {'hello', 'ismaster', 'isMaster', 'ping', 'saslStart', 'saslContinue',
+                           'buildinfo', 'buildInfo', 'endSessions'}
+MONGO_FETCH_COMMANDS = {'find', 'getMore', 'aggregate', 'count', 'distinct', 'listCollections'}
+
+
+class MongoLatencyListener(pymongo.monitoring.CommandListener):
+    """Przypisuje czas komend MongoDB do bieżącego scenariusza symulatora"""
+
+    def __init__(self, simulator, username):
+        self.simulator = simulator
+        self.username = username
+
+    def started(self, event):
+        pass
+
+    def succeeded(self, event):
+        self._record(event)
+
+    def failed(self, event):
+        self._record(event)
+
+    def _record(self, event):
+        if event.command_name in MONGO_INTERNAL_COMMANDS:
+            return
+        phase = 'fetch' if event.command_name in MONGO_FETCH_COMMANDS else 'execute'
+        self.simulator.latency.record('mongodb', self.simulator.scenario, phase,
+                                      event.duration_micros / 1_000_000)
+        METRICS.record_result('mongodb', self.username, self.simulator.scenario,
+                              isinstance(event, pymongo.monitoring.CommandSucceededEvent))
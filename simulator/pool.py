@@ -0,0 +1,195 @@
+"""
+Pule połączeń dla symulatora - jedna pula na (baza, użytkownik, hasło)
+Trzyma otwarte sesje pomiędzy scenariuszami, sprawdza ich stan i usuwa bezczynne
+"""
+
+import threading
+import time
+from collections import deque
+
+
+class PoolTimeout(Exception):
+    """Brak wolnego połączenia w puli w zadanym czasie"""
+
+
+class ConnectionPool:
+    """Pula połączeń jednego typu z rozmiarem min/max, health checkiem i eksmisją bezczynnych"""
+
+    def __init__(self, factory, closer, checker=None, reset=None, min_size=1, max_size=5,
+                 max_idle=300, check_interval=30):
+        self.factory = factory
+        self.closer = closer
+        self.checker = checker
+        self.reset = reset
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        # Elementy: [połączenie, ostatnie użycie, ostatni health check]
+        self.idle = deque()
+        self.in_use = 0
+        self.lock = threading.Condition()
+
+    def size(self):
+        return len(self.idle) + self.in_use
+
+    def prefill(self):
+        """Otwiera połączenia do rozmiaru minimalnego"""
+        while True:
+            with self.lock:
+                if self.size() >= self.min_size:
+                    return
+                self.in_use += 1
+            try:
+                conn = self.factory()
+            except Exception:
+                with self.lock:
+                    self.in_use -= 1
+                    self.lock.notify()
+                raise
+            self.release(conn)
+
+    def _close_quietly(self, conn):
+        try:
+            self.closer(conn)
+        except Exception:
+            pass
+
+    def _healthy(self, entry, now):
+        if self.checker is None or now - entry[2] < self.check_interval:
+            return True
+        try:
+            healthy = self.checker(entry[0])
+        except Exception:
+            healthy = False
+        entry[2] = now
+        return healthy
+
+    def evict_idle(self):
+        """Zamyka połączenia bezczynne dłużej niż max_idle (zostawia min_size)"""
+        now = time.monotonic()
+        expired = []
+        with self.lock:
+            while self.idle and self.size() > self.min_size and now - self.idle[0][1] > self.max_idle:
+                expired.append(self.idle.popleft()[0])
+        for conn in expired:
+            self._close_quietly(conn)
+
+    def acquire(self, timeout=10):
+        """Zwraca połączenie z puli - zdrowe bezczynne, nowe albo czeka na zwolnienie"""
+        self.evict_idle()
+        deadline = time.monotonic() + timeout
+        while True:
+            with self.lock:
+                entry = self.idle.pop() if self.idle else None
+                if entry is None and self.size() >= self.max_size:
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        raise PoolTimeout(f"Brak wolnego połączenia (max_size={self.max_size})")
+                    self.lock.wait(remaining)
+                    continue
+                self.in_use += 1
+
+            if entry is None:
+                try:
+                    return self.factory()
+                except Exception:
+                    with self.lock:
+                        self.in_use -= 1
+                        self.lock.notify()
+                    raise
+
+            if self._healthy(entry, time.monotonic()):
+                return entry[0]
+
+            # Martwe połączenie - zamykamy i próbujemy ponownie
+            self._close_quietly(entry[0])
+            with self.lock:
+                self.in_use -= 1
+                self.lock.notify()
+
+    def release(self, conn, broken=False):
+        """Oddaje połączenie do puli (albo zamyka, jeśli jest uszkodzone)"""
+        if not broken and self.reset is not None:
+            try:
+                self.reset(conn)
+            except Exception:
+                broken = True
+        if broken:
+            self._close_quietly(conn)
+        now = time.monotonic()
+        with self.lock:
+            self.in_use -= 1
+            if not broken:
+                self.idle.append([conn, now, now])
+            self.lock.notify()
+
+    def close_all(self):
+        with self.lock:
+            idle = [entry[0] for entry in self.idle]
+            self.idle.clear()
+        for conn in idle:
+            self._close_quietly(conn)
+
+
+class PoolManager:
+    """Zbiór pul kluczowanych przez (baza, użytkownik, hasło)"""
+
+    def __init__(self, drivers, min_size=1, max_size=5, max_idle=300, check_interval=30):
+        # drivers: baza -> dict(connect=, close=, check=, reset=)
+        self.drivers = drivers
+        self.min_size = min_size
+        self.max_size = max_size
+        self.max_idle = max_idle
+        self.check_interval = check_interval
+        self.pools = {}
+        self.owners = {}
+        self.lock = threading.Lock()
+
+    def get_pool(self, backend, username, password):
+        """Pula dla poświadczeń; nowa pula otwiera min_size połączeń od razu (poza blokadą menedżera)"""
+        key = (backend, username, password)
+        created = False
+        with self.lock:
+            pool = self.pools.get(key)
+            if pool is None:
+                created = True
+                driver = self.drivers[backend]
+                pool = ConnectionPool(
+                    factory=lambda: driver['connect'](username, password),
+                    closer=driver['close'],
+                    checker=driver.get('check'),
+                    reset=driver.get('reset'),
+                    min_size=self.min_size,
+                    max_size=self.max_size,
+                    max_idle=self.max_idle,
+                    check_interval=self.check_interval)
+                self.pools[key] = pool
+        if created:
+            # Pierwszy skok obciążenia nie płaci za connect i logowanie audytowane
+            pool.prefill()
+        return pool
+
+    def acquire(self, backend, username, password, timeout=10):
+        pool = self.get_pool(backend, username, password)
+        conn = pool.acquire(timeout)
+        with self.lock:
+            self.owners[id(conn)] = pool
+        return conn
+
+    def release(self, conn, broken=False):
+        with self.lock:
+            pool = self.owners.pop(id(conn), None)
+        if pool is None:
+            # Połączenie spoza puli (np. fresh=True) - po prostu je zamykamy
+            conn.close()
+            return
+        pool.release(conn, broken)
+
+    def close_all(self):
+        with self.lock:
+            pools = list(self.pools.values())
+            self.pools.clear()
+            self.owners.clear()
+        for pool in pools:
+            pool.close_all()
@@ -0,0 +1,679 @@
+"""
+Agent wstępnej agregacji logów baz przed indeksowaniem w Splunku
+Śledzi pliki logów przyrostowo w stałej pamięci (rotacja przez zmianę nazwy i obcięcie),
+zdarzenia istotne dla bezpieczeństwa przekazuje do HEC bez zmian, a rutynowy ruch
+(udane SELECT/INSERT/UPDATE, find/insert/update, połączenia) zwija do liczników na minutę
+wg użytkownika, bazy i klasy polecenia, wysyłanych jako zdarzenia indeksu metryk
+"""
+
+import glob
+import json
+import os
+import re
+import time
+
+from hec import HecClient
+from logformats import LOG_SOURCES, parse_timestamp
+
+# Monitorowane pliki jak w inputs.conf forwarderów: (baza, wzorzec ścieżki, sourcetype)
+WATCHED_LOGS = (
+    ('postgres', '/var/log/postgresql/*.log', 'postgresql'),
+    ('postgres', '/var/log/postgresql/*.json', 'postgresql'),   # log_destination = 'jsonlog'
+    ('mariadb', '/var/log/mysql/audit.log', 'mariadb:audit'),
+    ('mongodb', '/var/log/mongodb/mongod.log', 'mongodb'),
+    ('mongodb', '/var/log/mongodb/audit.json', 'mongodb:audit'),
+    ('mongodb', '/var/log/mongodb/audit.json/audit.json', 'mongodb:audit'),   # wolumen z docker-compose
+    ('mongodb', '/var/log/mongodb/audit/*.json', 'mongodb:audit'),
+)
+# Początek nowego zdarzenia - BREAK_ONLY_BEFORE z inputs.conf PostgreSQL (plus linie jsonlog)
+EVENT_BREAK = {'postgres': re.compile(r'\d{4}-\d{2}-\d{2}|\{')}
+# MAX_EVENTS z props.conf - dłuższe zdarzenia wieloliniowe Splunk też by rozciął
+MAX_EVENT_LINES = 256
+# Dłuższe linie są obcinane (TRUNCATE w props.conf, server_audit_query_log_limit = 10240)
+MAX_LINE_BYTES = 1 << 20
+READ_BYTES = 1 << 20
+# Splunk liczy każde zdarzenie metryki jako 150 B licencji
+METRIC_LICENSE_BYTES = 150
+OTHER = '_other'
+
+# ============================================
+# KLASYFIKACJA
+# ============================================
+
+# Słowa poleceń zmieniających dane masowo, schemat lub uprawnienia - zawsze przekazywane w całości
+PRIVILEGED_WORDS = frozenset((
+    'grant', 'revoke', 'create', 'drop', 'alter', 'truncate', 'delete', 'rename', 'remove', 'copy',
+    'createuser', 'dropuser', 'updateuser', 'grantrolestouser', 'revokerolesfromuser', 'createrole',
+    'updaterole', 'droprole', 'dropdatabase', 'dropcollection',
+))
+# Wzorce szukane przez panele zagrożeń: SQL injection, eksfiltracja, zrzuty, dane wrażliwe.
+# Stałe napisy sprawdza `in`, a każde wyrażenie zaczyna się od literału - jedna długa
+# alternatywa z re.I kosztowała kilkadziesiąt µs na zapytanie.
+SUSPICIOUS_MARKERS = (
+    '--', '#', 'xp_cmdshell', 'extractvalue', 'updatexml', 'information_schema', 'pg_catalog',
+    'mysql.user', 'outfile', 'dumpfile', 'sql_no_cache', 'pg_dump', 'pg_restore', 'mysqldump',
+    'mariadb-dump', 'mongodump', 'mongoexport', 'copydatabase', 'clonedatabase', '$where', '$function',
+    '$accumulator', 'mapreduce', '$out', '$merge', 'sensitive_medical_data',
+)
+SUSPICIOUS_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"union(\s+all)?\s+select", r"'\s*or\s*'1'\s*=\s*'1", r"or\s+1\s*=\s*1\b", r"where\s+1\s*=\s*1",
+    r"sleep\s*\(", r"benchmark\s*\(", r"waitfor\s+delay", r"load_file\s*\(", r"select\s+\*",
+    r"select\s[^;]*(pesel|diagnosis|treatment|account_number|amount)[^;]*from\s[^;]*"
+    r"(customers|financial_transactions|sensitive_medical_data)",
+))
+# Słowa, po których panele wyszukują błędy i odmowy w treści komunikatu
+FAILURE_WORDS = frozenset(('error', 'fatal', 'panic', 'fail', 'failed', 'failure', 'denied', 'unauthorized',
+                           'invalid'))
+# Komendy MongoDB traktowane jako rutynowy ruch aplikacji
+ROUTINE_MONGO_COMMANDS = frozenset((
+    'find', 'insert', 'update', 'getMore', 'count', 'distinct', 'aggregate', 'findAndModify',
+    'hello', 'isMaster', 'ismaster', 'ping', 'buildInfo', 'listCollections', 'listIndexes',
+    'killCursors', 'endSessions',
+))
+
+_PG_STDERR = re.compile(
+    r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2}(?:\.\d+)? \S+) \[(\d+)\]: user=([^,]*),db=([^,]*),'
+    r'app=[^,]*,client=\S* (\w+):  (.*)', re.S)
+_MARIA_AUDIT = re.compile(
+    r'(\d{8} \d{2}:\d{2}:\d{2}),[^,]*,([^,]*),[^,]*,\d*,\d*,([A-Z_]+),([^,]*),(.*),(-?\d+)$', re.S)
+_FIRST_WORD = re.compile(r'[\s(]*([A-Za-z]+)')
+_LITERAL = re.compile(r"'(?:[^'\\]|\\.|'')*'|\"(?:[^\"\\]|\\.)*\"|\b\d+(?:\.\d+)?\b")
+_SPACE = re.compile(r'\s+')
+_WORD = re.compile(r'[a-z]+')
+
+
+def statement_class(statement):
+    """Pierwsze słowo kluczowe zapytania (SELECT, INSERT, ...), 'OTHER' gdy brak"""
+    match = _FIRST_WORD.match(statement)
+    return match.group(1).upper() if match else 'OTHER'
+
+
+def statement_shape(statement):
+    """Kształt zapytania bez literałów - jeden reprezentant na kształt trafia do indeksu bez zmian"""
+    return _SPACE.sub(' ', _LITERAL.sub('?', statement)).strip()[:200]
+
+
+def _failure(text):
+    return not FAILURE_WORDS.isdisjoint(_WORD.findall(text.lower()))
+
+
+def _risky(statement):
+    lowered = statement.lower()
+    if not PRIVILEGED_WORDS.isdisjoint(_WORD.findall(lowered)):
+        return True
+    return any(marker in lowered for marker in SUSPICIOUS_MARKERS) \
+        or any(pattern.search(lowered) for pattern in SUSPICIOUS_PATTERNS)
+
+
+class LogEvent:
+    """Wynik klasyfikacji jednego zdarzenia
+
+    relevant=True oznacza przekazanie bez zmian; w przeciwnym razie zdarzenie jest liczone
+    w kluczu (użytkownik, baza, klasa polecenia), a shape wybiera reprezentanta minuty.
+    """
+
+    __slots__ = ('ts', 'user', 'database', 'command', 'relevant', 'shape')
+
+    def __init__(self, ts, user='', database='', command='', relevant=True, shape=None):
+        self.ts = ts
+        self.user = user
+        self.database = database
+        self.command = command
+        self.relevant = relevant
+        self.shape = shape
+
+
+def _postgres_statement(ts, user, database, severity, message, statement):
+    if severity not in ('LOG', 'INFO', 'NOTICE', 'DEBUG1', 'DEBUG2', 'DEBUG3', 'DEBUG4', 'DEBUG5'):
+        return LogEvent(ts, user, database, severity)
+    if message.startswith('AUDIT: '):
+        # pgaudit: AUDIT: SESSION,id,podid,KLASA,POLECENIE,TYP_OBIEKTU,OBIEKT,ZAPYTANIE,PARAMETRY
+        parts = message[7:].split(',', 6)
+        if len(parts) < 7:
+            return LogEvent(ts, user, database, 'AUDIT')
+        audit_class, command = parts[3], parts[4]
+        text = statement or parts[6]
+        if audit_class not in ('READ', 'WRITE', 'FUNCTION', 'MISC_SET') or _risky(text):
+            return LogEvent(ts, user, database, command)
+        return LogEvent(ts, user, database, command, False, statement_shape(text))
+    # log_statement = 'all' i log_min_duration_statement = 0
+    _, marker, text = message.partition('statement: ')
+    if not marker:
+        if message.startswith('duration: '):
+            return LogEvent(ts, user, database, 'DURATION', False, 'duration')
+        if message.startswith(('connection received', 'disconnection')):
+            return LogEvent(ts, user, database, message.split(':', 1)[0].upper(), False, 'connection')
+        # Pozostałe komunikaty serwera (uwierzytelnienie, checkpointy, autovacuum) - mały wolumen
+        return LogEvent(ts, user, database, 'SERVER')
+    if _risky(text) or _failure(text):
+        return LogEvent(ts, user, database, statement_class(text))
+    return LogEvent(ts, user, database, statement_class(text), False, statement_shape(text))
+
+
+def classify_postgres(raw):
+    """jsonlog (pola z log_line_prefix jako klucze) albo stderr z log_line_prefix; None, gdy nierozpoznane"""
+    if raw.startswith('{'):
+        try:
+            record = json.loads(raw)
+        except ValueError:
+            return None
+        return _postgres_statement(
+            parse_timestamp(record.get('timestamp', '')), record.get('user', ''), record.get('dbname', ''),
+            record.get('error_severity', ''), record.get('message', ''), record.get('statement'))
+    match = _PG_STDERR.match(raw)
+    if not match:
+        return None
+    stamp, _, user, database, severity, message = match.groups()
+    return _postgres_statement(parse_timestamp(stamp), user, database, severity, message, None)
+
+
+def classify_mariadb(raw):
+    """server_audit: czas,host,użytkownik,klient,połączenie,zapytanie,operacja,baza,obiekt,kod"""
+    match = _MARIA_AUDIT.match(raw)
+    if not match:
+        return None
+    stamp, user, operation, database, obj, retcode = match.groups()
+    ts = parse_timestamp(stamp)
+    if operation == 'DISCONNECT':
+        return LogEvent(ts, user, database, operation, False, 'connection')
+    if operation != 'QUERY' or retcode != '0':
+        # CONNECT i FAILED_CONNECT to logowania liczone przez dashboard uwierzytelnienia
+        return LogEvent(ts, user, database, operation)
+    statement = obj[1:-1].replace("\\'", "'") if obj.startswith("'") else obj
+    if _risky(statement):
+        return LogEvent(ts, user, database, statement_class(statement))
+    return LogEvent(ts, user, database, statement_class(statement), False, statement_shape(statement))
+
+
+def _mongo_command(ts, user, database, command, args):
+    text = json.dumps(args, separators=(',', ':'))
+    if command not in ROUTINE_MONGO_COMMANDS or _risky(text):
+        return LogEvent(ts, user, database, command)
+    return LogEvent(ts, user, database, command, False, f"{command} {statement_shape(text)}")
+
+
+def classify_mongodb(raw):
+    """Dokument audytu (atype/param/result) albo strukturalny mongod.log (t/s/c/msg/attr)"""
+    try:
+        record = json.loads(raw)
+    except ValueError:
+        return None
+    if not isinstance(record, dict):
+        return None
+    if 'atype' in record:
+        ts = parse_timestamp(raw)
+        users = record.get('users') or [{}]
+        param = record.get('param') or {}
+        database = str(param.get('ns', '')).split('.', 1)[0] or users[0].get('db', '')
+        user = users[0].get('user', '')
+        if record['atype'] != 'authCheck' or record.get('result', 0) != 0:
+            return LogEvent(ts, user, database, record['atype'])
+        return _mongo_command(ts, user, database, param.get('command', ''), param.get('args', {}))
+    ts = parse_timestamp(raw)
+    attr = record.get('attr') or {}
+    database = str(attr.get('ns', '')).split('.', 1)[0]
+    if record.get('s') in ('W', 'E', 'F') or record.get('c') == 'ACCESS' \
+            or _failure(record.get('msg', '')):
+        return LogEvent(ts, '', database, record.get('c', ''))
+    if record.get('c') == 'NETWORK' and record.get('msg') in ('Connection accepted', 'Connection ended'):
+        return LogEvent(ts, '', '', 'connection', False, 'connection')
+    command = attr.get('command')
+    if record.get('c') == 'COMMAND' and isinstance(command, dict) and command:
+        return _mongo_command(ts, '', database, next(iter(command)), command)
+    return LogEvent(ts, '', database, record.get('c', ''))
+
+
+CLASSIFIERS = {
+    'postgres': classify_postgres,
+    'mariadb': classify_mariadb,
+    'mongodb': classify_mongodb,
+}
+
+
+# ============================================
+# ŚLEDZENIE PLIKÓW
+# ============================================
+
+class LogFollower:
+    """Przyrostowy odczyt jednego pliku jak w forwarderze (tail -F)
+
+    Plik jest otwierany tylko na czas odczytu, więc liczba deskryptorów nie rośnie z liczbą
+    plików. Rotacja przez zmianę nazwy (audit.log -> audit.log.1, mongod.log.<data>) jest
+    wykrywana po numerze i-węzła - resztę starego pliku doczytujemy spod nowej nazwy,
+    a obcięcie pliku (rozmiar mniejszy niż pozycja) zaczyna odczyt od początku.
+    """
+
+    def __init__(self, backend, path, sourcetype, source, offset=0, inode=None):
+        self.backend = backend
+        self.path = path
+        self.sourcetype = sourcetype
+        self.source = source
+        self.offset = offset
+        self.inode = inode
+        self.remainder = b''
+        self.skipping = False
+        self.pending = []
+        self.breaker = EVENT_BREAK.get(backend)
+        self.rotations = 0
+        self.truncated_lines = 0
+
+    def _rotated_path(self):
+        """Nowa nazwa starego pliku po rotacji - szukana wśród plików z tym samym przedrostkiem"""
+        for candidate in glob.glob(glob.escape(self.path) + '.*'):
+            try:
+                if os.stat(candidate).st_ino == self.inode:
+                    return candidate
+            except OSError:
+                continue
+        return None
+
+    def _read(self, path, budget):
+        try:
+            with open(path, 'rb') as f:
+                f.seek(self.offset)
+                data = f.read(budget)
+        except OSError:
+            return b''
+        self.offset += len(data)
+        return data
+
+    def read(self, budget=READ_BYTES):
+        """Zwraca (nowe bajty, czy plik ma jeszcze dane do odczytu)"""
+        try:
+            stat = os.stat(self.path)
+        except OSError:
+            stat = None
+        if self.inode is not None and (stat is None or stat.st_ino != self.inode):
+            rotated = self._rotated_path()
+            if rotated is not None:
+                data = self._read(rotated, budget)
+                if data:
+                    return data, True
+            if stat is None:
+                return b'', False
+            self.inode, self.offset = stat.st_ino, 0
+            self.rotations += 1
+        elif stat is None:
+            return b'', False
+        if self.inode is None:
+            self.inode = stat.st_ino
+        if stat.st_size < self.offset:
+            self.offset = 0
+            self.rotations += 1
+        if stat.st_size == self.offset:
+            return b'', False
+        data = self._read(self.path, budget)
+        return data, self.offset < stat.st_size
+
+    def lines(self, data):
+        """Dzieli bajty na pełne linie; niedokończona linia czeka na kolejny odczyt"""
+        chunk = self.remainder + data
+        parts = chunk.split(b'\n')
+        self.remainder = parts.pop()
+        lines = []
+        for part in parts:
+            if self.skipping:
+                self.skipping = False
+                continue
+            if len(part) > MAX_LINE_BYTES:
+                part = part[:MAX_LINE_BYTES]
+                self.truncated_lines += 1
+            lines.append(part.rstrip(b'\r').decode('utf-8', 'replace'))
+        if len(self.remainder) > MAX_LINE_BYTES:
+            lines.append(self.remainder[:MAX_LINE_BYTES].decode('utf-8', 'replace'))
+            self.remainder = b''
+            self.skipping = True
+            self.truncated_lines += 1
+        return lines
+
+    def events(self, lines, idle=False):
+        """Skleja linie w zdarzenia; ostatnie zdarzenie wieloliniowe wychodzi, gdy plik ucichnie"""
+        if self.breaker is None:
+            return [line for line in lines if line]
+        events = []
+        for line in lines:
+            if self.pending and (self.breaker.match(line) or len(self.pending) >= MAX_EVENT_LINES):
+                events.append('\n'.join(self.pending))
+                self.pending = []
+            if line or self.pending:
+                self.pending.append(line)
+        if idle and self.pending:
+            events.append('\n'.join(self.pending).rstrip('\n'))
+            self.pending = []
+        return events
+
+    def state(self):
+        return {'inode': self.inode, 'offset': self.offset - len(self.remainder)}
+
+
+# ============================================
+# ZWIJANIE RUTYNOWEGO RUCHU
+# ============================================
+
+class StatementRollup:
+    """Liczniki (zdarzenia, bajty) w oknach czasu zdarzeń, ograniczone liczbą kluczy
+
+    Klucz to (baza, sourcetype, użytkownik, baza danych, klasa polecenia). Po przekroczeniu
+    max_keys w oknie nowe kombinacje trafiają do klucza z użytkownikiem i bazą '_other' -
+    sumy pozostają dokładne, traci się tylko rozbicie. Okno jest zamykane, gdy znacznik
+    czasu najnowszego zdarzenia wyprzedzi jego koniec o `lateness` sekund; spóźnione
+    zdarzenia otwierają okno ponownie i wychodzą w następnym opróżnieniu.
+    """
+
+    def __init__(self, window=60, lateness=60, max_keys=50000):
+        self.window = window
+        self.lateness = lateness
+        self.max_keys = max_keys
+        self.windows = {}
+        self.shapes = {}
+        self.watermark = 0.0
+        self.overflow = 0
+
+    def add(self, backend, sourcetype, event, size):
+        """Zlicza zdarzenie; zwraca True, gdy jest pierwszym w oknie reprezentantem swojego kształtu"""
+        ts = event.ts if event.ts is not None else time.time()
+        self.watermark = max(self.watermark, ts)
+        start = int(ts // self.window * self.window)
+        counters = self.windows.setdefault(start, {})
+        key = (backend, sourcetype, event.user, event.database, event.command)
+        if key not in counters and len(counters) >= self.max_keys:
+            key = (backend, sourcetype, OTHER, OTHER, event.command)
+            self.overflow += 1
+        entry = counters.get(key)
+        if entry is None:
+            counters[key] = [1, size]
+        else:
+            entry[0] += 1
+            entry[1] += size
+        shapes = self.shapes.setdefault(start, set())
+        shape = (key, event.shape)
+        if shape in shapes or len(shapes) >= self.max_keys:
+            return False
+        shapes.add(shape)
+        return True
+
+    def flush(self, everything=False):
+        """Zamknięte okna jako lista (początek okna, klucz, zdarzenia, bajty)"""
+        closed = []
+        for start in sorted(self.windows):
+            if not everything and start + self.window + self.lateness > self.watermark:
+                break
+            for key, (count, size) in self.windows.pop(start).items():
+                closed.append((start, key, count, size))
+            self.shapes.pop(start, None)
+        return closed
+
+    def open_keys(self):
+        return sum(len(counters) for counters in self.windows.values())
+
+
+# ============================================
+# AGENT
+# ============================================
+
+class PreAggStats:
+    """Liczniki agenta - bajty wejścia i wyjścia wg bazy pozwalają policzyć oszczędność"""
+
+    def __init__(self):
+        self.events = 0
+        self.bytes = 0
+        self.forwarded = 0
+        self.forwarded_bytes = 0
+        self.exemplars = 0
+        self.exemplar_bytes = 0
+        self.rolled_up = 0
+        self.rolled_up_bytes = 0
+        self.metric_events = 0
+        self.unparsed = 0
+        self.backends = {}
+
+    def as_dict(self):
+        return dict(vars(self))
+
+    def account(self, backend, size, indexed):
+        entry = self.backends.setdefault(backend, [0, 0])
+        entry[0] += size
+        entry[1] += indexed
+
+    @property
+    def indexed_bytes(self):
+        return self.forwarded_bytes + self.exemplar_bytes + self.metric_events * METRIC_LICENSE_BYTES
+
+
+class PreAggregationAgent:
+    """Śledzi logi baz i wysyła do HEC zdarzenia istotne oraz minutowe liczniki reszty
+
+    Zastępuje monitory forwarderów dla tych samych plików (stanzy w inputs.conf należy
+    wtedy wyłączyć). Zdarzenia surowe trafiają do indeksu bazy z tym samym sourcetype,
+    liczniki - do indeksu metryk jako db.statements.count/bytes z wymiarami backend, user,
+    dbname, statement_class; panele liczące rutynowy ruch sumują je przez mstats.
+    Jeden reprezentant każdego kształtu zapytania na okno też trafia do indeksu bez zmian,
+    więc tabele "ostatnie operacje" (dedup po treści zapytania) dalej mają co pokazać.
+
+    Pamięć jest ograniczona: odczyt porcjami READ_BYTES, linie do MAX_LINE_BYTES, zdarzenia
+    do MAX_EVENT_LINES linii, liczniki do max_keys na okno, a HecClient blokuje odczyt, gdy
+    indekser nie nadąża. Stan (i-węzeł, pozycja) jest zapisywany po każdym zamknięciu okien -
+    po awarii wracają zdarzenia od ostatniego zapisu, a liczniki otwartych okien przepadają.
+    """
+
+    def __init__(self, simulator, root='/', duration=0, window=60, lateness=60, max_keys=50000,
+                 from_start=False, state_file=None, index=None, metrics_index='simulator_metrics',
+                 poll_interval=1.0, rescan_interval=10.0, report_interval=10.0, backends=None,
+                 **client_options):
+        self.simulator = simulator
+        self.root = root
+        self.duration = duration
+        self.from_start = from_start
+        self.state_file = state_file
+        self.index = index
+        self.metrics_index = metrics_index
+        self.poll_interval = poll_interval
+        self.rescan_interval = rescan_interval
+        self.report_interval = report_interval
+        self.backends = list(backends or LOG_SOURCES)
+        self.rollup = StatementRollup(window, lateness, max_keys)
+        self.client = HecClient(**client_options)
+        self.stats = PreAggStats()
+        self.followers = {}
+        self.state = self.load_state()
+
+    def load_state(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        self.state = {path: follower.state() for path, follower in self.followers.items()}
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def _under(self, path):
+        return os.path.join(self.root, path.lstrip('/'))
+
+    def discover(self, initial=False):
+        """Dodaje pliki pasujące do WATCHED_LOGS; przy starcie bez stanu czyta tylko nowe wpisy"""
+        for backend, pattern, sourcetype in WATCHED_LOGS:
+            if backend not in self.backends:
+                continue
+            for path in glob.glob(self._under(pattern)):
+                if path in self.followers or not os.path.isfile(path):
+                    continue
+                saved = self.state.get(path)
+                if saved:
+                    offset, inode = saved['offset'], saved['inode']
+                elif initial and not self.from_start:
+                    stat = os.stat(path)
+                    offset, inode = stat.st_size, stat.st_ino
+                else:
+                    offset, inode = 0, None
+                source = '/' + os.path.relpath(path, self.root).replace(os.sep, '/')
+                self.followers[path] = LogFollower(backend, path, sourcetype, source, offset, inode)
+        # Usunięte pliki (np. stare logi PostgreSQL) przestają być śledzone po doczytaniu reszty
+        for path in [path for path, follower in self.followers.items()
+                     if not os.path.exists(path) and follower._rotated_path() is None]:
+            del self.followers[path]
+
+    def raw_event(self, follower, raw, ts):
+        meta = LOG_SOURCES[follower.backend]
+        return {
+            'time': round(ts if ts is not None else time.time(), 3),
+            'host': meta['host'],
+            'source': follower.source,
+            'sourcetype': follower.sourcetype,
+            'index': self.index or meta['index'],
+            'event': raw,
+        }
+
+    def handle(self, follower, raw):
+        stats = self.stats
+        size = len(raw.encode('utf-8')) + 1
+        stats.events += 1
+        stats.bytes += size
+        try:
+            event = CLASSIFIERS[follower.backend](raw)
+        except (ValueError, TypeError, AttributeError, KeyError, IndexError):
+            event = None
+        if event is None:
+            # Nierozpoznane zdarzenia przechodzą bez zmian - agent niczego nie gubi
+            stats.unparsed += 1
+            event = LogEvent(parse_timestamp(raw))
+        if event.relevant:
+            stats.forwarded += 1
+            stats.forwarded_bytes += size
+            stats.account(follower.backend, size, size)
+            self.client.send(self.raw_event(follower, raw, event.ts))
+            return
+        stats.rolled_up += 1
+        stats.rolled_up_bytes += size
+        if self.rollup.add(follower.backend, follower.sourcetype, event, size):
+            stats.exemplars += 1
+            stats.exemplar_bytes += size
+            stats.account(follower.backend, size, size)
+            self.client.send(self.raw_event(follower, raw, event.ts))
+        else:
+            stats.account(follower.backend, size, 0)
+
+    def metric_event(self, start, key, count, size):
+        backend, sourcetype, user, database, command = key
+        return {
+            'time': start, 'event': 'metric', 'source': 'preagg', 'sourcetype': 'simulator:preagg',
+            'host': LOG_SOURCES[backend]['host'], 'index': self.metrics_index,
+            'fields': {
+                'backend': backend, 'sourcetype': sourcetype, 'user': user or 'unknown',
+                'dbname': database or 'unknown', 'statement_class': command or 'unknown',
+                'metric_name:db.statements.count': count, 'metric_name:db.statements.bytes': size,
+            },
+        }
+
+    def flush(self, everything=False):
+        closed = self.rollup.flush(everything)
+        for start, key, count, size in closed:
+            self.client.send(self.metric_event(start, key, count, size))
+            self.stats.metric_events += 1
+            self.stats.account(key[0], 0, METRIC_LICENSE_BYTES)
+        if closed or everything:
+            self.client.flush()
+            self.save_state()
+
+    def poll(self, reads=16):
+        """Jedna runda po wszystkich plikach (do `reads` porcji z każdego); zwraca liczbę bajtów"""
+        total = 0
+        for follower in list(self.followers.values()):
+            for _ in range(reads):
+                data, more = follower.read()
+                total += len(data)
+                for raw in follower.events(follower.lines(data), idle=not more):
+                    self.handle(follower, raw)
+                if not more:
+                    break
+        self.flush()
+        return total
+
+    def run(self):
+        self.client.start()
+        started = time.monotonic()
+        deadline = started + self.duration if self.duration > 0 else None
+        next_scan = started
+        next_report = started + self.report_interval
+        self.discover(initial=True)
+        last = 0
+        try:
+            while deadline is None or time.monotonic() < deadline:
+                now = time.monotonic()
+                if now >= next_scan:
+                    self.discover()
+                    next_scan = now + self.rescan_interval
+                if not self.poll():
+                    time.sleep(self.poll_interval)
+                if self.report_interval and now >= next_report:
+                    last = self.report(last)
+                    next_report = now + self.report_interval
+        except KeyboardInterrupt:
+            self.simulator.print_info("Przerwano - zamykanie otwartych okien i wysyłanie reszty")
+        finally:
+            for follower in self.followers.values():
+                for raw in follower.events([], idle=True):
+                    self.handle(follower, raw)
+            self.flush(everything=True)
+            self.client.close()
+        return max(time.monotonic() - started, 1e-9)
+
+    def report(self, last):
+        """Linia postępu co report_interval; zwraca licznik zdarzeń do następnego wywołania"""
+        stats = self.stats
+        events = stats.events - last
+        if events:
+            self.simulator.print_info(
+                f"{events / self.report_interval:.0f} zdarzeń/s, {len(self.followers)} plików, "
+                f"otwartych kluczy {self.rollup.open_keys()}, do indeksu {stats.indexed_bytes / 2**20:.1f} MB "
+                f"z {stats.bytes / 2**20:.1f} MB")
+        return stats.events
+
+    def describe(self):
+        client = self.client
+        rollup = self.rollup
+        return (f"Agregacja logów spod {self.root} -> HEC {client.scheme}://{client.host}:{client.port}, "
+                f"okna {rollup.window}s (+{rollup.lateness}s na spóźnione), do {rollup.max_keys} kluczy na okno, "
+                f"metryki do indeksu {self.metrics_index}, "
+                f"{'od początku plików' if self.from_start else 'tylko nowe wpisy'}")
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run())
+
+    def print_summary(self, elapsed):
+        stats = self.stats
+        self.simulator.print_header("Podsumowanie agenta agregacji logów")
+        self.simulator.print_info(
+            f"Przeczytano {stats.events} zdarzeń ({stats.events / elapsed:.0f}/s), "
+            f"{stats.bytes / 2**20:.1f} MB z {len(self.followers)} plików")
+        self.simulator.print_info(
+            f"Bez zmian: {stats.forwarded} istotnych ({stats.forwarded_bytes / 2**20:.1f} MB) + "
+            f"{stats.exemplars} reprezentantów ({stats.exemplar_bytes / 2**20:.1f} MB); "
+            f"zwinięto {stats.rolled_up} rutynowych w {stats.metric_events} zdarzeń metryk")
+        if stats.bytes:
+            self.simulator.print_info(
+                f"Wolumen licencji: {stats.indexed_bytes / 2**20:.1f} MB zamiast {stats.bytes / 2**20:.1f} MB "
+                f"(-{1 - stats.indexed_bytes / stats.bytes:.0%})")
+        for backend, (raw, indexed) in sorted(stats.backends.items()):
+            self.simulator.print_detail(
+                f"{backend}: {raw / 2**20:.1f} MB -> {indexed / 2**20:.1f} MB"
+                + (f" (-{1 - indexed / raw:.0%})" if raw else ""))
+        if stats.unparsed:
+            self.simulator.print_info(f"Nierozpoznane zdarzenia przekazane bez zmian: {stats.unparsed}")
+        if self.rollup.overflow:
+            self.simulator.print_info(
+                f"Limit kluczy okna przekroczony {self.rollup.overflow} razy - nadmiar zliczony jako '{OTHER}'")
+        truncated = sum(follower.truncated_lines for follower in self.followers.values())
+        if truncated:
+            self.simulator.print_info(f"Obcięte linie dłuższe niż {MAX_LINE_BYTES >> 20} MB: {truncated}")
+        hec = self.client.stats
+        if hec.failed_batches:
+            self.simulator.print_error(f"Odrzucone paczki HEC: {hec.failed_batches} ({hec.failed_events} zdarzeń)")
+            for error in self.client.errors:
+                self.simulator.print_error(error)
@@ -0,0 +1,390 @@
+"""
+Sonda opóźnienia end-to-end: od wykonania zapytania w bazie do zdarzenia widocznego w wyszukiwaniu
+Do każdej bazy trafiają unikalnie oznaczone operacje-znaczniki (komentarz SQL, komentarz komendy Mongo),
+a sonda odpytuje REST API wyszukiwania Splunka (port 8089), aż znacznik pojawi się w indeksie
+"""
+
+import base64
+import http.client
+import json
+import re
+import secrets
+import ssl
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlencode, urlsplit
+
+from config import DB_CONFIG, SPLUNK_REST_CONFIG
+from latency import LatencyHistogram
+
+SEARCH_PATH = '/services/search/jobs'
+RECEIVER_PATH = '/services/receivers/simple'
+# Ścieżka zdarzenia: baza -> (opis potoku, indeks w Splunku, użytkownik wykonujący znacznik)
+PROBE_PIPELINES = {
+    'postgres': ('pgaudit -> forwarder-postgres', 'postgres', 'app_user'),
+    'mariadb': ('server_audit -> forwarder-mariadb', 'mariadb', 'dbadmin'),
+    'mongodb': ('mongod -> forwarder-mongodb', 'mongodb', 'appuser'),
+}
+PROBE_COLLECTION = 'ingest_probe'
+
+
+class ProbeStats:
+    """Wyniki sondy dla jednego potoku
+
+    searchable - od wykonania znacznika do pierwszego wyszukiwania, które go zwróciło
+    (rozdzielczość = odstęp odpytywania); indexed - od wykonania do _indextime (rozdzielczość 1 s).
+    """
+
+    def __init__(self):
+        self.sent = 0
+        self.failed = 0
+        self.found = 0
+        self.lost = 0
+        self.searchable = LatencyHistogram()
+        self.indexed = LatencyHistogram()
+
+
+# ============================================
+# REST API SPLUNKA
+# ============================================
+
+class SplunkRestClient:
+    """Minimalny klient REST Splunka: wyszukiwanie oneshot i przyjmowanie zdarzeń"""
+
+    def __init__(self, url=None, username=None, password=None, verify=None, timeout=30):
+        url = urlsplit(url or SPLUNK_REST_CONFIG['url'])
+        self.scheme = url.scheme
+        self.host = url.hostname
+        self.port = url.port or 8089
+        self.verify = SPLUNK_REST_CONFIG['verify'] if verify is None else verify
+        self.timeout = timeout
+        credentials = f"{username or SPLUNK_REST_CONFIG['username']}:{password or SPLUNK_REST_CONFIG['password']}"
+        self.authorization = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+        self._conn = None
+
+    def _connection(self):
+        if self._conn is None:
+            if self.scheme == 'https':
+                context = ssl.create_default_context()
+                if not self.verify:
+                    context.check_hostname = False
+                    context.verify_mode = ssl.CERT_NONE
+                self._conn = http.client.HTTPSConnection(self.host, self.port, timeout=self.timeout,
+                                                         context=context)
+            else:
+                self._conn = http.client.HTTPConnection(self.host, self.port, timeout=self.timeout)
+        return self._conn
+
+    def request(self, path, body, content_type='application/x-www-form-urlencoded'):
+        headers = {'Authorization': self.authorization, 'Content-Type': content_type}
+        conn = self._connection()
+        try:
+            conn.request('POST', path, body=body, headers=headers)
+            response = conn.getresponse()
+            payload = response.read()
+        except (OSError, http.client.HTTPException):
+            # Zerwane połączenie keep-alive - następne żądanie otworzy nowe
+            conn.close()
+            self._conn = None
+            raise
+        if response.status not in (200, 201):
+            raise RuntimeError(f"HTTP {response.status}: {payload[:200].decode('utf-8', 'replace')}")
+        return payload
+
+    def oneshot(self, search, earliest=None):
+        """Wyszukiwanie blokujące (exec_mode=oneshot) - zwraca listę wierszy wyniku"""
+        params = {'search': search, 'exec_mode': 'oneshot', 'output_mode': 'json', 'count': 0}
+        if earliest is not None:
+            params['earliest_time'] = f"{earliest:.0f}"
+        payload = self.request(SEARCH_PATH, urlencode(params).encode('utf-8'))
+        return json.loads(payload or b'{}').get('results', [])
+
+    def submit(self, index, sourcetype, source, text):
+        """Zdarzenie wysłane bezpośrednio do indeksu (z pominięciem baz i forwarderów)"""
+        query = urlencode({'index': index, 'sourcetype': sourcetype, 'source': source})
+        self.request(f"{RECEIVER_PATH}?{query}", text.encode('utf-8'), content_type='text/plain')
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+
+# ============================================
+# SONDA
+# ============================================
+
+class IngestProbe:
+    """Co interval sekund wstrzykuje znacznik do każdej bazy i odpytuje Splunka o zaległe znaczniki
+
+    inject='db' wykonuje znaczniki w bazach (pełna ścieżka log -> forwarder -> indekser),
+    inject='rest' wysyła je przez /services/receivers/simple - mierzy tylko indeksowanie
+    i wyszukiwanie, co pozwala sprawdzić sondę na zastępniku REST bez baz.
+    Po upływie duration sonda czeka na zaległe znaczniki najwyżej timeout sekund.
+    """
+
+    def __init__(self, simulator, duration=300, interval=5.0, backends=None, inject='db', timeout=300.0,
+                 poll_interval=1.0, **client_options):
+        self.simulator = simulator
+        self.duration = duration
+        self.interval = interval
+        self.backends = [b for b in (backends or PROBE_PIPELINES) if b in PROBE_PIPELINES]
+        self.inject = inject
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self.client = SplunkRestClient(**client_options)
+        # Znaczniki tylko z liter i cyfr - jeden token Splunka, wyszukiwany prefiksem
+        self.prefix = f"simprobe{secrets.token_hex(4)}n"
+        self.sequence = 0
+        self.pending = {}
+        self.stats = {backend: ProbeStats() for backend in self.backends}
+        self.search_errors = 0
+
+    def next_marker(self):
+        self.sequence += 1
+        return f"{self.prefix}{self.sequence:06d}"
+
+    # ============================================
+    # WSTRZYKIWANIE ZNACZNIKÓW
+    # ============================================
+
+    def inject_marker(self, backend):
+        marker = self.next_marker()
+        _, index, username = PROBE_PIPELINES[backend]
+        issued = time.time()
+        if self.inject == 'rest':
+            self.client.submit(index, f"probe:{backend}", 'ingest-probe',
+                               f"{time.strftime('%Y-%m-%dT%H:%M:%S%z', time.localtime(issued))} "
+                               f"user={username} probe={marker}")
+            return marker, issued
+        password = DB_CONFIG[backend]['users'][username]
+        if backend == 'mongodb':
+            client = self.simulator.connect_mongodb(username, password)
+            if client is None:
+                return None, issued
+            try:
+                # Komentarz komendy trafia do mongod.log razem z treścią find
+                client[DB_CONFIG['mongodb']['database']].command(
+                    'find', PROBE_COLLECTION, filter={'marker': marker}, comment=marker)
+            finally:
+                self.simulator.release(client)
+            return marker, issued
+        connect = self.simulator.connect_postgres if backend == 'postgres' else self.simulator.connect_mariadb
+        execute = self.simulator.execute_postgres if backend == 'postgres' else self.simulator.execute_mariadb
+        conn = connect(username, password)
+        if conn is None:
+            return None, issued
+        try:
+            # Komentarz zostaje w tekście zapytania logowanym przez pgaudit i server_audit
+            result = execute(conn, f"SELECT 1 AS probe /* {marker} */", fetch=True)
+        finally:
+            self.simulator.release(conn)
+        return (marker if result is not None else None), issued
+
+    def inject_round(self):
+        for backend in self.backends:
+            stats = self.stats[backend]
+            try:
+                marker, issued = self.inject_marker(backend)
+            except Exception as e:
+                self.simulator.print_error(f"Znacznik {backend}: {e}")
+                marker, issued = None, time.time()
+            if marker is None:
+                stats.failed += 1
+                continue
+            stats.sent += 1
+            self.pending[marker] = (backend, issued)
+            self.simulator.print_detail(f"{backend}: znacznik {marker}")
+
+    # ============================================
+    # ODPYTYWANIE SPLUNKA
+    # ============================================
+
+    def search_query(self, index):
+        return (f'search index={index} "{self.prefix}*" '
+                f'| rex field=_raw "(?<probe_marker>{self.prefix}\\d+)" '
+                f'| stats min(_indextime) as indexed by probe_marker')
+
+    def poll(self):
+        """Jedno wyszukiwanie na indeks z zaległymi znacznikami; zwraca liczbę odnalezionych"""
+        found = 0
+        for backend in self.backends:
+            waiting = [issued for b, issued in self.pending.values() if b == backend]
+            if not waiting:
+                continue
+            try:
+                rows = self.client.oneshot(self.search_query(PROBE_PIPELINES[backend][1]),
+                                           earliest=min(waiting) - 60)
+            except Exception as e:
+                self.search_errors += 1
+                self.simulator.print_error(f"Wyszukiwanie {backend}: {e}")
+                continue
+            seen = time.time()
+            for row in rows:
+                entry = self.pending.get(row.get('probe_marker'))
+                if entry is None or entry[0] != backend:
+                    continue
+                del self.pending[row['probe_marker']]
+                stats = self.stats[backend]
+                stats.found += 1
+                stats.searchable.record(seen - entry[1])
+                if row.get('indexed'):
+                    stats.indexed.record(max(0.0, float(row['indexed']) - entry[1]))
+                found += 1
+        return found
+
+    def expire(self, now):
+        for marker, (backend, issued) in list(self.pending.items()):
+            if now - issued > self.timeout:
+                del self.pending[marker]
+                self.stats[backend].lost += 1
+
+    # ============================================
+    # URUCHOMIENIE I RAPORT
+    # ============================================
+
+    def run_blocking(self):
+        started = time.monotonic()
+        deadline = started + self.duration
+        next_round = started
+        try:
+            while True:
+                now = time.monotonic()
+                if now < deadline and now >= next_round:
+                    self.inject_round()
+                    next_round += self.interval
+                elif now >= deadline and not self.pending:
+                    break
+                self.poll()
+                self.expire(time.time())
+                time.sleep(self.poll_interval)
+        except KeyboardInterrupt:
+            self.simulator.print_info("Przerwano sondę - zaległe znaczniki liczone jako utracone")
+            for backend, _ in self.pending.values():
+                self.stats[backend].lost += 1
+            self.pending.clear()
+        finally:
+            self.client.close()
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        via = 'REST (bez baz i forwarderów)' if self.inject == 'rest' else 'bazy danych'
+        return (f"Sonda opóźnienia ingestu: znacznik co {self.interval:g}s przez {via}, "
+                f"{', '.join(self.backends)}, {self.duration:g}s, prefiks {self.prefix}")
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run_blocking())
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Opóźnienie od zapytania do zdarzenia w wyszukiwaniu (s)")
+        for backend in self.backends:
+            stats = self.stats[backend]
+            pipeline = PROBE_PIPELINES[backend][0]
+            self.simulator.print_info(
+                f"{pipeline}: {stats.sent} znaczników, {stats.found} odnalezionych, {stats.lost} utraconych, "
+                f"{stats.failed} niewykonanych")
+            for label, histogram in (('widoczne', stats.searchable), ('_indextime', stats.indexed)):
+                if histogram.count:
+                    summary = histogram.summary()
+                    self.simulator.print_info(
+                        f"  {label}: p50 {summary['p50_ms'] / 1000:.2f}, p95 {summary['p95_ms'] / 1000:.2f}, "
+                        f"p99 {summary['p99_ms'] / 1000:.2f}, max {summary['max_ms'] / 1000:.2f}")
+        if self.search_errors:
+            self.simulator.print_error(f"Błędy wyszukiwania: {self.search_errors}")
+        self.simulator.print_info(f"Czas sondy: {elapsed:.1f}s")
+
+
+# ============================================
+# ZASTĘPNIK REST API
+# ============================================
+
+class _RestHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def _reply(self, status, body=b''):
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        body = self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        if self.headers.get('Authorization') != self.server.authorization:
+            self._reply(401, b'{"messages":[{"type":"WARN","text":"call not properly authenticated"}]}')
+            return
+        url = urlsplit(self.path)
+        if url.path == RECEIVER_PATH:
+            query = parse_qs(url.query)
+            self.server.index(query.get('index', ['main'])[0], body.decode('utf-8', 'replace'))
+            self._reply(200, b'{"index":"ok"}')
+        elif url.path == SEARCH_PATH:
+            form = parse_qs(body.decode('utf-8'))
+            rows = self.server.search(form.get('search', [''])[0])
+            self._reply(200, json.dumps({'results': rows}).encode('utf-8'))
+        else:
+            self._reply(404)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SplunkRestStandIn(ThreadingHTTPServer):
+    """Zastępnik REST API Splunka dla testów sondy
+
+    Zdarzenia z /services/receivers/simple stają się widoczne po index_delay (+ losowe jitter) sekundach.
+    Wyszukiwanie rozumie tylko postać generowaną przez sondę: index=X "prefiks*" ... by probe_marker.
+    """
+
+    daemon_threads = True
+
+    def __init__(self, host='0.0.0.0', port=8089, username=None, password=None, index_delay=2.0, jitter=1.0):
+        super().__init__((host, port), _RestHandler)
+        credentials = f"{username or SPLUNK_REST_CONFIG['username']}:{password or SPLUNK_REST_CONFIG['password']}"
+        self.authorization = 'Basic ' + base64.b64encode(credentials.encode('utf-8')).decode('ascii')
+        self.index_delay = index_delay
+        self.jitter = jitter
+        self.lock = threading.Lock()
+        self.events = []
+        self.searches = 0
+
+    def index(self, index, raw):
+        visible = time.time() + self.index_delay + secrets.randbelow(1000) / 1000.0 * self.jitter
+        with self.lock:
+            self.events.append((index, raw, visible))
+
+    def search(self, search):
+        index = re.search(r'index=(\w+)', search)
+        prefix = re.search(r'"(\w+)\*"', search)
+        if not index or not prefix:
+            return []
+        pattern = re.compile(re.escape(prefix.group(1)) + r'\d+')
+        now = time.time()
+        rows = {}
+        with self.lock:
+            self.searches += 1
+            for event_index, raw, visible in self.events:
+                if event_index != index.group(1) or visible > now:
+                    continue
+                for marker in pattern.findall(raw):
+                    # _indextime w Splunku ma rozdzielczość sekundy
+                    rows[marker] = min(rows.get(marker, int(visible)), int(visible))
+        return [{'probe_marker': marker, 'indexed': str(indexed)} for marker, indexed in sorted(rows.items())]
+
+    def serve(self, simulator, report_interval=10.0):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        simulator.print_info(f"Zastępnik REST Splunka nasłuchuje na {self.server_address[0]}:{self.server_address[1]} "
+                             f"(opóźnienie indeksowania {self.index_delay:g}s + do {self.jitter:g}s)")
+        try:
+            while True:
+                time.sleep(report_interval)
+                with self.lock:
+                    simulator.print_info(f"{len(self.events)} zdarzeń, {self.searches} wyszukiwań")
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.shutdown()
+            self.server_close()
@@ -0,0 +1,144 @@
+"""
+Gotowość baz danych przed startem obciążenia
+Wszystkie bazy sprawdzane są równolegle w tle (wykładniczy backoff z losowym rozrzutem),
+a obciążenie każdej bazy rusza, gdy tylko ona jest gotowa - bez czekania na najwolniejszą
+"""
+
+import asyncio
+import queue
+import random
+import threading
+import time
+
+from config import DB_CONFIG
+
+# Próba logowania użytkownikiem obciążenia - potwierdza też, że skrypty init utworzyły konta.
+# Sam port TCP nie wystarcza: gołe połączenie bez handshake'u MariaDB liczy do
+# max_connect_errors, a PostgreSQL loguje je jako "incomplete startup packet".
+READY_USERS = {'postgres': 'app_user', 'mariadb': 'dbadmin', 'mongodb': 'appuser'}
+
+
+def check_postgres(timeout):
+    import psycopg2
+
+    cfg = DB_CONFIG['postgres']
+    user = READY_USERS['postgres']
+    psycopg2.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'], user=user,
+                     password=cfg['users'][user], connect_timeout=max(1, int(timeout))).close()
+
+
+def check_mariadb(timeout):
+    import mysql.connector
+
+    cfg = DB_CONFIG['mariadb']
+    user = READY_USERS['mariadb']
+    mysql.connector.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'], user=user,
+                            password=cfg['users'][user], connect_timeout=max(1, int(timeout))).close()
+
+
+def check_mongodb(timeout):
+    import pymongo
+
+    cfg = DB_CONFIG['mongodb']
+    user = READY_USERS['mongodb']
+    client = pymongo.MongoClient(host=cfg['host'], port=cfg['port'], username=user,
+                                 password=cfg['users'][user], authSource='admin',
+                                 serverSelectionTimeoutMS=int(timeout * 1000))
+    try:
+        client.admin.command('ping')
+    finally:
+        client.close()
+
+
+CHECKS = {'postgres': check_postgres, 'mariadb': check_mariadb, 'mongodb': check_mongodb}
+
+
+class ReadinessProbe:
+    """Sprawdza bazy w osobnych wątkach aż do skutku albo upływu timeout
+
+    Przerwy między próbami rosną wykładniczo od base_delay do max_delay, a każda
+    jest losowana z przedziału [0, przerwa) (full jitter), żeby wiele symulatorów
+    startujących razem nie uderzało w bazę w tych samych chwilach.
+    """
+
+    def __init__(self, simulator, backends=None, timeout=120, base_delay=0.25, max_delay=5.0,
+                 attempt_timeout=3.0, seed=None):
+        self.simulator = simulator
+        self.backends = list(backends or DB_CONFIG)
+        self.timeout = timeout
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.attempt_timeout = attempt_timeout
+        self.rng = random.Random(seed)
+        self.events = {backend: threading.Event() for backend in self.backends}
+        # Wynik sprawdzenia: (gotowa, liczba prób, czas od startu, ostatni błąd)
+        self.results = {}
+        self.ready_order = queue.Queue()
+        self.reported = set()
+        self.started = None
+
+    def probe(self, backend, rng):
+        deadline = self.started + self.timeout
+        attempts = 0
+        error = None
+        while True:
+            attempts += 1
+            try:
+                CHECKS[backend](self.attempt_timeout)
+                ready = True
+                break
+            except ImportError as e:
+                # Brak sterownika nie minie z czasem
+                error, ready = e, False
+                break
+            except Exception as e:
+                error = e
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                ready = False
+                break
+            # Ostatnia próba wypada dokładnie w terminie, jeśli losowa przerwa by go przekroczyła
+            time.sleep(min(remaining, rng.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempts - 1)))))
+        self.results[backend] = (ready, attempts, time.monotonic() - self.started, error)
+        self.events[backend].set()
+        self.ready_order.put(backend)
+
+    def start(self):
+        """Uruchamia sprawdzanie wszystkich baz w tle i zwraca siebie"""
+        self.started = time.monotonic()
+        for backend in self.backends:
+            threading.Thread(target=self.probe, args=(backend, random.Random(self.rng.random())),
+                             name=f"readiness-{backend}", daemon=True).start()
+        return self
+
+    def report(self, backend):
+        """Drukuje wynik sprawdzenia bazy (raz) i zwraca, czy jest gotowa"""
+        ready, attempts, elapsed, error = self.results[backend]
+        if backend in self.reported:
+            return ready
+        self.reported.add(backend)
+        if ready:
+            self.simulator.print_info(f"{backend} gotowa po {elapsed:.1f}s ({attempts} prób)")
+        else:
+            self.simulator.print_error(
+                f"{backend} niegotowa po {elapsed:.1f}s ({attempts} prób), pomijam: {error}")
+        return ready
+
+    def wait(self, backend):
+        """Czeka na wynik sprawdzenia jednej bazy; True gdy gotowa"""
+        self.events[backend].wait()
+        return self.report(backend)
+
+    async def wait_async(self, backend, interval=0.05):
+        """Jak wait, ale bez blokowania pętli zdarzeń (wątki wykonawcy nie są zajmowane)"""
+        event = self.events[backend]
+        while not event.is_set():
+            await asyncio.sleep(interval)
+        return self.report(backend)
+
+    def as_ready(self):
+        """Zwraca gotowe bazy w kolejności, w jakiej stawały się gotowe (niegotowe są pomijane)"""
+        for _ in self.backends:
+            backend = self.ready_order.get()
+            if self.report(backend):
+                yield backend
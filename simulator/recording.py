@@ -0,0 +1,371 @@
+"""
+Nagrywanie i odtwarzanie przebiegów symulacji
+Każda wykonana operacja (czas, sesja, baza, użytkownik, zapytanie lub komenda Mongo, wynik)
+trafia jako jedna linia JSON do pliku śladu dopisywanego na bieżąco (opcjonalnie gzip).
+Odtwarzacz wysyła ślad ponownie z prędkością 1x, 10x lub maksymalną, zachowując
+kolejność operacji w obrębie każdej sesji
+"""
+
+import asyncio
+import gzip
+import heapq
+import json
+import os
+import threading
+import time
+from datetime import datetime
+
+import pymongo.monitoring
+from bson import json_util
+
+from async_engine import close_connection, close_pool, open_connection, open_pool
+from config import DB_CONFIG
+from latency import LatencyRecorder
+
+TRACE_VERSION = 1
+# Pola komend Mongo dodawane przez sterownik - nie należą do treści operacji
+MONGO_DRIVER_FIELDS = {'$db', 'lsid', '$clusterTime', '$readPreference', 'txnNumber', 'autocommit',
+                       'startTransaction', '$readConcern', 'apiVersion'}
+# Komendy, których nie da się (lub nie warto) odtworzyć
+MONGO_SKIPPED_COMMANDS = {'getMore', 'killCursors', 'endSessions', 'hello', 'ismaster', 'isMaster',
+                          'ping', 'saslStart', 'saslContinue', 'buildinfo', 'buildInfo'}
+# Hasło odtwarzanej próby logowania, którego hasło nie trafiło do śladu - logowanie ma się nie udać
+REDACTED_PASSWORD = '<redacted>'
+
+
+def _encode(value):
+    """Wartości spoza JSON: daty jako {'$date': ISO} (odtwarzane jako datetime), reszta jako tekst"""
+    if isinstance(value, datetime):
+        return {'$date': value.isoformat()}
+    return str(value)
+
+
+def _decode_args(args):
+    return [datetime.fromisoformat(arg['$date']) if isinstance(arg, dict) and '$date' in arg else arg
+            for arg in args]
+
+
+def _open(path, mode):
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8')
+
+
+# ============================================
+# NAGRYWANIE
+# ============================================
+
+class TraceWriter:
+    """Dopisuje rekordy do pliku śladu (JSON Lines, krótkie klucze)
+
+    Rekord: t - czas epoch rozpoczęcia operacji, s - sesja, b - baza, u - użytkownik, k - rodzaj
+    (connect/execute/fetch/mongo), q - zapytanie/komenda, a - argumenty, p - hasło (connect),
+    pr - hasło pominięte, ok - wynik, ms - czas wykonania. Plik .gz jest dopisywany jako
+    kolejny człon gzip.
+
+    Hasła kont z DB_CONFIG nie są zapisywane (odtwarzacz bierze je z konfiguracji), a inne
+    hasła (próby ataku) tylko przy passwords=True - domyślnie rekord dostaje pr=1.
+    """
+
+    def __init__(self, path, flush_every=1000, passwords=False):
+        self.path = path
+        self.flush_every = flush_every
+        self.passwords = passwords
+        self.file = _open(path, 'a')
+        self.lock = threading.Lock()
+        self.pending = 0
+        self.records = 0
+        self._sessions = {}
+        self._last_session = 0
+        self.file.write(json.dumps({'trace': TRACE_VERSION, 'started': round(time.time(), 3)}) + '\n')
+
+    def session(self, owner):
+        """Stały numer sesji dla obiektu (połączenia, klienta, wirtualnego użytkownika)"""
+        key = owner if isinstance(owner, (int, str)) else id(owner)
+        with self.lock:
+            if key not in self._sessions:
+                self._last_session += 1
+                self._sessions[key] = self._last_session
+            return self._sessions[key]
+
+    def new_session(self):
+        with self.lock:
+            self._last_session += 1
+            return self._last_session
+
+    def record(self, session, backend, user, kind, query, ok, seconds, args=None, password=None):
+        # Rekord powstaje po zakończeniu operacji - odtwarzacz planuje ją na chwilę jej startu
+        entry = {'t': round(time.time() - seconds, 3), 's': session, 'b': backend, 'u': user, 'k': kind, 'q': query}
+        if args:
+            entry['a'] = list(args)
+        if password is not None and password != DB_CONFIG[backend]['users'].get(user):
+            if self.passwords:
+                entry['p'] = password
+            else:
+                entry['pr'] = 1
+        entry['ok'] = bool(ok)
+        entry['ms'] = round(seconds * 1000, 3)
+        line = json.dumps(entry, ensure_ascii=False, separators=(',', ':'), default=_encode) + '\n'
+        with self.lock:
+            self.file.write(line)
+            self.records += 1
+            self.pending += 1
+            if self.pending >= self.flush_every:
+                self.file.flush()
+                self.pending = 0
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class TraceCommandListener(pymongo.monitoring.CommandListener):
+    """Nagrywa komendy Mongo (sterownik pymongo lub motor) jako rekordy 'mongo'
+
+    Sesją śladu jest sesja logiczna komendy (lsid): równoległe operacje jednego klienta
+    dostają różne sesje z puli sterownika, więc odtwarzacz wykonuje je równolegle.
+    Komendy bez lsid trafiają do stałej sesji słuchacza.
+    """
+
+    def __init__(self, writer, username, session=None):
+        self.writer = writer
+        self.username = username
+        self.session = session if session is not None else writer.session(self)
+        self._started = {}
+
+    def command_session(self, command):
+        lsid = command.get('lsid')
+        if not lsid or 'id' not in lsid:
+            return self.session
+        key = lsid['id']
+        key = key.hex() if isinstance(key, bytes) else str(key)
+        return self.writer.session(f"mongo:{id(self)}:{key}")
+
+    def started(self, event):
+        if event.command_name in MONGO_SKIPPED_COMMANDS:
+            return
+        command = {k: v for k, v in event.command.items() if k not in MONGO_DRIVER_FIELDS}
+        self._started[event.request_id] = (self.command_session(event.command), event.database_name,
+                                           json_util.dumps(command))
+
+    def succeeded(self, event):
+        self._finish(event, True)
+
+    def failed(self, event):
+        self._finish(event, False)
+
+    def _finish(self, event, ok):
+        started = self._started.pop(event.request_id, None)
+        if started is None:
+            return
+        session, database, command = started
+        self.writer.record(session, 'mongodb', self.username, 'mongo', command, ok,
+                           event.duration_micros / 1_000_000, args=[database])
+
+
+def worker_path(path, index):
+    """Plik śladu procesu --workers: trace.jsonl.gz -> trace.w0.jsonl.gz"""
+    directory, name = os.path.split(path)
+    stem, dot, extension = name.partition('.')
+    return os.path.join(directory, f"{stem}.w{index}{dot}{extension}")
+
+
+def read_trace(path):
+    """Strumieniowo zwraca rekordy operacji
+
+    Plik może zawierać kilka dopisanych nagrań - numery sesji są lokalne dla nagrania,
+    więc pole 's' zamieniane jest na parę (numer nagrania, sesja).
+    """
+    recording = 0
+    with _open(path, 'r') as f:
+        for line in f:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # Ostatnia linia przerwanego nagrania może być niepełna
+                continue
+            if 'trace' in entry:
+                recording += 1
+                continue
+            entry['s'] = (recording, entry['s'])
+            yield entry
+
+
+def merge_traces(paths):
+    """Scala kilka śladów (np. z procesów --workers) w jeden strumień uporządkowany czasem"""
+    streams = []
+    for index, path in enumerate(paths):
+        streams.append(({**entry, 's': (index,) + entry['s']} for entry in read_trace(path)))
+    return heapq.merge(*streams, key=lambda entry: entry['t'])
+
+
+# ============================================
+# ODTWARZANIE
+# ============================================
+
+class ReplayStats:
+    """Liczniki odtwarzania dla jednej bazy"""
+
+    def __init__(self):
+        self.replayed = 0
+        self.ok = 0
+        self.failed = 0
+        # Wynik inny niż w nagraniu (np. atak, który teraz się powiódł)
+        self.diverged = 0
+        self.skipped = 0
+        self.max_lag = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class TraceReplayer:
+    """Odtwarza ślad na asynchronicznych pulach połączeń
+
+    speed: 1.0 = tempo oryginalne, 10.0 = dziesięciokrotnie szybciej, 0 = tak szybko, jak się da.
+    Każda sesja ma własną kolejkę i zadanie - operacje sesji wykonują się po kolei, sesje równolegle.
+    Czytnik wyprzedza zegar odtwarzania najwyżej o lookahead sekund, więc plik nie jest
+    wczytywany w całości.
+    """
+
+    def __init__(self, simulator, paths, speed=1.0, pool_size=20, lookahead=2.0, queue_size=1000):
+        self.simulator = simulator
+        self.paths = [paths] if isinstance(paths, str) else list(paths)
+        self.speed = speed
+        self.pool_size = pool_size
+        self.lookahead = lookahead
+        self.queue_size = queue_size
+        self.stats = {backend: ReplayStats() for backend in DB_CONFIG}
+        self.latency = LatencyRecorder()
+        self.pools = {}
+        self._pool_locks = {}
+
+    async def pool(self, backend, user):
+        """Pula dla (baza, użytkownik) tworzona przy pierwszym użyciu"""
+        key = (backend, user)
+        if key in self.pools:
+            return self.pools[key]
+        lock = self._pool_locks.setdefault(key, asyncio.Lock())
+        async with lock:
+            if key not in self.pools:
+                password = DB_CONFIG[backend]['users'].get(user)
+                self.pools[key] = None if password is None else await open_pool(
+                    backend, user, password, self.pool_size)
+        return self.pools[key]
+
+    async def execute(self, entry):
+        backend, kind = entry['b'], entry['k']
+        if kind == 'connect':
+            if 'p' in entry:
+                password = entry['p']
+            elif entry.get('pr'):
+                password = REDACTED_PASSWORD
+            else:
+                password = DB_CONFIG[backend]['users'].get(entry['u'], REDACTED_PASSWORD)
+            conn = await open_connection(backend, entry['u'], password)
+            await close_connection(backend, conn)
+            return True
+        pool = await self.pool(backend, entry['u'])
+        if pool is None:
+            return None
+        if kind == 'mongo':
+            database = (entry.get('a') or [DB_CONFIG['mongodb']['database']])[0]
+            await pool[database].command(json_util.loads(entry['q']))
+            return True
+        args = _decode_args(entry.get('a') or ())
+        if backend == 'postgres':
+            async with pool.acquire() as conn:
+                if kind == 'fetch':
+                    await conn.fetch(entry['q'], *args)
+                else:
+                    await conn.execute(entry['q'], *args)
+            return True
+        async with pool.acquire() as conn:
+            async with conn.cursor() as cursor:
+                await cursor.execute(entry['q'], args or None)
+                if kind == 'fetch':
+                    await cursor.fetchall()
+        return True
+
+    async def session_worker(self, queue, start, origin):
+        while True:
+            entry = await queue.get()
+            if entry is None:
+                return
+            stats = self.stats[entry['b']]
+            if self.speed > 0:
+                delay = start + (entry['t'] - origin) / self.speed - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+                else:
+                    stats.max_lag = max(stats.max_lag, -delay)
+            try:
+                with self.latency.measure(entry['b'], entry['u'], entry['k']):
+                    result = await self.execute(entry)
+                if result is None:
+                    stats.skipped += 1
+                    continue
+                stats.ok += 1
+                ok = True
+            except Exception:
+                stats.failed += 1
+                ok = False
+            stats.replayed += 1
+            stats.diverged += ok != entry.get('ok', True)
+
+    async def run(self):
+        sessions = {}
+        tasks = []
+        start = time.monotonic()
+        origin = None
+        try:
+            for entry in merge_traces(self.paths):
+                if entry.get('b') not in self.stats:
+                    continue
+                if origin is None:
+                    origin = entry['t']
+                if self.speed > 0:
+                    ahead = start + (entry['t'] - origin) / self.speed - time.monotonic() - self.lookahead
+                    if ahead > 0:
+                        await asyncio.sleep(ahead)
+                queue = sessions.get(entry['s'])
+                if queue is None:
+                    queue = sessions[entry['s']] = asyncio.Queue(self.queue_size)
+                    tasks.append(asyncio.create_task(self.session_worker(queue, start, origin)))
+                await queue.put(entry)
+            for queue in sessions.values():
+                await queue.put(None)
+            await asyncio.gather(*tasks)
+        finally:
+            for (backend, _), pool in self.pools.items():
+                if pool is not None:
+                    await close_pool(backend, pool)
+
+    def run_blocking(self):
+        started = time.monotonic()
+        asyncio.run(self.run())
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        return f"Odtwarzanie {', '.join(self.paths)} z prędkością {f'{self.speed:g}x' if self.speed > 0 else 'maksymalną'}"
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run_blocking())
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie odtwarzania")
+        total = 0
+        for backend, stats in self.stats.items():
+            if not (stats.replayed or stats.skipped):
+                continue
+            total += stats.replayed
+            self.simulator.print_info(
+                f"{backend}: {stats.replayed} operacji ({stats.ok} OK, {stats.failed} błędów), "
+                f"{stats.diverged} z innym wynikiem niż w nagraniu, {stats.skipped} pominiętych, "
+                f"max opóźnienie {stats.max_lag * 1000:.1f} ms")
+        self.simulator.print_info(f"Razem: {total / elapsed:.1f} op/s w {elapsed:.1f}s")
+        self.latency.print_summary(self.simulator)
@@ -0,0 +1,262 @@
+"""
+Wyszukiwanie punktu nasycenia baz przy bieżącej konfiguracji audytu
+Zamknięta pętla z limitem tempa: tempo i współbieżność rosną krokami, dopóki p99 i odsetek
+błędów mieszczą się w progach, a potem przedział między ostatnim dobrym i pierwszym złym
+krokiem jest połowiony do wyznaczenia kolana - maksymalnej utrzymywalnej przepustowości
+"""
+
+import asyncio
+import json
+import math
+import random
+import time
+
+from async_engine import STEP_MIX, VU_PROFILES, close_pool, open_pool
+from benchmark import environment
+from config import DB_CONFIG
+from latency import LatencyHistogram
+from metrics import METRICS
+
+# Pierwsze sekundy kroku (napełnianie puli, rozgrzewka planów i buforów) nie są mierzone
+WARMUP_FRACTION = 0.2
+# Krok jest dobry, gdy osiąga co najmniej taki ułamek zadanego tempa
+MIN_ACHIEVED = 0.95
+# Zapas współbieżności ponad prawo Little'a (tempo x średni czas operacji)
+CONCURRENCY_HEADROOM = 2.0
+MAX_BISECTIONS = 8
+
+
+def mix_label(attack_ratio):
+    return 'normal' if not attack_ratio else f"attack={attack_ratio:.0%}"
+
+
+class LoadStep:
+    """Wynik jednego kroku obciążenia o stałym tempie i współbieżności"""
+
+    def __init__(self, rate, concurrency):
+        self.rate = rate
+        self.concurrency = concurrency
+        self.completed = 0
+        self.failed = 0
+        # Odmowy w krokach ataku są ich oczekiwanym wynikiem - nie wliczają się do odsetka błędów
+        self.rejected = 0
+        self.elapsed = 0.0
+        self.histogram = LatencyHistogram()
+        self.reason = None
+
+    @property
+    def throughput(self):
+        return (self.completed + self.failed + self.rejected) / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def error_rate(self):
+        total = self.completed + self.failed
+        return self.failed / total if total else 0.0
+
+    @property
+    def mean_seconds(self):
+        return self.histogram.sum_us / self.histogram.count / 1e6 if self.histogram.count else 0.0
+
+    def judge(self, p99_limit, max_error_rate):
+        """Zwraca True dla kroku w granicach; powód przekroczenia trafia do self.reason"""
+        p99 = self.histogram.percentile(99)
+        if self.error_rate > max_error_rate:
+            self.reason = f"błędy {self.error_rate:.1%}"
+        elif p99 > p99_limit:
+            self.reason = f"p99 {p99:.1f} ms"
+        elif self.throughput < self.rate * MIN_ACHIEVED:
+            self.reason = f"osiągnięto {self.throughput:.0f}/s"
+        return self.reason is None
+
+    def as_dict(self):
+        return {'rate': round(self.rate, 2), 'concurrency': self.concurrency,
+                'throughput': round(self.throughput, 2), 'error_rate': round(self.error_rate, 4),
+                'completed': self.completed, 'failed': self.failed, 'rejected': self.rejected,
+                'latency': self.histogram.summary(), 'healthy': self.reason is None, 'reason': self.reason}
+
+
+class SaturationFinder:
+    """Dla każdej bazy i mieszanki: narastanie geometryczne, potem bisekcja kolana
+
+    Wirtualni użytkownicy pobierają kolejne chwile startu z jednego wspólnego zegara
+    (1/tempo odstępu), ale każdy czeka na wynik swojej operacji - gdy baza nie nadąża,
+    niewykorzystane chwile przepadają i przepustowość spada poniżej zadanej.
+    """
+
+    def __init__(self, simulator, backends=None, mixes=(0.0,), p99_limit=250.0, max_error_rate=0.01,
+                 start_rate=50.0, max_rate=20000.0, growth=2.0, step_duration=15.0, tolerance=0.05,
+                 max_concurrency=256, pool_size=50, cooldown=2.0, ready_timeout=0, seed=None, output=None):
+        self.simulator = simulator
+        self.backends = [b for b in (backends or DB_CONFIG) if b in STEP_MIX]
+        self.mixes = list(mixes)
+        self.p99_limit = p99_limit
+        self.max_error_rate = max_error_rate
+        self.start_rate = start_rate
+        self.max_rate = max_rate
+        self.growth = growth
+        self.step_duration = step_duration
+        self.tolerance = tolerance
+        self.max_concurrency = max_concurrency
+        self.pool_size = pool_size
+        self.cooldown = cooldown
+        self.ready_timeout = ready_timeout
+        self.rng = random.Random(seed)
+        self.output = output
+        self.results = []
+
+    def concurrency_for(self, rate, previous):
+        """Współbieżność z prawa Little'a dla średniego czasu operacji z poprzedniego kroku"""
+        latency = previous.mean_seconds if previous is not None and previous.mean_seconds else 0.01
+        return max(4, min(self.max_concurrency, math.ceil(rate * latency * CONCURRENCY_HEADROOM)))
+
+    async def step(self, backend, pool, username, attack_ratio, rate, concurrency):
+        """Jeden krok: concurrency pętli zamkniętych dzielących zegar o tempie rate"""
+        result = LoadStep(rate, concurrency)
+        normal, attacks = STEP_MIX[backend]
+        scenario = f"saturation_{mix_label(attack_ratio)}"
+        started = time.monotonic()
+        measured_from = started + self.step_duration * WARMUP_FRACTION
+        deadline = started + self.step_duration
+        interval = 1.0 / rate
+        clock = [started]
+
+        async def virtual_user(rng):
+            while True:
+                now = time.monotonic()
+                # Zaległe chwile nie są nadrabiane - pętla zamknięta nie tworzy kolejki zgłoszeń
+                slot = max(clock[0], now)
+                clock[0] = slot + interval
+                if slot >= deadline:
+                    return
+                if slot > now:
+                    await asyncio.sleep(slot - now)
+                attack = rng.random() < attack_ratio
+                step = rng.choice(attacks if attack else normal)
+                began = time.perf_counter()
+                ok = True
+                try:
+                    with METRICS.operation(backend, username, scenario):
+                        if backend == 'mongodb':
+                            await step(pool[DB_CONFIG[backend]['database']])
+                        else:
+                            async with pool.acquire() as conn:
+                                await step(conn)
+                except Exception:
+                    ok = False
+                if slot < measured_from:
+                    continue
+                result.histogram.record(time.perf_counter() - began)
+                if ok:
+                    result.completed += 1
+                elif attack:
+                    result.rejected += 1
+                else:
+                    result.failed += 1
+
+        await asyncio.gather(*(virtual_user(random.Random(self.rng.random())) for _ in range(concurrency)))
+        result.elapsed = deadline - measured_from
+        result.judge(self.p99_limit, self.max_error_rate)
+        self.report_step(backend, attack_ratio, result)
+        await asyncio.sleep(self.cooldown)
+        return result
+
+    def report_step(self, backend, attack_ratio, result):
+        summary = result.histogram.summary()
+        verdict = "OK" if result.reason is None else f"PRZECIĄŻENIE ({result.reason})"
+        self.simulator.print_detail(
+            f"{backend}/{mix_label(attack_ratio)}: cel {result.rate:.0f}/s x{result.concurrency} -> "
+            f"{result.throughput:.0f}/s, p99 {summary['p99_ms']:.1f} ms, błędy {result.error_rate:.2%}: {verdict}")
+
+    async def search(self, backend, pool, username, attack_ratio):
+        """Narastanie x growth do pierwszego złego kroku, potem bisekcja tempa"""
+        steps = []
+        good = bad = previous = None
+        rate = self.start_rate
+        while rate <= self.max_rate:
+            previous = await self.step(backend, pool, username, attack_ratio, rate,
+                                       self.concurrency_for(rate, previous))
+            steps.append(previous)
+            if previous.reason is not None:
+                bad = previous
+                break
+            good = previous
+            rate *= self.growth
+        if bad is not None:
+            low = good.rate if good is not None else 0.0
+            high = bad.rate
+            for _ in range(MAX_BISECTIONS):
+                if high - low <= self.tolerance * high:
+                    break
+                middle = (low + high) / 2
+                step = await self.step(backend, pool, username, attack_ratio, middle,
+                                       self.concurrency_for(middle, good or previous))
+                steps.append(step)
+                if step.reason is None:
+                    good, low = step, middle
+                else:
+                    bad, high = step, middle
+        return {
+            'backend': backend,
+            'mix': mix_label(attack_ratio),
+            'attack_ratio': attack_ratio,
+            'username': username,
+            'max_sustainable': round(good.throughput, 2) if good is not None else 0.0,
+            'sustainable_step': good.as_dict() if good is not None else None,
+            'knee_rate': round(bad.rate, 2) if bad is not None else None,
+            'knee_reason': bad.reason if bad is not None else f"nie osiągnięto do {self.max_rate:.0f}/s",
+            'steps': [step.as_dict() for step in steps],
+        }
+
+    async def run(self):
+        probe = None
+        if self.ready_timeout:
+            from readiness import ReadinessProbe
+            probe = ReadinessProbe(self.simulator, self.backends, timeout=self.ready_timeout).start()
+        for backend in self.backends:
+            if probe is not None and not await probe.wait_async(backend):
+                continue
+            username = next(user for b, user in VU_PROFILES if b == backend)
+            try:
+                pool = await open_pool(backend, username, DB_CONFIG[backend]['users'][username], self.pool_size)
+            except Exception as e:
+                self.simulator.print_error(f"{backend}: nie można otworzyć puli: {e}")
+                continue
+            try:
+                for attack_ratio in self.mixes:
+                    self.simulator.print_scenario(f"{backend} - mieszanka {mix_label(attack_ratio)}")
+                    self.results.append(await self.search(backend, pool, username, attack_ratio))
+            finally:
+                await close_pool(backend, pool)
+
+    def describe(self):
+        return (f"Szukanie nasycenia: {', '.join(self.backends)}, mieszanki "
+                f"{', '.join(mix_label(m) for m in self.mixes)}, próg p99 {self.p99_limit:g} ms, "
+                f"błędy {self.max_error_rate:.1%}, kroki {self.step_duration:g}s od {self.start_rate:g}/s")
+
+    def start(self):
+        self.simulator.print_header("Szukanie maksymalnej przepustowości z audytem")
+        self.simulator.print_info(self.describe())
+        asyncio.run(self.run())
+        self.print_summary()
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump({'environment': environment(), 'p99_limit_ms': self.p99_limit,
+                           'max_error_rate': self.max_error_rate, 'step_duration_s': self.step_duration,
+                           'results': self.results}, f, indent=2, ensure_ascii=False)
+            self.simulator.print_info(f"Wyniki zapisane w {self.output}")
+
+    def print_summary(self):
+        self.simulator.print_header("Maksymalna utrzymywalna przepustowość")
+        for result in self.results:
+            step = result['sustainable_step']
+            if step is None:
+                self.simulator.print_error(
+                    f"{result['backend']}/{result['mix']}: przeciążenie już przy {self.start_rate:g}/s "
+                    f"({result['knee_reason']})")
+                continue
+            knee = f"kolano {result['knee_rate']:.0f}/s ({result['knee_reason']})" if result['knee_rate'] \
+                else result['knee_reason']
+            self.simulator.print_info(
+                f"{result['backend']}/{result['mix']}: {result['max_sustainable']:.0f} operacji/s "
+                f"przy x{step['concurrency']}, p99 {step['latency']['p99_ms']:.1f} ms, "
+                f"błędy {step['error_rate']:.2%}; {knee}")
@@ -0,0 +1,470 @@
+"""
+Deklaratywne scenariusze ładowane z plików JSON (katalog scenarios/)
+Loader kompiluje je raz przy starcie do płaskiej tablicy kroków - silnik wykonuje
+gotowe funkcje z gotowymi zapytaniami, bez rozgałęzień i formatowania napisów w pętli
+"""
+
+import asyncio
+import bisect
+import glob
+import json
+import os
+import random
+import time
+from datetime import datetime, timedelta
+from decimal import Decimal
+
+from async_engine import close_connection, close_pool, open_connection, open_pool
+from config import DB_CONFIG
+from identity import default_stream
+from latency import LatencyRecorder
+from metrics import METRICS
+
+SCENARIO_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'scenarios')
+
+
+class ScenarioError(Exception):
+    """Niepoprawna definicja scenariusza"""
+
+
+# ============================================
+# GENERATORY PARAMETRÓW
+# ============================================
+
+def _token_generator(token):
+    """Zamienia token '@nazwa:arg:...' na funkcję rng -> wartość"""
+    name, _, rest = token[1:].partition(':')
+    args = rest.split(':') if rest else []
+    if name == 'int':
+        low, high = int(args[0]), int(args[1])
+        return lambda rng: rng.randint(low, high)
+    if name == 'float':
+        low, high = float(args[0]), float(args[1])
+        digits = int(args[2]) if len(args) > 2 else 2
+        return lambda rng: round(rng.uniform(low, high), digits)
+    if name == 'choice':
+        options = rest.split('|')
+        return lambda rng: rng.choice(options)
+    if name == 'email':
+        prefix, domain = args[0], args[1]
+        return lambda rng: f"{prefix}{rng.getrandbits(40)}@{domain}"
+    if name == 'uid':
+        prefix = args[0] if args else ''
+        return lambda rng: f"{prefix}{rng.getrandbits(40)}"
+    if name == 'decimal':
+        low, high = float(args[0]), float(args[1])
+        digits = int(args[2]) if len(args) > 2 else 2
+        return lambda rng: Decimal(f"{rng.uniform(low, high):.{digits}f}")
+    if name == 'bool':
+        return lambda rng: rng.random() < 0.5
+    if name == 'days':
+        low, high = int(args[0]), int(args[1])
+        return lambda rng: timedelta(days=rng.randint(low, high))
+    if name == 'now':
+        return lambda rng: datetime.now()
+    if name == 'identity':
+        # Pole tożsamości z generatora wektorowego: pesel, account_number, email, phone, ...
+        field = args[0]
+        return lambda rng: default_stream().value(field)
+    raise ScenarioError(f"Nieznany generator parametru: {token}")
+
+
+def compile_value(value):
+    """Kompiluje wartość (także zagnieżdżony dokument) do funkcji rng -> wartość
+
+    Wartości bez tokenów zwracane są jako stałe - bez kopiowania przy każdym wykonaniu.
+    """
+    if isinstance(value, str) and value.startswith('@') and not value.startswith('@@'):
+        return _token_generator(value), True
+    if isinstance(value, str) and value.startswith('@@'):
+        literal = value[1:]
+        return (lambda rng: literal), False
+    if isinstance(value, dict):
+        parts = {key: compile_value(item) for key, item in value.items()}
+        if not any(dynamic for _, dynamic in parts.values()):
+            return (lambda rng: value), False
+        fns = [(key, fn) for key, (fn, _) in parts.items()]
+        return (lambda rng: {key: fn(rng) for key, fn in fns}), True
+    if isinstance(value, list):
+        parts = [compile_value(item) for item in value]
+        if not any(dynamic for _, dynamic in parts):
+            return (lambda rng: value), False
+        fns = [fn for fn, _ in parts]
+        return (lambda rng: [fn(rng) for fn in fns]), True
+    return (lambda rng: value), False
+
+
+def compile_params(params):
+    """Kompiluje listę parametrów zapytania do funkcji rng -> krotka
+
+    Wszystkie tokeny '@identity:pole' w jednym zapytaniu pochodzą z tej samej tożsamości
+    (imię, e-mail i PESEL opisują jedną osobę).
+    """
+    if not params:
+        return None
+    identity_fields = [param[len('@identity:'):] if isinstance(param, str) and param.startswith('@identity:')
+                       else None for param in params]
+    fns = [compile_value(param)[0] for param in params]
+    if not any(identity_fields):
+        return lambda rng: tuple(fn(rng) for fn in fns)
+    parts = list(zip(identity_fields, fns))
+
+    def build(rng):
+        person = default_stream().take()
+        return tuple(person[field] if field else fn(rng) for field, fn in parts)
+    return build
+
+
+# ============================================
+# KOMPILACJA KROKÓW
+# ============================================
+
+def _sql_placeholders(backend, sql):
+    """Zamienia znaczniki '?' na styl sterownika ($1.. dla asyncpg, %s dla aiomysql)"""
+    if backend == 'postgres':
+        parts = sql.split('?')
+        return parts[0] + ''.join(f"${i}{part}" for i, part in enumerate(parts[1:], start=1))
+    return sql.replace('%', '%%').replace('?', '%s')
+
+
+def _compile_sql(backend, step):
+    op = step['op']
+    params = compile_params(step.get('params'))
+    sql = _sql_placeholders(backend, step['sql']) if params else step['sql']
+
+    if backend == 'postgres':
+        if op == 'fetch':
+            if params:
+                return lambda conn, args: conn.fetch(sql, *args), params
+            return lambda conn, args: conn.fetch(sql), None
+        if op == 'execute':
+            if params:
+                return lambda conn, args: conn.execute(sql, *args), params
+            return lambda conn, args: conn.execute(sql), None
+    else:
+        fetch = op == 'fetch'
+
+        async def run(conn, args):
+            async with conn.cursor() as cursor:
+                await cursor.execute(sql, args)
+                if fetch:
+                    await cursor.fetchall()
+        if op in ('fetch', 'execute'):
+            return run, params
+    raise ScenarioError(f"Operacja '{op}' nie jest obsługiwana dla {backend}")
+
+
+def _compile_mongo(step):
+    op = step['op']
+    collection = step.get('collection')
+    if op == 'find':
+        query, _ = compile_value(step.get('filter', {}))
+        limit = step.get('limit', 0)
+        return (lambda db, rng: db[collection].find(query(rng)).limit(limit).to_list(length=limit or None)), True
+    if op == 'insert_one':
+        document, _ = compile_value(step['document'])
+        # Kopia płytka - sterownik dopisuje _id do wstawianego dokumentu
+        return (lambda db, rng: db[collection].insert_one(dict(document(rng)))), True
+    if op == 'update_one':
+        query, _ = compile_value(step['filter'])
+        update, _ = compile_value(step['update'])
+        return (lambda db, rng: db[collection].update_one(query(rng), update(rng))), True
+    if op == 'aggregate':
+        pipeline, _ = compile_value(step['pipeline'])
+        return (lambda db, rng: db[collection].aggregate(pipeline(rng)).to_list(length=None)), True
+    if op == 'command':
+        database = step.get('database')
+        command = step['command']
+        if database:
+            return (lambda db, rng: db.client[database].command(command)), False
+        return (lambda db, rng: db.command(command)), False
+    if op == 'list_collections':
+        return (lambda db, rng: db.list_collection_names()), False
+    raise ScenarioError(f"Operacja '{op}' nie jest obsługiwana dla mongodb")
+
+
+# Operacje zwracające wiersze/dokumenty
+FETCH_OPS = ('fetch', 'find', 'aggregate', 'list_collections')
+
+
+class CompiledStep:
+    """Jeden krok gotowy do wykonania: fn(cel, argumenty) + generator argumentów"""
+
+    __slots__ = ('name', 'fn', 'params', 'rng_arg', 'login', 'think_min', 'think_max', 'phase', 'sql')
+
+    def __init__(self, name, fn, params=None, rng_arg=False, login=None, think=(0.0, 0.0),
+                 phase='execute', sql=None):
+        self.name = name
+        self.fn = fn
+        self.params = params
+        # Treść zapytania SQL (w stylu sterownika) - do nagrywania śladu
+        self.sql = sql
+        # Faza w histogramach opóźnień (connect/execute/fetch)
+        self.phase = phase
+        # Kroki Mongo dostają rng bezpośrednio (dokumenty generowane w locie)
+        self.rng_arg = rng_arg
+        # Krok 'login' - (użytkownik, hasło) dla świeżego połączenia
+        self.login = login
+        self.think_min, self.think_max = think
+
+
+class CompiledScenario:
+    """Scenariusz skompilowany do płaskiej listy kroków"""
+
+    __slots__ = ('name', 'backend', 'scenario_class', 'weight', 'username', 'password', 'steps')
+
+    def __init__(self, name, backend, scenario_class, weight, username, password, steps):
+        self.name = name
+        self.backend = backend
+        self.scenario_class = scenario_class
+        self.weight = weight
+        self.username = username
+        self.password = password
+        self.steps = steps
+
+
+def compile_scenario(definition):
+    """Kompiluje jedną definicję scenariusza (słownik z pliku JSON)"""
+    try:
+        name = definition['name']
+        backend = definition['backend']
+        steps = definition['steps']
+    except KeyError as e:
+        raise ScenarioError(f"Brak pola {e} w definicji scenariusza")
+    if backend not in DB_CONFIG:
+        raise ScenarioError(f"Scenariusz '{name}': nieznana baza '{backend}'")
+
+    username = definition.get('user')
+    password = definition.get('password')
+    if username and password is None:
+        password = DB_CONFIG[backend]['users'].get(username)
+        if password is None:
+            raise ScenarioError(f"Scenariusz '{name}': brak hasła dla użytkownika '{username}'")
+    default_think = tuple(definition.get('think_time', (0.0, 0.0)))
+
+    compiled = []
+    for index, step in enumerate(steps):
+        step_name = step.get('name', f"{name}#{index}")
+        think = tuple(step.get('think_time', default_think))
+        repeat = step.get('repeat', 1)
+        if step['op'] == 'login':
+            compiled_step = CompiledStep(step_name, None, login=(step['user'], step['password']), think=think,
+                                         phase='connect')
+        elif backend == 'mongodb':
+            fn, _ = _compile_mongo(step)
+            compiled_step = CompiledStep(step_name, fn, rng_arg=True, think=think,
+                                         phase='fetch' if step['op'] in FETCH_OPS else 'execute')
+        else:
+            if not username:
+                raise ScenarioError(f"Scenariusz '{name}': krok SQL wymaga pola 'user'")
+            fn, params = _compile_sql(backend, step)
+            sql = _sql_placeholders(backend, step['sql']) if params else step['sql']
+            compiled_step = CompiledStep(step_name, fn, params=params, think=think,
+                                         phase='fetch' if step['op'] in FETCH_OPS else 'execute', sql=sql)
+        # Powtórzenia rozwijane w czasie kompilacji - silnik nie liczy iteracji
+        compiled.extend([compiled_step] * repeat)
+
+    return CompiledScenario(name, backend, definition.get('class', 'normal'),
+                            float(definition.get('weight', 1.0)), username, password, compiled)
+
+
+def load_scenarios(paths=None, weights=None):
+    """Wczytuje pliki/katalogi z definicjami i zwraca listę skompilowanych scenariuszy
+
+    weights: {nazwa scenariusza lub klasa: mnożnik wagi}
+    """
+    files = []
+    for path in paths or [SCENARIO_DIR]:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.json'))))
+        else:
+            files.append(path)
+
+    scenarios = []
+    for file_name in files:
+        with open(file_name, encoding='utf-8') as f:
+            data = json.load(f)
+        for definition in data.get('scenarios', []):
+            scenario = compile_scenario(definition)
+            for key, factor in (weights or {}).items():
+                if key in (scenario.name, scenario.scenario_class, scenario.backend):
+                    scenario.weight *= factor
+            if scenario.weight > 0:
+                scenarios.append(scenario)
+    if not scenarios:
+        raise ScenarioError("Brak scenariuszy o dodatniej wadze")
+    return scenarios
+
+
+def parse_weight_specs(specs):
+    """Parsuje 'klucz=mnożnik' (klucz: nazwa scenariusza, klasa albo baza)"""
+    weights = {}
+    for spec in specs:
+        key, _, value = spec.partition('=')
+        try:
+            weights[key] = float(value)
+        except ValueError:
+            raise ScenarioError(f"Niepoprawna specyfikacja wagi '{spec}' (oczekiwano klucz=liczba)")
+    return weights
+
+
+class StepPlan:
+    """Tablica scenariuszy z wagami skumulowanymi - losowanie to jedno wyszukiwanie binarne"""
+
+    def __init__(self, scenarios):
+        self.scenarios = scenarios
+        self.cumulative = []
+        total = 0.0
+        for scenario in scenarios:
+            total += scenario.weight
+            self.cumulative.append(total)
+        self.total = total
+
+    def pick(self, rng):
+        return self.scenarios[bisect.bisect_right(self.cumulative, rng.random() * self.total)]
+
+    def credentials(self):
+        return sorted({(s.backend, s.username, s.password) for s in self.scenarios if s.username})
+
+
+# ============================================
+# SILNIK SCENARIUSZY
+# ============================================
+
+class ScenarioEngine:
+    """Wirtualni użytkownicy wykonujący skompilowane scenariusze na pulach asynchronicznych"""
+
+    def __init__(self, simulator, plan, users=100, duration=60, pool_size=20, seed=None, vu_ids=None):
+        self.simulator = simulator
+        self.plan = plan
+        self.users = users
+        self.duration = duration
+        self.pool_size = pool_size
+        self.seed = seed
+        self.vu_ids = list(vu_ids) if vu_ids is not None else list(range(users))
+        self.pools = {}
+        self.stats = {s.name: {'runs': 0, 'ok': 0, 'failed': 0} for s in plan.scenarios}
+        self.latency = LatencyRecorder()
+        METRICS.register_latency(self.latency)
+        # Ślad operacji (--record) - kroki SQL i logowania zapisuje silnik, komendy Mongo słuchacz motor
+        self.trace = getattr(simulator, 'trace', None)
+
+    async def run_step(self, step, backend, target, rng):
+        if step.login is not None:
+            conn = await open_connection(backend, *step.login)
+            await close_connection(backend, conn)
+        elif step.rng_arg:
+            await step.fn(target, rng)
+        elif step.params is not None:
+            await step.fn(target, step.params(rng))
+        else:
+            await step.fn(target, None)
+
+    async def run_traced_step(self, step, scenario, target, rng):
+        """run_step z zapisem do śladu - sesją jest wirtualny użytkownik (jego generator rng)"""
+        args = None
+        if step.login is None and not step.rng_arg and step.params is not None:
+            args = step.params(rng)
+            step_fn = step.fn(target, args)
+        else:
+            step_fn = self.run_step(step, scenario.backend, target, rng)
+        ok = False
+        started = time.perf_counter()
+        try:
+            await step_fn
+            ok = True
+        finally:
+            if step.login is not None:
+                self.trace.record(self.trace.session(rng), scenario.backend, step.login[0], 'connect', None,
+                                  ok, time.perf_counter() - started, password=step.login[1])
+            elif step.sql is not None:
+                self.trace.record(self.trace.session(rng), scenario.backend, scenario.username, step.phase,
+                                  step.sql, ok, time.perf_counter() - started, args=args)
+
+    async def run_scenario(self, scenario, rng):
+        stats = self.stats[scenario.name]
+        stats['runs'] += 1
+        pool = self.pools.get((scenario.backend, scenario.username, scenario.password))
+
+        if scenario.backend == 'mongodb' or pool is None:
+            target = pool[DB_CONFIG['mongodb']['database']] if pool is not None else None
+            await self.run_steps(scenario, target, rng, stats)
+        else:
+            started = time.perf_counter()
+            async with pool.acquire() as conn:
+                # Oczekiwanie na wolne połączenie z puli jako faza connect
+                self.latency.record(scenario.backend, scenario.name, 'connect', time.perf_counter() - started)
+                await self.run_steps(scenario, conn, rng, stats)
+
+    async def run_steps(self, scenario, target, rng, stats):
+        for step in scenario.steps:
+            try:
+                with METRICS.operation(scenario.backend, scenario.username or '-', scenario.name), \
+                        self.latency.measure(scenario.backend, scenario.name, step.phase):
+                    if self.trace is None:
+                        await self.run_step(step, scenario.backend, target, rng)
+                    else:
+                        await self.run_traced_step(step, scenario, target, rng)
+                stats['ok'] += 1
+            except Exception:
+                stats['failed'] += 1
+            if step.think_max > 0:
+                await asyncio.sleep(rng.uniform(step.think_min, step.think_max))
+
+    async def virtual_user(self, vu_id, deadline):
+        rng = random.Random(f"{self.seed}:{vu_id}") if self.seed is not None else random.Random()
+        while time.monotonic() < deadline:
+            await self.run_scenario(self.plan.pick(rng), rng)
+            await asyncio.sleep(0)
+
+    async def run(self):
+        for backend, username, password in self.plan.credentials():
+            listeners = None
+            if self.trace is not None and backend == 'mongodb':
+                from recording import TraceCommandListener
+                listeners = [TraceCommandListener(self.trace, username)]
+            try:
+                self.pools[(backend, username, password)] = await open_pool(
+                    backend, username, password, self.pool_size, event_listeners=listeners)
+            except Exception as e:
+                self.simulator.print_error(f"Błąd puli {backend} ({username}): {e}")
+        try:
+            deadline = time.monotonic() + self.duration
+            await asyncio.gather(*(self.virtual_user(i, deadline) for i in self.vu_ids))
+        finally:
+            for (backend, _, _), pool in self.pools.items():
+                await close_pool(backend, pool)
+
+    def run_blocking(self):
+        started = time.monotonic()
+        asyncio.run(self.run())
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        return (f"Silnik scenariuszy: {len(self.plan.scenarios)} scenariuszy, "
+                f"{self.users} wirtualnych użytkowników, {self.duration}s")
+
+    def stats_dict(self):
+        return {'scenarios': {name: dict(values) for name, values in self.stats.items()},
+                'latency': self.latency.as_dict()}
+
+    def load_stats(self, data):
+        for name, values in data['scenarios'].items():
+            self.stats[name].update(values)
+        self.latency.load(data.get('latency', {}))
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run_blocking())
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie silnika scenariuszy")
+        total = 0
+        for scenario in self.plan.scenarios:
+            stats = self.stats[scenario.name]
+            total += stats['ok'] + stats['failed']
+            self.simulator.print_info(
+                f"{scenario.name} ({scenario.backend}/{scenario.scenario_class}, waga {scenario.weight:g}): "
+                f"{stats['runs']} przebiegów, {stats['ok']} OK, {stats['failed']} błędów")
+        self.simulator.print_info(f"Razem: {total / elapsed:.1f} kroków/s w {elapsed:.1f}s")
+        self.latency.print_summary(self.simulator, detailed=True)
@@ -0,0 +1,323 @@
+"""
+Harmonogram otwartej pętli (open-loop) sterowany docelową liczbą zdarzeń na sekundę
+Zastępuje random_sleep() i stałe przerwy - tempo zgłoszeń nie zależy od czasu odpowiedzi baz
+"""
+
+import asyncio
+import heapq
+import math
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from async_engine import STEP_MIX, VU_PROFILES, close_pool, open_pool, run_pooled_step, step_phase
+from config import DB_CONFIG
+from latency import LatencyRecorder
+from metrics import METRICS
+
+SCENARIO_CLASSES = ('normal', 'attack')
+
+# Średni odstęp uruchomień jednego scenariusza w trybie continuous bez --rate (dawny cykl pętli)
+CONTINUOUS_INTERVAL = 210.0
+
+
+class RateProfile:
+    """Mnożnik tempa w czasie: narastanie, wygaszanie i krzywa dobowa"""
+
+    def __init__(self, duration, ramp_up=0.0, ramp_down=0.0, diurnal=False,
+                 diurnal_min=0.2, diurnal_peak_hour=14.0, diurnal_period=86400.0, start_hour=None):
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.ramp_down = ramp_down
+        self.diurnal = diurnal
+        self.diurnal_min = diurnal_min
+        self.diurnal_peak_hour = diurnal_peak_hour
+        # Długość jednej doby w sekundach symulacji (np. 3600 = doba skompresowana do godziny)
+        self.diurnal_period = diurnal_period
+        if start_hour is None:
+            now = time.localtime()
+            start_hour = now.tm_hour + now.tm_min / 60.0
+        self.start_hour = start_hour
+
+    def factor(self, t):
+        """Zwraca mnożnik w przedziale [0, 1] dla chwili t (sekundy od startu)"""
+        if t < 0 or t > self.duration:
+            return 0.0
+        f = 1.0
+        if self.ramp_up > 0 and t < self.ramp_up:
+            f = min(f, t / self.ramp_up)
+        if self.ramp_down > 0 and t > self.duration - self.ramp_down:
+            f = min(f, (self.duration - t) / self.ramp_down)
+        if self.diurnal:
+            hour = (self.start_hour + t * 24.0 / self.diurnal_period) % 24.0
+            wave = 0.5 + 0.5 * math.cos(2 * math.pi * (hour - self.diurnal_peak_hour) / 24.0)
+            f *= self.diurnal_min + (1.0 - self.diurnal_min) * wave
+        return f
+
+
+def arrivals(rate, profile, process='poisson', rng=None):
+    """Generuje kolejne chwile zgłoszeń (sekundy od startu) dla tempa bazowego rate
+
+    Dla procesu Poissona niejednorodność profilu realizowana jest przez przerzedzanie
+    (thinning), dla procesu stałego zgłoszenia wynikają z całki chwilowego tempa.
+    """
+    rng = rng or random.Random()
+    if rate <= 0:
+        return
+    t = 0.0
+    if process == 'poisson':
+        while True:
+            t += rng.expovariate(rate)
+            if t > profile.duration:
+                return
+            if rng.random() <= profile.factor(t):
+                yield t
+    elif process == 'constant':
+        # Całkowanie chwilowego tempa: zgłoszenie co każdą pełną jednostkę "kredytu"
+        dt = min(1.0 / (rate * 4), 0.05)
+        credit = 1.0
+        while t <= profile.duration:
+            credit += rate * profile.factor(t) * dt
+            while credit >= 1.0:
+                credit -= 1.0
+                yield t
+            t += dt
+    else:
+        raise ValueError(f"Nieznany proces zgłoszeń: {process}")
+
+
+def parse_rate_specs(specs):
+    """Parsuje specyfikacje 'baza:klasa=zdarzenia/s' do słownika {(baza, klasa): tempo}"""
+    rates = {}
+    for spec in specs:
+        try:
+            target, value = spec.split('=', 1)
+            backend, scenario_class = target.split(':', 1)
+            rate = float(value)
+        except ValueError:
+            raise ValueError(f"Niepoprawna specyfikacja tempa '{spec}' (oczekiwano baza:klasa=liczba)")
+        if backend not in DB_CONFIG:
+            raise ValueError(f"Nieznana baza '{backend}' w '{spec}'")
+        if scenario_class not in SCENARIO_CLASSES:
+            raise ValueError(f"Nieznana klasa scenariusza '{scenario_class}' w '{spec}'")
+        rates[(backend, scenario_class)] = rate
+    return rates
+
+
+class StreamStats:
+    """Liczniki jednego strumienia zgłoszeń (baza, klasa)"""
+
+    def __init__(self):
+        self.scheduled = 0
+        self.completed = 0
+        self.failed = 0
+        self.dropped = 0
+        self.max_lag = 0.0
+
+    def as_dict(self):
+        return dict(vars(self))
+
+
+class OpenLoopScheduler:
+    """Wysyła zgłoszenia w zaplanowanych chwilach niezależnie od czasu wykonania zapytań"""
+
+    def __init__(self, simulator, rates, profile, process='poisson', max_in_flight=1000,
+                 pool_size=20, seed=None):
+        self.simulator = simulator
+        self.rates = rates
+        self.profile = profile
+        self.process = process
+        self.max_in_flight = max_in_flight
+        self.pool_size = pool_size
+        self.rng = random.Random(seed)
+        self.stats = {key: StreamStats() for key in rates}
+        self.latency = LatencyRecorder()
+        METRICS.register_latency(self.latency)
+        self.usernames = {}
+        self.in_flight = 0
+        self.pools = {}
+        self.tasks = set()
+
+    async def execute(self, backend, scenario_class, step):
+        stats = self.stats[(backend, scenario_class)]
+        try:
+            # Czas od zaplanowania do końca - z oczekiwaniem na wolne połączenie w puli
+            with METRICS.operation(backend, self.usernames[backend], scenario_class), \
+                    self.latency.measure(backend, scenario_class, step_phase(step)):
+                await run_pooled_step(backend, self.pools[backend], step)
+            stats.completed += 1
+        except Exception:
+            stats.failed += 1
+        finally:
+            self.in_flight -= 1
+
+    async def stream(self, backend, scenario_class, rate, start):
+        """Jeden strumień zgłoszeń - czeka wyłącznie na zegar, nigdy na wynik zapytania"""
+        stats = self.stats[(backend, scenario_class)]
+        rng = random.Random(self.rng.random())
+        steps = STEP_MIX[backend][SCENARIO_CLASSES.index(scenario_class)]
+        for offset in arrivals(rate, self.profile, self.process, rng):
+            delay = start + offset - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            else:
+                stats.max_lag = max(stats.max_lag, -delay)
+            stats.scheduled += 1
+            if self.in_flight >= self.max_in_flight:
+                # Przeciążenie - odrzucamy zamiast zwalniać tempo (brak sprzężenia zwrotnego)
+                stats.dropped += 1
+                continue
+            self.in_flight += 1
+            task = asyncio.create_task(self.execute(backend, scenario_class, rng.choice(steps)))
+            self.tasks.add(task)
+            task.add_done_callback(self.tasks.discard)
+
+    async def run(self):
+        backends = sorted({backend for backend, _ in self.rates})
+        for backend in backends:
+            username = next(user for b, user in VU_PROFILES if b == backend)
+            password = DB_CONFIG[backend]['users'][username]
+            self.usernames[backend] = username
+            self.pools[backend] = await open_pool(backend, username, password, self.pool_size)
+        try:
+            start = time.monotonic()
+            await asyncio.gather(*(
+                self.stream(backend, scenario_class, rate, start)
+                for (backend, scenario_class), rate in self.rates.items()))
+            if self.tasks:
+                await asyncio.gather(*self.tasks)
+        finally:
+            for backend, pool in self.pools.items():
+                await close_pool(backend, pool)
+
+    def run_blocking(self):
+        """Uruchamia pętlę zdarzeń i zwraca czas trwania w sekundach"""
+        started = time.monotonic()
+        asyncio.run(self.run())
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        return (f"Harmonogram open-loop ({self.process}), {self.profile.duration}s: " +
+                ", ".join(f"{b}:{c}={r}/s" for (b, c), r in self.rates.items()))
+
+    def stats_dict(self):
+        # Klucze 'baza:klasa' jak w --rate - słownik przechodzi też przez JSON (tryb klastra)
+        data = {f"{backend}:{scenario_class}": stats.as_dict()
+                for (backend, scenario_class), stats in self.stats.items()}
+        data['latency'] = self.latency.as_dict()
+        return data
+
+    def load_stats(self, data):
+        data = dict(data)
+        self.latency.load(data.pop('latency', {}))
+        for key, values in data.items():
+            vars(self.stats[tuple(key.split(':', 1))]).update(values)
+
+    def start(self):
+        self.simulator.print_info(self.describe())
+        self.print_summary(self.run_blocking())
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie harmonogramu open-loop")
+        for (backend, scenario_class), stats in self.stats.items():
+            self.simulator.print_info(
+                f"{backend}:{scenario_class}: cel {self.rates[(backend, scenario_class)]}/s, "
+                f"osiągnięto {stats.scheduled / elapsed:.1f}/s, {stats.completed} OK, "
+                f"{stats.failed} błędów, {stats.dropped} odrzuconych, "
+                f"max opóźnienie harmonogramu {stats.max_lag * 1000:.1f} ms")
+        self.latency.print_summary(self.simulator)
+
+
+class ScenarioLoop:
+    """Open-loop dla blokujących metod scenariuszy symulatora (tryb continuous)
+
+    Każda para (baza, klasa) ma własny strumień zgłoszeń; uruchomienia trafiają do puli
+    wątków w zaplanowanych chwilach, więc długi scenariusz nie opóźnia następnych.
+    Baza, która nie przeszła sprawdzenia gotowości, wypada z harmonogramu.
+    """
+
+    def __init__(self, simulator, plan, rates, profile, process='poisson', max_in_flight=None, seed=None):
+        # plan: {(baza, klasa): [metody scenariuszy]}, rates: {(baza, klasa): uruchomienia/s}
+        self.simulator = simulator
+        self.plan = plan
+        self.rates = rates
+        self.profile = profile
+        self.process = process
+        self.max_in_flight = max_in_flight or 2 * len(rates)
+        self.rng = random.Random(seed)
+        self.stats = {key: StreamStats() for key in rates}
+        self.unavailable = set()
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.stop = threading.Event()
+
+    def execute(self, backend, scenario_class, method):
+        stats = self.stats[(backend, scenario_class)]
+        try:
+            if not self.simulator.is_ready(backend):
+                self.unavailable.add(backend)
+                return
+            self.simulator.run_scenario(method)
+            stats.completed += 1
+        except Exception as e:
+            stats.failed += 1
+            self.simulator.print_error(f"{backend}:{scenario_class} {method.__name__}: {e}")
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+
+    def run(self):
+        """Wysyła zgłoszenia do przerwania (stop lub Ctrl+C); zwraca czas trwania w sekundach"""
+        queue = []
+        for position, ((backend, scenario_class), rate) in enumerate(sorted(self.rates.items())):
+            times = arrivals(rate, self.profile, self.process, random.Random(self.rng.random()))
+            rng = random.Random(self.rng.random())
+            first = next(times, None)
+            if first is not None:
+                queue.append((first, position, backend, scenario_class, times, rng))
+        heapq.heapify(queue)
+        started = time.monotonic()
+        with ThreadPoolExecutor(max_workers=self.max_in_flight, thread_name_prefix='scenario') as pool:
+            try:
+                while queue and not self.stop.is_set():
+                    offset, position, backend, scenario_class, times, rng = heapq.heappop(queue)
+                    if backend in self.unavailable:
+                        if len(self.unavailable) == len({b for b, _ in self.rates}):
+                            self.simulator.print_error("Żadna baza nie jest gotowa - koniec symulacji ciągłej")
+                            break
+                        continue
+                    delay = started + offset - time.monotonic()
+                    if delay > 0 and self.stop.wait(delay):
+                        break
+                    stats = self.stats[(backend, scenario_class)]
+                    stats.max_lag = max(stats.max_lag, -delay)
+                    stats.scheduled += 1
+                    with self.lock:
+                        overloaded = self.in_flight >= self.max_in_flight
+                        if not overloaded:
+                            self.in_flight += 1
+                    if overloaded:
+                        stats.dropped += 1
+                    else:
+                        pool.submit(self.execute, backend, scenario_class,
+                                    rng.choice(self.plan[(backend, scenario_class)]))
+                    following = next(times, None)
+                    if following is not None:
+                        heapq.heappush(queue, (following, position, backend, scenario_class, times, rng))
+            except KeyboardInterrupt:
+                self.simulator.print_info("\nPrzerwano symulację ciągłą - czekam na trwające scenariusze")
+        return max(time.monotonic() - started, 1e-9)
+
+    def describe(self):
+        return (f"Tryb ciągły open-loop ({self.process}): " +
+                ", ".join(f"{b}:{c}={r:g}/s" for (b, c), r in sorted(self.rates.items())))
+
+    def print_summary(self, elapsed):
+        self.simulator.print_header("Podsumowanie trybu ciągłego")
+        for (backend, scenario_class), stats in sorted(self.stats.items()):
+            self.simulator.print_info(
+                f"{backend}:{scenario_class}: cel {self.rates[(backend, scenario_class)]:g}/s, "
+                f"{stats.scheduled} zgłoszeń w {elapsed:.0f}s, {stats.completed} OK, "
+                f"{stats.failed} błędów, {stats.dropped} odrzuconych, "
+                f"max opóźnienie harmonogramu {stats.max_lag * 1000:.1f} ms")
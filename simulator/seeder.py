@@ -0,0 +1,389 @@
+"""
+Masowe ładowanie danych testowych (dziesiątki milionów wierszy)
+PostgreSQL przez COPY, MariaDB przez wielowierszowe INSERT-y, MongoDB przez
+nieuporządkowane insert_many - z postępem, wznawianiem i współczynnikiem skali
+"""
+
+import csv
+import io
+import json
+import os
+import time
+from datetime import datetime
+
+import numpy as np
+
+from config import DB_CONFIG
+from identity import IdentityGenerator
+
+# Liczba dokumentów/wierszy dla skali 1.0
+BASE_COUNTS = {
+    'postgres': {
+        'customers': 1_000_000,
+        'financial_transactions': 4_000_000,
+        'sensitive_medical_data': 500_000,
+    },
+    'mariadb': {
+        'customers': 1_000_000,
+        'financial_transactions': 4_000_000,
+        'sensitive_medical_data': 500_000,
+    },
+    'mongodb': {
+        'users': 1_000_000,
+        'orders': 4_000_000,
+    },
+}
+
+# Konta używane przez seeder (dba to superuser - może wyłączyć triggery)
+SEED_USERS = {
+    'postgres': 'dba',
+    'mariadb': 'dbadmin',
+    'mongodb': 'appuser',
+}
+
+TRANSACTION_TYPES = np.array(['payment', 'transfer', 'withdrawal', 'deposit'])
+DIAGNOSES = np.array(['Nadciśnienie', 'Cukrzyca typu 2', 'Migrena', 'Astma', 'Depresja'])
+TREATMENTS = np.array(['Leki hipotensyjne', 'Metformina, dieta', 'Tryptany, profilaktyka',
+                       'Wziewne sterydy', 'Psychoterapia, SSRI'])
+DOCTORS = np.array(['Dr. Kowalczyk', 'Dr. Nowicki', 'Dr. Zieliński', 'Dr. Wróbel', 'Dr. Pawlak'])
+
+# Kolumny ładowane do tabel SQL (klucz główny jawnie - spójne klucze obce)
+COLUMNS = {
+    'customers': ('customer_id', 'first_name', 'last_name', 'email', 'phone', 'pesel'),
+    'financial_transactions': ('customer_id', 'amount', 'transaction_type', 'account_number',
+                               'transaction_date'),
+    'sensitive_medical_data': ('customer_id', 'diagnosis', 'treatment', 'doctor_name'),
+}
+PRIMARY_KEYS = {
+    'customers': 'customer_id',
+    'financial_transactions': 'transaction_id',
+    'sensitive_medical_data': 'record_id',
+}
+
+# Kod błędu MongoDB dla duplikatu klucza unikalnego
+DUPLICATE_KEY = 11000
+
+
+# ============================================
+# GENEROWANIE WIERSZY
+# ============================================
+
+# Generowanie kolumnowe (NumPy) - do sterowników trafiają gotowe krotki przez zip(...)
+# Indeks tożsamości klienta = customer_id - 1, więc e-mail, PESEL i NRB są unikalne
+# także przy kolejnym ładowaniu na istniejące dane.
+
+def customer_rows(start, count, id_base, rng, identities):
+    ids = np.arange(id_base + start + 1, id_base + start + count + 1, dtype=np.int64)
+    people = identities.generate(id_base + start, count)
+    return list(zip(ids.tolist(), people['first_name'].tolist(), people['last_name'].tolist(),
+                    people['email'].tolist(), people['phone'].tolist(), people['pesel'].tolist()))
+
+
+def transaction_rows(start, count, customers, rng, identities):
+    base, total = customers
+    owner = rng.integers(0, total, count)
+    amounts = np.round(rng.uniform(10, 20000, count), 2)
+    types = TRANSACTION_TYPES[rng.integers(0, len(TRANSACTION_TYPES), count)]
+    # Rachunek transakcji to rachunek jej właściciela
+    accounts = identities.accounts(base + owner)
+    dates = (np.datetime64(datetime.now(), 's') -
+             rng.integers(0, 365 * 86400, count).astype('timedelta64[s]')).astype(datetime)
+    return list(zip((base + owner + 1).tolist(), amounts.tolist(), types.tolist(),
+                    accounts.tolist(), dates.tolist()))
+
+
+def medical_rows(start, count, customers, rng, identities):
+    base, total = customers
+    owner = rng.integers(0, total, count)
+    diagnosis = rng.integers(0, len(DIAGNOSES), count)
+    doctors = DOCTORS[rng.integers(0, len(DOCTORS), count)]
+    return list(zip((base + owner + 1).tolist(), DIAGNOSES[diagnosis].tolist(),
+                    TREATMENTS[diagnosis].tolist(), doctors.tolist()))
+
+
+# Dokumenty MongoDB mają _id wyliczone z indeksu - powtórzona paczka daje tylko błędy duplikatu klucza
+
+def user_documents(start, count, id_base, rng, identities):
+    now = datetime.now()
+    emails = identities.generate(id_base + start, count)['email'].tolist()
+    roles = np.where(rng.random(count) > 0.01, 'user', 'admin').tolist()
+    first = id_base + start + 1
+    return [{'_id': f'seed_user_{first + i}', 'username': f'seed_user_{first + i}', 'email': emails[i],
+             'role': roles[i], 'created': now}
+            for i in range(count)]
+
+
+def order_documents(start, count, users, rng, identities, id_base=0):
+    base, total = users
+    owners = (base + rng.integers(0, total, count) + 1).tolist()
+    totals = np.round(rng.uniform(5, 5000, count), 2).tolist()
+    first = id_base + start + 1
+    return [{'_id': f'SEED-{first + i:010d}', 'order_id': f'SEED-{first + i:010d}',
+             'user': f'seed_user_{owners[i]}', 'total': totals[i]}
+            for i in range(count)]
+
+
+# ============================================
+# SEEDER
+# ============================================
+
+class Seeder:
+    """Ładuje dane wsadowo, zapisując postęp po każdej zatwierdzonej paczce"""
+
+    def __init__(self, simulator, scale=1.0, batch_size=10000, defer=False,
+                 state_file='seed_state.json', seed=0, backends=None):
+        self.simulator = simulator
+        self.scale = scale
+        self.batch_size = batch_size
+        self.defer = defer
+        self.state_file = state_file
+        self.seed = seed
+        self.backends = backends or list(BASE_COUNTS)
+        self.state = self.load_state()
+        self.identities = IdentityGenerator(seed)
+
+    # --- stan (wznawianie) ---
+
+    def load_state(self):
+        if self.state_file and os.path.exists(self.state_file):
+            with open(self.state_file, encoding='utf-8') as f:
+                return json.load(f)
+        return {}
+
+    def save_state(self):
+        if not self.state_file:
+            return
+        tmp = f"{self.state_file}.tmp"
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, indent=2)
+        os.replace(tmp, self.state_file)
+
+    def table_state(self, backend, table):
+        return self.state.setdefault(backend, {}).setdefault(table, {'done': 0, 'id_base': None})
+
+    def target(self, backend, table):
+        return int(BASE_COUNTS[backend][table] * self.scale)
+
+    def batch_rng(self, backend, table, start):
+        # Paczka zależy tylko od (seed, tabela, początek) - wznowienie generuje te same dane
+        return np.random.default_rng([self.seed, list(BASE_COUNTS).index(backend),
+                                      list(BASE_COUNTS[backend]).index(table), start])
+
+    def progress(self, backend, table, done, total, started, rows_this_run):
+        elapsed = max(time.monotonic() - started, 1e-9)
+        self.simulator.print_info(
+            f"{backend}.{table}: {done}/{total} ({100.0 * done / max(total, 1):.1f}%), "
+            f"{rows_this_run / elapsed:,.0f} wierszy/s")
+
+    def load_table(self, backend, table, id_base, make_rows, write_batch, committed=None):
+        """Wspólna pętla paczek: generuj -> zapisz -> zatwierdź -> zapisz stan
+
+        Paczka jest zatwierdzana przed zapisem stanu, więc po awarii między tymi krokami
+        plik stanu jest o paczkę w tyle. committed() podaje liczbę wierszy faktycznie
+        obecnych w bazie powyżej id_base - od niej zaczyna się wznowienie. Bez committed
+        zapis paczki musi być idempotentny (MongoDB).
+        """
+        state = self.table_state(backend, table)
+        state['id_base'] = id_base
+        self.save_state()
+        total = self.target(backend, table)
+        if committed is not None:
+            done = min(committed(), total)
+            if done != state['done']:
+                self.simulator.print_info(
+                    f"{backend}.{table}: w bazie {done} wierszy, w pliku stanu {state['done']} - "
+                    f"wznawianie od stanu bazy")
+                state['done'] = done
+        started = time.monotonic()
+        loaded = 0
+        while state['done'] < total:
+            start = state['done']
+            count = min(self.batch_size, total - start)
+            rows = make_rows(start, count, self.batch_rng(backend, table, start), self.identities)
+            write_batch(rows)
+            state['done'] = start + count
+            loaded += count
+            self.save_state()
+            self.progress(backend, table, state['done'], total, started, loaded)
+        return total
+
+    # --- PostgreSQL ---
+
+    def seed_postgres(self):
+        import psycopg2
+
+        cfg = DB_CONFIG['postgres']
+        user = SEED_USERS['postgres']
+        conn = psycopg2.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'],
+                                user=user, password=cfg['users'][user])
+        cursor = conn.cursor()
+        try:
+            if self.defer:
+                # Sesja w trybie replica pomija triggery (audyt i klucze obce)
+                cursor.execute("SET session_replication_role = replica;")
+
+            def copy(table):
+                columns = ', '.join(COLUMNS[table])
+                sql = f"COPY {table} ({columns}) FROM STDIN WITH (FORMAT csv)"
+
+                def write(rows):
+                    buffer = io.StringIO()
+                    csv.writer(buffer).writerows(rows)
+                    buffer.seek(0)
+                    cursor.copy_expert(sql, buffer)
+                    conn.commit()
+                return write
+
+            self.load_sql_tables('postgres', cursor, copy)
+            cursor.execute("SELECT setval(pg_get_serial_sequence('customers', 'customer_id'), "
+                           "(SELECT MAX(customer_id) FROM customers));")
+            conn.commit()
+            if self.defer:
+                cursor.execute("SET session_replication_role = origin;")
+                self.postgres_backfill_audit(cursor)
+                conn.commit()
+            self.postgres_check_foreign_keys(cursor)
+        finally:
+            cursor.close()
+            conn.close()
+
+    def sql_id_base(self, backend, cursor, table):
+        """Największy klucz przed ładowaniem - zapisany w stanie, więc stały przy wznowieniu"""
+        state = self.table_state(backend, table)
+        if state['id_base'] is None:
+            cursor.execute(f"SELECT COALESCE(MAX({PRIMARY_KEYS[table]}), 0) FROM {table};")
+            state['id_base'] = cursor.fetchone()[0]
+        return state['id_base']
+
+    @staticmethod
+    def sql_committed(cursor, table, id_base):
+        """Wiersze załadowane powyżej id_base - paczki są atomowe i idą po kolei, więc to postęp"""
+        cursor.execute(f"SELECT COUNT(*) FROM {table} WHERE {PRIMARY_KEYS[table]} > %s;", (id_base,))
+        return cursor.fetchone()[0]
+
+    def load_sql_tables(self, backend, cursor, writer):
+        """Ładuje customers, a potem tabele zależne wskazujące na załadowanych klientów"""
+        id_base = self.sql_id_base(backend, cursor, 'customers')
+        total = self.load_table(backend, 'customers', id_base,
+                                lambda start, count, rng, ids: customer_rows(start, count, id_base, rng, ids),
+                                writer('customers'),
+                                lambda: self.sql_committed(cursor, 'customers', id_base))
+        customers = (id_base, total)
+        for table, make in (('financial_transactions', transaction_rows),
+                            ('sensitive_medical_data', medical_rows)):
+            table_base = self.sql_id_base(backend, cursor, table)
+            self.load_table(backend, table, table_base,
+                            lambda start, count, rng, ids, make=make: make(start, count, customers, rng, ids),
+                            writer(table),
+                            lambda table=table, table_base=table_base: self.sql_committed(cursor, table, table_base))
+        return customers
+
+    def postgres_backfill_audit(self, cursor):
+        """Dopisuje do audit_log wpisy, które triggery utworzyłyby przy zwykłym INSERT
+
+        Jedno zapytanie na tabelę zamiast wywołania audit_trigger_function() dla każdego wiersza.
+        """
+        if self.state['postgres'].get('audit_backfilled'):
+            return
+        self.simulator.print_info("postgres: uzupełnianie audit_log dla załadowanych wierszy")
+        for table, key in PRIMARY_KEYS.items():
+            id_base = self.state['postgres'][table]['id_base']
+            cursor.execute(
+                f"INSERT INTO audit_log (user_name, action, table_name, record_id, ip_address) "
+                f"SELECT current_user, 'INSERT', %s, customer_id, inet_client_addr()::TEXT "
+                f"FROM {table} WHERE {key} > %s;", (table, id_base))
+        self.state['postgres']['audit_backfilled'] = True
+        self.save_state()
+
+    def postgres_check_foreign_keys(self, cursor):
+        for table in ('financial_transactions', 'sensitive_medical_data'):
+            cursor.execute(
+                f"SELECT COUNT(*) FROM {table} t LEFT JOIN customers c "
+                f"ON c.customer_id = t.customer_id WHERE c.customer_id IS NULL;")
+            orphans = cursor.fetchone()[0]
+            if orphans:
+                self.simulator.print_error(f"postgres.{table}: {orphans} wierszy bez klienta")
+
+    # --- MariaDB ---
+
+    def seed_mariadb(self):
+        import mysql.connector
+
+        cfg = DB_CONFIG['mariadb']
+        user = SEED_USERS['mariadb']
+        # local_infile = 0 w my.cnf - LOAD DATA LOCAL jest wyłączone, zostają wielowierszowe INSERT-y
+        conn = mysql.connector.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'],
+                                       user=user, password=cfg['users'][user], autocommit=False)
+        cursor = conn.cursor()
+        try:
+            if self.defer:
+                cursor.execute("SET SESSION foreign_key_checks = 0, unique_checks = 0;")
+
+            def insert(table):
+                columns = COLUMNS[table]
+                sql = (f"INSERT INTO {table} ({', '.join(columns)}) "
+                       f"VALUES ({', '.join(['%s'] * len(columns))})")
+
+                def write(rows):
+                    # executemany przepisuje INSERT ... VALUES na jedno wielowierszowe zapytanie
+                    cursor.executemany(sql, rows)
+                    conn.commit()
+                return write
+
+            self.load_sql_tables('mariadb', cursor, insert)
+            if self.defer:
+                cursor.execute("SET SESSION foreign_key_checks = 1, unique_checks = 1;")
+        finally:
+            cursor.close()
+            conn.close()
+
+    # --- MongoDB ---
+
+    def seed_mongodb(self):
+        import pymongo
+        from pymongo.errors import BulkWriteError
+
+        cfg = DB_CONFIG['mongodb']
+        user = SEED_USERS['mongodb']
+        client = pymongo.MongoClient(host=cfg['host'], port=cfg['port'], username=user,
+                                     password=cfg['users'][user], authSource='admin')
+        db = client[cfg['database']]
+        try:
+            def insert(collection):
+                def write(documents):
+                    # ordered=False - serwer wstawia równolegle i nie przerywa na pierwszym błędzie;
+                    # duplikaty _id to dokumenty z paczki zapisanej przed awarią - pomijane
+                    try:
+                        db[collection].insert_many(documents, ordered=False)
+                    except BulkWriteError as exc:
+                        if any(error['code'] != DUPLICATE_KEY for error in exc.details['writeErrors']):
+                            raise
+                return write
+
+            state = self.table_state('mongodb', 'users')
+            id_base = state['id_base'] if state['id_base'] is not None else db.users.count_documents({})
+            total = self.load_table('mongodb', 'users', id_base,
+                                    lambda start, count, rng, ids: user_documents(start, count, id_base, rng, ids),
+                                    insert('users'))
+            users = (id_base, total)
+            state = self.table_state('mongodb', 'orders')
+            order_base = state['id_base'] if state['id_base'] is not None else self.mongo_order_base(db)
+            self.load_table('mongodb', 'orders', order_base,
+                            lambda start, count, rng, ids: order_documents(start, count, users, rng, ids,
+                                                                           order_base),
+                            insert('orders'))
+        finally:
+            client.close()
+
+    @staticmethod
+    def mongo_order_base(db):
+        """Największy numer SEED- w orders - kolejne ładowanie nie nadpisuje poprzedniego zakresu"""
+        last = db.orders.find_one({'_id': {'$regex': '^SEED-'}}, sort=[('_id', -1)])
+        return int(last['_id'][len('SEED-'):]) if last else 0
+
+    def run(self):
+        self.simulator.print_header(f"Ładowanie danych - skala {self.scale}")
+        for backend in self.backends:
+            started = time.monotonic()
+            getattr(self, f"seed_{backend}")()
+            self.simulator.print_info(f"{backend}: zakończono w {time.monotonic() - started:.1f}s")
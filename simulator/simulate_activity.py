@@ -4,115 +4,219 @@ Symulator aktywności użytkowników i ataków na bazy danych
 Działa jako kontener w sieci Docker i łączy się z bazami danych
 """
 
-import psycopg2
-import pymongo
-import mysql.connector
+import argparse
+import math
 import time
 import random
 import sys
+import threading
 from datetime import datetime
 from colorama import Fore, Style, init
 
+from config import DB_CONFIG
+from console import ConsoleSink
+from identity import configure_default_stream, default_stream
+from latency import LatencyRecorder
+from metrics import METRICS
+from pool import PoolManager
+
 # Inicjalizacja kolorów
 init(autoreset=True)
 
-# Konfiguracja połączeń
-DB_CONFIG = {
-    'postgres': {
-        'host': 'postgres',
-        'port': 5432,
-        'database': 'secure_data',
-        'users': {
-            'app_user': 'AppUser123!',
-            'analyst': 'Analyst123!',
-            'readonly_user': 'ReadOnly123!',
-            'suspicious_user': 'Suspicious123!',
-            'dba': 'DBA123!'
-        }
-    },
-    'mariadb': {
-        'host': 'mariadb',
-        'port': 3306,
-        'database': 'secure_data',
-        'users': {
-            'dbadmin': 'DbAdmin123!',
-            'root': 'MariadbPass123!'
-        }
-    },
-    'mongodb': {
-        'host': 'mongodb',
-        'port': 27017,
-        'database': 'secure_data',
-        'users': {
-            'appuser': 'AppPass123!',
-            'reader': 'ReadPass123!',
-            'admin': 'MongoPass123!'
-        }
-    }
-}
 
 class DatabaseSimulator:
-    def __init__(self):
-        self.connections = {}
+    def __init__(self, pool_min=1, pool_max=5, pool_idle=300, console=None, stream_batch=2000,
+                 stream_memory=16 << 20):
+        # Histogramy opóźnień (baza, scenariusz, faza) i nazwa bieżącego scenariusza (osobna dla wątku)
+        self.latency = LatencyRecorder()
+        METRICS.register_latency(self.latency)
+        self._scenario = threading.local()
+        # Przerwy random_sleep() między krokami - tryb continuous wyłącza, tempo ustala harmonogram
+        self.think_time = True
+        # Ślad wykonanych operacji (--record), None = nagrywanie wyłączone
+        self.trace = None
+        # Sprawdzanie gotowości baz (readiness.ReadinessProbe), None = start bez czekania
+        self.readiness = None
+        # Wyjście konsolowe (buforowane, opcjonalnie próbkowane)
+        self.console = console or ConsoleSink()
+        # Odczyt strumieniowy dużych wyników: wiersze na paczkę i limit bajtów jednej paczki
+        self.stream_batch = stream_batch
+        self.stream_memory = stream_memory
+        # Pule połączeń kluczowane przez (baza, użytkownik, hasło)
+        self.connections = PoolManager({
+            'postgres': {
+                'connect': self._open_postgres,
+                'close': lambda conn: conn.close(),
+                'check': lambda conn: conn.closed == 0,
+                'reset': lambda conn: conn.rollback(),
+            },
+            'mariadb': {
+                'connect': self._open_mariadb,
+                'close': lambda conn: conn.close(),
+                'check': lambda conn: conn.is_connected(),
+                'reset': lambda conn: conn.rollback(),
+            },
+            'mongodb': {
+                'connect': self._open_mongodb,
+                'close': lambda client: client.close(),
+                'check': lambda client: client.admin.command('ping'),
+            },
+        }, min_size=pool_min, max_size=pool_max, max_idle=pool_idle)
         
+    # Linie kończą się resetem koloru - ujście konsoli skleja je w jeden zapis
     def print_header(self, text):
-        print(f"\n{Fore.CYAN}{'=' * 60}")
-        print(f"{Fore.CYAN}{text}")
-        print(f"{Fore.CYAN}{'=' * 60}\n")
+        self.console.write('header', f"\n{Fore.CYAN}{'=' * 60}\n{Fore.CYAN}{text}\n{Fore.CYAN}{'=' * 60}{Style.RESET_ALL}\n")
     
     def print_scenario(self, text):
-        print(f"{Fore.MAGENTA}[SCENARIUSZ] {text}")
+        self.console.write('scenario', f"{Fore.MAGENTA}[SCENARIUSZ] {text}{Style.RESET_ALL}")
     
     def print_normal(self, text):
-        print(f"{Fore.GREEN}[NORMAL] {text}")
+        self.console.write('normal', f"{Fore.GREEN}[NORMAL] {text}{Style.RESET_ALL}")
     
     def print_attack(self, text):
-        print(f"{Fore.RED}[ATAK] {text}")
+        self.console.write('attack', f"{Fore.RED}[ATAK] {text}{Style.RESET_ALL}")
     
     def print_info(self, text):
-        print(f"{Fore.BLUE}[INFO] {text}")
+        self.console.write('info', f"{Fore.BLUE}[INFO] {text}{Style.RESET_ALL}")
     
     def print_error(self, text):
-        print(f"{Fore.YELLOW}[ERROR] {text}")
+        self.console.write('error', f"{Fore.YELLOW}[ERROR] {text}{Style.RESET_ALL}")
+    
+    def print_detail(self, text):
+        self.console.write('detail', f"  {text}")
+    
+    def print_stream(self, stream):
+        if stream is not None:
+            self.print_detail(f"Wyeksfiltrowano {stream.describe()}")
+    
+    @property
+    def scenario(self):
+        return getattr(self._scenario, 'name', 'adhoc')
+    
+    @scenario.setter
+    def scenario(self, name):
+        self._scenario.name = name
     
     def random_sleep(self, min_sec=1, max_sec=3):
-        time.sleep(random.uniform(min_sec, max_sec))
+        if self.think_time:
+            time.sleep(random.uniform(min_sec, max_sec))
+    
+    @staticmethod
+    def _connection_user(conn):
+        """Nazwa użytkownika połączenia SQL - etykieta liczników operacji"""
+        try:
+            info = getattr(conn, 'info', None)
+            return info.user if info is not None else conn.user
+        except Exception:
+            return 'unknown'
+    
+    def _record(self, backend, conn, user, kind, query, ok, started, password=None):
+        """Zapis operacji do śladu - sesją jest połączenie (nieudane logowanie dostaje nową sesję)"""
+        session = self.trace.session(conn) if conn is not None else self.trace.new_session()
+        self.trace.record(session, backend, user, kind, query, ok,
+                          time.perf_counter() - started, password=password)
+    
+    def release(self, conn):
+        """Oddaje połączenie do puli (połączenia fresh=True są zamykane)"""
+        try:
+            self.connections.release(conn)
+        except Exception as e:
+            self.print_error(f"Błąd zwalniania połączenia: {str(e)}")
     
     # ============================================
     # POSTGRESQL - Połączenia i operacje
     # ============================================
     
-    def connect_postgres(self, username, password):
-        """Nawiązuje połączenie z PostgreSQL"""
+    def _open_postgres(self, username, password):
+        import psycopg2
+
+        return psycopg2.connect(
+            host=DB_CONFIG['postgres']['host'],
+            port=DB_CONFIG['postgres']['port'],
+            database=DB_CONFIG['postgres']['database'],
+            user=username,
+            password=password,
+            connect_timeout=5
+        )
+    
+    def connect_postgres(self, username, password, fresh=False):
+        """Nawiązuje połączenie z PostgreSQL (z puli, albo nowe gdy fresh=True - zdarzenie logowania)"""
+        started = time.perf_counter()
+        conn = None
         try:
-            conn = psycopg2.connect(
-                host=DB_CONFIG['postgres']['host'],
-                port=DB_CONFIG['postgres']['port'],
-                database=DB_CONFIG['postgres']['database'],
-                user=username,
-                password=password,
-                connect_timeout=5
-            )
-            return conn
+            with self.latency.measure('postgres', self.scenario, 'connect'):
+                if fresh:
+                    conn = self._open_postgres(username, password)
+                    return conn
+                return self.connections.acquire('postgres', username, password)
         except Exception as e:
             self.print_error(f"Błąd połączenia PostgreSQL ({username}): {str(e)}")
             return None
+        finally:
+            if fresh and self.trace is not None:
+                self._record('postgres', conn, username, 'connect', None, conn is not None, started,
+                             password=password)
     
     def execute_postgres(self, conn, query, fetch=False):
-        """Wykonuje zapytanie SQL na PostgreSQL"""
+        """Wykonuje zapytanie SQL na PostgreSQL (czas execute/fetch/commit trafia do histogramów)"""
+        ok = True
+        started = time.perf_counter()
         try:
             cursor = conn.cursor()
-            cursor.execute(query)
+            with self.latency.measure('postgres', self.scenario, 'execute'):
+                cursor.execute(query)
             if fetch:
-                result = cursor.fetchall()
+                with self.latency.measure('postgres', self.scenario, 'fetch'):
+                    result = cursor.fetchall()
                 cursor.close()
                 return result
-            conn.commit()
+            with self.latency.measure('postgres', self.scenario, 'commit'):
+                conn.commit()
             cursor.close()
             return True
         except Exception as e:
+            ok = False
             self.print_error(f"Błąd zapytania: {str(e)}")
             return None
+        finally:
+            METRICS.record_result('postgres', self._connection_user(conn), self.scenario, ok)
+            if self.trace is not None:
+                self._record('postgres', conn, self._connection_user(conn), 'fetch' if fetch else 'execute',
+                             query, ok, started)
+    
+    def stream_postgres(self, conn, query):
+        """Odczytuje duży wynik kursorem nazwanym (FETCH paczkami po stronie serwera), bez trzymania go w pamięci
+
+        Zwraca streaming.ResultStream z liczbą wierszy i bajtów albo None przy błędzie.
+        """
+        from streaming import ResultStream
+
+        ok = True
+        started = time.perf_counter()
+        stream = ResultStream('postgres', self.stream_batch, self.stream_memory)
+        try:
+            # Kursor nazwany żyje w transakcji - zamyka go commit po opróżnieniu
+            cursor = conn.cursor(name=f"stream_{id(stream):x}")
+            cursor.itersize = self.stream_batch
+            with self.latency.measure('postgres', self.scenario, 'execute'):
+                cursor.execute(query)
+            with self.latency.measure('postgres', self.scenario, 'fetch'):
+                stream.drain(cursor.fetchmany)
+            cursor.close()
+            conn.commit()
+            return stream
+        except Exception as e:
+            ok = False
+            self.print_error(f"Błąd zapytania: {str(e)}")
+            try:
+                conn.rollback()
+            except Exception:
+                pass
+            return None
+        finally:
+            METRICS.record_result('postgres', self._connection_user(conn), self.scenario, ok)
+            if self.trace is not None:
+                self._record('postgres', conn, self._connection_user(conn), 'fetch', query, ok, started)
     
     def postgres_normal_activity(self):
         """Normalna aktywność użytkowników PostgreSQL"""
@@ -130,9 +234,11 @@ class DatabaseSimulator:
             self.random_sleep()
             
             self.print_normal("Rejestracja nowego klienta")
+            person = default_stream().take()
             self.execute_postgres(conn, 
                 f"INSERT INTO customers (first_name, last_name, email, phone, pesel) "
-                f"VALUES ('Tomasz', 'Kowalczyk', 'tomasz.k{random.randint(1000,9999)}@email.pl', '777888999', '91040198765');")
+                f"VALUES ('{person['first_name']}', '{person['last_name']}', '{person['email']}', "
+                f"'{person['phone']}', '{person['pesel']}');")
             self.random_sleep()
             
             self.print_normal("Aktualizacja numeru telefonu klienta")
@@ -143,7 +249,7 @@ class DatabaseSimulator:
             self.print_normal("Rejestracja nowej transakcji finansowej")
             self.execute_postgres(conn, 
                 f"INSERT INTO financial_transactions (customer_id, amount, transaction_type, account_number) "
-                f"VALUES (1, {random.uniform(50, 500):.2f}, 'payment', '12345678901234567890123456');")
+                f"VALUES (1, {random.uniform(50, 500):.2f}, 'payment', '{default_stream().value('account_number')}');")
             self.random_sleep()
             
             self.print_normal("Pobieranie historii transakcji klienta")
@@ -155,7 +261,7 @@ class DatabaseSimulator:
                 fetch=True)
             self.random_sleep()
             
-            conn.close()
+            self.release(conn)
         
         # Użytkownik analyst
         self.print_normal("Użytkownik analyst - Analiza danych")
@@ -174,7 +280,7 @@ class DatabaseSimulator:
             self.execute_postgres(conn, "SELECT * FROM active_sessions;", fetch=True)
             self.random_sleep()
             
-            conn.close()
+            self.release(conn)
     
     def postgres_attack_scenarios(self):
         """Scenariusze ataków na PostgreSQL"""
@@ -226,20 +332,18 @@ class DatabaseSimulator:
             self.print_scenario("4. Próby eksfiltracji wrażliwych danych")
             
             self.print_attack("Próba eksfiltracji danych medycznych")
-            self.execute_postgres(conn, 
+            self.print_stream(self.stream_postgres(conn, 
                 "SELECT c.first_name, c.last_name, c.pesel, m.diagnosis, m.treatment "
                 "FROM customers c "
-                "JOIN sensitive_medical_data m ON c.customer_id = m.customer_id;", 
-                fetch=True)
+                "JOIN sensitive_medical_data m ON c.customer_id = m.customer_id;"))
             self.random_sleep()
             
             self.print_attack("Próba eksfiltracji danych finansowych")
-            self.execute_postgres(conn, 
+            self.print_stream(self.stream_postgres(conn, 
                 "SELECT c.first_name, c.last_name, c.pesel, f.account_number, f.amount "
                 "FROM customers c "
                 "JOIN financial_transactions f ON c.customer_id = f.customer_id "
-                "WHERE f.amount > 1000;", 
-                fetch=True)
+                "WHERE f.amount > 1000;"))
             self.random_sleep()
             
             # 5. Dostęp do zasobów systemowych
@@ -271,57 +375,114 @@ class DatabaseSimulator:
                 fetch=True)
             self.random_sleep()
             
-            conn.close()
+            self.release(conn)
         
         # 2. Błędne logowania
         self.print_scenario("2. Próby nieautoryzowanego dostępu - błędne hasła")
         
         for i in range(1, 6):
             self.print_attack(f"Próba logowania z błędnym hasłem (próba {i})")
-            self.connect_postgres('app_user', f'WrongPassword{i}')
+            self.connect_postgres('app_user', f'WrongPassword{i}', fresh=True)
             time.sleep(2)
         
         # Próba logowania na konta z wysokimi uprawnieniami
         self.print_attack("Próby brute force na konto DBA")
         for pwd in ['admin123', 'Admin123', 'dba123', 'password', 'DBA123']:
-            self.connect_postgres('dba', pwd)
+            self.connect_postgres('dba', pwd, fresh=True)
             time.sleep(1)
     
     # ============================================
     # MARIADB - Połączenia i operacje
     # ============================================
     
-    def connect_mariadb(self, username, password):
-        """Nawiązuje połączenie z MariaDB"""
+    def _open_mariadb(self, username, password):
+        import mysql.connector
+
+        return mysql.connector.connect(
+            host=DB_CONFIG['mariadb']['host'],
+            port=DB_CONFIG['mariadb']['port'],
+            database=DB_CONFIG['mariadb']['database'],
+            user=username,
+            password=password,
+            connect_timeout=5
+        )
+    
+    def connect_mariadb(self, username, password, fresh=False):
+        """Nawiązuje połączenie z MariaDB (z puli, albo nowe gdy fresh=True - zdarzenie logowania)"""
+        started = time.perf_counter()
+        conn = None
         try:
-            conn = mysql.connector.connect(
-                host=DB_CONFIG['mariadb']['host'],
-                port=DB_CONFIG['mariadb']['port'],
-                database=DB_CONFIG['mariadb']['database'],
-                user=username,
-                password=password,
-                connect_timeout=5
-            )
-            return conn
+            with self.latency.measure('mariadb', self.scenario, 'connect'):
+                if fresh:
+                    conn = self._open_mariadb(username, password)
+                    return conn
+                return self.connections.acquire('mariadb', username, password)
         except Exception as e:
             self.print_error(f"Błąd połączenia MariaDB ({username}): {str(e)}")
             return None
+        finally:
+            if fresh and self.trace is not None:
+                self._record('mariadb', conn, username, 'connect', None, conn is not None, started,
+                             password=password)
     
     def execute_mariadb(self, conn, query, fetch=False):
-        """Wykonuje zapytanie SQL na MariaDB"""
+        """Wykonuje zapytanie SQL na MariaDB (czas execute/fetch/commit trafia do histogramów)"""
+        ok = True
+        started = time.perf_counter()
         try:
             cursor = conn.cursor()
-            cursor.execute(query)
+            with self.latency.measure('mariadb', self.scenario, 'execute'):
+                cursor.execute(query)
             if fetch:
-                result = cursor.fetchall()
+                with self.latency.measure('mariadb', self.scenario, 'fetch'):
+                    result = cursor.fetchall()
                 cursor.close()
                 return result
-            conn.commit()
+            with self.latency.measure('mariadb', self.scenario, 'commit'):
+                conn.commit()
             cursor.close()
             return True
         except Exception as e:
+            ok = False
             self.print_error(f"Błąd zapytania: {str(e)}")
             return None
+        finally:
+            METRICS.record_result('mariadb', self._connection_user(conn), self.scenario, ok)
+            if self.trace is not None:
+                self._record('mariadb', conn, self._connection_user(conn), 'fetch' if fetch else 'execute',
+                             query, ok, started)
+    
+    def stream_mariadb(self, conn, query):
+        """Odczytuje duży wynik kursorem niebuforowanym (wiersze czytane z gniazda paczkami)
+
+        Zwraca streaming.ResultStream z liczbą wierszy i bajtów albo None przy błędzie.
+        """
+        from streaming import ResultStream
+
+        ok = True
+        started = time.perf_counter()
+        stream = ResultStream('mariadb', self.stream_batch, self.stream_memory)
+        try:
+            cursor = conn.cursor(buffered=False)
+            with self.latency.measure('mariadb', self.scenario, 'execute'):
+                cursor.execute(query)
+            with self.latency.measure('mariadb', self.scenario, 'fetch'):
+                stream.drain(cursor.fetchmany)
+            cursor.close()
+            return stream
+        except Exception as e:
+            ok = False
+            self.print_error(f"Błąd zapytania: {str(e)}")
+            try:
+                # Nieprzeczytana reszta wyniku blokowałaby kolejne zapytania na połączeniu z puli
+                conn.consume_results()
+            except Exception:
+                pass
+            return None
+        finally:
+            METRICS.record_result('mariadb', self._connection_user(conn), self.scenario, ok)
+            if self.trace is not None:
+                self._record('mariadb', conn, self._connection_user(conn), 'fetch', query, ok, started)
     
     def mariadb_normal_activity(self):
         """Normalna aktywność użytkowników MariaDB"""
@@ -336,9 +497,11 @@ class DatabaseSimulator:
             self.random_sleep()
             
             self.print_normal("Dodawanie nowego klienta")
+            person = default_stream().take()
             self.execute_mariadb(conn, 
-                f"INSERT INTO customers (first_name, last_name, email, phone) "
-                f"VALUES ('Katarzyna', 'Nowacka', 'katarzyna.n{random.randint(1000,9999)}@email.pl', '555123456');")
+                f"INSERT INTO customers (first_name, last_name, email, phone, pesel) "
+                f"VALUES ('{person['first_name']}', '{person['last_name']}', '{person['email']}', "
+                f"'{person['phone']}', '{person['pesel']}');")
             self.random_sleep()
             
             self.print_normal("Generowanie raportów")
@@ -349,7 +512,7 @@ class DatabaseSimulator:
                 fetch=True)
             self.random_sleep()
             
-            conn.close()
+            self.release(conn)
     
     def mariadb_attack_scenarios(self):
         """Scenariusze ataków na MariaDB"""
@@ -420,11 +583,10 @@ class DatabaseSimulator:
             self.random_sleep()
             
             self.print_attack("Masowy odczyt wrażliwych danych")
-            self.execute_mariadb(conn, 
+            self.print_stream(self.stream_mariadb(conn, 
                 "SELECT c.*, f.account_number, f.amount "
                 "FROM customers c "
-                "LEFT JOIN financial_transactions f ON c.customer_id = f.customer_id;", 
-                fetch=True)
+                "LEFT JOIN financial_transactions f ON c.customer_id = f.customer_id;"))
             self.random_sleep()
             
             # 4. Dostęp do systemu
@@ -444,37 +606,90 @@ class DatabaseSimulator:
                     fetch=True)
                 time.sleep(0.5)
             
-            conn.close()
+            self.release(conn)
         
         # 2. Błędne logowania
         self.print_scenario("2. Brute force - próby złamania hasła")
         
         for i in range(1, 8):
             self.print_attack(f"Próba logowania jako root z losowym hasłem (próba {i})")
-            self.connect_mariadb('root', f'WrongPass{i}')
+            self.connect_mariadb('root', f'WrongPass{i}', fresh=True)
             time.sleep(1)
     
     # ============================================
     # MONGODB - Połączenia i operacje
     # ============================================
     
-    def connect_mongodb(self, username, password):
-        """Nawiązuje połączenie z MongoDB"""
+    def _open_mongodb(self, username, password):
+        import pymongo
+
+        client = pymongo.MongoClient(
+            host=DB_CONFIG['mongodb']['host'],
+            port=DB_CONFIG['mongodb']['port'],
+            username=username,
+            password=password,
+            authSource='admin',
+            serverSelectionTimeoutMS=5000,
+            event_listeners=self._mongo_listeners(username)
+        )
+        # Test połączenia (wymusza uwierzytelnienie)
         try:
-            client = pymongo.MongoClient(
-                host=DB_CONFIG['mongodb']['host'],
-                port=DB_CONFIG['mongodb']['port'],
-                username=username,
-                password=password,
-                authSource='admin',
-                serverSelectionTimeoutMS=5000
-            )
-            # Test połączenia
             client.server_info()
-            return client
+        except Exception:
+            client.close()
+            raise
+        return client
+    
+    def _mongo_listeners(self, username):
+        from monitoring import MongoLatencyListener
+
+        listeners = [MongoLatencyListener(self, username)]
+        if self.trace is not None:
+            from recording import TraceCommandListener
+            listeners.append(TraceCommandListener(self.trace, username))
+        return listeners
+    
+    def connect_mongodb(self, username, password, fresh=False):
+        """Nawiązuje połączenie z MongoDB (z puli, albo nowe gdy fresh=True - zdarzenie logowania)"""
+        started = time.perf_counter()
+        conn = None
+        try:
+            with self.latency.measure('mongodb', self.scenario, 'connect'):
+                if fresh:
+                    conn = self._open_mongodb(username, password)
+                    return conn
+                return self.connections.acquire('mongodb', username, password)
         except Exception as e:
             self.print_error(f"Błąd połączenia MongoDB ({username}): {str(e)}")
             return None
+        finally:
+            if fresh and self.trace is not None:
+                self._record('mongodb', conn, username, 'connect', None, conn is not None, started,
+                             password=password)
+    
+    def stream_mongodb(self, collection, query=None, limit=0):
+        """Opróżnia kursor find() z jawnym batch_size (getMore do końca wyniku)
+
+        Dokumenty nie są dekodowane (RawBSONDocument) - rozmiar w bajtach jest dokładny.
+        Zwraca streaming.ResultStream albo None przy błędzie.
+        """
+        from bson.codec_options import CodecOptions
+        from bson.raw_bson import RawBSONDocument
+        from streaming import ResultStream, mongo_batches
+
+        stream = ResultStream('mongodb', self.stream_batch, self.stream_memory)
+        try:
+            raw = collection.with_options(codec_options=CodecOptions(document_class=RawBSONDocument))
+            batch = min(limit, self.stream_batch) if limit else self.stream_batch
+            cursor = raw.find(query or {}, limit=limit, batch_size=batch)
+            try:
+                stream.drain(mongo_batches(cursor))
+            finally:
+                cursor.close()
+            return stream
+        except Exception as e:
+            self.print_error(str(e))
+            return None
     
     def mongodb_normal_activity(self):
         """Normalna aktywność użytkowników MongoDB"""
@@ -489,7 +704,7 @@ class DatabaseSimulator:
             self.print_normal("Pobieranie dokumentów użytkowników")
             try:
                 users = list(db.users.find().limit(3))
-                print(f"  Znaleziono {len(users)} użytkowników")
+                self.print_detail(f"Znaleziono {len(users)} użytkowników")
             except Exception as e:
                 self.print_error(str(e))
             self.random_sleep()
@@ -498,7 +713,7 @@ class DatabaseSimulator:
             try:
                 db.users.insert_one({
                     'username': f'new_user_{random.randint(1000,9999)}',
-                    'email': f'new{random.randint(100,999)}@example.com',
+                    'email': default_stream().value('email'),
                     'role': 'user',
                     'created': datetime.now()
                 })
@@ -526,12 +741,12 @@ class DatabaseSimulator:
                     }}
                 ]
                 stats = list(db.orders.aggregate(pipeline))
-                print(f"  Wygenerowano statystyki dla {len(stats)} użytkowników")
+                self.print_detail(f"Wygenerowano statystyki dla {len(stats)} użytkowników")
             except Exception as e:
                 self.print_error(str(e))
             self.random_sleep()
             
-            client.close()
+            self.release(client)
     
     def mongodb_attack_scenarios(self):
         """Scenariusze ataków na MongoDB"""
@@ -545,37 +760,24 @@ class DatabaseSimulator:
             # 1. NoSQL Injection
             self.print_scenario("1. NoSQL Injection - próby obejścia autentykacji")
             
+            # Kursory find() są leniwe - bez opróżnienia zapytanie nie trafia do serwera
             self.print_attack("Próba NoSQL injection w zapytaniu")
-            try:
-                db.users.find({'username': {'$ne': None}}).limit(10)
-            except Exception as e:
-                self.print_error(str(e))
+            self.stream_mongodb(db.users, {'username': {'$ne': None}}, limit=10)
             self.random_sleep()
             
             self.print_attack("Próba injection z operatorem $where")
-            try:
-                db.users.find({'$where': 'this.username == "admin" || true'})
-            except Exception as e:
-                self.print_error(str(e))
+            self.stream_mongodb(db.users, {'$where': 'this.username == "admin" || true'})
             self.random_sleep()
             
             # 3. Eksfiltracja danych
             self.print_scenario("3. Masowa eksfiltracja danych")
             
             self.print_attack("Odczyt wszystkich użytkowników")
-            try:
-                all_users = list(db.users.find())
-                print(f"  Wyeksfiltrowano {len(all_users)} użytkowników")
-            except Exception as e:
-                self.print_error(str(e))
+            self.print_stream(self.stream_mongodb(db.users))
             self.random_sleep()
             
             self.print_attack("Odczyt wszystkich zamówień")
-            try:
-                all_orders = list(db.orders.find())
-                print(f"  Wyeksfiltrowano {len(all_orders)} zamówień")
-            except Exception as e:
-                self.print_error(str(e))
+            self.print_stream(self.stream_mongodb(db.orders))
             self.random_sleep()
             
             # 4. Dostęp do zasobów systemowych
@@ -595,27 +797,24 @@ class DatabaseSimulator:
             self.print_attack("Próba enumeracji kolekcji")
             try:
                 collections = db.list_collection_names()
-                print(f"  Znaleziono {len(collections)} kolekcji")
+                self.print_detail(f"Znaleziono {len(collections)} kolekcji")
             except Exception as e:
                 self.print_error(str(e))
             self.random_sleep()
             
             self.print_attack("Szybka seria zapytań (automated attack)")
             for i in range(8):
-                try:
-                    db.users.find().limit(1)
-                except Exception as e:
-                    pass
+                self.stream_mongodb(db.users, limit=1)
                 time.sleep(0.3)
             
-            client.close()
+            self.release(client)
         
         # 2. Błędne logowania
         self.print_scenario("2. Próby nieautoryzowanego dostępu")
         
         for i in range(1, 7):
             self.print_attack(f"Próba logowania z błędnymi poświadczeniami (próba {i})")
-            self.connect_mongodb('admin', f'WrongPass{i}')
+            self.connect_mongodb('admin', f'WrongPass{i}', fresh=True)
             time.sleep(2)
     
     # ============================================
@@ -641,18 +840,17 @@ class DatabaseSimulator:
             # Etap 2: Lateral movement
             self.print_attack("ETAP 2: Lateral movement - próba dostępu do innych kont")
             for user in ['analyst', 'dba', 'readonly_user']:
-                self.connect_postgres(user, 'Guessed123!')
+                self.connect_postgres(user, 'Guessed123!', fresh=True)
                 time.sleep(1)
             
             # Etap 3: Eksfiltracja
             self.print_attack("ETAP 3: Eksfiltracja - kradzież wrażliwych danych")
-            self.execute_postgres(conn, 
+            self.print_stream(self.stream_postgres(conn, 
                 "SELECT c.pesel, f.account_number, m.diagnosis "
                 "FROM customers c "
                 "LEFT JOIN financial_transactions f ON c.customer_id = f.customer_id "
                 "LEFT JOIN sensitive_medical_data m ON c.customer_id = m.customer_id "
-                "WHERE c.pesel IS NOT NULL;", 
-                fetch=True)
+                "WHERE c.pesel IS NOT NULL;"))
             self.random_sleep()
             
             # Etap 4: Zatarcie śladów
@@ -661,70 +859,593 @@ class DatabaseSimulator:
                 "DELETE FROM audit_log WHERE user_name = 'app_user';")
             self.random_sleep()
             
-            conn.close()
+            self.release(conn)
     
     # ============================================
     # FUNKCJA GŁÓWNA
     # ============================================
     
-    def run_simulation(self, mode):
-        """Uruchamia symulację w wybranym trybie"""
+    def run_scenario(self, method):
+        """Wykonuje jedną metodę scenariusza - jej nazwa jest etykietą w histogramach opóźnień"""
+        self.scenario = method.__name__
+        try:
+            method()
+        finally:
+            self.scenario = 'adhoc'
+    
+    def backend_plan(self, mode):
+        """Scenariusze trybu pogrupowane według bazy - każda grupa startuje, gdy jej baza jest gotowa"""
+        normal = {
+            'postgres': [self.postgres_normal_activity],
+            'mariadb': [self.mariadb_normal_activity],
+            'mongodb': [self.mongodb_normal_activity],
+        }
+        attack = {
+            'postgres': [self.postgres_attack_scenarios, self.advanced_attack_scenarios],
+            'mariadb': [self.mariadb_attack_scenarios],
+            'mongodb': [self.mongodb_attack_scenarios],
+        }
+        if mode == "normal":
+            return normal
+        if mode == "attack":
+            return attack
+        return {backend: normal[backend] + attack[backend] for backend in normal}
+    
+    def ready_backends(self, backends):
+        """Bazy w kolejności gotowości (bez sprawdzania - w kolejności podanej)"""
+        if self.readiness is None:
+            return iter(backends)
+        return (backend for backend in self.readiness.as_ready() if backend in backends)
+    
+    def is_ready(self, backend):
+        """W trybie ciągłym: czeka na wynik sprawdzenia bazy (tylko przy pierwszym przebiegu)"""
+        return self.readiness is None or self.readiness.wait(backend)
+    
+    def continuous_plan(self):
+        """Scenariusze trybu ciągłego pogrupowane według (baza, klasa)"""
+        normal = self.backend_plan('normal')
+        attack = self.backend_plan('attack')
+        plan = {}
+        for backend in normal:
+            plan[(backend, 'normal')] = normal[backend]
+            # advanced_attack_scenarios nie było w dawnej pętli ciągłej
+            plan[(backend, 'attack')] = [method for method in attack[backend]
+                                         if method != self.advanced_attack_scenarios]
+        return plan
+    
+    def run_simulation(self, mode, rates=None, arrival='poisson', seed=None):
+        """Uruchamia symulację w wybranym trybie
+
+        rates ({(baza, klasa): uruchomienia/s}), arrival i seed dotyczą trybu continuous.
+        """
         self.print_header(f"START SYMULACJI - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         self.print_info(f"Tryb: {mode}")
         
-        if mode == "normal":
-            self.postgres_normal_activity()
-            self.mariadb_normal_activity()
-            self.mongodb_normal_activity()
-            
-        elif mode == "attack":
-            self.postgres_attack_scenarios()
-            self.mariadb_attack_scenarios()
-            self.mongodb_attack_scenarios()
-            self.advanced_attack_scenarios()
-            
-        elif mode in ["full", "all"]:
-            self.postgres_normal_activity()
-            self.postgres_attack_scenarios()
-            self.mariadb_normal_activity()
-            self.mariadb_attack_scenarios()
-            self.mongodb_normal_activity()
-            self.mongodb_attack_scenarios()
-            self.advanced_attack_scenarios()
+        if mode in ["normal", "attack", "full", "all"]:
+            plan = self.backend_plan(mode)
+            for backend in self.ready_backends(list(plan)):
+                for method in plan[backend]:
+                    self.run_scenario(method)
             
         elif mode == "continuous":
+            from scheduler import CONTINUOUS_INTERVAL, RateProfile, ScenarioLoop
             self.print_info("Tryb ciągły - symulacja będzie działać w pętli (Ctrl+C aby zatrzymać)")
+            plan = self.continuous_plan()
+            # Uruchomienia w chwilach z harmonogramu open-loop zamiast stałych przerw i random_sleep()
+            rates = {key: rate for key, rate in (rates or {}).items() if key in plan} or \
+                {key: 1.0 / CONTINUOUS_INTERVAL for key in plan}
+            loop = ScenarioLoop(self, plan, rates, RateProfile(math.inf), process=arrival, seed=seed)
+            self.think_time = False
+            self.print_info(loop.describe())
             try:
-                while True:
-                    self.postgres_normal_activity()
-                    time.sleep(30)
-                    self.postgres_attack_scenarios()
-                    time.sleep(30)
-                    self.mariadb_normal_activity()
-                    time.sleep(30)
-                    self.mariadb_attack_scenarios()
-                    time.sleep(30)
-                    self.mongodb_normal_activity()
-                    time.sleep(30)
-                    self.mongodb_attack_scenarios()
-                    time.sleep(60)
-            except KeyboardInterrupt:
-                self.print_info("\nPrzerwano symulację ciągłą")
+                loop.print_summary(loop.run())
+            finally:
+                self.think_time = True
+        
+        self.connections.close_all()
+        self.latency.print_summary(self, detailed=True)
         
         self.print_header(f"KONIEC SYMULACJI - {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}")
         self.print_info("Sprawdź logi w Splunk: http://localhost:8000")
 
 
+def start_metrics(args, worker=None):
+    """Uruchamia endpoint /metrics i wysyłanie metryk do Splunka; zwraca funkcję zamykającą"""
+    from metrics import MetricsServer, SplunkMetricsSink
+    if worker is not None:
+        METRICS.set_static_labels(worker=str(worker))
+    server = sink = None
+    if args.metrics_port:
+        port = args.metrics_port + (worker + 1 if worker is not None else 0)
+        server = MetricsServer(port).start()
+    if args.metrics_splunk:
+        sink = SplunkMetricsSink(index=args.metrics_index, interval=args.metrics_interval,
+                                 url=args.hec_url, token=args.hec_token).start()
+
+    def stop():
+        if sink is not None:
+            sink.stop()
+        if server is not None:
+            server.shutdown()
+    return stop
+
+
+# Tryby dzielone na fragmenty między procesy (--workers) i agentów (tryb klastra)
+SHARDED_MODES = ('async', 'rate', 'scenarios', 'hec', 'bruteforce')
+
+
+def sharded_job(simulator, args):
+    """Silnik trybu i fabryka jego fragmentów build(index, count)
+
+    Silnik uruchamia tryb w jednym procesie albo scala i drukuje podsumowanie fragmentów
+    z --workers lub agentów klastra. args może pochodzić z wiersza poleceń albo z zadania
+    przysłanego agentowi przez koordynatora.
+    """
+    from workers import (async_engine_shard, auth_attack_shard, hec_emitter_shard,
+                         scenario_engine_shard, scheduler_shard)
+    if args.mode == "async":
+        from async_engine import AsyncEngine
+        engine = AsyncEngine(simulator, users=args.users, duration=args.duration,
+                             attack_ratio=args.attack_ratio, think_time=tuple(args.think_time),
+                             backends=args.backends, seed=args.seed, ready_timeout=args.ready_timeout)
+        return engine, async_engine_shard(
+            simulator, args.users, args.duration, args.attack_ratio,
+            tuple(args.think_time), args.backends, args.seed, args.ready_timeout)
+    if args.mode == "rate":
+        from scheduler import OpenLoopScheduler, RateProfile, parse_rate_specs
+        rates = parse_rate_specs(args.rate) or {(backend, 'normal'): 10.0 for backend in DB_CONFIG}
+        profile = RateProfile(args.duration, ramp_up=args.ramp_up, ramp_down=args.ramp_down,
+                              diurnal=args.diurnal, diurnal_min=args.diurnal_min,
+                              diurnal_period=args.diurnal_period)
+        scheduler = OpenLoopScheduler(simulator, rates, profile, process=args.arrival,
+                                      max_in_flight=args.max_in_flight, pool_size=args.pool_max,
+                                      seed=args.seed)
+        return scheduler, scheduler_shard(
+            simulator, rates, profile, args.arrival, args.max_in_flight,
+            args.pool_max, args.seed)
+    if args.mode == "scenarios":
+        from scenarios import ScenarioEngine, StepPlan, load_scenarios, parse_weight_specs
+        plan = StepPlan(load_scenarios(args.scenario_file or None, parse_weight_specs(args.weight)))
+        engine = ScenarioEngine(simulator, plan, users=args.users, duration=args.duration,
+                                pool_size=args.pool_max, seed=args.seed)
+        return engine, scenario_engine_shard(
+            simulator, plan, args.users, args.duration, args.pool_max, args.seed)
+    if args.mode == "hec":
+        from hec import HecEmitter
+        client_options = dict(index=args.hec_index, url=args.hec_url, token=args.hec_token,
+                              batch_events=args.hec_batch, in_flight=args.hec_in_flight,
+                              gzip_level=args.hec_gzip_level)
+        emitter = HecEmitter(simulator, rate=args.hec_rate, duration=args.duration,
+                             backends=args.backends, attack_ratio=args.attack_ratio, seed=args.seed,
+                             **client_options)
+        return emitter, hec_emitter_shard(
+            simulator, args.hec_rate, args.duration, args.backends, args.attack_ratio,
+            args.seed, **client_options)
+    from bruteforce import AuthAttackEngine, read_dictionary
+    usernames = read_dictionary(args.usernames) if args.usernames else None
+    passwords = read_dictionary(args.passwords) if args.passwords else None
+    pairs = None
+    if args.auth_mode == 'stuffing' and passwords:
+        pairs = [tuple(line.split(':', 1)) for line in passwords if ':' in line]
+        passwords = None
+    auth_options = dict(mode=args.auth_mode, usernames=usernames, passwords=passwords, pairs=pairs,
+                        timeout=args.auth_timeout, abort_ratio=args.auth_abort_ratio, process=args.arrival)
+    engine = AuthAttackEngine(simulator, rate=args.auth_rate, concurrency=args.auth_concurrency,
+                              duration=args.duration, backends=args.backends, seed=args.seed,
+                              output=args.output, **auth_options)
+    return engine, auth_attack_shard(
+        simulator, args.auth_rate, args.auth_concurrency, args.duration, args.backends,
+        args.seed, **auth_options)
+
+
+def parse_args(argv):
+    parser = argparse.ArgumentParser(
+        description="Symulator aktywności użytkowników i ataków na bazy danych")
+    parser.add_argument('mode', choices=['normal', 'attack', 'full', 'all', 'continuous', 'async', 'rate', 'scenarios', 'seed',
+                                         'hec', 'hec-standin', 'logs', 'benchmark', 'replay',
+                                         'probe', 'splunk-standin', 'dashboard-cost', 'dashboard-consolidate',
+                                         'dashboard-run', 'preagg', 'bruteforce', 'coordinator', 'agent',
+                                         'workload-capture', 'saturation', 'audit-matrix', 'capacity'],
+                        help="Tryb symulacji")
+    parser.add_argument('--users', type=int, default=100,
+                        help="Liczba wirtualnych użytkowników (tryby async/scenarios/audit-matrix)")
+    parser.add_argument('--duration', type=float, default=60,
+                        help="Czas trwania w sekundach (tryby async/rate/scenarios/hec/logs/probe/preagg/bruteforce/audit-matrix, "
+                             "w trybie preagg 0 = do przerwania)")
+    parser.add_argument('--attack-ratio', type=float, default=0.1,
+                        help="Udział kroków ataku w mieszance (tryby async/hec/logs/dashboard-run/audit-matrix/capacity)")
+    parser.add_argument('--think-time', type=float, nargs=2, default=[0.0, 0.0],
+                        metavar=('MIN', 'MAX'), help="Przerwa między krokami w sekundach (tryb async)")
+    parser.add_argument('--backends', nargs='+', choices=list(DB_CONFIG), default=list(DB_CONFIG),
+                        help="Bazy objęte symulacją (tryby async/seed/hec/logs/probe/dashboard-run/preagg/bruteforce/"
+                             "workload-capture/saturation/audit-matrix/capacity)")
+    parser.add_argument('--seed', type=int, default=None, help="Ziarno generatora losowego")
+    parser.add_argument('--rate', action='append', default=[], metavar='BAZA:KLASA=N',
+                        help="Docelowe zdarzenia/s, np. postgres:normal=200 (tryby rate/capacity, można powtarzać; "
+                             "w trybie continuous uruchomienia scenariusza/s)")
+    parser.add_argument('--arrival', choices=['poisson', 'constant'], default='poisson',
+                        help="Rozkład zgłoszeń (tryby rate/bruteforce/continuous)")
+    parser.add_argument('--ramp-up', type=float, default=0, help="Czas narastania tempa w sekundach (tryb rate)")
+    parser.add_argument('--ramp-down', type=float, default=0, help="Czas wygaszania tempa w sekundach (tryb rate)")
+    parser.add_argument('--diurnal', action='store_true', help="Nałóż krzywą dobową na tempo (tryb rate)")
+    parser.add_argument('--diurnal-min', type=float, default=0.2,
+                        help="Minimum krzywej dobowej jako ułamek tempa szczytowego (tryb rate)")
+    parser.add_argument('--diurnal-period', type=float, default=86400,
+                        help="Długość symulowanej doby w sekundach (tryb rate)")
+    parser.add_argument('--max-in-flight', type=int, default=1000,
+                        help="Limit równoległych operacji, powyżej którego zgłoszenia są odrzucane (tryb rate)")
+    parser.add_argument('--scenario-file', action='append', default=[], metavar='ŚCIEŻKA',
+                        help="Plik lub katalog z definicjami scenariuszy JSON (tryb scenarios)")
+    parser.add_argument('--weight', action='append', default=[], metavar='KLUCZ=MNOŻNIK',
+                        help="Skalowanie wag scenariuszy wg nazwy, klasy lub bazy (tryb scenarios)")
+    parser.add_argument('--scale', type=float, default=1.0,
+                        help="Współczynnik skali danych - 1.0 to ok. 5.5 mln wierszy na bazę SQL (tryb seed)")
+    parser.add_argument('--batch-size', type=int, default=10000,
+                        help="Liczba wierszy w jednej paczce (tryb seed)")
+    parser.add_argument('--defer-constraints', action='store_true',
+                        help="Wyłącz triggery i klucze obce na czas ładowania, audit_log uzupełnij na końcu (tryb seed)")
+    parser.add_argument('--state-file', default='seed_state.json',
+                        help="Plik stanu pozwalający wznowić przerwane ładowanie (tryb seed)")
+    parser.add_argument('--hec-url', default=None,
+                        help="Adres HEC, np. https://splunk:8088 lub http://127.0.0.1:8088 dla zastępnika (tryby hec/hec-standin/preagg)")
+    parser.add_argument('--hec-token', default=None, help="Token HEC (domyślnie SPLUNK_HEC_TOKEN z config.py)")
+    parser.add_argument('--hec-rate', type=float, default=0,
+                        help="Docelowe zdarzenia/s, 0 = tak szybko, jak przyjmuje HEC (tryb hec)")
+    parser.add_argument('--hec-batch', type=int, default=1000, help="Liczba zdarzeń w jednym żądaniu (tryby hec/preagg)")
+    parser.add_argument('--hec-in-flight', type=int, default=4,
+                        help="Liczba paczek wysyłanych jednocześnie (tryby hec/preagg)")
+    parser.add_argument('--hec-gzip-level', type=int, default=1, choices=range(1, 10),
+                        help="Poziom kompresji gzip (tryby hec/preagg)")
+    parser.add_argument('--hec-index', default=None,
+                        help="Wymuszony indeks docelowy zamiast indeksów z inputs.conf (tryby hec/preagg/capacity)")
+    parser.add_argument('--hec-busy-ratio', type=float, default=0.0,
+                        help="Ułamek żądań, na które zastępnik odpowiada 503 (tryb hec-standin)")
+    parser.add_argument('--log-root', default='/',
+                        help="Katalog, pod którym powstaje (tryb logs) lub jest śledzone (tryby preagg/audit-matrix) drzewo var/log/...")
+    parser.add_argument('--gb-per-hour', type=float, default=1.0,
+                        help="Docelowy wolumen zapisu w GB/h, 0 = maksymalnie (tryb logs)")
+    parser.add_argument('--block-mb', type=int, default=4, help="Rozmiar bloku zapisu w MB (tryb logs)")
+    parser.add_argument('--rotate-mb', type=int, default=100,
+                        help="Rozmiar pliku, po którym następuje rotacja (tryb logs)")
+    parser.add_argument('--backfill-days', type=float, default=0,
+                        help="Zacznij znaczniki czasu N dni temu i dogoń teraźniejszość (tryb logs)")
+    parser.add_argument('--log-eps', type=float, default=200,
+                        help="Gęstość historii przy backfillu - wpisy na sekundę logu na plik (tryb logs)")
+    parser.add_argument('--benchmark-file', default=None, metavar='ŚCIEŻKA',
+                        help="Plik z definicjami obciążeń (tryb benchmark, domyślnie benchmarks/default.json)")
+    parser.add_argument('--workload', action='append', default=[], metavar='NAZWA',
+                        help="Uruchom tylko wybrane obciążenia (tryb benchmark, można powtarzać)")
+    parser.add_argument('--output', default=None,
+                        help="Plik wyników JSON (tryby benchmark/dashboard-cost/dashboard-run/bruteforce/saturation/audit-matrix/capacity), modelu obciążenia "
+                             "(tryb workload-capture, domyślnie workload_model.json) lub katalog przepisanych "
+                             "dashboardów (tryb dashboard-consolidate, domyślnie podkatalog consolidated/)")
+    parser.add_argument('--label', default=None, help="Etykieta przebiegu dopisywana do wyników (tryb benchmark)")
+    parser.add_argument('--repeat', type=int, default=1, help="Liczba powtórzeń każdego obciążenia lub panelu (tryby benchmark/dashboard-run)")
+    parser.add_argument('--compare', default=None, metavar='ŚCIEŻKA',
+                        help="Porównaj z wcześniejszym plikiem wyników (tryb benchmark)")
+    parser.add_argument('--record', default=None, metavar='ŚCIEŻKA',
+                        help="Nagrywaj wykonane operacje do pliku śladu JSONL, .gz = z kompresją "
+                             "(tryby normal/attack/full/continuous/scenarios; przy --workers plik na proces)")
+    parser.add_argument('--record-passwords', action='store_true',
+                        help="Zapisuj w śladzie hasła prób logowania spoza DB_CONFIG - bez tej opcji są "
+                             "pomijane, a odtworzona próba kończy się nieudanym logowaniem")
+    parser.add_argument('--trace', action='append', default=[], metavar='ŚCIEŻKA',
+                        help="Plik śladu do odtworzenia (tryb replay, można powtarzać - ślady są scalane wg czasu)")
+    parser.add_argument('--speed', type=float, default=1.0,
+                        help="Prędkość odtwarzania: 1 = oryginalna, 10 = dziesięciokrotna, 0 = maksymalna (tryb replay)")
+    parser.add_argument('--splunk-url', default=None,
+                        help="Adres REST API Splunka, np. https://splunk:8089 lub http://127.0.0.1:8089 dla zastępnika "
+                             "(tryby probe/splunk-standin/dashboard-consolidate)")
+    parser.add_argument('--splunk-user', default=None,
+                        help="Użytkownik REST API Splunka (tryby probe/splunk-standin/dashboard-consolidate)")
+    parser.add_argument('--splunk-password', default=None,
+                        help="Hasło REST API Splunka (tryby probe/splunk-standin/dashboard-consolidate)")
+    parser.add_argument('--probe-interval', type=float, default=5.0,
+                        help="Odstęp między znacznikami w każdej bazie w sekundach (tryb probe)")
+    parser.add_argument('--probe-poll', type=float, default=1.0,
+                        help="Odstęp odpytywania wyszukiwania w sekundach - rozdzielczość pomiaru (tryb probe)")
+    parser.add_argument('--probe-timeout', type=float, default=300.0,
+                        help="Po ilu sekundach nieodnaleziony znacznik uznać za utracony (tryb probe)")
+    parser.add_argument('--probe-inject', choices=['db', 'rest'], default='db',
+                        help="db = znaczniki w bazach (pełny potok), rest = bezpośrednio do indeksu (tryb probe)")
+    parser.add_argument('--standin-delay', type=float, default=2.0,
+                        help="Opóźnienie, po którym zdarzenie jest widoczne w wyszukiwaniu (tryb splunk-standin)")
+    parser.add_argument('--dashboard', action='append', default=[], metavar='ŚCIEŻKA',
+                        help="Plik XML lub katalog dashboardów (tryby dashboard-cost/dashboard-consolidate/dashboard-run, "
+                             "domyślnie ../dashboards)")
+    parser.add_argument('--top', type=int, default=10,
+                        help="Liczba najdroższych paneli opisywanych szczegółowo (tryb dashboard-cost)")
+    parser.add_argument('--events', action='append', default=[], metavar='ŚCIEŻKA',
+                        help="Eksport zdarzeń (CSV/JSON) lub surowe logi, plik albo katalog (tryb dashboard-run, "
+                             "bez tej opcji zdarzenia są syntetyzowane)")
+    parser.add_argument('--event-count', type=int, default=100000,
+                        help="Liczba syntetycznych zdarzeń z ostatniej doby (tryb dashboard-run)")
+    parser.add_argument('--rows', type=int, default=5,
+                        help="Liczba wierszy wyniku drukowanych dla każdego panelu (tryb dashboard-run)")
+    parser.add_argument('--metrics-port', type=int, default=0,
+                        help="Port endpointu /metrics w formacie Prometheusa, 0 = wyłączony "
+                             "(przy --workers proces k nasłuchuje na porcie+k+1)")
+    parser.add_argument('--metrics-splunk', action='store_true',
+                        help="Wysyłaj metryki do indeksu metryk Splunka przez HEC (adres/token jak --hec-url/--hec-token)")
+    parser.add_argument('--metrics-index', default='simulator_metrics',
+                        help="Indeks metryk w Splunku (także liczniki zwiniętego ruchu w trybie preagg)")
+    parser.add_argument('--preagg-window', type=int, default=60,
+                        help="Długość okna liczników zwiniętego ruchu w sekundach (tryb preagg)")
+    parser.add_argument('--preagg-max-keys', type=int, default=50000,
+                        help="Limit kluczy (użytkownik, baza, klasa polecenia) na okno, nadmiar trafia do '_other' (tryb preagg)")
+    parser.add_argument('--preagg-from-start', action='store_true',
+                        help="Czytaj istniejące pliki od początku zamiast tylko nowych wpisów (tryb preagg)")
+    parser.add_argument('--preagg-state', default=None, metavar='ŚCIEŻKA',
+                        help="Plik stanu z pozycjami w plikach, pozwalający wznowić odczyt po restarcie (tryb preagg)")
+    parser.add_argument('--auth-rate', type=float, default=100,
+                        help="Docelowe próby logowania na sekundę na bazę (tryb bruteforce)")
+    parser.add_argument('--auth-concurrency', type=int, default=50,
+                        help="Limit prób logowania w toku; nadmiar jest odrzucany i liczony (tryb bruteforce)")
+    parser.add_argument('--auth-mode', choices=['brute', 'spray', 'stuffing'], default='brute',
+                        help="brute - słownik haseł na wybranych kontach, spray - każde hasło na wszystkich kontach "
+                             "z config.py, stuffing - pary użytkownik:hasło (tryb bruteforce)")
+    parser.add_argument('--usernames', default=None, metavar='ŚCIEŻKA',
+                        help="Słownik użytkowników, jeden na linię (tryb bruteforce)")
+    parser.add_argument('--passwords', default=None, metavar='ŚCIEŻKA',
+                        help="Słownik haseł, jedno na linię, lub pary użytkownik:hasło w trybie stuffing (tryb bruteforce)")
+    parser.add_argument('--auth-timeout', type=float, default=5.0,
+                        help="Limit czasu jednej próby logowania w sekundach (tryb bruteforce)")
+    parser.add_argument('--auth-abort-ratio', type=float, default=0.0,
+                        help="Udział prób przerwanych przed uwierzytelnieniem - w MariaDB zwiększają "
+                             "licznik max_connect_errors hosta (tryb bruteforce)")
+    parser.add_argument('--metrics-interval', type=float, default=10.0,
+                        help="Co ile sekund wysyłać metryki do Splunka")
+    parser.add_argument('--console-sample', type=float, default=1.0,
+                        help="Ułamek drukowanych linii kroków (NORMAL/ATAK/ERROR), 1.0 = wszystkie")
+    parser.add_argument('--quiet', action='store_true',
+                        help="Nie drukuj linii kroków - tylko nagłówki, INFO i podsumowania")
+    parser.add_argument('--console-unbuffered', action='store_true',
+                        help="Drukuj każdą linię od razu zamiast paczkami")
+    parser.add_argument('--workers', type=int, default=1,
+                        help="Liczba procesów generujących obciążenie (tryby async/rate/scenarios/hec/bruteforce)")
+    parser.add_argument('--ready-timeout', type=float, default=120,
+                        help="Ile sekund czekać na gotowość każdej bazy przed jej obciążeniem, 0 = start bez "
+                             "sprawdzania (tryby normal/attack/full/continuous/async/saturation)")
+    parser.add_argument('--cluster-mode', choices=SHARDED_MODES, default='async',
+                        help="Tryb rozdzielany między agentów; jego opcje podaje się koordynatorowi (tryb coordinator)")
+    parser.add_argument('--agents', type=int, default=2,
+                        help="Liczba agentów, na którą czeka koordynator przed startem (tryb coordinator)")
+    parser.add_argument('--cluster-address', default='127.0.0.1:7070', metavar='HOST:PORT',
+                        help="Adres nasłuchu koordynatora lub adres, z którym łączy się agent (tryby coordinator/agent)")
+    parser.add_argument('--start-delay', type=float, default=3.0,
+                        help="Sekundy od rozesłania zadań do wspólnego startu agentów (tryb coordinator)")
+    parser.add_argument('--cluster-wait', type=float, default=300,
+                        help="Ile sekund czekać na agentów lub na koordynatora (tryby coordinator/agent)")
+    parser.add_argument('--cluster-interval', type=float, default=5.0,
+                        help="Co ile sekund agenci wysyłają bieżące liczniki (tryby coordinator/agent)")
+    parser.add_argument('--agent-name', default=None,
+                        help="Nazwa agenta w raportach koordynatora, domyślnie host:pid (tryb agent)")
+    parser.add_argument('--capture-window', type=float, default=0,
+                        help="Model z przyrostu statystyk w oknie o tej długości w sekundach, 0 = statystyki "
+                             "od ostatniego resetu (tryb workload-capture)")
+    parser.add_argument('--model-min-calls', type=int, default=2,
+                        help="Minimalna liczba wywołań szablonu zapytania, by trafił do modelu (tryb workload-capture)")
+    parser.add_argument('--model-top', type=int, default=200,
+                        help="Maksymalna liczba szablonów na bazę, od najczęstszych (tryb workload-capture)")
+    parser.add_argument('--saturation-mix', type=float, nargs='+', default=[0.0, 0.1], metavar='UDZIAŁ_ATAKÓW',
+                        help="Mieszanki kroków szukane osobno, jako udział kroków ataku (tryb saturation)")
+    parser.add_argument('--saturation-p99', type=float, default=250,
+                        help="Próg p99 czasu operacji w ms, powyżej którego krok jest przeciążony (tryb saturation)")
+    parser.add_argument('--saturation-errors', type=float, default=0.01,
+                        help="Dopuszczalny odsetek błędów kroków normalnych (tryb saturation)")
+    parser.add_argument('--saturation-start', type=float, default=50,
+                        help="Tempo pierwszego kroku w operacjach/s (tryb saturation)")
+    parser.add_argument('--saturation-max-rate', type=float, default=20000,
+                        help="Górna granica tempa narastania w operacjach/s (tryb saturation)")
+    parser.add_argument('--saturation-step', type=float, default=15,
+                        help="Czas jednego kroku w sekundach, pierwsze 20%% to rozgrzewka (tryb saturation)")
+    parser.add_argument('--saturation-tolerance', type=float, default=0.05,
+                        help="Względna szerokość przedziału, przy której bisekcja kolana się kończy (tryb saturation)")
+    parser.add_argument('--saturation-concurrency', type=int, default=256,
+                        help="Maksymalna liczba równoległych pętli wirtualnych użytkowników (tryb saturation)")
+    parser.add_argument('--saturation-pool', type=int, default=50,
+                        help="Rozmiar puli połączeń do bazy w czasie szukania (tryb saturation)")
+    parser.add_argument('--audit-variant', action='append', default=[], metavar='NAZWA',
+                        help="Mierzony wariant audytu, np. full, off, pgaudit-lean (tryb audit-matrix, "
+                             "można powtarzać, domyślnie wszystkie)")
+    parser.add_argument('--slow-ratio', type=float, default=0.01,
+                        help="Ułamek zapytań przekraczających long_query_time, zapisywanych w slow logu (tryb capacity)")
+    parser.add_argument('--capacity-samples', type=int, default=20000,
+                        help="Liczba wpisów generowanych do pomiaru bajtów na zdarzenie (tryb capacity)")
+    parser.add_argument('--stream-batch', type=int, default=2000,
+                        help="Wiersze lub dokumenty pobierane w jednej paczce przy eksfiltracji (tryby normal/attack/full/continuous)")
+    parser.add_argument('--stream-memory-mb', type=int, default=16,
+                        help="Limit pamięci jednej paczki odczytu strumieniowego w MB (tryby normal/attack/full/continuous)")
+    parser.add_argument('--pool-min', type=int, default=1,
+                        help="Minimalna liczba połączeń w puli na (bazę, użytkownika)")
+    parser.add_argument('--pool-max', type=int, default=5,
+                        help="Maksymalna liczba połączeń w puli na (bazę, użytkownika)")
+    parser.add_argument('--pool-idle', type=float, default=300,
+                        help="Czas bezczynności (s), po którym połączenie z puli jest zamykane")
+    return parser.parse_args(argv)
+
+
 if __name__ == "__main__":
     if len(sys.argv) < 2:
-        print("Użycie: python3 simulate_activity.py {normal|attack|full|continuous}")
+        print("Użycie: python3 simulate_activity.py {normal|attack|full|continuous|async|rate|scenarios|seed|hec|hec-standin|logs|benchmark|replay|probe|splunk-standin|dashboard-cost|dashboard-consolidate|dashboard-run|preagg|bruteforce|coordinator|agent|workload-capture|saturation|audit-matrix|capacity} [opcje]")
         print("\nTryby:")
         print("  normal      - Tylko normalna aktywność użytkowników")
         print("  attack      - Tylko scenariusze ataków")
         print("  full        - Pełna symulacja (normalna + ataki)")
         print("  continuous  - Ciągła symulacja w pętli")
+        print("  async       - Setki równoległych wirtualnych użytkowników (asyncio)")
+        print("  rate        - Harmonogram open-loop ze stałym tempem zdarzeń/s")
+        print("  scenarios   - Scenariusze deklaratywne z plików JSON (scenarios/)")
+        print("  seed        - Masowe ładowanie danych testowych (COPY / INSERT wsadowy / insert_many)")
+        print("  hec         - Syntetyczne logi baz wysyłane prosto do HTTP Event Collector")
+        print("  hec-standin - Lokalny zastępnik HEC do testów trybu hec")
+        print("  logs        - Zapis syntetycznych logów do ścieżek monitorowanych przez forwardery")
+        print("  benchmark   - Powtarzalne obciążenia z benchmarks/ i wyniki p50/p95/p99 do pliku JSON")
+        print("  replay      - Odtworzenie śladu nagranego przez --record (1x, 10x lub maksymalnie szybko)")
+        print("  probe       - Pomiar opóźnienia od zapytania w bazie do zdarzenia w wyszukiwaniu Splunka")
+        print("  splunk-standin - Lokalny zastępnik REST API Splunka do testów trybu probe")
+        print("  dashboard-cost - Statyczna analiza kosztu zapytań SPL w dashboardach i ranking paneli")
+        print("  dashboard-consolidate - Przepisanie dashboardów na wspólne wyszukiwania bazowe z post-process")
+        print("  dashboard-run - Wykonanie paneli offline na eksporcie zdarzeń lub danych syntetycznych z pomiarem czasu")
+        print("  preagg      - Agent śledzący logi baz: zdarzenia bezpieczeństwa do HEC, rutynowy ruch jako liczniki minutowe")
+        print("  bruteforce  - Masowe próby logowania (brute force, password spraying, credential stuffing) z pomiarem dławienia")
+        print("  coordinator - Koordynator klastra: dzieli tryb --cluster-mode między agentów i scala wyniki")
+        print("  agent       - Agent klastra: wykonuje fragment zadania przydzielony przez koordynatora")
+        print("  workload-capture - Model obciążenia z pg_stat_statements i digestów performance_schema jako plik scenariuszy")
+        print("  saturation  - Narastające obciążenie i bisekcja kolana: maksymalna przepustowość każdej bazy z audytem")
+        print("  audit-matrix - Warianty konfiguracji audytu po kolei: przepustowość, opóźnienia i bajty logów na 1000 operacji")
+        print("  capacity - Prognoza wolumenu logów na sourcetype, dziennego przyrostu i retencji indeksów Splunka")
         sys.exit(1)
     
-    mode = sys.argv[1]
-    simulator = DatabaseSimulator()
-    simulator.run_simulation(mode)
\ No newline at end of file
+    args = parse_args(sys.argv[1:])
+    console = ConsoleSink(sample=0.0 if args.quiet else args.console_sample,
+                          buffered=not args.console_unbuffered)
+    simulator = DatabaseSimulator(pool_min=args.pool_min, pool_max=args.pool_max,
+                                  pool_idle=args.pool_idle, console=console, stream_batch=args.stream_batch,
+                                  stream_memory=args.stream_memory_mb << 20)
+    stop_metrics = start_metrics(args)
+    # Tożsamości w zapytaniach powtarzalne dla danego --seed
+    configure_default_stream(args.seed)
+    if args.record and args.mode != 'replay' and args.workers <= 1:
+        from recording import TraceWriter
+        simulator.trace = TraceWriter(args.record, passwords=args.record_passwords)
+    
+    def worker_init(index):
+        stop_worker_metrics = start_metrics(args, worker=index)
+        configure_default_stream(args.seed, worker=index)
+        if args.record:
+            # Procesy nie dzielą jednego pliku - każdy nagrywa do własnego, replay je scala
+            from recording import TraceWriter, worker_path
+            simulator.trace = TraceWriter(worker_path(args.record, index), passwords=args.record_passwords)
+        
+        def cleanup():
+            stop_worker_metrics()
+            if simulator.trace is not None:
+                simulator.trace.close()
+            console.flush()
+        return cleanup
+    
+    if args.mode in SHARDED_MODES:
+        runner, build = sharded_job(simulator, args)
+        if args.workers > 1:
+            from workers import run_sharded
+            run_sharded(simulator, build, args.workers, runner, worker_init=worker_init)
+        else:
+            runner.start()
+    elif args.mode == "coordinator":
+        from cluster import Coordinator
+        job = dict(vars(args), mode=args.cluster_mode, workers=1)
+        runner, _ = sharded_job(simulator, argparse.Namespace(**job))
+        Coordinator(simulator, job, runner, agents=args.agents, address=args.cluster_address,
+                    start_delay=args.start_delay, wait=args.cluster_wait,
+                    interval=args.cluster_interval).run()
+    elif args.mode == "agent":
+        from cluster import Agent
+        Agent(simulator, lambda job: sharded_job(simulator, argparse.Namespace(**job))[1],
+              address=args.cluster_address, name=args.agent_name, wait=args.cluster_wait,
+              interval=args.cluster_interval).run()
+    elif args.mode == "seed":
+        from seeder import Seeder
+        Seeder(simulator, scale=args.scale, batch_size=args.batch_size,
+               defer=args.defer_constraints, state_file=args.state_file,
+               seed=args.seed or 0, backends=args.backends).run()
+    elif args.mode == "hec-standin":
+        from urllib.parse import urlsplit
+        from hec import HecStandIn
+        url = urlsplit(args.hec_url or 'http://0.0.0.0:8088')
+        HecStandIn(url.hostname, url.port or 8088, token=args.hec_token,
+                   busy_ratio=args.hec_busy_ratio).serve(simulator)
+    elif args.mode == "logs":
+        from logwriter import LogFileSynthesizer
+        LogFileSynthesizer(simulator, root=args.log_root, gb_per_hour=args.gb_per_hour,
+                           duration=args.duration, backends=args.backends,
+                           attack_ratio=args.attack_ratio, seed=args.seed,
+                           block_bytes=args.block_mb << 20, rotate_bytes=args.rotate_mb << 20,
+                           backfill_days=args.backfill_days, log_eps=args.log_eps).start()
+    elif args.mode == "benchmark":
+        from benchmark import BenchmarkRunner
+        BenchmarkRunner(simulator, workload_file=args.benchmark_file, output=args.output,
+                        only=args.workload, label=args.label, repeat=args.repeat,
+                        compare=args.compare).run()
+    elif args.mode == "replay":
+        from recording import TraceReplayer
+        if not args.trace:
+            simulator.print_error("Tryb replay wymaga --trace ŚCIEŻKA")
+            sys.exit(1)
+        TraceReplayer(simulator, args.trace, speed=args.speed, pool_size=args.pool_max).start()
+    elif args.mode == "probe":
+        from probe import IngestProbe
+        IngestProbe(simulator, duration=args.duration, interval=args.probe_interval, backends=args.backends,
+                    inject=args.probe_inject, timeout=args.probe_timeout, poll_interval=args.probe_poll,
+                    url=args.splunk_url, username=args.splunk_user, password=args.splunk_password).start()
+        simulator.connections.close_all()
+    elif args.mode == "splunk-standin":
+        from urllib.parse import urlsplit
+        from probe import SplunkRestStandIn
+        url = urlsplit(args.splunk_url or 'http://0.0.0.0:8089')
+        SplunkRestStandIn(url.hostname, url.port or 8089, username=args.splunk_user, password=args.splunk_password,
+                          index_delay=args.standin_delay).serve(simulator)
+    elif args.mode == "dashboard-cost":
+        from splcost import DashboardCostAnalyzer
+        DashboardCostAnalyzer(simulator, paths=args.dashboard or None, output=args.output, top=args.top).run()
+    elif args.mode == "dashboard-consolidate":
+        from consolidate import DashboardConsolidator
+        # Z --splunk-url oszczędność liczona w zdarzeniach z indeksu, bez niego szacowana
+        DashboardConsolidator(simulator, paths=args.dashboard or None, output=args.output,
+                              count_events=bool(args.splunk_url), url=args.splunk_url,
+                              username=args.splunk_user, password=args.splunk_password).run()
+    elif args.mode == "dashboard-run":
+        from splengine import DashboardRunner
+        DashboardRunner(simulator, paths=args.dashboard or None, events=args.events, count=args.event_count,
+                        backends=args.backends, attack_ratio=args.attack_ratio, seed=args.seed,
+                        repeat=args.repeat, rows=args.rows, output=args.output).run()
+    elif args.mode == "preagg":
+        from preagg import PreAggregationAgent
+        PreAggregationAgent(simulator, root=args.log_root, duration=args.duration, window=args.preagg_window,
+                            max_keys=args.preagg_max_keys, from_start=args.preagg_from_start,
+                            state_file=args.preagg_state, index=args.hec_index,
+                            metrics_index=args.metrics_index, backends=args.backends,
+                            url=args.hec_url, token=args.hec_token, batch_events=args.hec_batch,
+                            in_flight=args.hec_in_flight, gzip_level=args.hec_gzip_level).start()
+    elif args.mode == "saturation":
+        from saturation import SaturationFinder
+        SaturationFinder(simulator, backends=args.backends, mixes=args.saturation_mix,
+                         p99_limit=args.saturation_p99, max_error_rate=args.saturation_errors,
+                         start_rate=args.saturation_start, max_rate=args.saturation_max_rate,
+                         step_duration=args.saturation_step, tolerance=args.saturation_tolerance,
+                         max_concurrency=args.saturation_concurrency, pool_size=args.saturation_pool,
+                         ready_timeout=args.ready_timeout, seed=args.seed, output=args.output).start()
+    elif args.mode == "audit-matrix":
+        from auditmatrix import AuditMatrix
+        AuditMatrix(simulator, backends=args.backends, variants=args.audit_variant, users=args.users,
+                    duration=args.duration, attack_ratio=args.attack_ratio,
+                    seed=args.seed if args.seed is not None else 42, log_root=args.log_root,
+                    output=args.output).start()
+    elif args.mode == "capacity":
+        from capacity import CapacityPlanner
+        from scheduler import parse_rate_specs
+        rates = parse_rate_specs(args.rate)
+        if not rates:
+            for backend in args.backends:
+                rates[(backend, 'normal')] = 100.0 * (1 - args.attack_ratio)
+                rates[(backend, 'attack')] = 100.0 * args.attack_ratio
+        CapacityPlanner(simulator, rates, slow_ratio=args.slow_ratio, samples=args.capacity_samples,
+                        index=args.hec_index, seed=args.seed if args.seed is not None else 42,
+                        output=args.output).run()
+    elif args.mode == "workload-capture":
+        from workload import WorkloadCapture
+        WorkloadCapture(simulator, output=args.output or 'workload_model.json', backends=args.backends,
+                        window=args.capture_window, min_calls=args.model_min_calls, top=args.model_top).run()
+    else:
+        if args.ready_timeout:
+            from readiness import ReadinessProbe
+            simulator.readiness = ReadinessProbe(simulator, timeout=args.ready_timeout, seed=args.seed).start()
+        from scheduler import parse_rate_specs
+        simulator.run_simulation(args.mode, rates=parse_rate_specs(args.rate), arrival=args.arrival,
+                                 seed=args.seed)
+    
+    if simulator.trace is not None:
+        simulator.trace.close()
+        simulator.print_info(f"Ślad zapisany w {args.record} ({simulator.trace.records} operacji)")
+    stop_metrics()
+    console.flush()
@@ -0,0 +1,753 @@
+"""
+Parser paneli dashboardów Splunka i podzbioru SPL, którego używają
+Wczytuje pliki XML z dashboards/, rozwiązuje tokeny zakresu czasu i wyszukiwania bazowe,
+a zapytania rozbija na polecenia z drzewami wyrażeń (search, eval, where, rex, stats, ...)
+"""
+
+import glob
+import os
+import re
+import xml.etree.ElementTree as ET
+
+DASHBOARD_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'dashboards')
+# Polecenia, po których liczba wierszy przestaje zależeć od liczby zdarzeń
+REDUCING_COMMANDS = ('stats', 'timechart', 'chart', 'tstats', 'top', 'rare')
+# Pola indeksowane - wyszukiwanie po nich nie wymaga czytania surowych zdarzeń
+INDEXED_FIELDS = ('index', 'sourcetype', 'source', 'host', 'splunk_server', '_time')
+
+
+class SplError(Exception):
+    """Zapytanie spoza obsługiwanego podzbioru SPL"""
+
+
+# ============================================
+# DASHBOARDY
+# ============================================
+
+class Panel:
+    """Jedno wyszukiwanie panelu: zapytanie (z dołączonym wyszukiwaniem bazowym) i zakres czasu"""
+
+    def __init__(self, dashboard, title, search, query, earliest, latest, position, visualization):
+        self.dashboard = dashboard
+        self.title = title
+        # Element <search> - modyfikowany przez narzędzie konsolidacji
+        self.search = search
+        self.query = query
+        self.earliest = earliest
+        self.latest = latest
+        self.position = position
+        self.visualization = visualization
+
+    @property
+    def name(self):
+        return f"{os.path.basename(self.dashboard)}#{self.position} {self.title}"
+
+    def pipeline(self):
+        return parse_pipeline(self.query)
+
+
+def parse_xml(path):
+    """Drzewo XML z zachowanymi komentarzami (przepisany dashboard zachowuje podział sekcji)"""
+    parser = ET.XMLParser(target=ET.TreeBuilder(insert_comments=True))
+    return ET.parse(path, parser)
+
+
+def dashboard_paths(paths=None):
+    files = []
+    for path in paths or [DASHBOARD_DIR]:
+        if os.path.isdir(path):
+            files.extend(sorted(glob.glob(os.path.join(path, '*.xml'))))
+        else:
+            files.append(path)
+    return files
+
+
+def _token_defaults(root):
+    """Wartości domyślne tokenów formularza: $time_token.earliest$ -> -24h@h"""
+    tokens = {}
+    for control in root.iter('input'):
+        token = control.get('token')
+        if not token:
+            continue
+        default = control.find('default')
+        if control.get('type') == 'time' and default is not None:
+            for bound in ('earliest', 'latest'):
+                node = default.find(bound)
+                if node is not None and node.text:
+                    tokens[f"{token}.{bound}"] = node.text.strip()
+        elif default is not None and default.text:
+            tokens[token] = default.text.strip()
+    return tokens
+
+
+def substitute_tokens(text, tokens):
+    """Podstawia $token$ wartościami domyślnymi; $$ to dosłowny znak $"""
+    return re.sub(r'\$\$|\$([\w.]+)\$',
+                  lambda m: '$' if m.group(1) is None else tokens.get(m.group(1), m.group(0)), text or '')
+
+
+def load_panels(path, tree=None):
+    """Panele dashboardu w kolejności z pliku; wyszukiwania post-process dostają zapytanie bazowe"""
+    tree = tree or parse_xml(path)
+    root = tree.getroot()
+    tokens = _token_defaults(root)
+    bases = {}
+    for search in root.iter('search'):
+        if search.get('id'):
+            bases[search.get('id')] = search
+    panels = []
+    position = 0
+    for panel in root.iter('panel'):
+        title_node = panel.find('title')
+        title = title_node.text.strip() if title_node is not None and title_node.text else '(bez tytułu)'
+        for child in panel:
+            search = child.find('search') if child.tag != 'search' else child
+            if search is None or (search.find('query') is None and not search.get('base')):
+                continue
+            position += 1
+            query, earliest, latest = _resolve_search(search, bases, tokens)
+            panels.append(Panel(path, title, search, query, earliest, latest, position, child.tag))
+    return panels
+
+
+def _resolve_search(search, bases, tokens):
+    query_node = search.find('query')
+    query = (query_node.text or '').strip() if query_node is not None else ''
+    base = bases.get(search.get('base'))
+    timing = search
+    if base is not None:
+        base_query, earliest, latest = _resolve_search(base, bases, tokens)
+        query = f"{base_query}\n| {query.lstrip('|').strip()}" if query else base_query
+        timing = base
+    earliest = substitute_tokens(timing.findtext('earliest'), tokens) or None
+    latest = substitute_tokens(timing.findtext('latest'), tokens) or None
+    return substitute_tokens(query, tokens), earliest, latest
+
+
+def relative_hours(earliest, latest=None, default=24.0):
+    """Długość zakresu czasu w godzinach dla czasów względnych (-24h@h, -7d, -15m)"""
+    def offset(value):
+        if not value or value == 'now':
+            return 0.0
+        match = re.match(r'^-(\d*)([smhdw])', value.strip())
+        if not match:
+            return None
+        amount = int(match.group(1) or 1)
+        return amount * {'s': 1 / 3600, 'm': 1 / 60, 'h': 1, 'd': 24, 'w': 168}[match.group(2)]
+    start, end = offset(earliest), offset(latest)
+    if start is None or end is None:
+        return default
+    return max(start - end, 1 / 60)
+
+
+# ============================================
+# POTOK POLECEŃ
+# ============================================
+
+class Command:
+    """Polecenie potoku: nazwa, surowy tekst argumentów i sparsowane argumenty"""
+
+    def __init__(self, name, text, args=None):
+        self.name = name
+        self.text = text
+        self.args = args if args is not None else {}
+
+    def __repr__(self):
+        return f"Command({self.name!r}, {self.text[:40]!r})"
+
+    def render(self):
+        return f"{self.name} {self.text}".strip()
+
+
+def split_pipeline(query):
+    """Dzieli zapytanie na polecenia po '|' poza cudzysłowami i podwyszukiwaniami [...]"""
+    parts, current, depth, quote, escape = [], [], 0, False, False
+    for char in query:
+        if escape:
+            escape = False
+        elif char == '\\' and quote:
+            escape = True
+        elif char == '"':
+            quote = not quote
+        elif not quote and char == '[':
+            depth += 1
+        elif not quote and char == ']':
+            depth -= 1
+        elif not quote and depth == 0 and char == '|':
+            parts.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current).strip())
+    return [part for part in parts if part]
+
+
+def parse_pipeline(query):
+    commands = []
+    for index, part in enumerate(split_pipeline(query)):
+        name, text = re.match(r'(\S+)\s*(.*)$', part, re.S).groups()
+        name = name.lower()
+        if index == 0 and name not in ('search', 'tstats', 'inputlookup', 'makeresults'):
+            # Pierwsze polecenie bez nazwy to niejawne search
+            name, text = 'search', part
+        text = text.strip()
+        parser = COMMAND_PARSERS.get(name)
+        commands.append(Command(name, text, parser(text) if parser else None))
+    return commands
+
+
+def render_pipeline(commands):
+    return '\n| '.join(command.render() for command in commands)
+
+
+# ============================================
+# LEKSER
+# ============================================
+
+_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<quoted_field>'[^']*')
+  | (?P<number>\d+(?:\.\d+)?(?![\w.]))
+  | (?P<op>==|!=|>=|<=|=|<|>|\+|-|\*|/|%|\(|\)|,)
+  | (?P<word>[^\s"'(),=!<>+\-*/%]+)
+''', re.VERBOSE)
+
+
+def unquote(text):
+    """Treść napisu SPL: \\\\ -> \\, \\" -> ", pozostałe sekwencje bez zmian (np. \\b w regexach)"""
+    body = text[1:-1]
+    return re.sub(r'\\([\\"])', r'\1', body)
+
+
+def tokenize(text):
+    tokens = []
+    position = 0
+    while position < len(text):
+        match = _TOKEN.match(text, position)
+        if match is None:
+            raise SplError(f"Nieoczekiwany znak w '{text[position:position + 30]}'")
+        kind = match.lastgroup
+        value = match.group()
+        position = match.end()
+        if kind == 'space':
+            continue
+        if kind == 'string':
+            tokens.append(('str', unquote(value)))
+        elif kind == 'quoted_field':
+            tokens.append(('field', value[1:-1]))
+        elif kind == 'number':
+            tokens.append(('num', float(value) if '.' in value else int(value)))
+        elif kind == 'op':
+            tokens.append(('op', value))
+        else:
+            tokens.append(('word', value))
+    return tokens
+
+
+# ============================================
+# WYRAŻENIA EVAL / WHERE
+# ============================================
+# Węzły: ('num', v) ('str', v) ('field', nazwa) ('call', nazwa, [argumenty])
+#        ('bin', op, lewy, prawy) ('not', x) ('neg', x) ('in', x, [wartości])
+
+class _ExpressionParser:
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self, offset=0):
+        index = self.position + offset
+        return self.tokens[index] if index < len(self.tokens) else (None, None)
+
+    def take(self):
+        token = self.peek()
+        self.position += 1
+        return token
+
+    def expect(self, value):
+        token = self.take()
+        if token[1] != value:
+            raise SplError(f"Oczekiwano '{value}', jest '{token[1]}'")
+
+    def keyword(self, *words):
+        kind, value = self.peek()
+        return kind == 'word' and value.upper() in words
+
+    def parse(self):
+        node = self.parse_or()
+        if self.position != len(self.tokens):
+            raise SplError(f"Nadmiarowe elementy wyrażenia od '{self.peek()[1]}'")
+        return node
+
+    def parse_or(self):
+        node = self.parse_and()
+        while self.keyword('OR'):
+            self.take()
+            node = ('bin', 'OR', node, self.parse_and())
+        return node
+
+    def parse_and(self):
+        node = self.parse_not()
+        while self.keyword('AND'):
+            self.take()
+            node = ('bin', 'AND', node, self.parse_not())
+        return node
+
+    def parse_not(self):
+        if self.keyword('NOT'):
+            self.take()
+            return ('not', self.parse_not())
+        return self.parse_comparison()
+
+    def parse_comparison(self):
+        node = self.parse_additive()
+        kind, value = self.peek()
+        if kind == 'op' and value in ('=', '==', '!=', '<', '>', '<=', '>='):
+            self.take()
+            return ('bin', '==' if value == '=' else value, node, self.parse_additive())
+        if self.keyword('IN'):
+            self.take()
+            self.expect('(')
+            values = [self.parse_or()]
+            while self.peek()[1] == ',':
+                self.take()
+                values.append(self.parse_or())
+            self.expect(')')
+            return ('in', node, values)
+        if self.keyword('LIKE'):
+            self.take()
+            return ('call', 'like', [node, self.parse_additive()])
+        return node
+
+    def parse_additive(self):
+        node = self.parse_multiplicative()
+        while True:
+            kind, value = self.peek()
+            if kind == 'op' and value in ('+', '-'):
+                self.take()
+                node = ('bin', value, node, self.parse_multiplicative())
+            elif kind == 'word' and value == '.':
+                self.take()
+                node = ('bin', '.', node, self.parse_multiplicative())
+            else:
+                return node
+
+    def parse_multiplicative(self):
+        node = self.parse_unary()
+        while self.peek()[0] == 'op' and self.peek()[1] in ('*', '/', '%'):
+            op = self.take()[1]
+            node = ('bin', op, node, self.parse_unary())
+        return node
+
+    def parse_unary(self):
+        if self.peek() == ('op', '-'):
+            self.take()
+            return ('neg', self.parse_unary())
+        return self.parse_primary()
+
+    def parse_primary(self):
+        kind, value = self.take()
+        if kind == 'num':
+            return ('num', value)
+        if kind == 'str':
+            return ('str', value)
+        if kind == 'field':
+            return ('field', value)
+        if kind == 'op' and value == '(':
+            node = self.parse_or()
+            self.expect(')')
+            return node
+        if kind == 'word':
+            if self.peek() == ('op', '('):
+                self.take()
+                args = []
+                if self.peek() != ('op', ')'):
+                    args.append(self.parse_or())
+                    while self.peek() == ('op', ','):
+                        self.take()
+                        args.append(self.parse_or())
+                self.expect(')')
+                return ('call', value.lower(), args)
+            if value.lower() in ('true', 'false'):
+                return ('num', int(value.lower() == 'true'))
+            return ('field', value)
+        raise SplError(f"Nieoczekiwany element wyrażenia '{value}'")
+
+
+def parse_expression(text):
+    return _ExpressionParser(tokenize(text)).parse()
+
+
+def walk(node):
+    """Wszystkie węzły drzewa wyrażenia (także zagnieżdżone)"""
+    yield node
+    kind = node[0]
+    if kind == 'call':
+        for arg in node[2]:
+            yield from walk(arg)
+    elif kind == 'bin':
+        yield from walk(node[2])
+        yield from walk(node[3])
+    elif kind in ('not', 'neg'):
+        yield from walk(node[1])
+    elif kind == 'in':
+        yield from walk(node[1])
+        for value in node[2]:
+            yield from walk(value)
+
+
+def fields_used(node):
+    return {n[1] for n in walk(node) if n[0] == 'field'}
+
+
+def regexes_used(node):
+    """Pary (pole lub wyrażenie, wzorzec) dla wywołań match() i like()"""
+    found = []
+    for n in walk(node):
+        if n[0] == 'call' and n[1] in ('match', 'like') and len(n[2]) == 2 and n[2][1][0] == 'str':
+            target = n[2][0][1] if n[2][0][0] == 'field' else None
+            found.append((target, n[2][1][1]))
+    return found
+
+
+# ============================================
+# WYRAŻENIA SEARCH
+# ============================================
+# Węzły: ('and', [..]) ('or', [..]) ('not', x) ('term', tekst, w_cudzysłowie) ('cmp', pole, op, wartość)
+
+_SEARCH_TOKEN = re.compile(r'''
+    (?P<space>\s+)
+  | (?P<paren>[()])
+  | (?P<string>"(?:[^"\\]|\\.)*")
+  | (?P<cmp>[\w.:]+\s*(?:!=|<=|>=|=|<|>)\s*(?:"(?:[^"\\]|\\.)*"|[^\s()]*))
+  | (?P<word>[^\s()"]+)
+''', re.VERBOSE)
+
+
+def parse_search(text):
+    tokens = []
+    for match in _SEARCH_TOKEN.finditer(text):
+        kind = match.lastgroup
+        value = match.group()
+        if kind == 'space':
+            continue
+        if kind == 'string':
+            tokens.append(('term', unquote(value), True))
+        elif kind == 'cmp':
+            field, op, rest = re.match(r'([\w.:]+)\s*(!=|<=|>=|=|<|>)\s*(.*)$', value, re.S).groups()
+            tokens.append(('cmp', field, op, unquote(rest) if rest.startswith('"') else rest))
+        elif kind == 'paren':
+            tokens.append(('paren', value))
+        elif value in ('AND', 'OR', 'NOT'):
+            tokens.append(('bool', value))
+        else:
+            tokens.append(('term', value, False))
+    parser = _SearchParser(tokens)
+    node = parser.parse_and()
+    if parser.position != len(tokens):
+        raise SplError(f"Niezrównoważone nawiasy w wyszukiwaniu '{text[:60]}'")
+    return node
+
+
+class _SearchParser:
+    """W SPL OR wiąże mocniej niż (niejawne) AND: a b OR c = a AND (b OR c)"""
+
+    def __init__(self, tokens):
+        self.tokens = tokens
+        self.position = 0
+
+    def peek(self):
+        return self.tokens[self.position] if self.position < len(self.tokens) else None
+
+    def parse_and(self):
+        items = []
+        while True:
+            token = self.peek()
+            if token is None or token == ('paren', ')'):
+                break
+            if token == ('bool', 'AND'):
+                self.position += 1
+                continue
+            items.append(self.parse_or())
+        if not items:
+            return ('and', [])
+        return items[0] if len(items) == 1 else ('and', items)
+
+    def parse_or(self):
+        items = [self.parse_not()]
+        while self.peek() == ('bool', 'OR'):
+            self.position += 1
+            items.append(self.parse_not())
+        return items[0] if len(items) == 1 else ('or', items)
+
+    def parse_not(self):
+        if self.peek() == ('bool', 'NOT'):
+            self.position += 1
+            return ('not', self.parse_not())
+        token = self.peek()
+        if token is None:
+            raise SplError("Niekompletne wyrażenie wyszukiwania")
+        self.position += 1
+        if token == ('paren', '('):
+            node = self.parse_and()
+            if self.peek() != ('paren', ')'):
+                raise SplError("Brak nawiasu zamykającego w wyszukiwaniu")
+            self.position += 1
+            return node
+        return token
+
+
+def search_walk(node):
+    yield node
+    if node[0] in ('and', 'or'):
+        for item in node[1]:
+            yield from search_walk(item)
+    elif node[0] == 'not':
+        yield from search_walk(node[1])
+
+
+def render_search(node, top=True):
+    kind = node[0]
+    if kind == 'term':
+        return f'"{node[1]}"' if node[2] else node[1]
+    if kind == 'cmp':
+        value = node[3]
+        if value == '' or re.search(r'[\s()"]', value):
+            value = '"' + value.replace('\\', '\\\\').replace('"', '\\"') + '"'
+        return f"{node[1]}{node[2]}{value}"
+    if kind == 'not':
+        return f"NOT {render_search(node[1], False)}"
+    if kind == 'or':
+        text = ' OR '.join(render_search(item, False) for item in node[1])
+        return text if top else f"({text})"
+    items = node[1]
+    text = ' '.join(render_search(item, False) for item in items)
+    return text if top or len(items) < 2 else f"({text})"
+
+
+# ============================================
+# ARGUMENTY POLECEŃ
+# ============================================
+
+def _split_top(text, separator=','):
+    """Dzieli tekst po separatorze poza nawiasami i cudzysłowami"""
+    parts, current, depth, quote, escape = [], [], 0, False, False
+    for char in text:
+        if escape:
+            escape = False
+        elif char == '\\' and quote:
+            escape = True
+        elif char == '"':
+            quote = not quote
+        elif not quote and char == '(':
+            depth += 1
+        elif not quote and char == ')':
+            depth -= 1
+        elif not quote and depth == 0 and char == separator:
+            parts.append(''.join(current).strip())
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current).strip())
+    return [part for part in parts if part]
+
+
+def _options(text):
+    """Wiodące opcje polecenia klucz=wartość; zwraca (opcje, reszta tekstu)"""
+    options = {}
+    while True:
+        match = re.match(r'\s*(\w+)=("(?:[^"\\]|\\.)*"|\S+)\s*', text)
+        if not match:
+            return options, text.strip()
+        value = match.group(2)
+        options[match.group(1)] = unquote(value) if value.startswith('"') else value
+        text = text[match.end():]
+
+
+def _field_list(text):
+    return [name.strip().strip('"') for name in re.split(r'[\s,]+', text.strip()) if name.strip()]
+
+
+def _parse_search_command(text):
+    return {'expr': parse_search(text)}
+
+
+def _parse_eval(text):
+    assignments = []
+    for part in _split_top(text):
+        match = re.match(r"\s*('[^']+'|[\w.]+)\s*=(?!=)\s*(.*)$", part, re.S)
+        if not match:
+            raise SplError(f"Niepoprawne przypisanie eval '{part[:40]}'")
+        assignments.append((match.group(1).strip("'"), parse_expression(match.group(2))))
+    return {'assignments': assignments}
+
+
+def _parse_where(text):
+    return {'expr': parse_expression(text)}
+
+
+def _parse_rex(text):
+    options, rest = _options(text)
+    match = re.match(r'\s*("(?:[^"\\]|\\.)*")', rest)
+    if not match:
+        raise SplError(f"rex bez wyrażenia regularnego: '{text[:40]}'")
+    pattern = unquote(match.group(1))
+    return {'field': options.get('field', '_raw'), 'pattern': pattern,
+            'groups': re.findall(r'\(\?P?<(\w+)>', pattern)}
+
+
+def _parse_aggregations(text):
+    """'count(eval(x)) as "A", dc(f) AS b by u, v' -> ([(funkcja, argument, nazwa)], [pola by])"""
+    match = re.search(r'\s+by\s+', text, re.I)
+    by = _field_list(text[match.end():]) if match else []
+    text = text[:match.start()] if match else text
+    aggregations = []
+    tokens = _split_top(text)
+    expanded = []
+    for token in tokens:
+        # "count AS a count AS b" bez przecinków - podział po spacjach poza nawiasami
+        expanded.extend(_split_top(token, ' '))
+    position = 0
+    while position < len(expanded):
+        spec = expanded[position]
+        position += 1
+        alias = None
+        if position + 1 < len(expanded) and expanded[position].lower() == 'as':
+            alias = expanded[position + 1].strip('"')
+            position += 2
+        call = re.match(r'^(\w+)(?:\((.*)\))?$', spec, re.S)
+        if not call:
+            raise SplError(f"Niepoprawna agregacja '{spec}'")
+        function, argument = call.group(1).lower(), call.group(2)
+        if argument and argument.lower().startswith('eval(') and argument.endswith(')'):
+            argument = ('eval', parse_expression(argument[5:-1]))
+        aggregations.append((function, argument, alias or (f"{function}({call.group(2)})" if argument else function)))
+    return aggregations, by
+
+
+def _parse_stats(text):
+    options, rest = _options(text)
+    aggregations, by = _parse_aggregations(rest)
+    return {'options': options, 'aggregations': aggregations, 'by': by}
+
+
+def _parse_timechart(text):
+    options, rest = _options(text)
+    aggregations, by = _parse_aggregations(rest)
+    return {'span': options.get('span'), 'options': options, 'aggregations': aggregations, 'by': by}
+
+
+def _parse_bin(text):
+    items = text.split()
+    options = dict(item.split('=', 1) for item in items if '=' in item)
+    fields = [item for item in items if '=' not in item]
+    return {'field': fields[0] if fields else '_time', 'span': options.get('span')}
+
+
+def _parse_sort(text):
+    options, rest = _options(text)
+    limit = None
+    match = re.match(r'^(\d+)\s+(.*)$', rest)
+    if match:
+        limit, rest = int(match.group(1)), match.group(2)
+    keys = []
+    pending = None
+    for item in re.split(r'[\s,]+', rest.strip()):
+        if item in ('-', '+'):
+            pending = item
+            continue
+        if not item:
+            continue
+        descending = (pending or item[0]) == '-'
+        keys.append((item.lstrip('+-').strip('"'), descending))
+        pending = None
+    return {'keys': keys, 'limit': limit}
+
+
+def _parse_head(text):
+    options, rest = _options(text)
+    return {'limit': int(rest) if rest else int(options.get('limit', 10))}
+
+
+def _parse_fields_list(text):
+    options, rest = _options(text)
+    exclude = rest.startswith('-')
+    return {'fields': _field_list(rest.lstrip('+-')), 'exclude': exclude}
+
+
+def _parse_rename(text):
+    pairs = []
+    for part in _split_top(text):
+        match = re.match(r'^\s*("[^"]*"|\S+)\s+as\s+("[^"]*"|\S+)\s*$', part, re.I | re.S)
+        if not match:
+            raise SplError(f"Niepoprawne rename '{part[:40]}'")
+        pairs.append((match.group(1).strip('"'), match.group(2).strip('"')))
+    return {'pairs': pairs}
+
+
+def _parse_dedup(text):
+    options, rest = _options(text)
+    return {'fields': _field_list(rest)}
+
+
+def _parse_spath(text):
+    options, rest = _options(text)
+    path = options.get('path') or (rest.split()[0] if rest else None)
+    return {'path': path, 'output': options.get('output'), 'input': options.get('input', '_raw')}
+
+
+COMMAND_PARSERS = {
+    'search': _parse_search_command,
+    'eval': _parse_eval,
+    'where': _parse_where,
+    'rex': _parse_rex,
+    'stats': _parse_stats,
+    'timechart': _parse_timechart,
+    'bin': _parse_bin,
+    'bucket': _parse_bin,
+    'sort': _parse_sort,
+    'head': _parse_head,
+    'table': _parse_fields_list,
+    'fields': _parse_fields_list,
+    'rename': _parse_rename,
+    'dedup': _parse_dedup,
+    'spath': _parse_spath,
+}
+
+
+def referenced_fields(commands):
+    """Pola czytane przez polecenia potoku - zbiór nadmiarowy (także pola tworzone w potoku)"""
+    fields = set()
+    for command in commands:
+        args = command.args
+        if args is None:
+            raise SplError(f"polecenie '{command.name}' spoza obsługiwanego podzbioru SPL")
+        name = command.name
+        if name == 'search':
+            fields |= {node[1] for node in search_walk(args['expr']) if node[0] == 'cmp'}
+        elif name == 'eval':
+            for _, node in args['assignments']:
+                fields |= fields_used(node)
+        elif name == 'where':
+            fields |= fields_used(args['expr'])
+        elif name == 'rex':
+            fields.add(args['field'])
+        elif name in ('stats', 'timechart'):
+            for _, argument, _ in args['aggregations']:
+                if isinstance(argument, tuple):
+                    fields |= fields_used(argument[1])
+                elif argument:
+                    fields.add(argument)
+            fields |= set(args['by'])
+        elif name in ('bin', 'bucket'):
+            fields.add(args['field'])
+        elif name == 'sort':
+            fields |= {field for field, _ in args['keys']}
+        elif name in ('table', 'fields', 'dedup'):
+            fields |= set(args['fields'])
+        elif name == 'rename':
+            fields |= {source for source, _ in args['pairs']}
+        elif name == 'spath':
+            fields.add(args['input'])
+    return fields
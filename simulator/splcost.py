@@ -0,0 +1,335 @@
+"""
+Statyczna analiza kosztu zapytań SPL w dashboardach
+Dla każdego panelu szacuje względny koszt (zdarzenia x praca na zdarzenie x długość zakresu czasu),
+wskazuje kosztowne wzorce i układa panele w kolejności, w jakiej warto je poprawiać
+"""
+
+import json
+import re
+
+from spl import (INDEXED_FIELDS, REDUCING_COMMANDS, SplError, dashboard_paths, fields_used, load_panels,
+                 regexes_used, relative_hours, render_search, search_walk)
+
+# Względna praca na jedno zdarzenie (odczyt i dekompresja zdarzenia = 1.0)
+SCAN_COST = 1.0
+COMMAND_COSTS = {
+    'rex': 2.0,
+    'spath': 0.5,
+    'eval': 0.1,
+    'where': 0.1,
+    'search': 0.1,
+    'dedup': 0.8,
+    'sort': 1.5,
+    'bin': 0.1,
+    'table': 0.1,
+    'fields': 0.05,
+    'rename': 0.05,
+}
+REGEX_COST = 1.0
+SPATH_ALL_COST = 3.0
+# Szacowana selektywność: jeden termin dosłowny w wyszukiwaniu bazowym / filtr po wyszukiwaniu
+TERM_SELECTIVITY = 0.05
+FILTER_SELECTIVITY = 0.3
+
+FINDINGS = {
+    'full-index-scan': "pełny skan indeksu - wyszukiwanie bazowe bez terminów zawężających",
+    'raw-regex': "wyrażenia regularne na _raw (lub polu z niego) dla każdego zdarzenia",
+    'late-filter': "filtrowanie dopiero po eval/rex/spath - terminy można przenieść do wyszukiwania bazowego",
+    'repeated-base': "identyczne wyszukiwanie bazowe w kilku panelach",
+    'tstats-candidate': "stats/timechart na polach indeksowanych - można użyć tstats",
+    'spath-all': "spath bez ścieżki wyodrębnia wszystkie pola JSON",
+    'sort-events': "sort na surowych zdarzeniach przed agregacją/head",
+}
+
+
+def regex_keywords(pattern):
+    """Terminy, z których co najmniej jeden musi wystąpić w dopasowaniu - prefiltr dla wyszukiwania bazowego
+
+    Zwraca None, gdy któraś alternatywa nie zawiera dosłownego słowa (np. '1=1').
+    """
+    text = re.sub(r'\(\?[a-zA-Z]+\)', '', pattern)
+    text = re.sub(r'\\[bBAZ]|[\^$]', '', text)
+    # Jedna grupa obejmująca cały wzorzec: \b(grant|revoke)\b -> grant|revoke
+    while text.startswith('(') and text.endswith(')') and _balanced(text[1:-1]):
+        text = text[1:-1]
+    keywords = set()
+    for branch in _top_alternatives(text):
+        # Sekwencje specjalne (\s, \d, \( ...) i klasy znaków rozdzielają słowa
+        cleaned = re.sub(r'\\.|\[[^\]]*\]|[?*+{}().|]', ' ', branch)
+        words = [word for word in re.findall(r'[A-Za-z][A-Za-z0-9_]{2,}', cleaned)]
+        if not words:
+            return None
+        keywords.add(max(words, key=len).lower())
+    return sorted(keywords)
+
+
+def _balanced(text):
+    depth = 0
+    escape = False
+    for char in text:
+        if escape:
+            escape = False
+        elif char == '\\':
+            escape = True
+        elif char == '(':
+            depth += 1
+        elif char == ')':
+            depth -= 1
+            if depth < 0:
+                return False
+    return depth == 0
+
+
+def _top_alternatives(text):
+    parts, current, depth, escape, klass = [], [], 0, False, False
+    for char in text:
+        if escape:
+            escape = False
+        elif char == '\\':
+            escape = True
+        elif char == '[':
+            klass = True
+        elif char == ']':
+            klass = False
+        elif not klass and char == '(':
+            depth += 1
+        elif not klass and char == ')':
+            depth -= 1
+        elif not klass and depth == 0 and char == '|':
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+def base_selectivity(node):
+    """Szacowany ułamek zdarzeń indeksu zwracanych przez wyrażenie wyszukiwania"""
+    kind = node[0]
+    if kind == 'term':
+        return TERM_SELECTIVITY
+    if kind == 'cmp':
+        # Pola indeksowane wybierają indeks/źródło - bez czytania zdarzeń
+        return 1.0 if node[1] in INDEXED_FIELDS else FILTER_SELECTIVITY
+    if kind == 'not':
+        return 1.0
+    if kind == 'or':
+        return min(1.0, sum(base_selectivity(item) for item in node[1]))
+    result = 1.0
+    for item in node[1]:
+        result *= base_selectivity(item)
+    return result
+
+
+def _required_matches(node):
+    """Wzorce match(), które muszą być spełnione, żeby where przepuścił zdarzenie (bez NOT/OR)"""
+    if node[0] == 'call' and node[1] == 'match' and len(node[2]) == 2 and node[2][1][0] == 'str':
+        return [node[2][1][1]]
+    if node[0] == 'bin' and node[1] == 'AND':
+        return _required_matches(node[2]) + _required_matches(node[3])
+    return []
+
+
+def _only_raw_terms(node):
+    """Czy wyrażenie search składa się wyłącznie z terminów dosłownych (bez pól)"""
+    return all(item[0] in ('term', 'and', 'or', 'not') for item in search_walk(node))
+
+
+class PanelCost:
+    """Wynik analizy jednego panelu"""
+
+    def __init__(self, panel):
+        self.panel = panel
+        self.hours = relative_hours(panel.earliest, panel.latest)
+        self.cost = 0.0
+        self.selectivity = 1.0
+        self.findings = []
+        self.base = None
+        self.error = None
+
+    def add(self, code, detail):
+        self.findings.append((code, detail))
+
+    def as_dict(self):
+        return {'dashboard': self.panel.dashboard, 'position': self.panel.position, 'title': self.panel.title,
+                'hours': self.hours, 'cost': round(self.cost, 2), 'selectivity': self.selectivity,
+                'base': self.base, 'error': self.error,
+                'findings': [{'code': code, 'detail': detail} for code, detail in self.findings]}
+
+
+class DashboardCostAnalyzer:
+    """Analizuje panele z podanych plików i drukuje ranking kosztu"""
+
+    def __init__(self, simulator, paths=None, output=None, top=10):
+        self.simulator = simulator
+        self.paths = dashboard_paths(paths)
+        self.output = output
+        self.top = top
+        self.results = []
+
+    def analyze_panel(self, panel):
+        result = PanelCost(panel)
+        try:
+            commands = panel.pipeline()
+        except SplError as e:
+            result.error = str(e)
+            return result
+        base = commands[0]
+        result.base = base.render()
+        expr = base.args.get('expr') if base.name == 'search' else None
+        if expr is not None:
+            result.selectivity = base_selectivity(expr)
+            terms = [n for n in search_walk(expr) if n[0] == 'term']
+            if not terms:
+                result.add('full-index-scan', f"'{result.base}' czyta wszystkie zdarzenia z zakresu "
+                                              f"{result.hours:g} h")
+        flow = result.selectivity
+        cost = flow * SCAN_COST
+        raw_fields = {'_raw'}
+        per_event = []
+        raw_regexes = []
+        for position, command in enumerate(commands[1:], start=1):
+            if command.name in REDUCING_COMMANDS:
+                cost += flow * 0.5
+                self._check_tstats(result, commands, position, expr)
+                break
+            weight = COMMAND_COSTS.get(command.name, 0.2)
+            nodes = []
+            if command.name == 'eval':
+                nodes = [node for _, node in command.args['assignments']]
+            elif command.name == 'where':
+                nodes = [command.args['expr']]
+            regexes = [item for node in nodes for item in regexes_used(node)]
+            weight += REGEX_COST * len(regexes)
+            on_raw = [pattern for target, pattern in regexes if target in raw_fields]
+            if command.name == 'rex' and command.args['field'] in raw_fields:
+                on_raw.append(command.args['pattern'])
+            if on_raw:
+                raw_regexes.append((command.name, len(on_raw), flow))
+            if command.name == 'spath' and not command.args.get('path'):
+                weight += SPATH_ALL_COST
+                result.add('spath-all', "spath bez ścieżki - wskaż potrzebne pola (spath path=...)")
+            if command.name == 'sort':
+                result.add('sort-events', f"sort na {flow:.0%} zdarzeń indeksu przed agregacją")
+            if command.name == 'eval':
+                # Pola wyliczone z _raw (coalesce(statement, message, _raw)) też są "surowe"
+                for name, node in command.args['assignments']:
+                    if fields_used(node) & raw_fields:
+                        raw_fields.add(name)
+            if command.name in ('where', 'search') and per_event:
+                self._check_late_filter(result, command, per_event, expr)
+            cost += flow * weight
+            if command.name in ('where', 'search', 'dedup'):
+                flow *= FILTER_SELECTIVITY
+            if command.name in ('eval', 'rex', 'spath'):
+                per_event.append(command.name)
+            if command.name == 'head' and not any(c.name == 'sort' for c in commands[1:position]):
+                break
+        if raw_regexes:
+            count = sum(n for _, n, _ in raw_regexes)
+            commands_used = sorted({name for name, _, _ in raw_regexes})
+            result.add('raw-regex', f"{count} wyrażeń ({', '.join(commands_used)}) na _raw, najwięcej na "
+                                    f"{max(f for _, _, f in raw_regexes):.0%} zdarzeń indeksu")
+        result.cost = cost * result.hours
+        return result
+
+    def _check_late_filter(self, result, command, per_event, base_expr):
+        if command.name == 'search' and _only_raw_terms(command.args['expr']):
+            result.add('late-filter', f"'search {command.text}' za {len(per_event)} poleceniami per-event "
+                                      f"({', '.join(sorted(set(per_event)))}) - przenieś do wyszukiwania bazowego")
+            return
+        if command.name != 'where':
+            return
+        if base_expr is not None and any(n[0] == 'term' for n in search_walk(base_expr)):
+            return
+        for pattern in _required_matches(command.args['expr']):
+            keywords = regex_keywords(pattern)
+            if keywords:
+                result.add('late-filter', f"where match(...) za {len(per_event)} poleceniami per-event - prefiltr "
+                                          f"w wyszukiwaniu bazowym: ({' OR '.join(keywords)})")
+                return
+
+    def _check_tstats(self, result, commands, position, base_expr):
+        command = commands[position]
+        if position != 1 or base_expr is None or command.name not in ('stats', 'timechart'):
+            return
+        aggregations = command.args.get('aggregations', [])
+        if not aggregations or any(function != 'count' or argument for function, argument, _ in aggregations):
+            return
+        if any(field not in INDEXED_FIELDS for field in command.args.get('by', [])):
+            return
+        nodes = list(search_walk(base_expr))
+        if any(n[0] == 'cmp' and n[1] not in INDEXED_FIELDS for n in nodes):
+            return
+        # Terminy dosłowne w tstats jako TERM(...) - tylko pojedyncze tokeny bez spacji
+        if any(n[0] == 'term' and re.search(r'\s', n[1]) for n in nodes):
+            return
+        where = render_search(_tstats_terms(base_expr))
+        by = command.args.get('by', [])
+        span = f" span={command.args['span']}" if command.name == 'timechart' and command.args.get('span') else ''
+        target = (f"| tstats count where {where}" + (f" by {', '.join(by)}" if by else '')
+                  if command.name == 'stats' else
+                  f"| tstats prestats=t count where {where} by _time{span} | timechart{span} count")
+        result.add('tstats-candidate', target)
+
+    # ============================================
+    # RAPORT
+    # ============================================
+
+    def repeated_bases(self):
+        groups = {}
+        for result in self.results:
+            if result.base:
+                key = (re.sub(r'\s+', ' ', result.base), result.panel.earliest, result.panel.latest)
+                groups.setdefault(key, []).append(result)
+        for (base, _, _), members in groups.items():
+            if len(members) > 1:
+                for result in members:
+                    result.add('repeated-base', f"'{base}' także w {len(members) - 1} innych panelach")
+        return {key: members for key, members in groups.items() if len(members) > 1}
+
+    def run(self):
+        for path in self.paths:
+            for panel in load_panels(path):
+                self.results.append(self.analyze_panel(panel))
+        repeated = self.repeated_bases()
+        self.results.sort(key=lambda r: r.cost, reverse=True)
+        self.print_report(repeated)
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump({'panels': [r.as_dict() for r in self.results]}, f, indent=2, ensure_ascii=False)
+            self.simulator.print_info(f"Wyniki zapisane w {self.output}")
+        return self.results
+
+    def print_report(self, repeated):
+        total = sum(r.cost for r in self.results) or 1.0
+        self.simulator.print_header(f"Koszt paneli: {len(self.results)} wyszukiwań w {len(self.paths)} dashboardach")
+        for rank, result in enumerate(self.results, start=1):
+            line = (f"{rank:2d}. koszt {result.cost:8.1f} ({result.cost / total:5.1%}), "
+                    f"{result.hours:g} h, selektywność {result.selectivity:.3g}: {result.panel.name}")
+            if rank <= self.top:
+                self.simulator.print_info(line)
+                for code, detail in result.findings:
+                    self.simulator.print_detail(f"[{code}] {detail}")
+                if result.error:
+                    self.simulator.print_error(f"Nie przeanalizowano: {result.error}")
+            else:
+                self.simulator.print_detail(line)
+        self.simulator.print_header("Wzorce")
+        for code, description in FINDINGS.items():
+            panels = sum(1 for r in self.results if any(c == code for c, _ in r.findings))
+            if panels:
+                self.simulator.print_info(f"{code}: {panels} paneli - {description}")
+        for (base, earliest, _), members in sorted(repeated.items(), key=lambda item: -len(item[1])):
+            self.simulator.print_info(f"{len(members)}x '{base}' ({earliest}) - kandydat na wspólne wyszukiwanie bazowe")
+
+
+def _tstats_terms(node):
+    if node[0] == 'term':
+        return ('term', f"TERM({node[1]})", False)
+    if node[0] in ('and', 'or'):
+        return (node[0], [_tstats_terms(item) for item in node[1]])
+    if node[0] == 'not':
+        return ('not', _tstats_terms(node[1]))
+    return node
@@ -0,0 +1,1485 @@
+"""
+Lokalny silnik podzbioru SPL do uruchamiania paneli dashboardów bez instancji Splunka
+Zdarzenia z eksportu Splunka (JSON/CSV), z plików logów baz albo wygenerowane przez symulator
+trafiają do tabeli kolumnowej (tablice numpy); polecenia działają na całych kolumnach naraz
+"""
+
+import csv
+import fnmatch
+import gzip
+import json
+import math
+import os
+import random
+import re
+import time
+from datetime import datetime
+
+import numpy as np
+
+from logformats import LOG_SOURCES, LOG_TIMEZONE, LogSynthesizer, parse_timestamp
+from spl import SplError, dashboard_paths, load_panels, parse_pipeline, parse_search
+
+# Domyślny limit sort w Splunku (sort bez liczby zwraca najwyżej 10 000 wierszy)
+SORT_LIMIT = 10000
+# Seria timechart spoza `limit` najczęstszych wartości by
+OTHER_SERIES = 'OTHER'
+NULL_SERIES = 'NULL'
+# Kolejność pól zdarzenia w wynikach (pozostałe alfabetycznie)
+EVENT_FIELDS = ('_time', '_raw', 'index', 'sourcetype', 'source', 'host')
+# Automatyczny dobór span timechart/bin: najmniejszy, przy którym kubełków jest najwyżej AUTO_BINS
+AUTO_BINS = 100
+AUTO_SPANS = (1, 5, 10, 30, 60, 300, 600, 1800, 3600, 86400, 7 * 86400, 30 * 86400)
+SPAN_UNITS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hr': 3600, 'd': 86400, 'day': 86400,
+              'w': 7 * 86400, 'mon': 30 * 86400}
+# Separator wierszy w sklejonej kolumnie - wyszukiwanie terminów jednym przebiegiem regexu
+_ROW_SEPARATOR = '\x00'
+
+_is_none = np.frompyfunc(lambda value: value is None, 1, 1)
+
+
+# ============================================
+# WARTOŚCI
+# ============================================
+
+def _format_number(value):
+    if value != value:
+        return None
+    if float(value).is_integer() and abs(value) < 1e15:
+        return str(int(value))
+    return repr(float(value))
+
+
+def _to_text_value(value):
+    if value is None or type(value) is str:
+        return value
+    if isinstance(value, (bool, np.bool_)):
+        return 'true' if value else 'false'
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return _format_number(value)
+    if isinstance(value, list):
+        return '\n'.join(filter(None, (_to_text_value(item) for item in value)))
+    return str(value)
+
+
+def _to_float_value(value):
+    if value is None:
+        return math.nan
+    if isinstance(value, (int, float, np.integer, np.floating)):
+        return float(value)
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return math.nan
+
+
+def _to_truth_value(value):
+    if value is None:
+        return False
+    if isinstance(value, str):
+        return value != ''
+    if isinstance(value, float):
+        return value == value and value != 0
+    return bool(value)
+
+
+_to_text = np.frompyfunc(_to_text_value, 1, 1)
+_to_float = np.frompyfunc(_to_float_value, 1, 1)
+_to_truth = np.frompyfunc(_to_truth_value, 1, 1)
+
+
+def text(array):
+    """Kolumna jako napisy (object, None = brak wartości)"""
+    if array.dtype == object:
+        return _to_text(array) if len(array) else array
+    if array.dtype == bool:
+        return np.where(array, 'true', 'false').astype(object)
+    result = np.empty(len(array), dtype=object)
+    valid = ~np.isnan(array)
+    result[valid] = [_format_number(value) for value in array[valid]]
+    return result
+
+
+def number(array):
+    """Kolumna jako float64 (NaN = brak wartości lub wartość nieliczbowa)"""
+    if array.dtype == np.float64:
+        return array
+    if array.dtype != object:
+        return array.astype(np.float64)
+    return _to_float(array).astype(np.float64) if len(array) else np.empty(0)
+
+
+def truth(array):
+    if array.dtype == bool:
+        return array
+    if array.dtype == np.float64:
+        return ~np.isnan(array) & (array != 0)
+    return _to_truth(array).astype(bool) if len(array) else np.zeros(0, dtype=bool)
+
+
+def nulls(array):
+    if array.dtype == object:
+        return _is_none(array).astype(bool) if len(array) else np.zeros(0, dtype=bool)
+    if array.dtype == np.float64:
+        return np.isnan(array)
+    return np.zeros(len(array), dtype=bool)
+
+
+def to_object(array):
+    if array.dtype == object:
+        return array
+    result = array.astype(object)
+    if array.dtype == np.float64:
+        result[np.isnan(array)] = None
+    return result
+
+
+def _constant(value, length):
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return np.full(length, float(value))
+    result = np.empty(length, dtype=object)
+    result[:] = [value] * length if isinstance(value, list) else value
+    return result
+
+
+def python_regex(pattern):
+    """Wzorzec PCRE ze Splunka dla modułu re: (?<nazwa> -> (?P<nazwa>, flagi (?i) przeniesione na początek"""
+    flags = ''
+
+    def collect(match):
+        nonlocal flags
+        flags += match.group(1)
+        return ''
+    pattern = re.sub(r'\(\?([aimsux]+)\)', collect, pattern)
+    pattern = re.sub(r'\(\?<(?![=!])(\w+)>', r'(?P<\1>', pattern)
+    if flags:
+        pattern = f"(?{''.join(sorted(set(flags)))}){pattern}"
+    try:
+        return re.compile(pattern)
+    except re.error as e:
+        raise SplError(f"Niepoprawne wyrażenie regularne '{pattern[:60]}': {e}")
+
+
+def _map_values(array, function, memo=True):
+    """Funkcja po wartościach kolumny; powtarzające się wartości liczone raz (kolumny słownikowe)"""
+    result = np.empty(len(array), dtype=object)
+    if not memo:
+        result[:] = [None if value is None else function(value) for value in array]
+        return result
+    cache = {}
+    values = []
+    for value in array:
+        if value is None:
+            values.append(None)
+            continue
+        key = value if type(value) is str else repr(value)
+        if key not in cache:
+            cache[key] = function(value)
+        values.append(cache[key])
+    result[:] = values
+    return result
+
+
+def flatten_json(node, prefix='', out=None):
+    """Pola JSON w nazewnictwie Splunka: a.b, tablice jako a{} / a{}.b (wiele wartości -> lista)"""
+    out = {} if out is None else out
+    if isinstance(node, dict):
+        for key, value in node.items():
+            flatten_json(value, f"{prefix}.{key}" if prefix else key, out)
+    elif isinstance(node, list):
+        for item in node:
+            flatten_json(item, f"{prefix}{{}}", out)
+    else:
+        if isinstance(node, bool):
+            node = 'true' if node else 'false'
+        elif node is not None and not isinstance(node, str):
+            node = float(node)
+        if prefix in out:
+            existing = out[prefix]
+            out[prefix] = existing + [node] if isinstance(existing, list) else [existing, node]
+        else:
+            out[prefix] = node
+    return out
+
+
+# ============================================
+# TABELA ZDARZEŃ
+# ============================================
+
+class EventTable:
+    """Kolumnowa tabela wyników
+
+    Kolumny bazowe (zdarzenia z pliku) są współdzielone przez wszystkie tabele pochodne - filtr
+    zapamiętuje tylko wektor indeksów wierszy, a kolumnę bazową materializuje przy pierwszym
+    odczycie (późna materializacja). Kolumny wyliczone w potoku trzyma już przefiltrowane.
+    """
+
+    def __init__(self, columns, order=None, base=None, index=None, cache=None, overridden=None):
+        self.base = base if base is not None else {}
+        self.index = index
+        self.local = dict(columns)
+        # Pola bazowe nadpisane w potoku (eval/rex na istniejącym polu) - nie wolno czytać ich z bazy
+        self.overridden = set(overridden or ())
+        self.order = list(order) if order is not None else list(columns)
+        self.cache = cache if cache is not None else {}
+        if self.local:
+            self.length = len(next(iter(self.local.values())))
+        elif index is not None:
+            self.length = len(index)
+        else:
+            self.length = len(next(iter(self.base.values()))) if self.base else 0
+
+    def __len__(self):
+        return self.length
+
+    @classmethod
+    def from_rows(cls, rows, order=None):
+        names = list(order or [])
+        for row in rows:
+            for name in row:
+                if name not in names:
+                    names.append(name)
+        columns = {}
+        for name in names:
+            if name == '_time':
+                columns[name] = np.array([_to_float_value(row.get(name)) for row in rows], dtype=np.float64)
+            else:
+                column = np.empty(len(rows), dtype=object)
+                column[:] = [row.get(name) for row in rows]
+                columns[name] = column
+        return cls(columns, order=names)
+
+    def fields(self):
+        return list(self.order)
+
+    def has(self, name):
+        return name in self.local or name in self.base
+
+    def column(self, name):
+        if name in self.local:
+            return self.local[name]
+        if name in self.base:
+            column = self.base[name] if self.index is None else self.base[name][self.index]
+            self.local[name] = column
+            return column
+        return np.full(self.length, None, dtype=object)
+
+    def set(self, name, column):
+        self.local[name] = column
+        if name in self.base:
+            self.overridden.add(name)
+        if name not in self.order:
+            self.order.append(name)
+
+    def base_column(self, name):
+        """Pełna kolumna bazowa (przed filtrami), jeśli pole nie zostało nadpisane w potoku"""
+        if name in self.base and name not in self.overridden:
+            return self.base[name]
+        return None
+
+    def filter(self, selection):
+        """Wiersze wg maski lub wektora indeksów; kolumny bazowe tylko przez indeks"""
+        index = np.arange(self.length)[selection] if self.index is None else self.index[selection]
+        local = {name: column[selection] for name, column in self.local.items()
+                 if self.base_column(name) is None}
+        return EventTable(local, order=self.order, base=self.base, index=index, cache=self.cache,
+                          overridden=self.overridden)
+
+    def project(self, names):
+        columns = {name: self.column(name) for name in names}
+        return EventTable(columns, order=names)
+
+    def rows(self, limit=None):
+        names = self.order
+        count = self.length if limit is None else min(limit, self.length)
+        columns = [self.column(name)[:count] for name in names]
+        result = []
+        for position in range(count):
+            row = {}
+            for name, column in zip(names, columns):
+                value = column[position]
+                if value is None or (isinstance(value, float) and value != value):
+                    continue
+                if name == '_time':
+                    value = datetime.fromtimestamp(float(value), LOG_TIMEZONE).isoformat(timespec='milliseconds')
+                elif isinstance(value, (np.floating, float)):
+                    value = int(value) if float(value).is_integer() else float(value)
+                elif isinstance(value, (np.bool_, bool)):
+                    value = bool(value)
+                row[name] = value
+            result.append(row)
+        return result
+
+    def joined(self, name):
+        """Kolumna małymi literami sklejona w jeden napis + przesunięcia wierszy
+
+        Jeden przebieg regexu po całej kolumnie zamiast wywołania na każdym wierszu. Kolumnę bazową
+        skleja raz na zapytanie; po silnym filtrze taniej skleić tylko pozostałe wiersze.
+        """
+        base = self.base_column(name)
+        full = base is not None and (self.index is None or len(self.index) * 4 >= len(base))
+        key = ('joined', name)
+        if full and key in self.cache:
+            blob, offsets = self.cache[key]
+            return blob, offsets, True
+        values = text(base if full else self.column(name))
+        parts = ['' if value is None else value.lower().replace(_ROW_SEPARATOR, ' ') for value in values]
+        lengths = np.fromiter((len(part) + 1 for part in parts), dtype=np.int64, count=len(parts))
+        offsets = np.concatenate(([0], np.cumsum(lengths)[:-1])) if len(parts) else np.zeros(0, np.int64)
+        blob = _ROW_SEPARATOR.join(parts) + _ROW_SEPARATOR
+        if full:
+            self.cache[key] = (blob, offsets)
+        return blob, offsets, full
+
+    def search_rows(self, regex, name='_raw'):
+        """Maska wierszy z dopasowaniem regexu; lewa granica tokenu sprawdzana poza regexem
+
+        Wzorzec zaczynający się od dosłownego tekstu pozwala modułowi re szybko przeskakiwać
+        napis - asercja (?<!...) na początku wyłączyłaby tę optymalizację.
+        """
+        blob, offsets, full = self.joined(name)
+        starts = np.fromiter((match.start() for match in regex.finditer(blob)
+                              if match.start() == 0 or not blob[match.start() - 1].isalnum()), dtype=np.int64)
+        hits = np.zeros(len(offsets), dtype=bool)
+        if len(starts):
+            hits[np.searchsorted(offsets, starts, side='right') - 1] = True
+        if full and self.index is not None:
+            return hits[self.index]
+        return hits
+
+    def parsed_json(self, name):
+        """Sparsowane dokumenty JSON z kolumny (pamiętane dla kolumny bazowej w obrębie zapytania)"""
+        def parse(value):
+            try:
+                return json.loads(value)
+            except ValueError:
+                return None
+        base = self.base_column(name)
+        if base is None:
+            return _map_values(text(self.column(name)), parse, memo=False)
+        key = ('json', name)
+        if key not in self.cache:
+            self.cache[key] = _map_values(text(base), parse, memo=False)
+        parsed = self.cache[key]
+        return parsed if self.index is None else parsed[self.index]
+
+
+# ============================================
+# WCZYTYWANIE ZDARZEŃ
+# ============================================
+
+_KV_PAIR = re.compile(r'(?<![\w.])([A-Za-z_][\w.]*)=("(?:[^"\\]|\\.)*"|[^\s,;"]*)')
+def extract_fields(raw):
+    """Pola wyciągane w Splunku w czasie wyszukiwania: JSON (AUTO_KV_JSON) albo pary klucz=wartość"""
+    stripped = raw.lstrip()
+    if stripped.startswith('{'):
+        try:
+            return flatten_json(json.loads(raw))
+        except ValueError:
+            pass
+    fields = {}
+    for key, value in _KV_PAIR.findall(raw):
+        if key not in fields:
+            fields[key] = value[1:-1] if value.startswith('"') else value
+    return fields
+
+
+def _open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', errors='replace', newline='')
+    return open(path, encoding='utf-8', errors='replace', newline='')
+
+
+def _source_backend(path):
+    """Baza, z której pochodzi plik logu - po katalogu monitorowanym przez forwarder"""
+    normalized = path.replace('\\', '/')
+    for backend, meta in LOG_SOURCES.items():
+        if os.path.dirname(meta['source']).rsplit('/', 1)[-1] in normalized.split('/'):
+            return backend
+    return None
+
+
+class EventStore:
+    """Zbiór zdarzeń wejściowych - tabela bazowa dla wszystkich zapytań"""
+
+    def __init__(self):
+        self.events = []
+
+    def add(self, raw, ts=None, **meta):
+        if ts is None:
+            ts = parse_timestamp(raw)
+        event = extract_fields(raw)
+        event.update(meta)
+        event['_raw'] = raw
+        event['_time'] = ts if ts is not None else time.time()
+        self.events.append(event)
+
+    def add_fields(self, fields):
+        """Zdarzenie z eksportu Splunka - pola już wyciągnięte, _raw może dołożyć brakujące"""
+        raw = fields.get('_raw')
+        event = extract_fields(raw) if isinstance(raw, str) else {}
+        event.update({key: value for key, value in fields.items() if not key.startswith('__')})
+        ts = fields.get('_time')
+        value = _to_float_value(ts)
+        if value != value and isinstance(ts, str):
+            try:
+                value = datetime.fromisoformat(ts.replace('Z', '+00:00')).timestamp()
+            except ValueError:
+                value = parse_timestamp(raw or '') or time.time()
+        event['_time'] = value
+        self.events.append(event)
+
+    def load(self, path):
+        """Plik lub katalog: eksport Splunka (JSON/CSV z polem _raw) albo surowe logi baz"""
+        if os.path.isdir(path):
+            for directory, _, files in os.walk(path):
+                for name in sorted(files):
+                    self.load(os.path.join(directory, name))
+            return
+        name = os.path.basename(path).lower()
+        stem = name[:-3] if name.endswith('.gz') else name
+        if stem.endswith('.csv'):
+            with _open_text(path) as f:
+                reader = csv.DictReader(f)
+                if '_raw' in (reader.fieldnames or []):
+                    for row in reader:
+                        self.add_fields({key: value for key, value in row.items() if value not in (None, '')})
+                    return
+        with _open_text(path) as f:
+            first = f.readline()
+            f.seek(0)
+            if stem.endswith(('.json', '.jsonl')) and self._is_export(first):
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        self.add_fields(record.get('result', record))
+                return
+            self._load_raw(path, f)
+
+    @staticmethod
+    def _is_export(line):
+        try:
+            record = json.loads(line)
+        except ValueError:
+            return False
+        return isinstance(record, dict) and ('result' in record or '_raw' in record)
+
+    def _load_raw(self, path, f):
+        backend = _source_backend(path)
+        meta = dict(LOG_SOURCES.get(backend, {'host': 'localhost', 'index': 'main', 'sourcetype': 'unknown'}))
+        meta['source'] = path
+        if backend == 'mongodb' and 'audit' not in os.path.basename(path):
+            meta['sourcetype'] = 'mongodb'
+        multiline = backend == 'postgres' and not path.endswith(('.json', '.json.gz'))
+        pending = []
+        for line in f:
+            line = line.rstrip('\r\n')
+            if not line:
+                continue
+            # BREAK_ONLY_BEFORE = ^\d{4}-\d{2}-\d{2} z inputs.conf PostgreSQL
+            if multiline and pending and not re.match(r'\d{4}-\d{2}-\d{2}', line):
+                pending.append(line)
+                continue
+            if pending:
+                self.add('\n'.join(pending), **meta)
+            pending = [line]
+        if pending:
+            self.add('\n'.join(pending), **meta)
+
+    def synthesize(self, count, backends=None, attack_ratio=0.1, seed=None, hours=24.0, now=None):
+        """Zdarzenia z generatora symulatora rozłożone równomiernie w ostatnich `hours` godzinach"""
+        synthesizer = LogSynthesizer(backends, attack_ratio=attack_ratio, seed=seed)
+        rng = random.Random(seed)
+        now = time.time() if now is None else now
+        stamps = sorted(now - rng.random() * hours * 3600 for _ in range(count))
+        for ts in stamps:
+            backend = rng.choice(synthesizer.backends)
+            meta = dict(LOG_SOURCES[backend])
+            if backend == 'mongodb' and rng.random() < 0.5:
+                raw = synthesizer.render_mongod_log(ts, rng.random() < attack_ratio)
+                meta.update(sourcetype='mongodb', source='/var/log/mongodb/mongod.log')
+                self.add(raw, ts=ts, **meta)
+            else:
+                # Wpis PostgreSQL to kilka rekordów jsonlog - każdy jest osobnym zdarzeniem
+                for raw in synthesizer.render(backend, ts).split('\n'):
+                    self.add(raw, ts=ts, **meta)
+
+    def table(self):
+        """Tabela bazowa: zdarzenia od najnowszego (kolejność wyników wyszukiwania w Splunku)"""
+        events = sorted(self.events, key=lambda event: event['_time'], reverse=True)
+        names = set()
+        for event in events:
+            names.update(event)
+        order = [name for name in EVENT_FIELDS if name in names] + sorted(names - set(EVENT_FIELDS))
+        columns = {}
+        for name in order:
+            if name == '_time':
+                columns[name] = np.fromiter((event['_time'] for event in events), dtype=np.float64,
+                                            count=len(events))
+            else:
+                column = np.empty(len(events), dtype=object)
+                column[:] = [event.get(name) for event in events]
+                columns[name] = column
+        return EventTable({}, order=order, base=columns)
+
+
+# ============================================
+# CZAS
+# ============================================
+
+def parse_span(value):
+    match = re.match(r'^(\d*\.?\d*)\s*([a-z]+)$', str(value).strip().lower())
+    if not match or match.group(2) not in SPAN_UNITS:
+        raise SplError(f"Nieobsługiwany span '{value}'")
+    return float(match.group(1) or 1) * SPAN_UNITS[match.group(2)]
+
+
+def resolve_time(value, now):
+    """Czas względny Splunka (-24h@h, -7d@d, now, epoch) na znacznik czasu"""
+    if value is None or value == '':
+        return None
+    value = str(value).strip()
+    if value == 'now':
+        return now
+    if re.match(r'^\d+(\.\d+)?$', value):
+        return float(value)
+    match = re.match(r'^(?:([+-])(\d*)([a-z]+))?(?:@([a-z]+)\d*)?$', value)
+    if not match:
+        raise SplError(f"Nieobsługiwany czas '{value}'")
+    sign, amount, unit, snap = match.groups()
+    moment = datetime.fromtimestamp(now, LOG_TIMEZONE)
+    if unit:
+        offset = parse_span(f"{amount or 1}{unit}")
+        moment = datetime.fromtimestamp(now + (offset if sign == '+' else -offset), LOG_TIMEZONE)
+    if snap:
+        unit = {'min': 'm', 'hr': 'h', 'day': 'd', 'sec': 's'}.get(snap, snap)
+        if unit == 's':
+            moment = moment.replace(microsecond=0)
+        elif unit == 'm':
+            moment = moment.replace(second=0, microsecond=0)
+        elif unit == 'h':
+            moment = moment.replace(minute=0, second=0, microsecond=0)
+        elif unit == 'd':
+            moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        elif unit == 'w':
+            moment = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+            moment = datetime.fromtimestamp(moment.timestamp() - ((moment.weekday() + 1) % 7) * 86400,
+                                            LOG_TIMEZONE)
+        elif unit == 'mon':
+            moment = moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+        else:
+            raise SplError(f"Nieobsługiwane zaokrąglenie czasu '@{snap}'")
+    return moment.timestamp()
+
+
+def bucket_times(times, span):
+    """Początki kubełków czasu; kubełki dobowe i dłuższe od lokalnej północy"""
+    if span >= 86400 and len(times):
+        offset = datetime.fromtimestamp(float(np.nanmin(times)), LOG_TIMEZONE).utcoffset().total_seconds()
+        return np.floor((times + offset) / span) * span - offset
+    return np.floor(times / span) * span
+
+
+def auto_span(earliest, latest):
+    width = max((latest or 0) - (earliest or 0), 1)
+    return next((span for span in AUTO_SPANS if width / span <= AUTO_BINS), AUTO_SPANS[-1])
+
+
+# ============================================
+# WYRAŻENIA
+# ============================================
+
+def _compare(op, left, right):
+    """Porównanie jak w eval: liczbowo, gdy obie strony są liczbami, inaczej jako napisy"""
+    left_number, right_number = number(left), number(right)
+    numeric = ~np.isnan(left_number) & ~np.isnan(right_number)
+    left_text, right_text = text(left), text(right)
+    present = ~nulls(left_text) & ~nulls(right_text)
+    result = np.zeros(len(left), dtype=bool)
+    with np.errstate(invalid='ignore'):
+        compare = {'==': np.equal, '!=': np.not_equal, '<': np.less, '>': np.greater,
+                   '<=': np.less_equal, '>=': np.greater_equal}[op]
+        result[numeric] = compare(left_number[numeric], right_number[numeric])
+    textual = present & ~numeric
+    if textual.any():
+        result[textual] = compare(left_text[textual], right_text[textual]).astype(bool)
+    return result
+
+
+def _like_regex(pattern):
+    parts = ''.join('.*' if char == '%' else '.' if char == '_' else re.escape(char) for char in pattern)
+    return re.compile(f"^{parts}$", re.S)
+
+
+class Evaluator:
+    """Wylicza drzewo wyrażenia eval/where na całej tabeli - wynik to kolumna"""
+
+    def __init__(self, table, now):
+        self.table = table
+        self.now = now
+        self.length = len(table)
+
+    def evaluate(self, node):
+        kind = node[0]
+        if kind == 'num':
+            return _constant(node[1], self.length)
+        if kind == 'str':
+            return _constant(node[1], self.length)
+        if kind == 'field':
+            return self.table.column(node[1])
+        if kind == 'not':
+            return ~truth(self.evaluate(node[1]))
+        if kind == 'neg':
+            return -number(self.evaluate(node[1]))
+        if kind == 'in':
+            value = self.evaluate(node[1])
+            result = np.zeros(self.length, dtype=bool)
+            for item in node[2]:
+                result |= _compare('==', value, self.evaluate(item))
+            return result
+        if kind == 'bin':
+            return self.binary(node[1], node[2], node[3])
+        if kind == 'call':
+            function = getattr(self, f"fn_{node[1]}", None)
+            if function is None:
+                raise SplError(f"Funkcja eval '{node[1]}' spoza obsługiwanego podzbioru")
+            return function(node[2])
+        raise SplError(f"Nieobsługiwany węzeł wyrażenia '{kind}'")
+
+    def truth(self, node):
+        return truth(self.evaluate(node))
+
+    def binary(self, op, left_node, right_node):
+        if op == 'AND':
+            return self.truth(left_node) & self.truth(right_node)
+        if op == 'OR':
+            return self.truth(left_node) | self.truth(right_node)
+        left, right = self.evaluate(left_node), self.evaluate(right_node)
+        if op in ('==', '!=', '<', '>', '<=', '>='):
+            return _compare(op, left, right)
+        if op == '.':
+            return self._concat(left, right)
+        left_number, right_number = number(left), number(right)
+        if op == '+':
+            numeric = ~np.isnan(left_number) & ~np.isnan(right_number)
+            if numeric.all():
+                return left_number + right_number
+            result = to_object(left_number + right_number)
+            textual = ~numeric & ~nulls(left) & ~nulls(right)
+            result[textual] = self._concat(left[textual], right[textual])
+            return result
+        with np.errstate(divide='ignore', invalid='ignore'):
+            if op == '-':
+                return left_number - right_number
+            if op == '*':
+                return left_number * right_number
+            if op == '/':
+                result = left_number / right_number
+            else:
+                result = np.fmod(left_number, right_number)
+        result[~np.isfinite(result)] = np.nan
+        return result
+
+    @staticmethod
+    def _concat(left, right):
+        left, right = text(left), text(right)
+        result = np.empty(len(left), dtype=object)
+        present = ~nulls(left) & ~nulls(right)
+        result[present] = left[present] + right[present]
+        return result
+
+    def _scalar(self, node, default=None):
+        """Argument liczbowy funkcji (liczba cyfr, podstawa) - stała, także przy pustej tabeli"""
+        if node[0] == 'num':
+            return node[1]
+        values = number(self.evaluate(node))
+        return values[0] if len(values) and values[0] == values[0] else default
+
+    def _regex_argument(self, node):
+        if node[0] != 'str':
+            raise SplError("Wyrażenie regularne musi być stałą napisową")
+        return node[1]
+
+    # Funkcje eval - nazwy fn_<funkcja>
+
+    def fn_if(self, args):
+        condition = self.truth(args[0])
+        yes, no = self.evaluate(args[1]), self.evaluate(args[2])
+        if yes.dtype == no.dtype == np.float64:
+            return np.where(condition, yes, no)
+        return np.where(condition, to_object(yes), to_object(no))
+
+    def fn_case(self, args):
+        result = np.full(self.length, None, dtype=object)
+        done = np.zeros(self.length, dtype=bool)
+        for position in range(0, len(args) - 1, 2):
+            selected = self.truth(args[position]) & ~done
+            if selected.any():
+                result[selected] = to_object(self.evaluate(args[position + 1]))[selected]
+            done |= selected
+        return result
+
+    def fn_match(self, args):
+        regex = python_regex(self._regex_argument(args[1]))
+        values = text(self.evaluate(args[0]))
+        return _map_values(values, lambda value: regex.search(value) is not None).astype(bool) \
+            & ~nulls(values)
+
+    def fn_like(self, args):
+        regex = _like_regex(self._regex_argument(args[1]))
+        values = text(self.evaluate(args[0]))
+        return _map_values(values, lambda value: regex.match(value) is not None).astype(bool) \
+            & ~nulls(values)
+
+    def fn_searchmatch(self, args):
+        return _search_mask(self.table, parse_search(self._regex_argument(args[0])))
+
+    def fn_coalesce(self, args):
+        result = np.full(self.length, None, dtype=object)
+        missing = np.ones(self.length, dtype=bool)
+        for node in args:
+            value = to_object(self.evaluate(node))
+            selected = missing & ~nulls(value)
+            result[selected] = value[selected]
+            missing &= ~selected
+        return result
+
+    def fn_isnull(self, args):
+        return nulls(self.evaluate(args[0]))
+
+    def fn_isnotnull(self, args):
+        return ~nulls(self.evaluate(args[0]))
+
+    def fn_true(self, args):
+        return np.ones(self.length, dtype=bool)
+
+    def fn_false(self, args):
+        return np.zeros(self.length, dtype=bool)
+
+    def fn_null(self, args):
+        return np.full(self.length, None, dtype=object)
+
+    def fn_now(self, args):
+        return np.full(self.length, float(self.now))
+
+    def fn_time(self, args):
+        return np.full(self.length, time.time())
+
+    def _strip(self, args, method):
+        values = text(self.evaluate(args[0]))
+        chars = self._regex_argument(args[1]) if len(args) > 1 else None
+        return _map_values(values, lambda value: getattr(value, method)(chars))
+
+    def fn_trim(self, args):
+        return self._strip(args, 'strip')
+
+    def fn_ltrim(self, args):
+        return self._strip(args, 'lstrip')
+
+    def fn_rtrim(self, args):
+        return self._strip(args, 'rstrip')
+
+    def fn_lower(self, args):
+        return _map_values(text(self.evaluate(args[0])), str.lower)
+
+    def fn_upper(self, args):
+        return _map_values(text(self.evaluate(args[0])), str.upper)
+
+    def fn_len(self, args):
+        return number(_map_values(text(self.evaluate(args[0])), len))
+
+    def fn_tostring(self, args):
+        return text(self.evaluate(args[0]))
+
+    def fn_tonumber(self, args):
+        if len(args) > 1:
+            base = int(self._scalar(args[1], 10))
+
+            def parse(value):
+                try:
+                    return float(int(value, base))
+                except ValueError:
+                    return None
+            return number(_map_values(text(self.evaluate(args[0])), parse))
+        return number(self.evaluate(args[0]))
+
+    def fn_substr(self, args):
+        values = text(self.evaluate(args[0]))
+        start = number(self.evaluate(args[1]))
+        length = number(self.evaluate(args[2])) if len(args) > 2 else np.full(self.length, np.nan)
+        result = np.empty(self.length, dtype=object)
+        for position, value in enumerate(values):
+            if value is None or start[position] != start[position]:
+                result[position] = None
+                continue
+            begin = int(start[position])
+            begin = begin - 1 if begin > 0 else max(len(value) + begin, 0)
+            count = length[position]
+            result[position] = value[begin:] if count != count else value[begin:begin + int(count)]
+        return result
+
+    def fn_replace(self, args):
+        regex = python_regex(self._regex_argument(args[1]))
+        replacement = re.sub(r'\\(\d)', r'\\g<\1>', self._regex_argument(args[2]))
+        return _map_values(text(self.evaluate(args[0])), lambda value: regex.sub(replacement, value))
+
+    def fn_split(self, args):
+        separator = self._regex_argument(args[1])
+        return _map_values(text(self.evaluate(args[0])),
+                           lambda value: value.split(separator) if separator else list(value))
+
+    def fn_mvindex(self, args):
+        values = to_object(self.evaluate(args[0]))
+        start = number(self.evaluate(args[1]))
+        end = number(self.evaluate(args[2])) if len(args) > 2 else None
+        result = np.empty(self.length, dtype=object)
+        for position, value in enumerate(values):
+            items = value if isinstance(value, list) else [] if value is None else [value]
+            if start[position] != start[position]:
+                result[position] = None
+                continue
+            first = int(start[position])
+            if end is None:
+                result[position] = items[first] if -len(items) <= first < len(items) else None
+            else:
+                last = int(end[position])
+                last = len(items) + last if last < 0 else last
+                selected = items[first:last + 1]
+                result[position] = selected if len(selected) > 1 else (selected[0] if selected else None)
+        return result
+
+    def fn_mvcount(self, args):
+        values = to_object(self.evaluate(args[0]))
+        return number(_map_values(values, lambda value: len(value) if isinstance(value, list) else 1,
+                                  memo=False))
+
+    def _rounding(self, args, function):
+        return function(number(self.evaluate(args[0])))
+
+    def fn_round(self, args):
+        digits = int(self._scalar(args[1], 0)) if len(args) > 1 else 0
+        values = number(self.evaluate(args[0]))
+        # Splunk zaokrągla połówki od zera, numpy do parzystej
+        scale = 10.0 ** digits
+        return np.sign(values) * np.floor(np.abs(values) * scale + 0.5) / scale
+
+    def fn_floor(self, args):
+        return self._rounding(args, np.floor)
+
+    def fn_ceil(self, args):
+        return self._rounding(args, np.ceil)
+
+    def fn_ceiling(self, args):
+        return self._rounding(args, np.ceil)
+
+    def fn_abs(self, args):
+        return self._rounding(args, np.abs)
+
+    def fn_strftime(self, args):
+        fmt = self._regex_argument(args[1])
+        values = number(self.evaluate(args[0]))
+        result = np.full(self.length, None, dtype=object)
+        valid = ~np.isnan(values)
+        result[valid] = _map_values(to_object(values[valid]), lambda value: datetime.fromtimestamp(
+            value, LOG_TIMEZONE).strftime(fmt))
+        return result
+
+    def fn_strptime(self, args):
+        fmt = self._regex_argument(args[1])
+
+        def parse(value):
+            try:
+                moment = datetime.strptime(value, fmt)
+            except ValueError:
+                return None
+            if moment.tzinfo is None:
+                moment = moment.replace(tzinfo=LOG_TIMEZONE)
+            return moment.timestamp()
+        return number(_map_values(text(self.evaluate(args[0])), parse))
+
+    def fn_relative_time(self, args):
+        values = number(self.evaluate(args[0]))
+        modifier = self._regex_argument(args[1])
+        return number(_map_values(to_object(values), lambda value: resolve_time(modifier, value)))
+
+
+# ============================================
+# WYSZUKIWANIE
+# ============================================
+
+def _term_pattern(term):
+    """Termin wyszukiwania małymi literami, prawa granica tokenu jak w segmentacji Splunka, * = dowolny ciąg"""
+    body = '[^\\s\x00]*'.join(re.escape(part) for part in term.lower().split('*'))
+    return f"{body}(?![a-z0-9])"
+
+
+def _value_regex(value):
+    body = '.*'.join(re.escape(part) for part in value.split('*'))
+    return re.compile(f"^{body}$", re.I | re.S)
+
+
+def _search_terms(table, terms):
+    regex = re.compile('|'.join(_term_pattern(term) for term in terms))
+    if table.has('_raw'):
+        return table.search_rows(regex, '_raw')
+    # Po agregacji terminy dopasowuje się do wartości pól
+    result = np.zeros(len(table), dtype=bool)
+    for name in table.fields():
+        result |= table.search_rows(regex, name)
+    return result
+
+
+def _search_mask(table, node):
+    kind = node[0]
+    if kind == 'term' and node[1] == '*':
+        return np.ones(len(table), dtype=bool)
+    if kind == 'term':
+        return _search_terms(table, [node[1]])
+    if kind == 'cmp':
+        return _compare_field(table, node[1], node[2], node[3])
+    if kind == 'not':
+        return ~_search_mask(table, node[1])
+    if kind == 'or':
+        terms = [item[1] for item in node[1] if item[0] == 'term' and item[1] != '*']
+        result = _search_terms(table, terms) if terms else np.zeros(len(table), dtype=bool)
+        for item in node[1]:
+            if item[0] != 'term' or item[1] == '*':
+                result |= _search_mask(table, item)
+        return result
+    result = np.ones(len(table), dtype=bool)
+    for item in node[1]:
+        result &= _search_mask(table, item)
+        if not result.any():
+            break
+    return result
+
+
+def _compare_field(table, field, op, value):
+    """field=value w wyszukiwaniu: bez rozróżniania wielkości liter, * jako wieloznacznik"""
+    column = table.column(field)
+    if op in ('=', '!='):
+        values = text(column)
+        present = ~nulls(values)
+        if value == '*':
+            matched = present
+        else:
+            regex = _value_regex(value)
+            matched = _map_values(values, lambda item: regex.match(item) is not None).astype(bool) & present
+        return matched if op == '=' else present & ~matched
+    return _compare(op, column, _constant(value, len(table)))
+
+
+# ============================================
+# POLECENIA
+# ============================================
+
+class SplEngine:
+    """Wykonuje zapytanie na tabeli bazowej; zwraca wynik i czasy poszczególnych poleceń"""
+
+    def __init__(self, table, now=None):
+        self.table = table
+        times = table.base.get('_time')
+        if now is None:
+            now = math.ceil(float(times.max())) if times is not None and len(times) else time.time()
+        self.now = now
+
+    def run(self, query, earliest=None, latest=None):
+        commands = parse_pipeline(query) if isinstance(query, str) else query
+        start, end = resolve_time(earliest, self.now), resolve_time(latest, self.now)
+        table = EventTable({}, order=self.table.order, base=self.table.base, cache={})
+        profile = []
+        started = time.perf_counter()
+        if start is not None or end is not None:
+            times = table.column('_time')
+            selection = np.ones(len(table), dtype=bool)
+            if start is not None:
+                selection &= times >= start
+            if end is not None:
+                selection &= times < end
+            table = table.filter(selection)
+        profile.append(('time', len(self.table), len(table), time.perf_counter() - started))
+        self.bounds = (start, end if end is not None else self.now)
+        for command in commands:
+            if command.args is None:
+                raise SplError(f"Polecenie '{command.name}' spoza obsługiwanego podzbioru SPL")
+            handler = getattr(self, f"cmd_{command.name}", None)
+            if handler is None:
+                raise SplError(f"Polecenie '{command.name}' nie jest obsługiwane przez silnik")
+            rows_in = len(table)
+            began = time.perf_counter()
+            table = handler(table, command.args)
+            profile.append((command.name, rows_in, len(table), time.perf_counter() - began))
+        return table, profile
+
+    def cmd_search(self, table, args):
+        if args['expr'] in (('and', []), ('term', '*', False)):
+            return table
+        return table.filter(_search_mask(table, args['expr']))
+
+    def cmd_where(self, table, args):
+        return table.filter(Evaluator(table, self.now).truth(args['expr']))
+
+    def cmd_eval(self, table, args):
+        for name, node in args['assignments']:
+            value = Evaluator(table, self.now).evaluate(node)
+            if value.dtype == bool:
+                # Wynik logiczny zapisany w polu: prawda -> "true", fałsz -> brak wartości (jak count(eval(...)))
+                column = np.full(len(table), None, dtype=object)
+                column[value] = 'true'
+                value = column
+            table.set(name, number(value) if name == '_time' else value)
+        return table
+
+    def cmd_rex(self, table, args):
+        regex = python_regex(args['pattern'])
+        groups = list(regex.groupindex)
+        values = text(table.column(args['field']))
+        outputs = {name: to_object(table.column(name)).copy() for name in groups}
+        memo = args['field'] != '_raw'
+        matches = _map_values(values, regex.search, memo=memo)
+        for position, match in enumerate(matches):
+            if match is None:
+                continue
+            for name in groups:
+                value = match.group(name)
+                if value is not None:
+                    outputs[name][position] = value
+        for name in groups:
+            table.set(name, outputs[name])
+        return table
+
+    def cmd_spath(self, table, args):
+        documents = table.parsed_json(args['input'])
+        path = args['path']
+        if path is None:
+            flattened = [flatten_json(document) if isinstance(document, (dict, list)) else {}
+                         for document in documents]
+            names = sorted({name for fields in flattened for name in fields})
+            for name in names:
+                column = np.empty(len(table), dtype=object)
+                column[:] = [fields.get(name) for fields in flattened]
+                table.set(name, column)
+            return table
+        steps = path.split('.')
+        column = np.empty(len(table), dtype=object)
+        column[:] = [_json_path(document, steps) for document in documents]
+        table.set(args['output'] or path, column)
+        return table
+
+    def cmd_rename(self, table, args):
+        for source, target in args['pairs']:
+            if '*' in source:
+                regex = re.compile('^' + '(.*)'.join(re.escape(part) for part in source.split('*')) + '$')
+                for name in list(table.fields()):
+                    match = regex.match(name)
+                    if match:
+                        groups = iter(match.groups())
+                        renamed = re.sub(r'\*', lambda _: next(groups, ''), target)
+                        table = _rename(table, name, renamed)
+            elif table.has(source):
+                table = _rename(table, source, target)
+        return table
+
+    def cmd_table(self, table, args):
+        names = _expand_fields(table, args['fields'], missing=True)
+        return table.project(names)
+
+    def cmd_fields(self, table, args):
+        selected = _expand_fields(table, args['fields'], missing=False)
+        if args['exclude']:
+            names = [name for name in table.fields() if name not in selected]
+        else:
+            names = selected + [name for name in ('_time', '_raw') if table.has(name) and name not in selected]
+        return table.project(names)
+
+    def cmd_head(self, table, args):
+        return table.filter(slice(0, args['limit']))
+
+    def cmd_dedup(self, table, args):
+        codes, valid, _ = _group_codes(table, args['fields'])
+        rows = np.flatnonzero(valid)
+        _, first = np.unique(codes, return_index=True)
+        return table.filter(np.sort(rows[first]))
+
+    def cmd_sort(self, table, args):
+        limit = SORT_LIMIT if args['limit'] is None else args['limit']
+        keys = []
+        # np.lexsort: ostatni klucz jest główny - klucze dodawane od najmniej ważnego
+        for field, descending in reversed(args['keys']):
+            keys.extend(_sort_keys(table.column(field), descending))
+        order = np.lexsort(keys) if keys else np.arange(len(table))
+        if limit:
+            order = order[:limit]
+        return table.filter(order)
+
+    def cmd_bin(self, table, args):
+        field, span = args['field'], args['span']
+        values = number(table.column(field))
+        if field == '_time':
+            width = parse_span(span) if span else auto_span(*self.bounds)
+            table.set(field, bucket_times(values, width))
+        elif span:
+            width = float(span)
+            table.set(field, np.floor(values / width) * width)
+        return table
+
+    cmd_bucket = cmd_bin
+
+    def cmd_stats(self, table, args):
+        return _stats(table, args['aggregations'], args['by'], self.now)
+
+    def cmd_timechart(self, table, args):
+        options = args['options']
+        span = parse_span(args['span']) if args['span'] else auto_span(*self.bounds)
+        times = bucket_times(number(table.column('_time')), span)
+        table.set('_time', times)
+        by = args['by'][:1]
+        limit = int(options.get('limit', 10))
+        if by:
+            series = text(table.column(by[0]))
+            if options.get('usenull', 'true').lower() in ('true', 't', '1'):
+                series = np.where(nulls(series), NULL_SERIES, series)
+            if limit and len(args['aggregations']) == 1:
+                kept = _top_series(table, by[0], series, args['aggregations'][0], limit, self.now)
+                other = ~np.isin(series, kept) & ~nulls(series)
+                if options.get('useother', 'true').lower() in ('true', 't', '1'):
+                    series = np.where(other, OTHER_SERIES, series)
+                else:
+                    series = np.where(other, None, series)
+            table.set(by[0], series)
+        grouped = _stats(table, args['aggregations'], ['_time'] + by, self.now)
+        # Kubełki w całym zakresie wyszukiwania, także puste
+        start, end = self.bounds
+        low = start if start is not None else (np.nanmin(times) if len(times) else None)
+        if low is None:
+            buckets = np.zeros(0)
+        else:
+            first = bucket_times(np.array([low]), span)[0]
+            last = bucket_times(np.array([end - 1e-6]), span)[0]
+            buckets = np.arange(first, last + span / 2, span)
+        return _pivot(grouped, buckets, by, args['aggregations'])
+
+
+def _json_path(document, steps):
+    values = [document]
+    for step in steps:
+        match = re.match(r'^([^{}]*)((?:\{\d*\})*)$', step)
+        name, indexes = match.groups() if match else (step, '')
+        next_values = []
+        for value in values:
+            if name:
+                value = value.get(name) if isinstance(value, dict) else None
+            for index in re.findall(r'\{(\d*)\}', indexes):
+                if not isinstance(value, list):
+                    value = None
+                elif index == '':
+                    break
+                else:
+                    position = int(index) - 1
+                    value = value[position] if 0 <= position < len(value) else None
+            if value is None:
+                continue
+            if indexes.endswith('{}') and isinstance(value, list):
+                next_values.extend(value)
+            else:
+                next_values.append(value)
+        values = next_values
+    values = [_to_text_value(json.dumps(value) if isinstance(value, (dict, list)) else value)
+              for value in values if value is not None]
+    if not values:
+        return None
+    return values[0] if len(values) == 1 else values
+
+
+def _rename(table, source, target):
+    columns, order = {}, []
+    for name in table.fields():
+        if name == target and name != source:
+            continue
+        renamed = target if name == source else name
+        columns[renamed] = table.column(name)
+        order.append(renamed)
+    return EventTable(columns, order=order)
+
+
+def _expand_fields(table, patterns, missing):
+    names = []
+    for pattern in patterns:
+        if '*' in pattern:
+            names.extend(name for name in table.fields() if fnmatch.fnmatchcase(name, pattern) and name not in names)
+        elif pattern not in names and (missing or table.has(pattern)):
+            names.append(pattern)
+    return names
+
+
+def _sort_keys(column, descending):
+    """Klucze lexsort jednego pola: liczby przed napisami, puste na końcu"""
+    numbers = number(column)
+    texts = text(column)
+    is_number = ~np.isnan(numbers)
+    is_null = nulls(texts)
+    kind = np.where(is_null, 2, np.where(is_number, 0, 1))
+    filled = np.where(is_null | is_number, '', texts).astype(str)
+    _, ranks = np.unique(filled, return_inverse=True)
+    numeric = np.where(is_number, numbers, 0.0)
+    if descending:
+        numeric, ranks = -numeric, -ranks
+        kind = np.where(is_null, 2, 1 - kind)
+    return [ranks, numeric, kind]
+
+
+def _group_codes(table, by):
+    """Kod grupy każdego wiersza (grupy posortowane wg wartości pól by) i maska wierszy z kompletem pól"""
+    length = len(table)
+    if not by:
+        return np.zeros(length, dtype=np.int64), np.ones(length, dtype=bool), [np.zeros(1, dtype=object)]
+    valid = np.ones(length, dtype=bool)
+    inverses, uniques = [], []
+    for field in by:
+        column = table.column(field)
+        values = text(column)
+        present = ~nulls(values)
+        valid &= present
+        if field == '_time' or column.dtype == np.float64:
+            keys = np.where(present, number(column), np.inf)
+        else:
+            keys = np.where(present, values, '').astype(str)
+        unique, inverse = np.unique(keys, return_inverse=True)
+        uniques.append((unique, column.dtype == np.float64 or field == '_time'))
+        inverses.append(inverse.reshape(-1))
+    stacked = np.column_stack(inverses)[valid]
+    if len(stacked):
+        groups, codes = np.unique(stacked, axis=0, return_inverse=True)
+    else:
+        groups, codes = np.zeros((0, len(by)), dtype=np.int64), np.zeros(0, dtype=np.int64)
+    values = []
+    for position, (unique, numeric) in enumerate(uniques):
+        column = unique[groups[:, position]] if len(groups) else unique[:0]
+        values.append(column.astype(np.float64) if numeric else column.astype(object))
+    return codes.reshape(-1), valid, values
+
+
+def _stats(table, aggregations, by, now):
+    codes, valid, group_values = _group_codes(table, by)
+    groups = len(group_values[0]) if by else 1
+    columns = {}
+    order = []
+    for field, values in zip(by, group_values):
+        columns[field] = values
+        order.append(field)
+    evaluator = Evaluator(table, now)
+    for function, argument, alias in aggregations:
+        if isinstance(argument, tuple):
+            argument_values = evaluator.evaluate(argument[1])
+            if argument_values.dtype == bool:
+                argument_values = np.where(argument_values, 1.0, np.nan)
+        elif argument:
+            argument_values = table.column(argument)
+        else:
+            argument_values = None
+        if argument_values is not None:
+            argument_values = argument_values[valid]
+        columns[alias] = _aggregate(function, argument_values, codes, groups)
+        order.append(alias)
+    return EventTable(columns, order=order)
+
+
+def _aggregate(function, values, codes, groups):
+    if function == 'count':
+        if values is None:
+            return np.bincount(codes, minlength=groups).astype(np.float64)
+        return np.bincount(codes[~nulls(values)], minlength=groups).astype(np.float64)
+    if values is None:
+        raise SplError(f"Agregacja '{function}' wymaga argumentu")
+    if function in ('dc', 'distinct_count', 'values'):
+        texts = text(values)
+        present = ~nulls(texts)
+        pairs = np.unique(np.column_stack([codes[present], np.unique(texts[present].astype(str),
+                                                                     return_inverse=True)[1].reshape(-1)]),
+                          axis=0) if present.any() else np.zeros((0, 2), dtype=np.int64)
+        if function != 'values':
+            return np.bincount(pairs[:, 0], minlength=groups).astype(np.float64)
+        unique = np.unique(texts[present].astype(str)) if present.any() else np.zeros(0, dtype=str)
+        result = np.empty(groups, dtype=object)
+        result[:] = [[] for _ in range(groups)]
+        for group, value in pairs:
+            result[group].append(str(unique[value]))
+        return result
+    if function in ('list', 'first', 'last', 'earliest', 'latest'):
+        objects = to_object(values)
+        present = ~nulls(objects)
+        result = np.full(groups, None, dtype=object)
+        rows = np.flatnonzero(present)
+        if function == 'list':
+            result[:] = [[] for _ in range(groups)]
+            for row in rows:
+                result[codes[row]].append(objects[row])
+            return result
+        # Zdarzenia są od najnowszego: first/latest = pierwsze wystąpienie w grupie
+        if function in ('last', 'earliest'):
+            rows = rows[::-1]
+        _, first = np.unique(codes[rows], return_index=True)
+        chosen = rows[first]
+        result[codes[chosen]] = objects[chosen]
+        return result
+    numbers = number(values)
+    present = ~np.isnan(numbers)
+    counts = np.bincount(codes[present], minlength=groups)
+    empty = counts == 0
+    if function == 'sum':
+        result = np.bincount(codes[present], weights=numbers[present], minlength=groups)
+    elif function in ('avg', 'mean'):
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.bincount(codes[present], weights=numbers[present], minlength=groups) / counts
+    elif function == 'min':
+        result = np.full(groups, np.inf)
+        np.minimum.at(result, codes[present], numbers[present])
+    elif function == 'max':
+        result = np.full(groups, -np.inf)
+        np.maximum.at(result, codes[present], numbers[present])
+    else:
+        raise SplError(f"Agregacja '{function}' spoza obsługiwanego podzbioru")
+    result = result.astype(np.float64)
+    result[empty] = np.nan
+    return result
+
+
+def _top_series(table, field, series, aggregation, limit, now):
+    """Wartości by o największej sumie agregacji - pozostałe trafiają do OTHER"""
+    scratch = table.filter(slice(None))
+    scratch.set(field, series)
+    totals = _stats(scratch, [aggregation], [field], now)
+    names = totals.column(field)
+    values = np.nan_to_num(number(totals.column(aggregation[2])))
+    order = np.lexsort((names.astype(str), -values))
+    return np.array(list(names[order][:limit]), dtype=object)
+
+
+def _pivot(grouped, buckets, by, aggregations):
+    """Wynik timechart: wiersz na kubełek czasu, kolumna na serię; puste kubełki count = 0"""
+    times = number(grouped.column('_time'))
+    positions = np.searchsorted(buckets, times)
+    inside = (positions < len(buckets)) & np.isclose(buckets[np.minimum(positions, len(buckets) - 1)], times) \
+        if len(buckets) else np.zeros(len(times), dtype=bool)
+    columns = {'_time': buckets}
+    order = ['_time']
+    series = text(grouped.column(by[0])) if by else None
+    names = sorted({value for value in series if value is not None}, key=lambda name: (name == OTHER_SERIES, name)) \
+        if by else [None]
+    for function, _, alias in aggregations:
+        values = grouped.column(alias)
+        for name in names:
+            title = alias if name is None else (name if len(aggregations) == 1 else f"{alias}: {name}")
+            column = np.zeros(len(buckets)) if function in ('count', 'dc', 'distinct_count', 'sum') \
+                else np.full(len(buckets), np.nan)
+            selected = inside if name is None else inside & (series == name)
+            column[positions[selected]] = number(values)[selected]
+            columns[title] = column
+            order.append(title)
+    return EventTable(columns, order=order)
+
+
+# ============================================
+# URUCHAMIANIE PANELI
+# ============================================
+
+class DashboardRunner:
+    """Uruchamia panele dashboardów na zdarzeniach z plików lub z generatora symulatora"""
+
+    def __init__(self, simulator, paths=None, events=None, count=100000, backends=None, attack_ratio=0.1,
+                 seed=None, hours=24.0, repeat=1, rows=5, output=None):
+        self.simulator = simulator
+        self.paths = dashboard_paths(paths)
+        self.events = events or []
+        self.count = count
+        self.backends = backends
+        self.attack_ratio = attack_ratio
+        self.seed = seed
+        self.hours = hours
+        self.repeat = max(1, repeat)
+        self.rows = rows
+        self.output = output
+        self.results = []
+
+    def load(self):
+        store = EventStore()
+        started = time.perf_counter()
+        if self.events:
+            for path in self.events:
+                store.load(path)
+            origin = f"{len(self.events)} ścieżek"
+        else:
+            store.synthesize(self.count, self.backends, self.attack_ratio, self.seed, self.hours)
+            origin = "generatora symulatora"
+        table = store.table()
+        self.simulator.print_info(f"Wczytano {len(table):,} zdarzeń z {origin}, {len(table.order)} pól "
+                                  f"({time.perf_counter() - started:.2f}s)")
+        return table
+
+    def run_panel(self, engine, panel):
+        entry = {'dashboard': panel.dashboard, 'position': panel.position, 'title': panel.title,
+                 'earliest': panel.earliest, 'latest': panel.latest}
+        try:
+            commands = panel.pipeline()
+            timings = []
+            for _ in range(self.repeat):
+                result, profile = engine.run(commands, panel.earliest, panel.latest)
+                timings.append(sum(seconds for *_, seconds in profile))
+        except SplError as e:
+            entry['error'] = str(e)
+            return entry
+        entry.update(seconds=min(timings), seconds_median=float(np.median(timings)), rows=len(result),
+                     fields=result.fields(), results=result.rows(1000),
+                     profile=[{'command': name, 'rows_in': rows_in, 'rows_out': rows_out, 'seconds': seconds}
+                              for name, rows_in, rows_out, seconds in profile])
+        return entry
+
+    def run(self):
+        table = self.load()
+        engine = SplEngine(table)
+        panels = [panel for path in self.paths for panel in load_panels(path)]
+        self.simulator.print_header(f"Panele: {len(panels)} zapytań, {self.repeat} powtórzeń")
+        for panel in panels:
+            entry = self.run_panel(engine, panel)
+            self.results.append(entry)
+            self.print_panel(panel, entry)
+        self.print_summary()
+        if self.output:
+            with open(self.output, 'w', encoding='utf-8') as f:
+                json.dump({'events': len(table), 'repeat': self.repeat, 'panels': self.results}, f,
+                          indent=2, ensure_ascii=False, default=str)
+            self.simulator.print_info(f"Wyniki zapisane w {self.output}")
+        return self.results
+
+    def print_panel(self, panel, entry):
+        if 'error' in entry:
+            self.simulator.print_error(f"{panel.name}: {entry['error']}")
+            return
+        self.simulator.print_info(f"{panel.name}: {entry['rows']} wierszy, {entry['seconds'] * 1000:.1f} ms")
+        for row in entry['results'][:self.rows]:
+            self.simulator.print_detail(', '.join(f"{name}={_preview(value)}" for name, value in row.items()))
+
+    def print_summary(self):
+        done = [entry for entry in self.results if 'error' not in entry]
+        failed = len(self.results) - len(done)
+        self.simulator.print_header("Podsumowanie")
+        total = sum(entry['seconds'] for entry in done)
+        self.simulator.print_info(f"Wykonano {len(done)} paneli w {total:.2f}s, błędy: {failed}")
+        for entry in sorted(done, key=lambda entry: -entry['seconds'])[:5]:
+            slowest = max(entry['profile'], key=lambda step: step['seconds'])
+            self.simulator.print_info(
+                f"{entry['seconds'] * 1000:8.1f} ms  {os.path.basename(entry['dashboard'])}#{entry['position']} "
+                f"{entry['title']} - najdłużej {slowest['command']} ({slowest['seconds'] * 1000:.1f} ms, "
+                f"{slowest['rows_in']:,} wierszy)")
+        commands = {}
+        for entry in done:
+            for step in entry['profile']:
+                commands[step['command']] = commands.get(step['command'], 0.0) + step['seconds']
+        self.simulator.print_detail("Czas wg poleceń: " + ', '.join(
+            f"{name} {seconds * 1000:.0f} ms" for name, seconds in sorted(commands.items(), key=lambda item: -item[1])))
+
+
+def _preview(value, width=60):
+    value = ', '.join(map(str, value)) if isinstance(value, list) else str(value)
+    value = value.replace('\n', ' ')
+    return value if len(value) <= width else value[:width - 3] + '...'
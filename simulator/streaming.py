@@ -0,0 +1,100 @@
+"""
+Strumieniowy odczyt dużych wyników zapytań przy ograniczonej pamięci
+Wiersze pobierane są paczkami (kursor nazwany PostgreSQL, niebuforowany kursor MariaDB,
+batch_size kursora MongoDB) i od razu porzucane - w pamięci symulatora jest najwyżej
+jedna paczka, której rozmiar dopasowuje się do limitu bajtów
+"""
+
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from itertools import islice
+
+from metrics import METRICS
+
+DEFAULT_BATCH = 2000
+DEFAULT_MEMORY = 16 << 20
+# Paczka nie schodzi poniżej tylu wierszy - przy bardzo szerokich wierszach limit jest przybliżony
+MIN_BATCH = 10
+# Pierwsza paczka jest mała - szerokość wiersza nie jest jeszcze znana
+PROBE_BATCH = 100
+
+
+def value_bytes(value):
+    """Przybliżony rozmiar wartości na łączu (tekst w kodowaniu, liczby i daty stałe)"""
+    if value is None:
+        return 1
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return len(value)
+    if isinstance(value, str):
+        return len(value.encode('utf-8', 'replace'))
+    if isinstance(value, (int, float, bool)):
+        return 8
+    if isinstance(value, (Decimal, date, datetime, timedelta)):
+        return 16
+    return len(str(value))
+
+
+def row_bytes(row):
+    """Rozmiar wiersza SQL (krotka) albo dokumentu MongoDB (RawBSONDocument - dokładny)"""
+    raw = getattr(row, 'raw', None)
+    if raw is not None:
+        return len(raw)
+    return sum(value_bytes(value) for value in row)
+
+
+class ResultStream:
+    """Opróżnia kursor paczkami i liczy wiersze, bajty i największą paczkę w pamięci
+
+    fetch(n) zwraca listę najwyżej n wierszy (pusta = koniec), np. cursor.fetchmany. Po każdej
+    paczce jej rozmiar jest przeliczany ze średniej wielkości wiersza tak, by mieścił się w max_bytes.
+    """
+
+    def __init__(self, backend, batch=DEFAULT_BATCH, max_bytes=DEFAULT_MEMORY):
+        self.backend = backend
+        self.batch = batch
+        self.max_bytes = max_bytes
+        self.rows = 0
+        self.bytes = 0
+        self.batches = 0
+        self.peak_bytes = 0
+        self.elapsed = 0.0
+
+    def limit(self, size):
+        """Rozmiar kolejnej paczki po paczce o średnim wierszu size bajtów"""
+        if size <= 0:
+            return self.batch
+        return max(MIN_BATCH, min(self.batch, self.max_bytes // size))
+
+    def drain(self, fetch):
+        started = time.perf_counter()
+        size = min(self.batch, PROBE_BATCH)
+        try:
+            while True:
+                rows = fetch(size)
+                if not rows:
+                    break
+                chunk = sum(row_bytes(row) for row in rows)
+                self.rows += len(rows)
+                self.bytes += chunk
+                self.batches += 1
+                self.peak_bytes = max(self.peak_bytes, chunk)
+                size = self.limit(chunk // len(rows))
+                # Paczka nie jest nigdzie przechowywana - zwalniana przed pobraniem następnej
+                del rows
+        finally:
+            self.elapsed = time.perf_counter() - started
+            METRICS.inc('stream_rows_total', self.rows, backend=self.backend)
+            METRICS.inc('stream_bytes_total', self.bytes, backend=self.backend)
+        return self
+
+    def describe(self):
+        elapsed = max(self.elapsed, 1e-9)
+        return (f"{self.rows} wierszy, {self.bytes / 1048576:.1f} MB w {self.elapsed:.2f}s "
+                f"({self.rows / elapsed:.0f} wierszy/s, {self.bytes / 1048576 / elapsed:.1f} MB/s, "
+                f"{self.batches} paczek, największa {self.peak_bytes / 1024:.0f} KB)")
+
+
+def mongo_batches(cursor):
+    """fetch(n) dla kursora MongoDB (bufor sterownika wyznacza batch_size kursora)"""
+    return lambda size: list(islice(cursor, size))
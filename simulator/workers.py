@@ -0,0 +1,148 @@
+"""
+Wieloprocesowe generowanie obciążenia (--workers N)
+Każdy proces obsługuje deterministyczny fragment wirtualnych użytkowników i część tempa,
+a liczniki ze wszystkich procesów są na końcu scalane w jedno podsumowanie
+"""
+
+import multiprocessing
+import queue
+import time
+
+from async_engine import AsyncEngine
+from bruteforce import AuthAttackEngine
+from hec import HecEmitter
+from scenarios import ScenarioEngine
+from scheduler import OpenLoopScheduler
+
+# Co tyle sekund rodzic sprawdza, czy procesy bez wyniku jeszcze żyją
+WORKER_POLL = 1.0
+
+
+def merge_counters(total, part):
+    """Scala zagnieżdżone słowniki liczników - sumuje, a pola max_* bierze jako maksimum"""
+    for key, value in part.items():
+        if isinstance(value, dict):
+            merge_counters(total.setdefault(key, {}), value)
+        elif str(key).startswith('max'):
+            total[key] = max(total.get(key, value), value)
+        else:
+            total[key] = total.get(key, 0) + value
+    return total
+
+
+def async_engine_shard(simulator, users, duration, attack_ratio, think_time, backends, seed, ready_timeout=0):
+    """Fabryka fragmentów dla silnika asyncio - proces k dostaje VU o id k, k+N, k+2N, ..."""
+    def build(index, count):
+        return AsyncEngine(simulator, users=users, duration=duration, attack_ratio=attack_ratio,
+                           think_time=think_time, backends=backends, seed=seed,
+                           vu_ids=range(index, users, count), ready_timeout=ready_timeout)
+    return build
+
+
+def scheduler_shard(simulator, rates, profile, process, max_in_flight, pool_size, seed):
+    """Fabryka fragmentów dla harmonogramu open-loop - proces dostaje 1/N tempa każdego strumienia"""
+    def build(index, count):
+        return OpenLoopScheduler(
+            simulator, {key: rate / count for key, rate in rates.items()}, profile,
+            process=process, max_in_flight=max(1, max_in_flight // count),
+            pool_size=max(1, pool_size // count),
+            seed=None if seed is None else f"{seed}:{index}")
+    return build
+
+
+def scenario_engine_shard(simulator, plan, users, duration, pool_size, seed):
+    """Fabryka fragmentów dla silnika scenariuszy - podział VU jak w silniku asyncio"""
+    def build(index, count):
+        return ScenarioEngine(simulator, plan, users=users, duration=duration,
+                              pool_size=max(1, pool_size // count), seed=seed,
+                              vu_ids=range(index, users, count))
+    return build
+
+
+def hec_emitter_shard(simulator, rate, duration, backends, attack_ratio, seed, **client_options):
+    """Fabryka fragmentów dla nadawcy HEC - każdy proces renderuje 1/N tempa własnym generatorem"""
+    def build(index, count):
+        return HecEmitter(simulator, rate=rate / count, duration=duration, backends=backends,
+                          attack_ratio=attack_ratio, seed=None if seed is None else f"{seed}:{index}",
+                          **client_options)
+    return build
+
+
+def auth_attack_shard(simulator, rate, concurrency, duration, backends, seed, **options):
+    """Fabryka fragmentów dla ataku na uwierzytelnianie - 1/N tempa i limitu, słownik z przeplotem"""
+    def build(index, count):
+        return AuthAttackEngine(simulator, rate=rate / count, concurrency=max(1, concurrency // count),
+                                duration=duration, backends=backends, seed=seed, shard=(index, count),
+                                **options)
+    return build
+
+
+def _worker_main(build, index, count, results, worker_init):
+    cleanup = None
+    try:
+        cleanup = worker_init(index) if worker_init is not None else None
+        runner = build(index, count)
+        runner.run_blocking()
+        results.put((index, runner.stats_dict(), None))
+    except Exception as e:
+        results.put((index, None, str(e)))
+    finally:
+        # Proces potomny kończy się bez atexit - zamknięcie jawnie
+        if cleanup is not None:
+            cleanup()
+
+
+def run_sharded(simulator, build, workers, summary_runner, worker_init=None):
+    """Uruchamia N procesów (fork), czeka na wyniki i drukuje scalone podsumowanie
+
+    worker_init(index) wywoływane jest w procesie potomnym przed zbudowaniem fragmentu
+    (np. własny endpoint metryk na kolejnym porcie) i może zwrócić funkcję zamykającą.
+    """
+    context = multiprocessing.get_context('fork')
+    results = context.Queue()
+    processes = [context.Process(target=_worker_main, args=(build, index, workers, results, worker_init),
+                                 name=f"simulator-worker-{index}")
+                 for index in range(workers)]
+
+    simulator.print_info(f"{summary_runner.describe()} - {workers} procesów")
+    started = time.monotonic()
+    for process in processes:
+        process.start()
+
+    merged = {}
+    pending = set(range(workers))
+
+    def collect(result):
+        index, stats, error = result
+        pending.discard(index)
+        if error is not None:
+            simulator.print_error(f"Proces {index} zakończył się błędem: {error}")
+        else:
+            merge_counters(merged, stats)
+
+    while pending:
+        try:
+            collect(results.get(timeout=WORKER_POLL))
+            continue
+        except queue.Empty:
+            pass
+        dead = [index for index in pending if processes[index].exitcode is not None]
+        if not dead:
+            continue
+        # Wynik mógł dotrzeć między upływem limitu a sprawdzeniem procesów
+        try:
+            collect(results.get(timeout=WORKER_POLL))
+            continue
+        except queue.Empty:
+            pass
+        for index in dead:
+            # Proces zabity (OOM, SIGKILL) albo zakończony bez wyniku - nie czekamy na niego
+            pending.discard(index)
+            simulator.print_error(f"Proces {index} zakończył się bez wyniku "
+                                  f"(kod wyjścia {processes[index].exitcode})")
+    for process in processes:
+        process.join()
+
+    if merged:
+        summary_runner.load_stats(merged)
+    summary_runner.print_summary(max(time.monotonic() - started, 1e-9))
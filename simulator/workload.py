@@ -0,0 +1,480 @@
+"""
+Model obciążenia z tablic digestów: pg_stat_statements (PostgreSQL) i performance_schema (MariaDB)
+Migawka statystyk zapytań zamieniana jest na ważony model szablonów: częstość, rozkład czasu
+wykonania i liczba wierszy. Model zapisywany jest w formacie scenariuszy (scenarios/*.json),
+więc tryb scenarios odtwarza go jako normalny ruch w dowolnej skali (--users, --workers, klaster)
+"""
+
+import json
+import math
+import re
+import time
+from datetime import datetime
+
+from config import DB_CONFIG
+from preagg import statement_class
+
+# Konta, którymi odczytywane są statystyki (wymagają wglądu w zapytania wszystkich użytkowników)
+CAPTURE_USERS = {'postgres': 'dba', 'mariadb': 'root'}
+# Konto odtwarzania, gdy autor szablonu nie ma hasła w config.py (MariaDB nie zapisuje autora digestu)
+REPLAY_USERS = {'postgres': 'app_user', 'mariadb': 'dbadmin'}
+# Do modelu trafia tylko ruch aplikacyjny - sterowanie transakcją, SET, DDL itp. pomijane
+MODEL_CLASSES = ('SELECT', 'INSERT', 'UPDATE', 'DELETE', 'WITH', 'REPLACE', 'VALUES')
+FETCH_CLASSES = ('SELECT', 'WITH', 'VALUES')
+# Zapytania katalogowe sterowników i samego narzędzia - odtworzą się same przy połączeniu
+SYSTEM_MARKERS = ('pg_catalog', 'information_schema', 'performance_schema', 'pg_stat_statements',
+                  'pg_prepared_statements', 'pg_type', 'pg_settings', 'mysql.')
+# Pola generowane spójnie przez identity.py (jedna osoba na zapytanie)
+IDENTITY_FIELDS = ('first_name', 'last_name', 'email', 'phone', 'pesel', 'account_number')
+# Kolumny tekstowe o tylu różnych wartościach lub mniej losowane są z wartości z bazy
+MAX_CHOICES = 20
+# Znamiona ataku (wstrzyknięcia, eksfiltracja, dane medyczne) - ruch scenariuszy podejrzanych, nie linia bazowa.
+# Węższe niż filtr preagg: zwykłe DELETE i SELECT * aplikacji należą do modelu.
+ATTACK_PATTERNS = tuple(re.compile(pattern) for pattern in (
+    r"union(\s+all)?\s+select", r"\bor\s+'?1'?\s*=\s*'?1", r"sleep\s*\(", r"benchmark\s*\(",
+    r"pg_sleep", r"load_file\s*\(", r"into\s+(out|dump)file", r"extractvalue|updatexml|xp_cmdshell",
+    r"sensitive_medical_data", r"mysql\.user|pg_shadow|pg_authid",
+))
+# Kwantyle rozkładu log-normalnego dopasowanego do średniej i odchylenia
+QUANTILES = ((50, 0.0), (95, 1.6449), (99, 2.3263))
+
+PG_MARKER = re.compile(r'\$(\d+)')
+MARIADB_MARKER = re.compile(r'\?')
+_TABLES = re.compile(r'\b(?:FROM|JOIN|INTO|UPDATE)\s+([`"\w.]+)', re.I)
+_INSERT = re.compile(r'\bINSERT\s+INTO\s+[`"\w.]+\s*\(([^)]*)\)\s*VALUES\s*\(', re.I)
+_COMPARED = re.compile(r'([`"\w.]+)\s*(?:(?:=|<>|!=|<=|>=|<|>|\bI?LIKE\b)\s*(?:(?:ANY|ALL)\s*\(\s*)?'
+                       r'|\bIN\s*\([^()]*)$', re.I)
+_LIMIT = re.compile(r'\b(?:LIMIT|OFFSET)\s*$', re.I)
+_BETWEEN = re.compile(r'([`"\w.]+)\s+BETWEEN\s+(?:\S+\s+AND\s+)?$', re.I)
+
+
+def _identifier(name):
+    return name.strip().strip('`"').rsplit('.', 1)[-1].lower()
+
+
+def _split_top_level(text):
+    """Dzieli listę po przecinkach poza nawiasami"""
+    parts, depth, current = [], 0, []
+    for char in text:
+        if char == '(':
+            depth += 1
+        elif char == ')':
+            if depth == 0:
+                break
+            depth -= 1
+        elif char == ',' and depth == 0:
+            parts.append(''.join(current))
+            current = []
+            continue
+        current.append(char)
+    parts.append(''.join(current))
+    return parts
+
+
+def parameter_context(sql, marker):
+    """Dla każdego znacznika parametru: (kolumna albo 'limit' albo None, tabele zapytania)
+
+    Kolumna wynika z listy kolumn INSERT, porównania 'kolumna op ?', listy IN lub BETWEEN.
+    """
+    tables = [_identifier(name) for name in _TABLES.findall(sql)]
+    positions = [match.start() for match in marker.finditer(sql)]
+    columns = [None] * len(positions)
+
+    insert = _INSERT.search(sql)
+    if insert:
+        names = [_identifier(name) for name in insert.group(1).split(',')]
+        offset = insert.end()
+        for index, value in enumerate(_split_top_level(sql[offset:])):
+            for match in marker.finditer(value):
+                slot = positions.index(offset + match.start())
+                if index < len(names):
+                    columns[slot] = names[index]
+            offset += len(value) + 1
+
+    for slot, position in enumerate(positions):
+        if columns[slot] is not None:
+            continue
+        before = sql[max(0, position - 120):position]
+        if _LIMIT.search(before):
+            columns[slot] = 'limit'
+            continue
+        match = _BETWEEN.search(before) or _COMPARED.search(before)
+        if match:
+            columns[slot] = _identifier(match.group(1))
+    return columns, tables
+
+
+def lognormal_quantiles(mean, stddev, maximum):
+    """Percentyle z rozkładu log-normalnego o danej średniej i odchyleniu (ograniczone maksimum)"""
+    if not mean or not stddev:
+        return {}
+    sigma = math.sqrt(math.log(1 + (stddev / mean) ** 2))
+    mu = math.log(mean) - sigma ** 2 / 2
+    return {f"p{p}_ms": round(min(math.exp(mu + z * sigma), maximum or math.inf), 3) for p, z in QUANTILES}
+
+
+class ColumnProfile:
+    """Typ i zakres wartości kolumny - źródło generatorów parametrów"""
+
+    __slots__ = ('data_type', 'low', 'high', 'scale', 'choices')
+
+    def __init__(self, data_type, low=None, high=None, scale=None, choices=None):
+        self.data_type = data_type
+        self.low = low
+        self.high = high
+        self.scale = scale
+        self.choices = choices
+
+
+def _type_family(data_type):
+    data_type = (data_type or '').lower()
+    if data_type in ('boolean', 'bool') or data_type.startswith('tinyint(1)'):
+        return 'bool'
+    if 'int' in data_type or data_type in ('serial', 'bigserial'):
+        return 'int'
+    if data_type.startswith(('numeric', 'decimal')):
+        return 'decimal'
+    if data_type.startswith(('double', 'real', 'float')):
+        return 'float'
+    if data_type.startswith(('timestamp', 'date', 'time')):
+        return 'time'
+    if data_type.startswith('interval'):
+        return 'interval'
+    if data_type.startswith(('char', 'varchar', 'character', 'text', 'json', 'uuid', 'enum', 'inet')):
+        return 'text'
+    return None
+
+
+def parameter_token(column, data_type, profile):
+    """Token generatora scenariuszy ('@int:1:100', '@identity:email', ...) dla jednego parametru"""
+    if column == 'limit':
+        return '@int:5:50'
+    if column in IDENTITY_FIELDS:
+        return f"@identity:{column}"
+    family = _type_family(data_type or (profile.data_type if profile else None))
+    if family == 'bool':
+        return '@bool'
+    if family == 'time':
+        return '@now'
+    if family == 'interval':
+        return '@days:1:90'
+    if family in ('int', 'decimal', 'float'):
+        low = profile.low if profile and profile.low is not None else 1
+        high = profile.high if profile and profile.high is not None else max(low, 1000)
+        if family == 'int':
+            return f"@int:{int(low)}:{int(high)}"
+        return f"@{family}:{float(low):g}:{float(high):g}:{profile.scale if profile and profile.scale else 2}"
+    if family == 'text' or column:
+        if profile and profile.choices:
+            return '@choice:' + '|'.join(profile.choices)
+        return f"@uid:{column or 'v'}_"
+    return '@int:1:100'
+
+
+# ============================================
+# MIGAWKI STATYSTYK
+# ============================================
+
+def _pg_connect():
+    import psycopg2
+
+    cfg = DB_CONFIG['postgres']
+    user = CAPTURE_USERS['postgres']
+    conn = psycopg2.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'],
+                            user=user, password=cfg['users'][user], connect_timeout=5)
+    conn.autocommit = True
+    return conn
+
+
+def _mariadb_connect():
+    import mysql.connector
+
+    cfg = DB_CONFIG['mariadb']
+    user = CAPTURE_USERS['mariadb']
+    return mysql.connector.connect(host=cfg['host'], port=cfg['port'], database=cfg['database'],
+                                   user=user, password=cfg['users'][user], connect_timeout=5, autocommit=True)
+
+
+PG_STATEMENTS = """
+    SELECT s.queryid::text, r.rolname, s.query, s.calls, s.total_exec_time + s.total_plan_time,
+           s.mean_exec_time + s.mean_plan_time, s.stddev_exec_time, s.min_exec_time, s.max_exec_time, s.rows
+    FROM pg_stat_statements s
+    JOIN pg_roles r ON r.oid = s.userid
+    JOIN pg_database d ON d.oid = s.dbid
+    WHERE d.datname = current_database() AND s.toplevel
+"""
+MARIADB_DIGESTS = """
+    SELECT DIGEST, NULL, DIGEST_TEXT, COUNT_STAR, SUM_TIMER_WAIT / 1e9, AVG_TIMER_WAIT / 1e9, NULL,
+           MIN_TIMER_WAIT / 1e9, MAX_TIMER_WAIT / 1e9, SUM_ROWS_SENT + SUM_ROWS_AFFECTED
+    FROM performance_schema.events_statements_summary_by_digest
+    WHERE SCHEMA_NAME = DATABASE() AND DIGEST_TEXT IS NOT NULL
+"""
+STAT_FIELDS = ('key', 'user', 'query', 'calls', 'total_ms', 'mean_ms', 'stddev_ms', 'min_ms', 'max_ms', 'rows')
+
+
+def snapshot(backend, cursor):
+    """Migawka tablicy digestów: {klucz: słownik pól STAT_FIELDS} (czasy w ms)"""
+    cursor.execute(PG_STATEMENTS if backend == 'postgres' else MARIADB_DIGESTS)
+    rows = {}
+    for row in cursor.fetchall():
+        entry = dict(zip(STAT_FIELDS, row))
+        for field in STAT_FIELDS[3:]:
+            if entry[field] is not None:
+                entry[field] = float(entry[field])
+        rows[(entry['key'], entry['user'])] = entry
+    return rows
+
+
+def difference(before, after):
+    """Przyrost między migawkami: liczniki i sumy odejmowane, min/max/odchylenie z drugiej migawki"""
+    window = {}
+    for key, entry in after.items():
+        previous = before.get(key)
+        if previous is None or previous['calls'] > entry['calls']:
+            window[key] = entry
+            continue
+        calls = entry['calls'] - previous['calls']
+        if calls <= 0:
+            continue
+        total = entry['total_ms'] - previous['total_ms']
+        window[key] = dict(entry, calls=calls, total_ms=total, mean_ms=total / calls,
+                           rows=entry['rows'] - previous['rows'])
+    return window
+
+
+class WorkloadCapture:
+    """Zbiera digesty zapytań, profiluje kolumny parametrów i zapisuje model jako plik scenariuszy
+
+    Bez okna (window=0) model opisuje statystyki zgromadzone od ostatniego resetu;
+    z oknem - przyrost między dwiema migawkami, wtedy znana jest też częstość na sekundę.
+    """
+
+    def __init__(self, simulator, output='workload_model.json', backends=None, window=0,
+                 min_calls=2, top=200):
+        self.simulator = simulator
+        self.output = output
+        self.backends = [b for b in (backends or DB_CONFIG) if b in CAPTURE_USERS]
+        self.window = window
+        self.min_calls = min_calls
+        self.top = top
+        self.skipped = {}
+        self.columns = {}
+        self.profiles = {}
+
+    def skip(self, backend, reason):
+        counts = self.skipped.setdefault(backend, {})
+        counts[reason] = counts.get(reason, 0) + 1
+
+    def schema(self, backend, cursor):
+        """Typy kolumn bazy: {tabela: {kolumna: typ}}"""
+        if backend == 'postgres':
+            cursor.execute("SELECT table_name, column_name, data_type FROM information_schema.columns "
+                           "WHERE table_schema = 'public'")
+        else:
+            cursor.execute("SELECT TABLE_NAME, COLUMN_NAME, COLUMN_TYPE FROM information_schema.COLUMNS "
+                           "WHERE TABLE_SCHEMA = DATABASE()")
+        columns = {}
+        for table, column, data_type in cursor.fetchall():
+            columns.setdefault(table.lower(), {})[column.lower()] = data_type.lower()
+        return columns
+
+    def profile(self, backend, cursor, tables, column):
+        """Profil kolumny z pierwszej tabeli zapytania, która ją ma (wynik zapamiętywany)"""
+        schema = self.columns[backend]
+        table = next((t for t in tables if column in schema.get(t, {})), None)
+        if table is None:
+            table = next((t for t, names in schema.items() if column in names), None)
+        if table is None:
+            return None
+        key = (backend, table, column)
+        if key in self.profiles:
+            return self.profiles[key]
+        data_type = schema[table][column]
+        family = _type_family(data_type)
+        quote = '"' if backend == 'postgres' else '`'
+        name = f"{quote}{table}{quote}.{quote}{column}{quote}"
+        profile = ColumnProfile(data_type)
+        try:
+            if family in ('int', 'decimal', 'float'):
+                cursor.execute(f"SELECT MIN({name}), MAX({name}) FROM {quote}{table}{quote}")
+                profile.low, profile.high = cursor.fetchone()
+                match = re.search(r',\s*(\d+)', data_type)
+                profile.scale = int(match.group(1)) if match else None
+            elif family == 'text':
+                cursor.execute(f"SELECT DISTINCT {name} FROM {quote}{table}{quote} WHERE {name} IS NOT NULL "
+                               f"LIMIT {MAX_CHOICES + 1}")
+                values = [str(row[0]) for row in cursor.fetchall()]
+                if 0 < len(values) <= MAX_CHOICES and not any('|' in value for value in values):
+                    profile.choices = values
+        except Exception as e:
+            self.simulator.print_error(f"Profil kolumny {backend}.{table}.{column}: {e}")
+        self.profiles[key] = profile
+        return profile
+
+    def parameter_types(self, cursor, sql):
+        """Typy parametrów szablonu PostgreSQL wyznaczone przez serwer (PREPARE bez wykonania)"""
+        cursor.execute(f"PREPARE simulator_capture AS {sql}")
+        try:
+            cursor.execute("SELECT parameter_types::text[] FROM pg_prepared_statements "
+                           "WHERE name = 'simulator_capture'")
+            return list(cursor.fetchone()[0])
+        finally:
+            cursor.execute("DEALLOCATE simulator_capture")
+
+    def template(self, backend, cursor, entry):
+        """Krok scenariusza dla jednego szablonu albo None (z powodem w self.skipped)"""
+        query = ' '.join(entry['query'].split())
+        lowered = query.lower()
+        kind = statement_class(query)
+        if kind not in MODEL_CLASSES:
+            self.skip(backend, 'utility')
+            return None
+        if any(marker in lowered for marker in SYSTEM_MARKERS):
+            self.skip(backend, 'system')
+            return None
+        if any(pattern.search(lowered) for pattern in ATTACK_PATTERNS):
+            # Model to linia bazowa normalnego ruchu - ataki mają własne scenariusze
+            self.skip(backend, 'suspicious')
+            return None
+        if '...' in query:
+            # Digest obcięty (max_digest_length) albo zwinięta lista wartości
+            self.skip(backend, 'truncated')
+            return None
+
+        if backend == 'postgres':
+            if '?' in query:
+                self.skip(backend, 'unsupported')
+                return None
+            try:
+                types = self.parameter_types(cursor, query) if PG_MARKER.search(query) else []
+            except Exception:
+                self.skip(backend, 'unpreparable')
+                return None
+            # Numery $n wg typów z PREPARE, w szablonie zamieniane na '?' w kolejności wystąpień
+            numbers = [int(match.group(1)) for match in PG_MARKER.finditer(query)]
+            columns, tables = parameter_context(query, PG_MARKER)
+            sql = PG_MARKER.sub('?', query)
+            params = [parameter_token(column, types[number - 1] if number <= len(types) else None,
+                                      self.profile(backend, cursor, tables, column) if column not in (None, 'limit') else None)
+                      for number, column in zip(numbers, columns)]
+        else:
+            columns, tables = parameter_context(query, MARIADB_MARKER)
+            sql = query
+            params = [parameter_token(column, None,
+                                      self.profile(backend, cursor, tables, column) if column not in (None, 'limit') else None)
+                      for column in columns]
+
+        step = {'op': 'fetch' if kind in FETCH_CLASSES or ' returning ' in lowered else 'execute', 'sql': sql}
+        if params:
+            step['params'] = params
+        return step
+
+    def capture(self, backend):
+        """Pierwsza migawka digestów jednej bazy z otwartym połączeniem: (statystyki, kursor, połączenie)"""
+        conn = _pg_connect() if backend == 'postgres' else _mariadb_connect()
+        cursor = conn.cursor()
+        try:
+            if backend == 'postgres':
+                cursor.execute("CREATE EXTENSION IF NOT EXISTS pg_stat_statements")
+            self.columns[backend] = self.schema(backend, cursor)
+            stats = snapshot(backend, cursor)
+            return stats, cursor, conn
+        except Exception:
+            cursor.close()
+            conn.close()
+            raise
+
+    def build(self, backend, stats, cursor):
+        """Definicje scenariuszy dla najczęstszych szablonów migawki"""
+        entries = sorted((e for e in stats.values() if e['calls'] >= self.min_calls),
+                         key=lambda e: e['calls'], reverse=True)
+        self.skipped.setdefault(backend, {})['rare'] = len(stats) - len(entries)
+        scenarios = []
+        for entry in entries:
+            if len(scenarios) >= self.top:
+                self.skip(backend, 'beyond_top')
+                continue
+            step = self.template(backend, cursor, entry)
+            if step is None:
+                continue
+            user = entry['user'] if entry['user'] in DB_CONFIG[backend]['users'] \
+                and entry['user'] != CAPTURE_USERS[backend] else REPLAY_USERS[backend]
+            calls = int(entry['calls'])
+            model = {'calls': calls,
+                     'mean_ms': round(entry['mean_ms'] or 0.0, 3),
+                     'min_ms': round(entry['min_ms'] or 0.0, 3),
+                     'max_ms': round(entry['max_ms'] or 0.0, 3),
+                     'rows_per_call': round((entry['rows'] or 0) / calls, 2),
+                     'source_user': entry['user']}
+            if entry['stddev_ms'] is not None:
+                model['stddev_ms'] = round(entry['stddev_ms'], 3)
+                model.update(lognormal_quantiles(entry['mean_ms'], entry['stddev_ms'], entry['max_ms']))
+            if self.window:
+                model['calls_per_second'] = round(calls / self.window, 3)
+            scenarios.append({
+                'name': f"{backend}_{len(scenarios) + 1:03d}_{statement_class(step['sql']).lower()}",
+                'backend': backend,
+                'class': 'normal',
+                'weight': calls,
+                'user': user,
+                'steps': [step],
+                'model': model,
+            })
+        return scenarios
+
+    def run(self):
+        self.simulator.print_header("Przechwytywanie modelu obciążenia")
+        snapshots = {}
+        for backend in self.backends:
+            try:
+                snapshots[backend] = self.capture(backend)
+                self.simulator.print_info(f"{backend}: {len(snapshots[backend][0])} szablonów w tablicy digestów")
+            except Exception as e:
+                self.simulator.print_error(f"{backend}: odczyt statystyk nieudany: {e}")
+        if self.window and snapshots:
+            self.simulator.print_info(f"Okno pomiaru {self.window:g}s...")
+            time.sleep(self.window)
+            for backend, (before, cursor, conn) in snapshots.items():
+                snapshots[backend] = (difference(before, snapshot(backend, cursor)), cursor, conn)
+
+        scenarios = []
+        summary = {}
+        for backend, (stats, cursor, conn) in snapshots.items():
+            try:
+                built = self.build(backend, stats, cursor)
+            finally:
+                cursor.close()
+                conn.close()
+            scenarios.extend(built)
+            calls = sum(s['weight'] for s in built)
+            summary[backend] = {'templates': len(built), 'calls': calls,
+                                'skipped': {k: v for k, v in self.skipped.get(backend, {}).items() if v}}
+            if self.window:
+                summary[backend]['calls_per_second'] = round(calls / self.window, 3)
+
+        if not scenarios:
+            self.simulator.print_error("Brak szablonów do zapisania w modelu")
+            return None
+        model = {'model': {'captured_at': datetime.now().isoformat(timespec='seconds'),
+                           'window_seconds': self.window or None, 'min_calls': self.min_calls,
+                           'backends': summary},
+                 'scenarios': scenarios}
+        with open(self.output, 'w', encoding='utf-8') as f:
+            json.dump(model, f, indent=2, ensure_ascii=False, default=str)
+        self.print_summary(model)
+        return model
+
+    def print_summary(self, model):
+        for backend, entry in model['model']['backends'].items():
+            rate = f", {entry['calls_per_second']:.1f}/s" if 'calls_per_second' in entry else ''
+            skipped = ', '.join(f"{reason} {count}" for reason, count in sorted(entry['skipped'].items()))
+            self.simulator.print_info(f"{backend}: {entry['templates']} szablonów, {entry['calls']} wywołań{rate}"
+                                      + (f" (pominięte: {skipped})" if skipped else ""))
+        total = sum(s['weight'] for s in model['scenarios'])
+        for scenario in model['scenarios'][:10]:
+            stats = scenario['model']
+            self.simulator.print_detail(
+                f"{scenario['weight'] / total:6.1%}  {stats['mean_ms']:8.2f} ms  {stats['rows_per_call']:8.1f} wierszy  "
+                f"{scenario['backend']}/{scenario['user']}: {scenario['steps'][0]['sql'][:90]}")
+        self.simulator.print_info(f"Model zapisany w {self.output} - odtwarzanie: "
+                                  f"simulate_activity.py scenarios --scenario-file {self.output} --users N")